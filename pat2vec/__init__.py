@@ -65,6 +65,7 @@ from .pat2vec_get_methods.get_method_diagnostics import (
     COLUMNS_TO_DROP,
     DIAGNOSTICS_FIELDS,
     calculate_diagnostic_features,
+    calculate_diagnostic_order_features,
     create_diagnostic_features_dataframe,
     get_current_pat_diagnostics,
     prepare_diagnostic_datetime,
@@ -73,6 +74,7 @@ from .pat2vec_get_methods.get_method_diagnostics import (
 from .pat2vec_get_methods.get_method_drugs import (
     DRUG_FIELDS,
     calculate_drug_features,
+    calculate_drug_order_features,
     create_drug_features_dataframe,
     get_current_pat_drugs,
     prepare_drug_datetime,
@@ -581,7 +583,9 @@ __all__ = [
     "calculate_core_resus_features",
     "calculate_covid_features",
     "calculate_diagnostic_features",
+    "calculate_diagnostic_order_features",
     "calculate_drug_features",
+    "calculate_drug_order_features",
     "calculate_hospital_site_features",
     "calculate_interval",
     "calculate_pretty_name_count_features",
@@ -5,6 +5,10 @@ import pandas as pd
 
 from pat2vec.util.filter_dataframe_by_timestamp import filter_dataframe_by_timestamp
 from pat2vec.util.get_start_end_year_month import get_start_end_year_month
+from pat2vec.util.observation_features import (
+    ObservationFeatureSpec,
+    observation_features_frame,
+)
 from pat2vec.util.parse_date import validate_input_dates
 
 BED_FIELDS = [
@@ -16,6 +20,9 @@ BED_FIELDS = [
     "clientvisit_visitidcode",
 ]
 
+#: A binary `bed_<value>` feature per distinct CORE_BedNumber3 value.
+BED_SPEC = ObservationFeatureSpec("CORE_BedNumber3", "presence", prefix="bed_")
+
 
 def search_bed_data(
     cohort_searcher_with_terms_and_search=None,
@@ -198,25 +205,6 @@ def get_bed(
             config_obj=config_obj,
         )
 
-    features = pd.DataFrame(
-        data=[current_pat_client_id_code], columns=["client_idcode"]
+    return observation_features_frame(
+        current_pat_client_id_code, current_pat_raw, BED_SPEC
     )
-
-    if len(current_pat_raw) == 0:
-        return features
-
-    features_data = current_pat_raw[
-        current_pat_raw["obscatalogmasteritem_displayname"] == search_term
-    ].copy()
-
-    features_data.dropna(subset=["observation_valuetext_analysed"], inplace=True)
-
-    "bed".lower()
-
-    if len(features_data) > 0:
-        all_bed_terms = list(features_data["observation_valuetext_analysed"].unique())
-
-        for bed_term in all_bed_terms:
-            features[f"bed_{bed_term}"] = 1
-
-    return features
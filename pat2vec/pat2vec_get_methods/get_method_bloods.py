@@ -5,7 +5,6 @@ from typing import Union, Optional, List
 import numpy as np
 import pandas as pd
 from IPython.display import display
-from scipy import stats
 
 from pat2vec.util.filter_dataframe_by_timestamp import filter_dataframe_by_timestamp
 from pat2vec.util.get_start_end_year_month import get_start_end_year_month
@@ -20,6 +19,32 @@ BLOODS_FIELDS = [
     "updatetime",
 ]
 
+#: The features calculated for each blood test, in column order.
+BLOODS_FEATURES = [
+    "mean",
+    "median",
+    "mode",
+    "std",
+    "num-tests",
+    "days-since-last-test",
+    "max",
+    "min",
+    "most-recent",
+    "earliest-test",
+    "days-between-first-last",
+    "contains-extreme-low",
+    "contains-extreme-high",
+]
+
+#: The number of results a test needs for each feature to be calculated.
+BLOODS_FEATURE_MIN_TESTS = {
+    "mean": 1,
+    "most-recent": 2,
+    "earliest-test": 2,
+    "days-since-last-test": 2,
+    "num-tests": 2,
+}
+
 
 def search_bloods_data(
     cohort_searcher_with_terms_and_search=None,
@@ -133,6 +158,88 @@ def search_bloods_data(
     return results
 
 
+def calculate_bloods_features(
+    current_pat_bloods: pd.DataFrame, today: datetime
+) -> pd.DataFrame:
+    """Calculates the features of each blood test of a patient at once.
+
+    The results are sorted by time once and reduced per test with a single
+    groupby, rather than per test in Python. Each test gets the
+    `BLOODS_FEATURES` columns `<test>_<feature>`, which are missing if the
+    test has fewer results than `BLOODS_FEATURE_MIN_TESTS` (3 by default).
+
+    Args:
+        current_pat_bloods (pd.DataFrame): The patient's blood test results,
+            with `basicobs_itemname_analysed`, `basicobs_value_numeric` and
+            `datetime` columns.
+        today (datetime): The date the days since the last test are counted to.
+
+    Returns:
+        pd.DataFrame: A single-row DataFrame with the `client_idcode` and the
+            features of each test, or an empty DataFrame if there are no
+            results.
+    """
+    if current_pat_bloods.empty:
+        return pd.DataFrame(columns=["client_idcode"])
+
+    bloods = pd.DataFrame(
+        {
+            "item": current_pat_bloods["basicobs_itemname_analysed"].to_numpy(),
+            "value": current_pat_bloods["basicobs_value_numeric"]
+            .astype(float)
+            .to_numpy(),
+            "datetime": current_pat_bloods["datetime"].reset_index(drop=True),
+        }
+    ).sort_values("datetime", kind="mergesort")
+    items = pd.unique(current_pat_bloods["basicobs_itemname_analysed"].dropna())
+
+    grouped = bloods.groupby("item", sort=False)
+    features = grouped["value"].agg(["mean", "median", "std", "min", "max", "size"])
+    features = features.rename(columns={"size": "num-tests"}).reindex(items)
+
+    # The most frequent value of each test, the smallest of any ties.
+    value_counts = bloods.groupby(["item", "value"]).size().reset_index(name="n")
+    features["mode"] = (
+        value_counts.sort_values(["item", "n", "value"], ascending=[True, False, True])
+        .drop_duplicates("item")
+        .set_index("item")["value"]
+    )
+
+    earliest = bloods.drop_duplicates("item", keep="first").set_index("item")
+    latest = bloods.drop_duplicates("item", keep="last").set_index("item")
+    features["earliest-test"] = earliest["value"]
+    features["most-recent"] = latest["value"]
+    features["days-since-last-test"] = (
+        pd.Timestamp(today) - latest["datetime"]
+    ).dt.days
+    features["days-between-first-last"] = (
+        latest["datetime"] - earliest["datetime"]
+    ).dt.days
+
+    extreme_range = features["std"] * 3
+    features["contains-extreme-low"] = (
+        features["min"] < features["mean"] - extreme_range
+    ).astype(float)
+    features["contains-extreme-high"] = (
+        features["max"] > features["mean"] + extreme_range
+    ).astype(float)
+
+    n_tests = features["num-tests"]
+    features = features[BLOODS_FEATURES].astype(float)
+    for feature in BLOODS_FEATURES:
+        min_tests = BLOODS_FEATURE_MIN_TESTS.get(feature, 3)
+        features.loc[n_tests < min_tests, feature] = np.nan
+
+    df_unique_filtered = pd.DataFrame(
+        [features.to_numpy().ravel()],
+        columns=[f"{item}_{feature}" for item in items for feature in BLOODS_FEATURES],
+    )
+    df_unique_filtered.insert(
+        0, "client_idcode", current_pat_bloods["client_idcode"].iloc[0]
+    )
+    return df_unique_filtered
+
+
 def get_current_pat_bloods(
     current_pat_client_id_code,
     target_date_range,
@@ -225,74 +332,6 @@ def get_current_pat_bloods(
             current_pat_bloods[bloods_time_field], errors="coerce"
         )
 
-    basicobs_itemname_analysed_list = list(
-        current_pat_bloods["basicobs_itemname_analysed"].unique()
-    )
-
-    basicobs_itemname_analysed_df_dict = {
-        elem: current_pat_bloods[current_pat_bloods.basicobs_itemname_analysed == elem]
-        for elem in basicobs_itemname_analysed_list
-    }
-
-    df_unique = current_pat_bloods.copy()
-
-    df_unique.drop_duplicates(subset="client_idcode", inplace=True)
-
-    df_unique.reset_index(inplace=True)
-
-    obs_columns_list = basicobs_itemname_analysed_list
-
-    obs_columns_set = list(set(obs_columns_list))
-
-    obs_columns_set_columns_for_df = []
-    for i in range(0, len(obs_columns_set)):
-        obs_columns_set_columns_for_df.append(obs_columns_set[i] + "_mean")
-        obs_columns_set_columns_for_df.append(obs_columns_set[i] + "_median")
-        obs_columns_set_columns_for_df.append(obs_columns_set[i] + "_mode")
-        obs_columns_set_columns_for_df.append(obs_columns_set[i] + "_std")
-        obs_columns_set_columns_for_df.append(obs_columns_set[i] + "_num-tests")
-        obs_columns_set_columns_for_df.append(
-            obs_columns_set[i] + "_days-since-last-test"
-        )
-        obs_columns_set_columns_for_df.append(obs_columns_set[i] + "_max")
-        obs_columns_set_columns_for_df.append(obs_columns_set[i] + "_min")
-        obs_columns_set_columns_for_df.append(obs_columns_set[i] + "_most-recent")
-        obs_columns_set_columns_for_df.append(obs_columns_set[i] + "_earliest-test")
-        obs_columns_set_columns_for_df.append(
-            obs_columns_set[i] + "_days-between-first-last"
-        )
-        obs_columns_set_columns_for_df.append(
-            obs_columns_set[i] + "_contains-extreme-low"
-        )
-        obs_columns_set_columns_for_df.append(
-            obs_columns_set[i] + "_contains-extreme-high"
-        )
-
-    orig_columns = list(df_unique.columns)
-
-    comb_cols = orig_columns + obs_columns_set_columns_for_df
-
-    df_unique = df_unique.reindex(comb_cols, axis=1)
-
-    df_unique = df_unique.copy()
-    df_unique.drop(
-        [
-            "index",
-            "_index",
-            "_id",
-            "_score",
-            "basicobs_itemname_analysed",
-            "basicobs_value_numeric",
-            "basicobs_entered",
-            "clientvisit_serviceguid",
-            "datetime",
-            "updatetime",
-        ],
-        inplace=True,
-        axis=1,
-        errors="ignore",
-    )
-
     if batch_mode:
 
         today = datetime.now(timezone.utc)
@@ -300,121 +339,7 @@ def get_current_pat_bloods(
     else:
         today = datetime.today()
 
-    df_unique_filtered = df_unique.copy()
-
-    i = 0
-
-    for j in range(0, len(basicobs_itemname_analysed_list)):
-        col_name = basicobs_itemname_analysed_list[j]
-
-        filtered_df = basicobs_itemname_analysed_df_dict.get(col_name)
-
-        filtered_column_values = filtered_df.basicobs_value_numeric.astype(
-            float
-        )._get_numeric_data()
-
-        df_len = len(filtered_df)
-
-        if df_len >= 1:
-            # Mean assurance*
-            agg_val = float(filtered_column_values.values[0])
-
-            df_unique_filtered.at[i, col_name + "_mean"] = agg_val
-
-        if df_len >= 2:
-            # try:
-            # Mean
-            agg_val = filtered_column_values.mean()
-
-            df_unique_filtered.at[i, col_name + "_mean"] = agg_val
-
-            # recent
-            agg_val = filtered_df.sort_values(by="datetime").iloc[-1][
-                "basicobs_value_numeric"
-            ]
-
-            df_unique_filtered.at[i, col_name + "_most-recent"] = agg_val
-
-            # earliest-test
-            agg_val = filtered_df.sort_values(by="datetime").iloc[0][
-                "basicobs_value_numeric"
-            ]
-            df_unique_filtered.at[i, col_name + "_earliest-test"] = agg_val
-
-            # days-since-last-test
-            date_object = filtered_df.sort_values(by="datetime").iloc[-1]["datetime"]
-
-            delta = today - date_object
-
-            agg_val = delta.days
-
-            df_unique_filtered.at[i, col_name + "_days-since-last-test"] = agg_val
-
-            # n tests
-
-            agg_val = len(filtered_column_values)
-
-            df_unique_filtered.at[i, col_name + "_num-tests"] = agg_val
-
-        if df_len >= 3:
-
-            # median
-            agg_val = filtered_column_values.median()
-            df_unique_filtered.at[i, col_name + "_median"] = agg_val
-
-            # mode
-            agg_val = np.atleast_1d(stats.mode(filtered_column_values)[0])[0]
-            df_unique_filtered.at[i, col_name + "_mode"] = agg_val
-
-            # std
-            agg_val = filtered_column_values.std()
-            df_unique_filtered.at[i, col_name + "_std"] = agg_val
-
-            # min
-            agg_val = min(filtered_column_values)
-            df_unique_filtered.at[i, col_name + "_min"] = agg_val
-
-            # max
-            agg_val = max(filtered_column_values)
-            df_unique_filtered.at[i, col_name + "_max"] = agg_val
-
-            # contains extreme low
-            col_name_mean = (
-                basicobs_itemname_analysed_df_dict.get(col_name)
-                .basicobs_value_numeric._get_numeric_data()
-                .mean()
-            )
-            col_name_std = (
-                basicobs_itemname_analysed_df_dict.get(col_name)
-                .basicobs_value_numeric._get_numeric_data()
-                .std()
-            )
-
-            col_name_low = col_name_mean - (col_name_std * 3)
-
-            agg_val = int(float(min(filtered_column_values)) < col_name_low)
-            df_unique_filtered.at[i, col_name + "_contains-extreme-low"] = agg_val
-
-            # contains extreme high
-            col_name_high = col_name_mean + (col_name_std * 3)
-
-            agg_val = int(float(max(filtered_column_values)) > col_name_high)
-
-            df_unique_filtered.at[i, col_name + "_contains-extreme-high"] = agg_val
-
-            # days_between earliest and last
-
-            latest = filtered_df.sort_values(by="datetime").iloc[-1]["datetime"]
-
-            oldest = filtered_df.sort_values(by="datetime").iloc[0]["datetime"]
-
-            delta = latest - oldest
-
-            agg_val = delta.days
-
-            df_unique_filtered.at[i, col_name + "_days-between-first-last"] = agg_val
-
-            # current_pat_bloods = df_unique_filtered
+    df_unique_filtered = calculate_bloods_features(current_pat_bloods, today)
 
     if config_obj.verbosity >= 6:
         display(df_unique_filtered)
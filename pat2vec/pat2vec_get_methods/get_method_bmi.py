@@ -6,6 +6,7 @@ from IPython.display import display
 
 from pat2vec.util.filter_dataframe_by_timestamp import filter_dataframe_by_timestamp
 from pat2vec.util.get_start_end_year_month import get_start_end_year_month
+from pat2vec.util.observation_features import calculate_component_stats
 from pat2vec.util.parse_date import validate_input_dates
 
 BMI_FIELDS = [
@@ -17,6 +18,16 @@ BMI_FIELDS = [
     "clientvisit_visitidcode",
 ]
 
+#: The BMI, height and weight observation items mapped to their feature prefixes.
+BMI_COMPONENTS = {
+    "OBS BMI Calculation": "bmi",
+    "OBS Height": "height",
+    "OBS Weight": "weight",
+}
+
+#: Exclusive bounds of plausible BMI, height (cm) and weight (kg) values.
+BMI_BOUNDS = {"bmi": (6, 200), "height": (30, 300), "weight": (1, 800)}
+
 
 def search_bmi_observations(
     cohort_searcher_with_terms_and_search=None,
@@ -154,50 +165,52 @@ def calculate_bmi_features(bmi_sample, term_prefix="bmi", negate_biochem=False):
     Returns:
         Dict[str, Union[float, int]]: A dictionary of calculated features.
     """
-    features = {}
-
+    stats = None
     if len(bmi_sample) > 0:
-        value_array = bmi_sample["observation_valuetext_analysed"].astype(float)
-
-        features[f"{term_prefix}_mean"] = value_array.mean()
-        features[f"{term_prefix}_median"] = value_array.median()
-        features[f"{term_prefix}_std"] = value_array.std()
-
-        if term_prefix == "bmi":
-            # BMI-specific features
-            features[f"{term_prefix}_high"] = int(bool(value_array.median() > 24.9))
-            features[f"{term_prefix}_low"] = int(bool(value_array.median() < 18.5))
-            features[f"{term_prefix}_extreme"] = int(bool(value_array.median() > 30))
-            features[f"{term_prefix}_max"] = max(value_array)
-            features[f"{term_prefix}_min"] = min(value_array)
-        elif term_prefix in ["weight"]:
-            # Weight-specific features (max/min)
-            features[f"{term_prefix}_max"] = max(value_array)
-            features[f"{term_prefix}_min"] = min(value_array)
-
-    elif negate_biochem:
-        # Set NaN values for all features
-        base_features = [
-            f"{term_prefix}_mean",
-            f"{term_prefix}_median",
-            f"{term_prefix}_std",
-        ]
-
-        if term_prefix == "bmi":
-            base_features.extend(
-                [
-                    f"{term_prefix}_high",
-                    f"{term_prefix}_low",
-                    f"{term_prefix}_extreme",
-                    f"{term_prefix}_max",
-                    f"{term_prefix}_min",
-                ]
-            )
-        elif term_prefix == "weight":
-            base_features.extend([f"{term_prefix}_max", f"{term_prefix}_min"])
+        stats = (
+            bmi_sample["observation_valuetext_analysed"]
+            .astype(float)
+            .agg(["mean", "median", "std", "max", "min"])
+        )
+
+    return bmi_stat_features(stats, term_prefix, negate_biochem)
+
+
+def bmi_stat_features(stats, term_prefix="bmi", negate_biochem=False):
+    """Names the BMI, weight or height features of a term's statistics.
+
+    Args:
+        stats (Optional[Mapping[str, float]]): The mean, median, std, max and
+            min of the term's values, or None if it has no values.
+        term_prefix (str): Prefix for feature column names (e.g., 'bmi',
+            'weight', 'height'). Defaults to "bmi".
+        negate_biochem (bool): If True, returns features with NaN values when
+            `stats` is None. Defaults to False.
 
-        for feature in base_features:
-            features[feature] = np.nan
+    Returns:
+        Dict[str, Union[float, int]]: A dictionary of calculated features.
+    """
+    if stats is None:
+        if not negate_biochem:
+            return {}
+        stats = dict.fromkeys(["mean", "median", "std", "max", "min"], np.nan)
+
+    features = {
+        f"{term_prefix}_mean": stats["mean"],
+        f"{term_prefix}_median": stats["median"],
+        f"{term_prefix}_std": stats["std"],
+    }
+    if term_prefix == "bmi":
+        # BMI-specific features
+        median = stats["median"]
+        flags = {"high": median > 24.9, "low": median < 18.5, "extreme": median > 30}
+        for name, flag in flags.items():
+            features[f"{term_prefix}_{name}"] = (
+                np.nan if pd.isna(median) else int(bool(flag))
+            )
+    if term_prefix in ["bmi", "weight"]:
+        features[f"{term_prefix}_max"] = stats["max"]
+        features[f"{term_prefix}_min"] = stats["min"]
 
     return features
 
@@ -268,60 +281,25 @@ def get_bmi_features(
             config_obj=config_obj,
         )
 
-    # Check if we have BMI calculation data
-    bmi_calculation_data = current_pat_raw_bmi[
-        current_pat_raw_bmi["obscatalogmasteritem_displayname"] == "OBS BMI Calculation"
-    ]
+    bmi_features = {"client_idcode": current_pat_client_id_code}
 
-    if len(bmi_calculation_data) == 0:
-        bmi_features = pd.DataFrame(
-            data={"client_idcode": [current_pat_client_id_code]}
-        )
-    else:
-        # Initialize features DataFrame
-        bmi_features = pd.DataFrame(
-            data={"client_idcode": [current_pat_client_id_code]}
+    # Features are only given if there is BMI calculation data
+    if (
+        current_pat_raw_bmi["obscatalogmasteritem_displayname"] == "OBS BMI Calculation"
+    ).any():
+        # The statistics of BMI, height and weight, in one grouped reduction
+        bmi_stats = calculate_component_stats(
+            current_pat_raw_bmi, BMI_COMPONENTS, bounds=BMI_BOUNDS
         )
+        for term_prefix in BMI_COMPONENTS.values():
+            stats = (
+                bmi_stats.loc[term_prefix] if term_prefix in bmi_stats.index else None
+            )
+            bmi_features.update(
+                bmi_stat_features(stats, term_prefix, config_obj.negate_biochem)
+            )
 
-        # Get BMI features
-        bmi_sample = bmi_calculation_data[
-            (bmi_calculation_data["observation_valuetext_analysed"].astype(float) < 200)
-            & (bmi_calculation_data["observation_valuetext_analysed"].astype(float) > 6)
-        ]
-
-        bmi_stats = calculate_bmi_features(bmi_sample, "bmi", config_obj.negate_biochem)
-        for key, value in bmi_stats.items():
-            bmi_features[key] = value
-
-        # Get height features
-        height_sample = current_pat_raw_bmi[
-            current_pat_raw_bmi["obscatalogmasteritem_displayname"] == "OBS Height"
-        ]
-        height_sample = height_sample[
-            (height_sample["observation_valuetext_analysed"].astype(float) < 300)
-            & (height_sample["observation_valuetext_analysed"].astype(float) > 30)
-        ]
-
-        height_stats = calculate_bmi_features(
-            height_sample, "height", config_obj.negate_biochem
-        )
-        for key, value in height_stats.items():
-            bmi_features[key] = value
-
-        # Get weight features
-        weight_sample = current_pat_raw_bmi[
-            current_pat_raw_bmi["obscatalogmasteritem_displayname"] == "OBS Weight"
-        ]
-        weight_sample = weight_sample[
-            (weight_sample["observation_valuetext_analysed"].astype(float) < 800)
-            & (weight_sample["observation_valuetext_analysed"].astype(float) > 1)
-        ]
-
-        weight_stats = calculate_bmi_features(
-            weight_sample, "weight", config_obj.negate_biochem
-        )
-        for key, value in weight_stats.items():
-            bmi_features[key] = value
+    bmi_features = pd.DataFrame([bmi_features])
 
     if config_obj.verbosity >= 6:
         display(bmi_features)
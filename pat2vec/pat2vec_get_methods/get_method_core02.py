@@ -1,10 +1,16 @@
 import os
+from dataclasses import replace
 import pandas as pd
 from IPython.display import display
 from typing import List, Optional
 
 from pat2vec.util.filter_dataframe_by_timestamp import filter_dataframe_by_timestamp
 from pat2vec.util.get_start_end_year_month import get_start_end_year_month
+from pat2vec.util.observation_features import (
+    ObservationFeatureSpec,
+    calculate_observation_features,
+    observation_features_frame,
+)
 from pat2vec.util.parse_date import validate_input_dates
 
 CORE_O2_FIELDS = [
@@ -158,6 +164,12 @@ def clean_observation_value(value):
     return str(value).replace("-", "_").replace("%", "pct")
 
 
+#: A binary feature per distinct CORE_SpO2 value.
+CORE_O2_SPEC = ObservationFeatureSpec(
+    "CORE_SpO2", "presence", clean=clean_observation_value
+)
+
+
 def calculate_core_o2_features(features_data, search_term="CORE_SpO2"):
     """Calculates O2 saturation features from CORE_SpO2 observations.
 
@@ -170,19 +182,9 @@ def calculate_core_o2_features(features_data, search_term="CORE_SpO2"):
     Returns:
         Dict[str, int]: A dictionary of calculated binary features.
     """
-    features = {}
-
-    if len(features_data) > 0:
-        # Get all unique observation values, excluding NaN values
-        all_terms = features_data["observation_valuetext_analysed"].dropna().unique()
-
-        # Create binary features for each unique observation value
-        for term in all_terms:
-            cleaned_term = clean_observation_value(term)
-            if cleaned_term:  # Only add if cleaning was successful
-                features[cleaned_term] = 1
-
-    return features
+    return calculate_observation_features(
+        features_data, replace(CORE_O2_SPEC, search_term=search_term)
+    )
 
 
 def get_core_02(
@@ -264,30 +266,10 @@ def get_core_02(
             config_obj=config_obj,
         )
 
-    # Initialize features DataFrame
-    features = pd.DataFrame(
-        data=[current_pat_client_id_code], columns=["client_idcode"]
+    features = observation_features_frame(
+        current_pat_client_id_code, current_pat_raw, CORE_O2_SPEC
     )
 
-    if len(current_pat_raw) == 0:
-        # Return base DataFrame with just client_idcode if no data found
-        return features
-
-    # Filter for the specific observation type and clean data
-    features_data = current_pat_raw[
-        current_pat_raw["obscatalogmasteritem_displayname"] == search_term
-    ].copy()
-
-    # Remove rows with NaN values in the observation_valuetext_analysed column
-    features_data = features_data.dropna(subset=["observation_valuetext_analysed"])
-
-    # Calculate features
-    o2_stats = calculate_core_o2_features(features_data, search_term)
-
-    # Add calculated features to the DataFrame
-    for key, value in o2_stats.items():
-        features[key] = value
-
     if config_obj.verbosity >= 6:
         display(features)
 
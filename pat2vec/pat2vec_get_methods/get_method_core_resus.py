@@ -1,10 +1,16 @@
 import os
+from dataclasses import replace
 import pandas as pd
 from IPython.display import display
 from typing import List, Optional
 
 from pat2vec.util.filter_dataframe_by_timestamp import filter_dataframe_by_timestamp
 from pat2vec.util.get_start_end_year_month import get_start_end_year_month
+from pat2vec.util.observation_features import (
+    ObservationFeatureSpec,
+    calculate_observation_features,
+    observation_features_frame,
+)
 from pat2vec.util.parse_date import validate_input_dates
 
 CORE_RESUS_FIELDS = [
@@ -16,6 +22,21 @@ CORE_RESUS_FIELDS = [
     "clientvisit_visitidcode",
 ]
 
+#: The number of each resuscitation status.
+CORE_RESUS_SPEC = ObservationFeatureSpec(
+    "CORE_RESUS_STATUS",
+    "count",
+    prefix="core_resus_status_",
+    values={
+        "For cardiopulmonary resuscitation": "For cardiopulmonary resuscitation",
+        "Not for cardiopulmonary resuscitation": (
+            "Not for cardiopulmonary resuscitation"
+        ),
+    },
+    negated_value=0,
+    dropna=False,
+)
+
 
 def search_core_resus_observations(
     cohort_searcher_with_terms_and_search=None,
@@ -155,29 +176,11 @@ def calculate_core_resus_features(
     Returns:
         Dict[str, int]: A dictionary of calculated features.
     """
-    features = {}
-
-    if len(features_data) > 0:
-        # Count occurrences of each resuscitation status
-        features[f"{term_prefix}_For cardiopulmonary resuscitation"] = len(
-            features_data[
-                features_data["observation_valuetext_analysed"]
-                == "For cardiopulmonary resuscitation"
-            ]
-        )
-        features[f"{term_prefix}_Not for cardiopulmonary resuscitation"] = len(
-            features_data[
-                features_data["observation_valuetext_analysed"]
-                == "Not for cardiopulmonary resuscitation"
-            ]
-        )
-    elif negate_biochem:
-        # Set 0 values when negate_biochem is True and no data available
-        features[f"{term_prefix}_For cardiopulmonary resuscitation"] = 0
-        features[f"{term_prefix}_Not for cardiopulmonary resuscitation"] = 0
-    # If negate_biochem is False and no data, don't add features (pass)
-
-    return features
+    return calculate_observation_features(
+        features_data,
+        replace(CORE_RESUS_SPEC, prefix=f"{term_prefix}_"),
+        negate_biochem,
+    )
 
 
 def get_core_resus(
@@ -251,29 +254,16 @@ def get_core_resus(
             config_obj=config_obj,
         )
 
-    # Initialize features DataFrame
-    features = pd.DataFrame(
-        data=[current_pat_client_id_code], columns=["client_idcode"]
-    )
-
     if len(current_pat_raw) == 0:
-        # Return base DataFrame with just client_idcode if no data found
-        return features
-
-    # Filter for CORE_RESUS_STATUS observations
-    features_data = current_pat_raw[
-        current_pat_raw["obscatalogmasteritem_displayname"] == "CORE_RESUS_STATUS"
-    ].copy()
-
-    # Calculate features
-    term = "CORE_RESUS_STATUS".lower()
-    resus_stats = calculate_core_resus_features(
-        features_data, term, config_obj.negate_biochem
-    )
+        # Unlike `calculate_core_resus_features`, empty slices are not negated.
+        return pd.DataFrame({"client_idcode": [current_pat_client_id_code]})
 
-    # Add calculated features to the DataFrame
-    for key, value in resus_stats.items():
-        features[key] = value
+    features = observation_features_frame(
+        current_pat_client_id_code,
+        current_pat_raw,
+        CORE_RESUS_SPEC,
+        config_obj.negate_biochem,
+    )
 
     if config_obj.verbosity >= 6:
         display(features)
@@ -7,6 +7,10 @@ from IPython.display import display
 
 from pat2vec.util.filter_dataframe_by_timestamp import filter_dataframe_by_timestamp
 from pat2vec.util.get_start_end_year_month import get_start_end_year_month
+from pat2vec.util.observation_features import (
+    ObservationFeatureSpec,
+    observation_features_frame,
+)
 from pat2vec.util.parse_date import validate_input_dates
 
 COVID_FIELDS = [
@@ -21,6 +25,20 @@ COVID_FIELDS = [
 SEARCH_TERM_ES = r"SARS CoV-2 \(COVID-19\) RNA"
 SEARCH_TERM_PLAIN = "SARS CoV-2 (COVID-19) RNA"
 
+#: `covid_positive` is 1 if any result is positive, else 0 if any is negative.
+COVID_SPEC = ObservationFeatureSpec(
+    SEARCH_TERM_PLAIN,
+    "first_match",
+    prefix="covid_positive",
+    values={"positive": 1, "negative": 0},
+    item_column="basicobs_itemname_analysed",
+    value_column="basicobs_value_analysed",
+    lowercase=True,
+    negated_value=0,
+    always_present=True,
+    dropna=False,
+)
+
 
 def search_covid(
     cohort_searcher_with_terms_and_search: Optional[Callable] = None,
@@ -153,26 +171,9 @@ def calculate_covid_features(
     Returns:
         pd.DataFrame: A single-row DataFrame with the `covid_positive` feature.
     """
-    features = pd.DataFrame({"client_idcode": [current_pat_client_id_code]})
-
-    if not features_data.empty:
-        value_array = features_data["basicobs_value_analysed"].dropna().str.lower()
-
-        is_positive = value_array.str.contains("positive").any()
-        is_negative = value_array.str.contains("negative").any()
-
-        if is_positive:
-            features["covid_positive"] = 1
-        elif is_negative:
-            features["covid_positive"] = 0
-        else:
-            features["covid_positive"] = np.nan  # No clear positive or negative results
-    elif negate_biochem:
-        features["covid_positive"] = 0
-    else:
-        features["covid_positive"] = np.nan
-
-    return features
+    return observation_features_frame(
+        current_pat_client_id_code, features_data, COVID_SPEC, negate_biochem
+    )
 
 
 def get_covid(
@@ -238,23 +239,10 @@ def get_covid(
             config_obj=config_obj,
         )
 
-    if raw_data.empty:
-        features = pd.DataFrame({"client_idcode": [current_pat_client_id_code]})
-        features["covid_positive"] = 0 if config_obj.negate_biochem else np.nan
-        return features
-
-    features_data = raw_data[
-        raw_data["basicobs_itemname_analysed"] == SEARCH_TERM_PLAIN
-    ].copy()
-
-    if features_data.empty:
-        features = pd.DataFrame({"client_idcode": [current_pat_client_id_code]})
-        features["covid_positive"] = 0 if config_obj.negate_biochem else np.nan
-        return features
-
-    features = calculate_covid_features(
-        features_data,
+    features = observation_features_frame(
         current_pat_client_id_code,
+        raw_data,
+        COVID_SPEC,
         negate_biochem=config_obj.negate_biochem,
     )
 
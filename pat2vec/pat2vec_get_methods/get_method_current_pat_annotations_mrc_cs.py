@@ -3,13 +3,20 @@ from typing import Callable, Optional, Tuple
 import pandas as pd
 from IPython.display import display
 
-from pat2vec.util.filter_dataframe_by_timestamp import filter_dataframe_by_timestamp
 from pat2vec.util.get_start_end_year_month import get_start_end_year_month
-from pat2vec.util.methods_annotation import (
-    calculate_pretty_name_count_features,
-)
+from pat2vec.util.annotation_count_index import get_annotation_count_index
 from pat2vec.util.methods_get import update_pbar
 
+#: The fields of the MRC clinical notes (observations) whose annotations are read.
+MCT_DOCS_FIELDS = [
+    "observation_guid",
+    "client_idcode",
+    "obscatalogmasteritem_displayname",
+    "observation_valuetext_analysed",
+    "observationdocument_recordeddtm",
+    "clientvisit_visitidcode",
+]
+
 
 def get_current_pat_annotations_mrc_cs(
     current_pat_client_id_code: str,
@@ -77,29 +84,16 @@ def get_current_pat_annotations_mrc_cs(
 
     if batch_mct_docs_annotations is not None:
 
-        filtered_batch_mct_docs_annotations = filter_dataframe_by_timestamp(
-            batch_mct_docs_annotations,
-            start_year,
-            start_month,
-            end_year,
-            end_month,
-            start_day,
-            end_day,
-            "observationdocument_recordeddtm",
-            dropna=True,
+        # Counted from the patient's count index, built once across slices
+        df_pat_target = get_annotation_count_index(
+            batch_mct_docs_annotations, "observationdocument_recordeddtm"
+        ).count_features(
+            start_year, start_month, end_year, end_month, start_day, end_day
         )
 
-        if len(filtered_batch_mct_docs_annotations) > 0:
-
-            df_pat_target = calculate_pretty_name_count_features(
-                filtered_batch_mct_docs_annotations, suffix="mct"
-            )
-        else:
+        if df_pat_target is None:
             if config_obj.verbosity >= 6:
-                print(
-                    "len(filtered_batch_mct_docs_annotations)>0",
-                    len(filtered_batch_mct_docs_annotations) > 0,
-                )
+                print("No annotations in target_date_range", target_date_range)
             df_pat_target = pd.DataFrame(
                 data=[current_pat_client_id_code], columns=["client_idcode"]
             )
@@ -9,6 +9,7 @@ from pat2vec.pat2vec_search.data_helper_functions import append_age_at_record_se
 
 # from COGStats import EthnicityAbstractor
 # from COGStats import *
+from pat2vec.util.demographics_timeline import get_demographics_timeline
 from pat2vec.util.ethnicity_abstractor import EthnicityAbstractor
 from pat2vec.util.filter_dataframe_by_timestamp import filter_dataframe_by_timestamp
 from pat2vec.util.get_start_end_year_month import get_start_end_year_month
@@ -24,7 +25,9 @@ def get_demo(
 
     This function orchestrates the retrieval of the latest demographic record
     for a patient within a target date range and then processes it to extract
-    features for age, sex, deceased status, and ethnicity.
+    features for age, sex, deceased status, and ethnicity. In batch mode, the
+    records of `pat_batch` are processed once per patient into a
+    `DemographicsTimeline`, which each time slice then reads from.
 
     Args:
         current_pat_client_id_code (str): The client ID code for the patient.
@@ -35,6 +38,23 @@ def get_demo(
     Returns:
         pd.DataFrame: A single-row DataFrame with demographic features.
     """
+    if config_obj.batch_mode and not pat_batch.empty:
+        start_year, start_month, end_year, end_month, start_day, end_day = (
+            get_start_end_year_month(target_date_range, config_obj=config_obj)
+        )
+        current_pat_demo = get_demographics_timeline(pat_batch).demographic_features(
+            current_pat_client_id_code,
+            start_year,
+            start_month,
+            end_year,
+            end_month,
+            start_day,
+            end_day,
+        )
+        if config_obj.verbosity >= 6:
+            display(current_pat_demo)
+        return current_pat_demo
+
     # Filters the raw pat batch of data to return the latest row of raw data within the target date range
     current_pat_demo = get_demographics3_batch(
         [current_pat_client_id_code],
@@ -8,6 +8,11 @@ from IPython.display import display
 from pat2vec.util.filter_dataframe_by_timestamp import filter_dataframe_by_timestamp
 from pat2vec.util.get_start_end_year_month import get_start_end_year_month
 from pat2vec.util.methods_get import convert_date
+from pat2vec.util.order_features import (
+    concat_orders_by_name,
+    order_features,
+    summarise_orders,
+)
 from pat2vec.util.parse_date import validate_input_dates
 
 DIAGNOSTICS_FIELDS = [
@@ -188,21 +193,20 @@ def prepare_diagnostic_datetime(
     return data
 
 
-def calculate_diagnostic_features(
-    order_name_df_dict: Dict[str, pd.DataFrame],
-    order_name_list: List[str],
+def calculate_diagnostic_order_features(
+    current_pat_diagnostics: pd.DataFrame,
     batch_mode: bool = False,
 ) -> Dict:
     """Calculates diagnostic features for each order type.
 
     Computes features like the number of orders, days since the last order,
     and the time span between the first and last order for each diagnostic
-    test type.
+    test type. All order names are summarised at once, with one groupby over
+    the order times.
 
     Args:
-        order_name_df_dict (Dict[str, pd.DataFrame]): A dictionary mapping order
-            names to their corresponding DataFrames.
-        order_name_list (List[str]): A list of unique order names to process.
+        current_pat_diagnostics (pd.DataFrame): The patient's diagnostic
+            orders, with `order_name` and `datetime` columns.
         batch_mode (bool): Whether the function is running in batch mode.
             Defaults to False.
 
@@ -214,49 +218,38 @@ def calculate_diagnostic_features(
     else:
         today = datetime.today()
 
-    features = {}
-
-    for col_name in order_name_list:
-        filtered_df = order_name_df_dict.get(col_name)
-
-        if filtered_df is None or len(filtered_df) == 0:
-            continue
-
-        df_len = len(filtered_df)
-
-        if df_len >= 1:
-            # Number of tests
-            features[f"{col_name}_num-diagnostic-order"] = df_len
-
-            # Days since last test
-            try:
-                sorted_df = filtered_df.sort_values(by="datetime")
-                date_object = sorted_df.iloc[-1]["datetime"]
-                delta = today - date_object
-                features[f"{col_name}_days-since-last-diagnostic-order"] = delta.days
-            except Exception as e:
-                print(
-                    f"Error calculating days since last diagnostic for {col_name}: {e}"
-                )
-                features[f"{col_name}_days-since-last-diagnostic-order"] = None
-
-        if df_len >= 2:
-            # Days between earliest and latest (fixed logic from original)
-            try:
-                sorted_df = filtered_df.sort_values(by="datetime")
-                # First record (earliest)
-                earliest = sorted_df.iloc[0]["datetime"]
-                # Last record (latest)
-                latest = sorted_df.iloc[-1]["datetime"]
-                delta = latest - earliest
-                features[f"{col_name}_days-between-first-last-diagnostic"] = delta.days
-            except Exception as e:
-                print(
-                    f"Error calculating days between first-last diagnostic for {col_name}: {e}"
-                )
-                features[f"{col_name}_days-between-first-last-diagnostic"] = None
-
-    return features
+    return order_features(
+        summarise_orders(current_pat_diagnostics, today),
+        "_num-diagnostic-order",
+        "_days-since-last-diagnostic-order",
+        "_days-between-first-last-diagnostic",
+    )
+
+
+def calculate_diagnostic_features(
+    order_name_df_dict: Dict[str, pd.DataFrame],
+    order_name_list: List[str],
+    batch_mode: bool = False,
+) -> Dict:
+    """Calculates diagnostic features from orders grouped by order name.
+
+    Kept for callers of the former per-order-name implementation; see
+    `calculate_diagnostic_order_features`, which takes the orders as one
+    DataFrame.
+
+    Args:
+        order_name_df_dict (Dict[str, pd.DataFrame]): A dictionary mapping order
+            names to their corresponding DataFrames.
+        order_name_list (List[str]): A list of unique order names to process.
+        batch_mode (bool): Whether the function is running in batch mode.
+            Defaults to False.
+
+    Returns:
+        Dict: A dictionary of calculated features.
+    """
+    return calculate_diagnostic_order_features(
+        concat_orders_by_name(order_name_df_dict, order_name_list), batch_mode
+    )
 
 
 def create_diagnostic_features_dataframe(
@@ -278,28 +271,23 @@ def create_diagnostic_features_dataframe(
         pd.DataFrame: A single-row DataFrame containing the final features.
     """
     # Start with basic patient info
-    base_df = pd.DataFrame({"client_idcode": [current_pat_client_id_code]})
+    row = {"client_idcode": current_pat_client_id_code}
 
-    # Add any additional base columns from original data (excluding ones we'll drop)
     if len(original_data) > 0:
-        sample_row = original_data.iloc[0:1].copy()
-
-        # Keep only columns that aren't in our drop list
-        columns_to_keep = [
-            col
-            for col in sample_row.columns
-            if col not in COLUMNS_TO_DROP and col not in diagnostic_features.keys()
-        ]
-
-        for col in columns_to_keep:
-            if col != "client_idcode":  # Don't duplicate client_idcode
-                base_df[col] = sample_row[col].iloc[0]
-
-    # Add calculated features
-    for feature_name, feature_value in diagnostic_features.items():
-        base_df[feature_name] = feature_value
+        sample_row = original_data.iloc[0]
+        row.update(
+            {
+                col: sample_row[col]
+                for col in original_data.columns
+                if col not in COLUMNS_TO_DROP
+                and col not in diagnostic_features
+                and col != "client_idcode"
+            }
+        )
 
-    return base_df
+    # Built in one step, as adding thousands of columns one at a time is slow.
+    row.update(diagnostic_features)
+    return pd.DataFrame([row])
 
 
 def get_current_pat_diagnostics(
@@ -379,16 +367,9 @@ def get_current_pat_diagnostics(
         diagnostics, diagnostic_time_field, batch_mode
     )
 
-    # Group data by order name
-    order_name_list = list(current_pat_diagnostics["order_name"].unique())
-    order_name_df_dict = {
-        elem: current_pat_diagnostics[current_pat_diagnostics.order_name == elem]
-        for elem in order_name_list
-    }
-
     # Calculate diagnostic features
-    diagnostic_features = calculate_diagnostic_features(
-        order_name_df_dict, order_name_list, batch_mode
+    diagnostic_features = calculate_diagnostic_order_features(
+        current_pat_diagnostics, batch_mode
     )
 
     # Create final features DataFrame
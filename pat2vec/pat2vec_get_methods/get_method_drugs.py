@@ -8,6 +8,11 @@ from IPython.display import display
 from pat2vec.util.filter_dataframe_by_timestamp import filter_dataframe_by_timestamp
 from pat2vec.util.get_start_end_year_month import get_start_end_year_month
 from pat2vec.util.methods_get import convert_date
+from pat2vec.util.order_features import (
+    concat_orders_by_name,
+    order_features,
+    summarise_orders,
+)
 from pat2vec.util.parse_date import validate_input_dates
 
 DRUG_FIELDS = [
@@ -177,9 +182,8 @@ def prepare_drug_datetime(
     return data
 
 
-def calculate_drug_features(
-    order_name_df_dict: Dict[str, pd.DataFrame],
-    order_name_list: List[str],
+def calculate_drug_order_features(
+    current_pat_drugs: pd.DataFrame,
     drugs_arg_dict: Dict,
     batch_mode: bool = False,
 ) -> Dict:
@@ -187,12 +191,12 @@ def calculate_drug_features(
 
     Computes features like the number of orders, days since the last order,
     and the time span between the first and last order, depending on the
-    flags in `drugs_arg_dict`.
+    flags in `drugs_arg_dict`. All order names are summarised at once, with
+    one groupby over the order times.
 
     Args:
-        order_name_df_dict (Dict[str, pd.DataFrame]): A dictionary mapping drug order
-            names to their corresponding DataFrames.
-        order_name_list (List[str]): A list of unique order names to process.
+        current_pat_drugs (pd.DataFrame): The patient's drug orders, with
+            `order_name` and `datetime` columns.
         drugs_arg_dict (Dict): A dictionary of flags indicating which features to calculate.
         batch_mode (bool): Whether the function is running in batch mode. Defaults to False.
 
@@ -204,43 +208,45 @@ def calculate_drug_features(
     else:
         today = datetime.today()
 
-    features = {}
-
-    for col_name in order_name_list:
-        filtered_df = order_name_df_dict.get(col_name)
-        if filtered_df is None or len(filtered_df) == 0:
-            continue
-
-        df_len = len(filtered_df)
-
-        if df_len >= 1:
-            if drugs_arg_dict.get("_num-drug-order"):
-                features[f"{col_name}_num-drug-order"] = df_len
-
-            if drugs_arg_dict.get("_days-since-last-drug-order"):
-                try:
-                    sorted_df = filtered_df.sort_values(by="datetime")
-                    date_object = sorted_df.iloc[-1]["datetime"]
-                    delta = today - date_object
-                    features[f"{col_name}_days-since-last-drug-order"] = delta.days
-                except Exception as e:
-                    print(f"Error calculating days since last drug for {col_name}: {e}")
-                    features[f"{col_name}_days-since-last-drug-order"] = None
-
-        if df_len >= 2 and drugs_arg_dict.get("_days-between-first-last-drug"):
-            try:
-                sorted_df = filtered_df.sort_values(by="datetime")
-                earliest = sorted_df.iloc[0]["datetime"]
-                latest = sorted_df.iloc[-1]["datetime"]
-                delta = latest - earliest
-                features[f"{col_name}_days-between-first-last-drug"] = delta.days
-            except Exception as e:
-                print(
-                    f"Error calculating days between first-last drug for {col_name}: {e}"
-                )
-                features[f"{col_name}_days-between-first-last-drug"] = None
-
-    return features
+    suffixes = {
+        flag: flag if drugs_arg_dict.get(flag) else None
+        for flag in [
+            "_num-drug-order",
+            "_days-since-last-drug-order",
+            "_days-between-first-last-drug",
+        ]
+    }
+    return order_features(
+        summarise_orders(current_pat_drugs, today), *suffixes.values()
+    )
+
+
+def calculate_drug_features(
+    order_name_df_dict: Dict[str, pd.DataFrame],
+    order_name_list: List[str],
+    drugs_arg_dict: Dict,
+    batch_mode: bool = False,
+) -> Dict:
+    """Calculates drug features from orders grouped by order name.
+
+    Kept for callers of the former per-order-name implementation; see
+    `calculate_drug_order_features`, which takes the orders as one DataFrame.
+
+    Args:
+        order_name_df_dict (Dict[str, pd.DataFrame]): A dictionary mapping drug order
+            names to their corresponding DataFrames.
+        order_name_list (List[str]): A list of unique order names to process.
+        drugs_arg_dict (Dict): A dictionary of flags indicating which features to calculate.
+        batch_mode (bool): Whether the function is running in batch mode. Defaults to False.
+
+    Returns:
+        Dict: A dictionary of calculated features.
+    """
+    return calculate_drug_order_features(
+        concat_orders_by_name(order_name_df_dict, order_name_list),
+        drugs_arg_dict,
+        batch_mode,
+    )
 
 
 def create_drug_features_dataframe(
@@ -259,23 +265,23 @@ def create_drug_features_dataframe(
     Returns:
         pd.DataFrame: A single-row DataFrame containing the final features.
     """
-    base_df = pd.DataFrame({"client_idcode": [current_pat_client_id_code]})
+    row = {"client_idcode": current_pat_client_id_code}
 
     if len(original_data) > 0:
-        sample_row = original_data.iloc[0:1].copy()
-        columns_to_keep = [
-            col
-            for col in sample_row.columns
-            if col not in COLUMNS_TO_DROP and col not in drug_features.keys()
-        ]
-        for col in columns_to_keep:
-            if col != "client_idcode":
-                base_df[col] = sample_row[col].iloc[0]
-
-    for feature_name, feature_value in drug_features.items():
-        base_df[feature_name] = feature_value
+        sample_row = original_data.iloc[0]
+        row.update(
+            {
+                col: sample_row[col]
+                for col in original_data.columns
+                if col not in COLUMNS_TO_DROP
+                and col not in drug_features
+                and col != "client_idcode"
+            }
+        )
 
-    return base_df
+    # Built in one step, as adding thousands of columns one at a time is slow.
+    row.update(drug_features)
+    return pd.DataFrame([row])
 
 
 def get_current_pat_drugs(
@@ -352,16 +358,9 @@ def get_current_pat_drugs(
     # Prepare datetime
     current_pat_drugs = prepare_drug_datetime(drugs, drug_time_field, batch_mode)
 
-    # Group by order_name
-    order_name_list = list(current_pat_drugs["order_name"].unique())
-    order_name_df_dict = {
-        elem: current_pat_drugs[current_pat_drugs.order_name == elem]
-        for elem in order_name_list
-    }
-
     # Calculate features
-    drug_features = calculate_drug_features(
-        order_name_df_dict, order_name_list, drugs_arg_dict, batch_mode
+    drug_features = calculate_drug_order_features(
+        current_pat_drugs, drugs_arg_dict, batch_mode
     )
 
     # Create final features dataframe
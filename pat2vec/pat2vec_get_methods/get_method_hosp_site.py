@@ -1,12 +1,16 @@
 import os
 from typing import Callable, Optional, Tuple, List
 
-import numpy as np
 import pandas as pd
 from IPython.display import display
 
 from pat2vec.util.filter_dataframe_by_timestamp import filter_dataframe_by_timestamp
 from pat2vec.util.get_start_end_year_month import get_start_end_year_month
+from pat2vec.util.observation_features import (
+    ObservationFeatureSpec,
+    observation_features_frame,
+    select_observations,
+)
 from pat2vec.util.parse_date import validate_input_dates
 
 HOSP_SITE_FIELDS = [
@@ -20,6 +24,11 @@ HOSP_SITE_FIELDS = [
 
 SEARCH_TERM = "CORE_HospitalSite"
 
+#: Binary features for the Denmark Hill (DH) and PRUH hospital sites.
+HOSP_SITE_SPEC = ObservationFeatureSpec(
+    SEARCH_TERM, "contains", prefix="hosp_site_", values={"dh": "DH", "ph": "PRUH"}
+)
+
 
 def search_hospital_site(
     cohort_searcher_with_terms_and_search=None,
@@ -111,29 +120,17 @@ def search_hospital_site(
 
 
 def prepare_hospital_site_data(raw_data):
-    """Filter to valid CORE_HospitalSite records and drop NAs."""
-    data = raw_data[raw_data["obscatalogmasteritem_displayname"] == SEARCH_TERM].copy()
-    data.dropna(inplace=True)
-    return data
+    """Filter to CORE_HospitalSite records with a value."""
+    return select_observations(raw_data, HOSP_SITE_SPEC)
 
 
 def calculate_hospital_site_features(
     features_data, current_pat_client_id_code, negate_biochem=False
 ):
     """Generate binary hospital site features from observation values."""
-    term = "hosp_site".lower()
-    features = pd.DataFrame({"client_idcode": [current_pat_client_id_code]})
-
-    if len(features_data) > 0:
-        value_array = features_data["observation_valuetext_analysed"].dropna()
-        features[f"{term}_dh"] = value_array.str.contains("DH").astype(int).max()
-        features[f"{term}_ph"] = value_array.str.contains("PRUH").astype(int).max()
-
-    elif negate_biochem:
-        features[f"{term}_dh"] = np.nan
-        features[f"{term}_ph"] = np.nan
-
-    return features
+    return observation_features_frame(
+        current_pat_client_id_code, features_data, HOSP_SITE_SPEC, negate_biochem
+    )
 
 
 def get_hosp_site(
@@ -7,8 +7,43 @@ from IPython.display import display
 
 from pat2vec.util.filter_dataframe_by_timestamp import filter_dataframe_by_timestamp
 from pat2vec.util.get_start_end_year_month import get_start_end_year_month
+from pat2vec.util.observation_features import (
+    OBSERVATION_STATS,
+    calculate_component_stats,
+)
 from pat2vec.util.parse_date import validate_input_dates
 
+NEWS_FIELDS = [
+    "observation_guid",
+    "client_idcode",
+    "obscatalogmasteritem_displayname",
+    "observation_valuetext_analysed",
+    "observationdocument_recordeddtm",
+    "clientvisit_visitidcode",
+]
+
+#: The NEWS/NEWS2 observation items mapped to their feature names.
+NEWS_FEATURE_MAP = {
+    "NEWS2_Score": "news_score",
+    "NEWS_Systolic_BP": "news_systolic_bp",
+    "NEWS_Diastolic_BP": "news_diastolic_bp",
+    "NEWS_Respiration_Rate": "news_respiration_rate",
+    "NEWS_Heart_Rate": "news_heart_rate",
+    "NEWS_Oxygen_Saturation": "news_oxygen_saturation",
+    "NEWS Temperature": "news_temperature",
+    "NEWS_AVPU": "news_avpu",
+    "NEWS_Supplemental_Oxygen": "news_supplemental_oxygen",
+    "NEWS2_Sp02_Target": "news_sp02_target",
+    "NEWS2_Sp02_Scale": "news_sp02_scale",
+    "NEWS_Pulse_Type": "news_pulse_type",
+    "NEWS_Pain_Score": "news_pain_score",
+    "NEWS Oxygen Litres": "news_oxygen_litres",
+    "NEWS Oxygen Delivery": "news_oxygen_delivery",
+}
+
+#: Exclusive bounds of the NEWS features, outside of which values are ignored.
+NEWS_FEATURE_BOUNDS = {"news_score": (-20, 20)}
+
 
 def compute_feature_stats(
     data: pd.DataFrame, column: str, feature_name: str, config_obj: object
@@ -109,14 +144,7 @@ def search_news_observations(
     if additional_custom_search_string:
         search_string += f" {additional_custom_search_string}"
 
-    fields_to_use = [
-        "observation_guid",
-        "client_idcode",
-        "obscatalogmasteritem_displayname",
-        "observation_valuetext_analysed",
-        "observationdocument_recordeddtm",
-        "clientvisit_visitidcode",
-    ]
+    fields_to_use = NEWS_FIELDS
     if fields_override:
         fields_to_use = fields_override
 
@@ -207,43 +235,21 @@ def get_news(
     # Always start with client_idcode
     news_features = {"client_idcode": current_pat_client_id_code}
 
-    # Define mappings between display names and feature names
-    feature_map = {
-        "NEWS2_Score": "news_score",
-        "NEWS_Systolic_BP": "news_systolic_bp",
-        "NEWS_Diastolic_BP": "news_diastolic_bp",
-        "NEWS_Respiration_Rate": "news_respiration_rate",
-        "NEWS_Heart_Rate": "news_heart_rate",
-        "NEWS_Oxygen_Saturation": "news_oxygen_saturation",
-        "NEWS Temperature": "news_temperature",
-        "NEWS_AVPU": "news_avpu",
-        "NEWS_Supplemental_Oxygen": "news_supplemental_oxygen",
-        "NEWS2_Sp02_Target": "news_sp02_target",
-        "NEWS2_Sp02_Scale": "news_sp02_scale",
-        "NEWS_Pulse_Type": "news_pulse_type",
-        "NEWS_Pain_Score": "news_pain_score",
-        "NEWS Oxygen Litres": "news_oxygen_litres",
-        "NEWS Oxygen Delivery": "news_oxygen_delivery",
-    }
-
-    for display_name, feature_name in feature_map.items():
-        subset = current_pat_raw_news[
-            current_pat_raw_news["obscatalogmasteritem_displayname"] == display_name
-        ].copy()
-
-        subset.dropna(subset=["observation_valuetext_analysed"], inplace=True)
-
-        # special case: cap NEWS2 score at [-20, 20]
-        if feature_name == "news_score" and len(subset) > 0:
-            numeric_values = pd.to_numeric(
-                subset["observation_valuetext_analysed"], errors="coerce"
-            )
-            subset = subset[(numeric_values < 20) & (numeric_values > -20)].copy()
-
-        stats = compute_feature_stats(
-            subset, "observation_valuetext_analysed", feature_name, config_obj
+    # The statistics of all NEWS components, in one grouped reduction
+    news_stats = calculate_component_stats(
+        current_pat_raw_news, NEWS_FEATURE_MAP, bounds=NEWS_FEATURE_BOUNDS
+    ).astype(object)
+
+    for feature_name in NEWS_FEATURE_MAP.values():
+        if feature_name in news_stats.index:
+            stats = news_stats.loc[feature_name]
+        elif config_obj.negate_biochem:
+            stats = dict.fromkeys(OBSERVATION_STATS, np.nan)
+        else:
+            continue
+        news_features.update(
+            {f"{feature_name}_{stat}": stats[stat] for stat in OBSERVATION_STATS}
         )
-        news_features.update(stats)
 
     news_features_df = pd.DataFrame([news_features])
 
@@ -3,11 +3,20 @@ from typing import Callable, Optional, Tuple
 import pandas as pd
 from IPython.display import display
 
-from pat2vec.util.filter_dataframe_by_timestamp import filter_dataframe_by_timestamp
 from pat2vec.util.get_start_end_year_month import get_start_end_year_month
-from pat2vec.util.methods_annotation import calculate_pretty_name_count_features
+from pat2vec.util.annotation_count_index import get_annotation_count_index
 from pat2vec.util.methods_get import update_pbar
 
+#: The fields of the EPR documents whose annotations are read.
+EPR_DOCS_FIELDS = [
+    "client_idcode",
+    "document_guid",
+    "document_description",
+    "body_analysed",
+    "updatetime",
+    "clientvisit_visitidcode",
+]
+
 
 def get_current_pat_annotations(
     current_pat_client_id_code: str,
@@ -82,33 +91,17 @@ def get_current_pat_annotations(
     # Filter the batch_epr_docs_annotations DataFrame based on the target_date_range
     if batch_epr_docs_annotations is not None:
 
-        # Filter the dataframe based on the target date range
-        filtered_batch_epr_docs_annotations = filter_dataframe_by_timestamp(
-            batch_epr_docs_annotations,
-            start_year,
-            start_month,
-            end_year,
-            end_month,
-            start_day,
-            end_day,
-            "updatetime",
-            dropna=True,
+        # Counted from the patient's count index, built once across slices
+        df_pat_target = get_annotation_count_index(
+            batch_epr_docs_annotations, "updatetime"
+        ).count_features(
+            start_year, start_month, end_year, end_month, start_day, end_day
         )
 
-        if len(filtered_batch_epr_docs_annotations) > 0:
-
-            # Calculate pretty name count features for the filtered dataframe
-            df_pat_target = calculate_pretty_name_count_features(
-                filtered_batch_epr_docs_annotations
-            )
-
-        else:
+        if df_pat_target is None:
             # If filtered annotations don't exist, create a DataFrame with the client_idcode
             if config_obj.verbosity >= 6:
-                print(
-                    "len(filtered_batch_epr_docs_annotations)>0",
-                    len(filtered_batch_epr_docs_annotations) > 0,
-                )
+                print("No annotations in target_date_range", target_date_range)
             df_pat_target = pd.DataFrame(
                 data=[current_pat_client_id_code], columns=["client_idcode"]
             )
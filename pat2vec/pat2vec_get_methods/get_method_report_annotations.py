@@ -3,11 +3,20 @@ from typing import Callable, Optional, Tuple
 import pandas as pd
 from IPython.display import display
 
-from pat2vec.util.filter_dataframe_by_timestamp import filter_dataframe_by_timestamp
 from pat2vec.util.get_start_end_year_month import get_start_end_year_month
-from pat2vec.util.methods_annotation import calculate_pretty_name_count_features
+from pat2vec.util.annotation_count_index import get_annotation_count_index
 from pat2vec.util.methods_get import update_pbar
 
+#: The fields of the reports whose annotations are read.
+REPORTS_FIELDS = [
+    "client_idcode",
+    "updatetime",
+    "textualObs",
+    "basicobs_guid",
+    "basicobs_value_analysed",
+    "basicobs_itemname_analysed",
+]
+
 
 def get_current_pat_report_annotations(
     current_pat_client_id_code: str,
@@ -74,30 +83,16 @@ def get_current_pat_report_annotations(
 
     if report_annotations is not None:
 
-        filtered_report_annotations = filter_dataframe_by_timestamp(
-            report_annotations,
-            start_year,
-            start_month,
-            end_year,
-            end_month,
-            start_day,
-            end_day,
-            "updatetime",
-            dropna=True,
+        # Counted from the patient's count index, built once across slices
+        processed_annotations = get_annotation_count_index(
+            report_annotations, "updatetime"
+        ).count_features(
+            start_year, start_month, end_year, end_month, start_day, end_day
         )
 
-        if len(filtered_report_annotations) > 0:
-
-            processed_annotations = calculate_pretty_name_count_features(
-                filtered_report_annotations
-            )
-
-        else:
+        if processed_annotations is None:
             if config_obj.verbosity >= 6:
-                print(
-                    "len(filtered_report_annotations)>0",
-                    len(filtered_report_annotations) > 0,
-                )
+                print("No annotations in target_date_range", target_date_range)
             processed_annotations = pd.DataFrame(
                 data=[current_pat_client_id_code], columns=["client_idcode"]
             )
@@ -1,12 +1,16 @@
 import os
 from typing import Callable, List, Optional, Tuple, Union
 
-import numpy as np
 import pandas as pd
 from IPython.display import display
 
 from pat2vec.util.filter_dataframe_by_timestamp import filter_dataframe_by_timestamp
 from pat2vec.util.get_start_end_year_month import get_start_end_year_month
+from pat2vec.util.observation_features import (
+    ObservationFeatureSpec,
+    observation_features_frame,
+    select_observations,
+)
 from pat2vec.util.parse_date import validate_input_dates
 
 SMOKING_FIELDS = [
@@ -20,6 +24,14 @@ SMOKING_FIELDS = [
 
 SEARCH_TERM = "CORE_SmokingStatus"
 
+#: Binary features for records of being a current smoker or a non-smoker.
+SMOKING_SPEC = ObservationFeatureSpec(
+    SEARCH_TERM,
+    "contains",
+    prefix="smoking_status_",
+    values={"current": "Current Smoker", "non": "Non-Smoker"},
+)
+
 
 def search_smoking(
     cohort_searcher_with_terms_and_search: Optional[Callable] = None,
@@ -133,7 +145,7 @@ def search_smoking(
 
 
 def prepare_smoking_data(raw_data: pd.DataFrame) -> pd.DataFrame:
-    """Filters for valid CORE_SmokingStatus records and drops NAs.
+    """Filters for CORE_SmokingStatus records with a value.
 
     Args:
         raw_data (pd.DataFrame): The raw observation data.
@@ -141,9 +153,7 @@ def prepare_smoking_data(raw_data: pd.DataFrame) -> pd.DataFrame:
     Returns:
         pd.DataFrame: A cleaned DataFrame containing only valid smoking status records.
     """
-    data = raw_data[raw_data["obscatalogmasteritem_displayname"] == SEARCH_TERM].copy()
-    data.dropna(inplace=True)
-    return data
+    return select_observations(raw_data, SMOKING_SPEC)
 
 
 def calculate_smoking_features(
@@ -165,25 +175,9 @@ def calculate_smoking_features(
     Returns:
         pd.DataFrame: A single-row DataFrame with binary features for smoking status.
     """
-    term = "smoking_status"
-    categories = {
-        "current": "Current Smoker",
-        "non": "Non-Smoker",
-    }
-
-    features = pd.DataFrame({"client_idcode": [current_pat_client_id_code]})
-
-    if len(features_data) > 0:
-        value_array = features_data["observation_valuetext_analysed"].dropna()
-        for suffix, match_str in categories.items():
-            features[f"{term}_{suffix}"] = value_array.str.contains(match_str).astype(
-                int
-            )
-    elif negate_biochem:
-        for suffix in categories:
-            features[f"{term}_{suffix}"] = np.nan
-
-    return features
+    return observation_features_frame(
+        current_pat_client_id_code, features_data, SMOKING_SPEC, negate_biochem
+    )
 
 
 def get_smoking(
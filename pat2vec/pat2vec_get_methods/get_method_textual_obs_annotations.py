@@ -3,11 +3,23 @@ from typing import Callable, Optional, Tuple
 import pandas as pd
 from IPython.display import display
 
-from pat2vec.util.filter_dataframe_by_timestamp import filter_dataframe_by_timestamp
 from pat2vec.util.get_start_end_year_month import get_start_end_year_month
-from pat2vec.util.methods_annotation import calculate_pretty_name_count_features
+from pat2vec.util.annotation_count_index import get_annotation_count_index
 from pat2vec.util.methods_get import update_pbar
 
+#: The fields of the textual observations whose annotations are read.
+TEXTUAL_OBS_DOCS_FIELDS = [
+    "client_idcode",
+    "basicobs_itemname_analysed",
+    "basicobs_value_numeric",
+    "basicobs_value_analysed",
+    "basicobs_entered",
+    "clientvisit_serviceguid",
+    "basicobs_guid",
+    "updatetime",
+    "textualObs",
+]
+
 
 def get_current_pat_textual_obs_annotations(
     current_pat_client_id_code: str,
@@ -95,32 +107,17 @@ def get_current_pat_textual_obs_annotations(
     # filter the textual observation annotations based on the provided target date range
     if textual_obs_annotations is not None:
 
-        filtered_textual_obs_annotations = filter_dataframe_by_timestamp(
-            textual_obs_annotations,
-            start_year,
-            start_month,
-            end_year,
-            end_month,
-            start_day,
-            end_day,
-            "basicobs_entered",
-            dropna=True,
+        # Counted from the patient's count index, built once across slices
+        processed_annotations = get_annotation_count_index(
+            textual_obs_annotations, "basicobs_entered"
+        ).count_features(
+            start_year, start_month, end_year, end_month, start_day, end_day
         )
 
-        # if there are any filtered annotations, calculate the pretty name count features
-        if len(filtered_textual_obs_annotations) > 0:
-
-            processed_annotations = calculate_pretty_name_count_features(
-                filtered_textual_obs_annotations
-            )
-
-        else:
+        if processed_annotations is None:
             # if there are no filtered annotations, create a DataFrame with the client ID code
             if config_obj.verbosity >= 6:
-                print(
-                    "len(filtered_report_annotations)>0",
-                    len(filtered_textual_obs_annotations) > 0,
-                )
+                print("No annotations in target_date_range", target_date_range)
             processed_annotations = pd.DataFrame(
                 data=[current_pat_client_id_code], columns=["client_idcode"]
             )
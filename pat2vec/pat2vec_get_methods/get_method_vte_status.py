@@ -1,12 +1,16 @@
 import os
 from typing import Callable, List, Optional, Tuple, Union
 
-import numpy as np
 import pandas as pd
 from IPython.display import display
 
 from pat2vec.util.filter_dataframe_by_timestamp import filter_dataframe_by_timestamp
 from pat2vec.util.get_start_end_year_month import get_start_end_year_month
+from pat2vec.util.observation_features import (
+    ObservationFeatureSpec,
+    observation_features_frame,
+    select_observations,
+)
 from pat2vec.util.parse_date import validate_input_dates
 
 VTE_FIELDS = [
@@ -20,6 +24,18 @@ VTE_FIELDS = [
 
 SEARCH_TERM = "CORE_VTE_STATUS"
 
+#: Summary statistics of the VTE statuses, mapped to high (1) or low (0) risk
+#: of bleeding.
+VTE_SPEC = ObservationFeatureSpec(
+    SEARCH_TERM,
+    "stats",
+    prefix="vte_status_",
+    values={
+        "High risk of VTE High risk of bleeding": 1,
+        "High risk of VTE Low risk of bleeding": 0,
+    },
+)
+
 
 def search_vte(
     cohort_searcher_with_terms_and_search: Optional[Callable] = None,
@@ -133,7 +149,7 @@ def search_vte(
 
 
 def prepare_vte_data(raw_data: pd.DataFrame) -> pd.DataFrame:
-    """Filters for valid CORE_VTE_STATUS records and drops NAs.
+    """Filters for CORE_VTE_STATUS records with a value.
 
     Args:
         raw_data (pd.DataFrame): The raw observation data.
@@ -141,9 +157,7 @@ def prepare_vte_data(raw_data: pd.DataFrame) -> pd.DataFrame:
     Returns:
         pd.DataFrame: A cleaned DataFrame containing only valid VTE status records.
     """
-    data = raw_data[raw_data["obscatalogmasteritem_displayname"] == SEARCH_TERM].copy()
-    data.dropna(inplace=True)
-    return data
+    return select_observations(raw_data, VTE_SPEC)
 
 
 def calculate_vte_features(
@@ -165,34 +179,10 @@ def calculate_vte_features(
     Returns:
         pd.DataFrame: A single-row DataFrame with summary statistics for VTE status.
     """
-    term = "vte_status"
-    mapping = {
-        "High risk of VTE High risk of bleeding": 1,
-        "High risk of VTE Low risk of bleeding": 0,
-    }
-
-    features = pd.DataFrame({"client_idcode": [current_pat_client_id_code]})
-
-    value_array = (
-        features_data["observation_valuetext_analysed"]
-        .map(mapping)
-        .dropna()
-        .astype(float)
+    return observation_features_frame(
+        current_pat_client_id_code, features_data, VTE_SPEC, negate_biochem
     )
 
-    if len(value_array) > 0:
-        features[f"{term}_mean"] = value_array.mean()
-        features[f"{term}_median"] = value_array.median()
-        features[f"{term}_std"] = value_array.std()
-        features[f"{term}_max"] = value_array.max()
-        features[f"{term}_min"] = value_array.min()
-        features[f"{term}_n"] = value_array.shape[0]
-    elif negate_biochem:
-        for stat in ["mean", "median", "std", "max", "min", "n"]:
-            features[f"{term}_{stat}"] = np.nan
-
-    return features
-
 
 def get_vte_status(
     current_pat_client_id_code: str,
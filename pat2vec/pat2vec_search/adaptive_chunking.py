@@ -0,0 +1,164 @@
+import logging
+import math
+import threading
+from typing import Any, Dict, Generator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Upper bound on the number of values in a single terms filter.
+MAX_TERMS_CHUNK_SIZE = 10000
+
+
+class AdaptiveChunkSizer:
+    """Sizes terms-filter chunks from the hits and latency of earlier chunks.
+
+    After each chunk is searched, `record` updates smoothed estimates of the
+    hits returned per ID and the seconds spent per hit. `next_size` then picks
+    the largest chunk expected to stay within both `target_hits` and
+    `target_seconds`. Growth is capped at `max_growth` times the previous
+    size so that one sparse chunk does not cause a very large next request.
+
+    Before any chunk has been searched, the estimates can be seeded from a
+    count query with `seed`.
+    """
+
+    def __init__(
+        self,
+        initial_chunk_size: int = MAX_TERMS_CHUNK_SIZE,
+        min_chunk_size: int = 50,
+        max_chunk_size: int = MAX_TERMS_CHUNK_SIZE,
+        target_hits: int = 200000,
+        target_seconds: float = 60.0,
+        smoothing: float = 0.5,
+        max_growth: float = 2.0,
+    ) -> None:
+        """Initializes the chunk sizer.
+
+        Args:
+            initial_chunk_size: The chunk size used before any observation.
+            min_chunk_size: The smallest chunk size to return.
+            max_chunk_size: The largest chunk size to return.
+            target_hits: The number of documents a chunk should return.
+            target_seconds: The time a chunk search should take.
+            smoothing: The weight of the newest observation in the moving
+                averages, between 0 and 1.
+            max_growth: The largest factor by which the chunk size may grow
+                between consecutive chunks.
+        """
+        if not 0 < smoothing <= 1:
+            raise ValueError("smoothing must be in (0, 1].")
+        self.min_chunk_size = max(1, int(min_chunk_size))
+        self.max_chunk_size = max(self.min_chunk_size, int(max_chunk_size))
+        self.target_hits = target_hits
+        self.target_seconds = target_seconds
+        self.smoothing = smoothing
+        self.max_growth = max_growth
+
+        self.hits_per_id: Optional[float] = None
+        self.seconds_per_hit: Optional[float] = None
+        self.last_size = self._clamp(initial_chunk_size)
+        self._lock = threading.Lock()
+
+    def _clamp(self, size: float) -> int:
+        return int(max(self.min_chunk_size, min(self.max_chunk_size, size)))
+
+    def _smooth(self, current: Optional[float], observed: float) -> float:
+        if current is None:
+            return observed
+        return self.smoothing * observed + (1 - self.smoothing) * current
+
+    def seed(self, n_ids: int, n_hits: int) -> None:
+        """Seeds the hits-per-ID estimate from a count over a sample of IDs.
+
+        Args:
+            n_ids: The number of IDs in the counted sample.
+            n_hits: The number of documents matching the sample.
+        """
+        if n_ids <= 0:
+            return
+        with self._lock:
+            self.hits_per_id = n_hits / n_ids
+            self.last_size = self._clamp(self._budget_size())
+
+    def record(self, n_ids: int, n_hits: int, seconds: float) -> None:
+        """Records the outcome of a searched chunk.
+
+        Args:
+            n_ids: The number of IDs in the chunk.
+            n_hits: The number of documents the chunk returned.
+            seconds: The time taken to search the chunk.
+        """
+        if n_ids <= 0:
+            return
+        with self._lock:
+            self.hits_per_id = self._smooth(self.hits_per_id, n_hits / n_ids)
+            if n_hits > 0:
+                self.seconds_per_hit = self._smooth(
+                    self.seconds_per_hit, seconds / n_hits
+                )
+
+    def _budget_size(self) -> float:
+        """Returns the chunk size allowed by the hit and time budgets."""
+        if not self.hits_per_id:
+            return self.max_chunk_size
+        expected_hits_budget = self.target_hits
+        if self.seconds_per_hit:
+            expected_hits_budget = min(
+                expected_hits_budget, self.target_seconds / self.seconds_per_hit
+            )
+        return expected_hits_budget / self.hits_per_id
+
+    def next_size(self) -> int:
+        """Returns the size for the next chunk."""
+        with self._lock:
+            if self.hits_per_id is None:
+                return self.last_size
+            size = self._budget_size()
+            size = min(size, self.last_size * self.max_growth)
+            self.last_size = self._clamp(math.floor(size))
+            return self.last_size
+
+    def iter_chunks(self, entered_list: List[Any]) -> Generator[List[Any], None, None]:
+        """Yields consecutive chunks of `entered_list`, sized by `next_size`.
+
+        Each chunk is sized when it is requested, so recording the previous
+        chunk's outcome before asking for the next one adapts the size.
+
+        Args:
+            entered_list: The list of values to split.
+
+        Yields:
+            Consecutive chunks covering `entered_list` in order.
+        """
+        start = 0
+        while start < len(entered_list):
+            size = self.next_size()
+            yield entered_list[start : start + size]
+            start += size
+
+
+# One sizer per index, so estimates carry over between searches of the same index.
+_CHUNK_SIZERS: Dict[str, AdaptiveChunkSizer] = {}
+_CHUNK_SIZERS_LOCK = threading.Lock()
+
+
+def get_chunk_sizer(index_name: str, **kwargs: Any) -> AdaptiveChunkSizer:
+    """Returns the shared chunk sizer for an index, creating it if needed.
+
+    Args:
+        index_name: The Elasticsearch index the sizer is used for.
+        **kwargs: Arguments passed to `AdaptiveChunkSizer` when it is created.
+
+    Returns:
+        The `AdaptiveChunkSizer` for `index_name`.
+    """
+    with _CHUNK_SIZERS_LOCK:
+        if index_name not in _CHUNK_SIZERS:
+            _CHUNK_SIZERS[index_name] = AdaptiveChunkSizer(**kwargs)
+        return _CHUNK_SIZERS[index_name]
+
+
+def reset_chunk_sizers() -> None:
+    """Discards the learned chunk size estimates for all indices."""
+    with _CHUNK_SIZERS_LOCK:
+        _CHUNK_SIZERS.clear()
@@ -9,9 +9,17 @@ import elasticsearch
 import elasticsearch.helpers
 import pandas as pd
 import importlib.util
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from typing import Any, Dict, Generator, List, Optional, Tuple, Union
 
 import getpass
+import time
+
+from pat2vec.pat2vec_search.adaptive_chunking import (
+    MAX_TERMS_CHUNK_SIZE,
+    AdaptiveChunkSizer,
+    get_chunk_sizer,
+)
 
 from pat2vec.util.get_dummy_data_cohort_searcher import (
     cohort_searcher_with_terms_and_search_dummy,
@@ -166,6 +174,7 @@ class CogStack(object):
         column_headers: Optional[List[str]] = None,
         es_gen_size: int = 800,
         request_timeout: int = 300,
+        include_matched_queries: bool = False,
     ) -> pd.DataFrame:
         """Executes a search query and returns the results as a pandas DataFrame.
 
@@ -175,6 +184,8 @@ class CogStack(object):
             column_headers: A specific list of columns for the DataFrame.
             es_gen_size: The number of documents per scroll request.
             request_timeout: The timeout in seconds for the request.
+            include_matched_queries: If True, adds a `matched_queries` column
+                listing the named queries each hit matched.
 
         Returns:
             A pandas DataFrame containing the search results.
@@ -195,6 +206,8 @@ class CogStack(object):
             row["_id"] = hit["_id"]
             row["_score"] = hit["_score"]
             row.update(hit["_source"])
+            if include_matched_queries:
+                row["matched_queries"] = hit.get("matched_queries", [])
             temp_results.append(row)
         if column_headers:
             df_headers = [
@@ -203,6 +216,8 @@ class CogStack(object):
                 "_score",
             ]  # ['_index', '_type', '_id', '_score']
             df_headers.extend(column_headers)
+            if include_matched_queries:
+                df_headers.append("matched_queries")
             df = pd.DataFrame(temp_results, columns=df_headers)
         else:
             df = pd.DataFrame(temp_results)
@@ -304,16 +319,22 @@ def get_all_fields_for_method(
     return cs.get_index_fields(index_name)
 
 
-def list_chunker(entered_list: List[Any]) -> List[List[Any]]:
-    """Splits a list into smaller chunks of up to 10,000 elements.
+def list_chunker(
+    entered_list: List[Any], chunk_size: int = MAX_TERMS_CHUNK_SIZE
+) -> List[List[Any]]:
+    """Splits a list into smaller chunks of up to `chunk_size` elements.
 
     Args:
         entered_list: The list to be split into chunks.
+        chunk_size: The maximum number of elements per chunk.
 
     Returns:
         A list of lists, where each sublist is a chunk of the original list.
     """
-    return [entered_list[x : x + 10000] for x in range(0, len(entered_list), 10000)]
+    return [
+        entered_list[x : x + chunk_size]
+        for x in range(0, len(entered_list), chunk_size)
+    ]
 
 
 def dataframe_generator(
@@ -324,59 +345,147 @@ def dataframe_generator(
         yield df
 
 
+def count_terms_query_hits(
+    index_name: str,
+    term_name: str,
+    entered_list: List[Any],
+    search_string: Optional[str] = None,
+) -> int:
+    """Counts the documents matching a terms filter without fetching them.
+
+    Args:
+        index_name: The name of the Elasticsearch index to count in.
+        term_name: The name of the field to use for the term-level filter.
+        entered_list: The list of values to filter for in the `term_name` field.
+        search_string: An optional query string to apply.
+
+    Returns:
+        The number of matching documents.
+    """
+    query: Dict[str, Any] = {"bool": {"filter": {"terms": {term_name: entered_list}}}}
+    if search_string is not None:
+        query["bool"]["must"] = [{"query_string": {"query": search_string}}]
+    response = cs.elastic.count(index=index_name, query=query, request_timeout=30)
+    return int(response["count"])
+
+
+def _search_in_adaptive_chunks(
+    index_name: str,
+    fields_list: List[str],
+    term_name: str,
+    entered_list: List[Any],
+    search_string: Optional[str],
+    chunk_sizer: AdaptiveChunkSizer,
+    count_seed_sample_size: int = 0,
+) -> List[pd.DataFrame]:
+    """Runs a terms-filter search in chunks sized by `chunk_sizer`.
+
+    The hits and latency of each chunk are recorded on `chunk_sizer`, so the
+    next chunk is sized from what the previous ones returned.
+
+    Args:
+        index_name: The name of the Elasticsearch index to search.
+        fields_list: The list of fields to return from each document.
+        term_name: The name of the field to use for the term-level filter.
+        entered_list: The list of values to filter for in the `term_name` field.
+        search_string: An optional query string to apply.
+        chunk_sizer: The sizer used to choose chunk sizes.
+        count_seed_sample_size: If greater than 0, the hits-per-ID estimate is
+            seeded with a count query over this many leading values before the
+            first chunk is searched.
+
+    Returns:
+        A list with one results DataFrame per chunk.
+    """
+    if count_seed_sample_size > 0:
+        sample = entered_list[:count_seed_sample_size]
+        try:
+            n_hits = count_terms_query_hits(
+                index_name, term_name, sample, search_string
+            )
+            chunk_sizer.seed(len(sample), n_hits)
+            logging.debug(
+                f"Seeded chunk sizer for {index_name}: {n_hits} hits for "
+                f"{len(sample)} IDs."
+            )
+        except Exception as e:
+            logging.warning(f"Count query for chunk sizing failed: {e}")
+
+    results = []
+    for mini_list in chunk_sizer.iter_chunks(entered_list):
+        query: Dict[str, Any] = {
+            "from": 0,
+            "size": 10000,
+            "query": {"bool": {"filter": {"terms": {term_name: mini_list}}}},
+            "_source": fields_list,
+        }
+        if search_string is not None:
+            query["query"]["bool"]["must"] = [
+                {"query_string": {"query": search_string}}
+            ]
+        start_time = time.perf_counter()
+        df = cs.cogstack2df(query=query, index=index_name, column_headers=fields_list)
+        seconds = time.perf_counter() - start_time
+        chunk_sizer.record(len(mini_list), len(df), seconds)
+        logging.debug(
+            f"Chunk of {len(mini_list)} IDs on {index_name}: {len(df)} hits in "
+            f"{seconds:.2f}s."
+        )
+        results.append(df)
+    return results
+
+
 def cohort_searcher_with_terms_and_search(
     index_name: str,
     fields_list: List[str],
     term_name: str,
     entered_list: List[str],
     search_string: str,
+    chunk_sizer: Optional[AdaptiveChunkSizer] = None,
+    count_seed_sample_size: int = 0,
 ) -> pd.DataFrame:
     """Searches a cohort using a term filter and a query string.
 
+    Cohorts of `MAX_TERMS_CHUNK_SIZE` or more values, or any cohort when
+    `chunk_sizer` is given, are searched in chunks whose size adapts to the
+    hits per ID and latency observed so far (see `AdaptiveChunkSizer`). By
+    default the sizer shared by all searches of `index_name` is used.
+
     Args:
         index_name: The name of the Elasticsearch index to search.
         fields_list: The list of fields to return from each document.
         term_name: The name of the field to use for the term-level filter.
         entered_list: The list of values to filter for in the `term_name` field.
         search_string: The query string to apply to the search.
+        chunk_sizer: An optional sizer to use instead of the shared one.
+        count_seed_sample_size: If greater than 0, a count query over this many
+            values seeds the chunk size before the first chunked search.
 
     Returns:
         A pandas DataFrame containing the search results.
     """
     if cs is None:
         initialize_cogstack_client()
-    if len(entered_list) >= 10000:
-
-        results = []
-        chunked_list = list_chunker(entered_list)
-        for mini_list in chunked_list:
-            query = {
-                "from": 0,
-                "size": 10000,
-                "query": {
-                    "bool": {
-                        "filter": {"terms": {term_name: mini_list}},
-                        "must": [{"query_string": {"query": search_string}}],
-                    }
-                },
-                "_source": fields_list,
-            }
-            df = cs.cogstack2df(
-                query=query, index=index_name, column_headers=fields_list
-            )
-            results.append(df)
-        try:
-            merged_df = [df.set_index("_id") for df in results]
-        except Exception as e:
-            logging.error(e)
-            raise e
-            return results
+    if len(entered_list) >= MAX_TERMS_CHUNK_SIZE or chunk_sizer is not None:
+        if chunk_sizer is None:
+            chunk_sizer = get_chunk_sizer(index_name)
+
+        results = _search_in_adaptive_chunks(
+            index_name,
+            fields_list,
+            term_name,
+            entered_list,
+            search_string,
+            chunk_sizer,
+            count_seed_sample_size=count_seed_sample_size,
+        )
 
         try:
             # Concatenate DataFrames using the generator
             merged_df = pd.concat(dataframe_generator(results), ignore_index=True)
             merged_df = merged_df.set_index("_id")
         except Exception as e:
+            logging.error(e)
             raise e
 
         return merged_df
@@ -411,34 +520,31 @@ def cohort_searcher_with_terms_no_search(
     fields_list: List[str],
     term_name: str,
     entered_list: List[str],
+    chunk_sizer: Optional[AdaptiveChunkSizer] = None,
 ) -> pd.DataFrame:
     """Searches a cohort using only a term-level filter.
 
+    Large cohorts are searched in adaptively sized chunks, as in
+    `cohort_searcher_with_terms_and_search`.
+
     Args:
         index_name: The name of the index to search.
         fields_list: A list of fields to return.
         term_name: The field to filter on.
         entered_list: The list of values to search for in the `term_name` field.
+        chunk_sizer: An optional sizer to use instead of the shared one.
 
     Returns:
         A pandas DataFrame containing the search results.
     """
     if cs is None:
         initialize_cogstack_client()
-    if len(entered_list) >= 10000:
-        results = []
-        chunked_list = list_chunker(entered_list)
-        for mini_list in chunked_list:
-            query = {
-                "from": 0,
-                "size": 10000,
-                "query": {"bool": {"filter": {"terms": {term_name: mini_list}}}},
-                "_source": fields_list,
-            }
-            df = cs.cogstack2df(
-                query=query, index=index_name, column_headers=fields_list
-            )
-            results.append(df)
+    if len(entered_list) >= MAX_TERMS_CHUNK_SIZE or chunk_sizer is not None:
+        if chunk_sizer is None:
+            chunk_sizer = get_chunk_sizer(index_name)
+        results = _search_in_adaptive_chunks(
+            index_name, fields_list, term_name, entered_list, None, chunk_sizer
+        )
         merged_df = [set_index_safe_wrapper(df) for df in results]
         return merged_df
     else:
@@ -500,73 +606,205 @@ def cohort_searcher_no_terms_fuzzy(
     """
     if cs is None:
         initialize_cogstack_client()
+
+    query = {
+        "from": 0,
+        "size": 10000,
+        "query": _build_fuzzy_search_clause(
+            fields_list, search_string, method=method, fuzzy=fuzzy, slop=slop
+        ),
+        "_source": fields_list,
+    }
+
+    # Execute the query and return the results as a DataFrame
+    df = cs.cogstack2df(query=query, index=index_name, column_headers=fields_list)
+    return df
+
+
+def _build_fuzzy_search_clause(
+    fields_list: List[str],
+    search_string: str,
+    method: str = "fuzzy",
+    fuzzy: int = 2,
+    slop: int = 1,
+) -> Dict[str, Any]:
+    """Builds the query clause used by `cohort_searcher_no_terms_fuzzy`.
+
+    Args:
+        fields_list: List of fields to retrieve. The first field is used for
+            "exact" matching.
+        search_string: The search string to query.
+        method: The search method ("fuzzy", "exact", or "phrase").
+        fuzzy: The fuzziness level for fuzzy matching.
+        slop: The slop value for phrase searches (word proximity).
+
+    Returns:
+        The Elasticsearch query clause for the requested method.
+    """
     if method == "fuzzy":
         # Fuzzy query
-        query = {
-            "from": 0,
-            "size": 10000,
-            "query": {
-                "bool": {
-                    "must": [
-                        {
-                            "query_string": {
-                                "fields": ["*"],  # Search across all fields by default
-                                "query": search_string,
-                                "fuzziness": fuzzy,  # Set fuzziness level
-                            }
+        return {
+            "bool": {
+                "must": [
+                    {
+                        "query_string": {
+                            "fields": ["*"],  # Search across all fields by default
+                            "query": search_string,
+                            "fuzziness": fuzzy,  # Set fuzziness level
                         }
-                    ]
-                }
-            },
-            "_source": fields_list,
+                    }
+                ]
+            }
         }
     elif method == "exact":
         # Exact match query using keyword fields
-        query = {
-            "from": 0,
-            "size": 10000,
-            "query": {
-                "term": {
-                    f"{fields_list[0]}.keyword": search_string  # Exact match on the first field in the list
-                }
-            },
-            "_source": fields_list,
+        return {
+            "term": {
+                f"{fields_list[0]}.keyword": search_string  # Exact match on the first field in the list
+            }
         }
     elif method == "phrase":
         # Phrase match query with slop and fuzziness for typos
-        query = {
-            "from": 0,
-            "size": 10000,
-            "query": {
-                "bool": {
-                    "must": [
-                        {
-                            "match": {
-                                "_all": {  # Fuzzy matching to allow typos
-                                    "query": search_string,
-                                    "fuzziness": fuzzy,  # Allow typos
-                                }
+        return {
+            "bool": {
+                "must": [
+                    {
+                        "match": {
+                            "_all": {  # Fuzzy matching to allow typos
+                                "query": search_string,
+                                "fuzziness": fuzzy,  # Allow typos
                             }
-                        },
-                        {
-                            "match_phrase": {
-                                "_all": {  # Ensure phrase-like behavior with word proximity
-                                    "query": search_string,
-                                    "slop": slop,  # Allow slight reordering of words
-                                }
+                        }
+                    },
+                    {
+                        "match_phrase": {
+                            "_all": {  # Ensure phrase-like behavior with word proximity
+                                "query": search_string,
+                                "slop": slop,  # Allow slight reordering of words
                             }
-                        },
-                    ]
-                }
-            },
-            "_source": fields_list,
+                        }
+                    },
+                ]
+            }
         }
     else:
         raise ValueError("Invalid method. Choose from 'fuzzy', 'exact', or 'phrase'.")
 
-    # Execute the query and return the results as a DataFrame
-    df = cs.cogstack2df(query=query, index=index_name, column_headers=fields_list)
-    return df
+
+def cohort_searcher_multi_term_grouped(
+    index_name: str,
+    fields_list: List[str],
+    term_search_strings: Dict[str, str],
+    method: str = "fuzzy",
+    fuzzy: int = 2,
+    slop: int = 1,
+    term_group_size: int = 25,
+    n_workers: int = 4,
+) -> pd.DataFrame:
+    """Searches an index for many terms using grouped, named queries.
+
+    Terms are batched into groups of `term_group_size`. Each group is sent as
+    a single `bool.should` query in which every clause is named after its
+    term, so Elasticsearch reports which terms matched each hit via
+    `matched_queries`. Groups are executed concurrently on a thread pool and
+    the hits are de-duplicated by document id and matched term.
+
+    Args:
+        index_name: The name of the Elasticsearch index.
+        fields_list: List of fields to retrieve.
+        term_search_strings: Mapping of search term to the full search string
+            to run for that term.
+        method: The search method ("fuzzy", "exact", or "phrase").
+        fuzzy: The fuzziness level for fuzzy matching.
+        slop: The slop value for phrase searches (word proximity).
+        term_group_size: The number of terms combined into one query.
+        n_workers: The number of term groups searched concurrently.
+
+    Returns:
+        A DataFrame with one row per matching document and term, with the
+        matching term recorded in a `search_term` column.
+    """
+    if cs is None:
+        initialize_cogstack_client()
+
+    terms = list(term_search_strings.keys())
+    term_group_size = max(1, int(term_group_size))
+    term_groups = [
+        terms[i : i + term_group_size] for i in range(0, len(terms), term_group_size)
+    ]
+
+    def _search_term_group(term_group: List[str]) -> pd.DataFrame:
+        should_clauses = []
+        for term in term_group:
+            clause = _build_fuzzy_search_clause(
+                fields_list,
+                term_search_strings[term],
+                method=method,
+                fuzzy=fuzzy,
+                slop=slop,
+            )
+            should_clauses.append({"bool": {"must": [clause], "_name": term}})
+
+        query = {
+            "from": 0,
+            "size": 10000,
+            "query": {"bool": {"should": should_clauses, "minimum_should_match": 1}},
+            "_source": fields_list,
+        }
+        return cs.cogstack2df(
+            query=query,
+            index=index_name,
+            column_headers=fields_list,
+            include_matched_queries=True,
+        )
+
+    results = []
+    with ThreadPoolExecutor(max_workers=max(1, int(n_workers))) as executor:
+        futures = {
+            executor.submit(_search_term_group, term_group): term_group
+            for term_group in term_groups
+        }
+        for future in tqdm(as_completed(futures), total=len(futures)):
+            term_group = futures[future]
+            try:
+                results.append(future.result())
+            except Exception as e:
+                logging.error(
+                    f"Search failed for term group starting '{term_group[0]}': {e}"
+                )
+                raise
+
+    results = [df for df in results if df is not None and not df.empty]
+    if not results:
+        return pd.DataFrame(
+            columns=["_index", "_id", "_score", *fields_list, "search_term"]
+        )
+
+    docs = pd.concat(results, ignore_index=True)
+
+    # One row per (document, matched term), as produced by per-term searches.
+    docs = docs.explode("matched_queries").rename(
+        columns={"matched_queries": "search_term"}
+    )
+    docs = docs[docs["search_term"].isin(terms)]
+    docs = docs.drop_duplicates(subset=["_id", "search_term"]).reset_index(drop=True)
+
+    return docs[[col for col in docs.columns if col != "search_term"] + ["search_term"]]
+
+
+def _log_grouped_term_counts(
+    docs: pd.DataFrame, term_search_strings: Dict[str, str]
+) -> None:
+    """Logs per-term hit counts for the output of a grouped term search."""
+    term_counts = (
+        docs["search_term"].value_counts() if not docs.empty else pd.Series(dtype=int)
+    )
+    for term in term_search_strings:
+        n_docs = int(term_counts.get(term, 0))
+        if n_docs == 0:
+            logging.info(f"No results found for term: {term}")
+        else:
+            logging.info(f"Found {n_docs} documents for term: {term}")
 
 
 def iterative_multi_term_cohort_searcher_no_terms_fuzzy(
@@ -586,9 +824,14 @@ def iterative_multi_term_cohort_searcher_no_terms_fuzzy(
     method: str = "fuzzy",
     fuzzy: int = 2,
     slop: int = 1,
+    term_group_size: int = 25,
+    n_workers: int = 4,
 ) -> pd.DataFrame:
     """Iteratively searches for EPR documents matching multiple search terms.
 
+    Terms are batched into grouped named queries and the groups are searched
+    concurrently (see `cohort_searcher_multi_term_grouped`).
+
     Args:
         terms_list: The list of search terms to search for.
         treatment_doc_filename: The name of the file to store the results in.
@@ -606,6 +849,8 @@ def iterative_multi_term_cohort_searcher_no_terms_fuzzy(
         method: The search method to use ('fuzzy', 'exact', or 'phrase').
         fuzzy: The fuzziness level for fuzzy matching.
         slop: The slop value for phrase searches.
+        term_group_size: The number of terms combined into a single query.
+        n_workers: The number of term groups searched concurrently.
 
     Returns:
         A DataFrame containing the search results.
@@ -624,9 +869,9 @@ def iterative_multi_term_cohort_searcher_no_terms_fuzzy(
         )
         docs = pd.read_csv(treatment_doc_filename)
     else:
-        all_docs = []
+        term_search_strings = {}
 
-        for term in tqdm(terms_list):
+        for term in dict.fromkeys(terms_list):
             # Modify the search string for each term
             search_string = f'"{term}" AND updatetime:[{start_year}-{start_month}-{start_day} TO {end_year}-{end_month}-{end_day}]'
 
@@ -714,26 +959,24 @@ def iterative_multi_term_cohort_searcher_no_terms_fuzzy(
             else:
                 field_list = "client_idcode document_guid document_description body_analysed updatetime clientvisit_visitidcode".split()
 
-            # method="fuzzy", fuzzy=2, slop=1
-            # Perform the search
-            term_docs = cohort_searcher_no_terms_fuzzy(
-                index_name="epr_documents",
-                fields_list=field_list,
-                search_string=search_string,
-                method=method,
-                fuzzy=fuzzy,
-                slop=slop,
-            )
-
-            term_docs["search_term"] = term
-
-            if debug:
-                logging.debug("%s: %d docs", term, len(term_docs))
-
-            all_docs.append(term_docs)
+            term_search_strings[term] = search_string
+
+        # method="fuzzy", fuzzy=2, slop=1
+        # Perform the grouped search for all terms
+        docs = cohort_searcher_multi_term_grouped(
+            index_name="epr_documents",
+            fields_list=field_list,
+            term_search_strings=term_search_strings,
+            method=method,
+            fuzzy=fuzzy,
+            slop=slop,
+            term_group_size=term_group_size,
+            n_workers=n_workers,
+        )
 
-        # Concatenate the results for all terms
-        docs = pd.concat(all_docs, ignore_index=True)
+        if debug:
+            for term, n_docs in docs["search_term"].value_counts().items():
+                logging.debug("%s: %d docs", term, n_docs)
 
         docs = docs.drop_duplicates()
 
@@ -775,6 +1018,8 @@ def iterative_multi_term_cohort_searcher_no_terms_fuzzy_mct(
     slop: int = 1,
     testing: bool = False,
     testing_elastic: bool = False,
+    term_group_size: int = 25,
+    n_workers: int = 4,
 ) -> pd.DataFrame:
     """Iteratively searches for MCT documents matching multiple search terms.
 
@@ -797,6 +1042,9 @@ def iterative_multi_term_cohort_searcher_no_terms_fuzzy_mct(
         testing: Whether to use a dummy searcher for testing.
         testing_elastic: If True, uses the real searcher against the configured ES
                          instance even if `testing` is True.
+        term_group_size: The number of terms combined into a single grouped
+            query.
+        n_workers: The number of term groups searched concurrently.
 
     Returns:
         A DataFrame containing the search results.
@@ -831,8 +1079,9 @@ def iterative_multi_term_cohort_searcher_no_terms_fuzzy_mct(
             logging.info(f"Loaded existing file and append: {treatment_doc_filename}")
 
         all_docs = []
+        term_search_strings = {}
 
-        for term in tqdm(terms_list):
+        for term in tqdm(dict.fromkeys(terms_list)):
             # Modify the search string for each term
 
             search_string = f'obscatalogmasteritem_displayname:("AoMRC_ClinicalSummary_FT") AND observation_valuetext_analysed:("{term}") AND observationdocument_recordeddtm:[{start_year}-{start_month}-{start_day} TO {end_year}-{end_month}-{end_day}]'
@@ -966,16 +1215,9 @@ def iterative_multi_term_cohort_searcher_no_terms_fuzzy_mct(
                 )
 
             else:
-
-                # Perform the search
-                term_docs = cohort_searcher_no_terms_fuzzy(
-                    index_name="observations",
-                    fields_list=field_list,
-                    search_string=search_string,
-                    method=method,
-                    fuzzy=fuzzy,
-                    slop=slop,
-                )
+                # Real searches are grouped and run after the loop.
+                term_search_strings[term] = search_string
+                continue
 
             # Check if term_docs is empty and log if necessary
             if term_docs is None or term_docs.empty:
@@ -985,6 +1227,22 @@ def iterative_multi_term_cohort_searcher_no_terms_fuzzy_mct(
                 term_docs["search_term"] = term
                 all_docs.append(term_docs)
 
+        if term_search_strings:
+            # Perform the grouped search for all terms
+            grouped_docs = cohort_searcher_multi_term_grouped(
+                index_name="observations",
+                fields_list=field_list,
+                term_search_strings=term_search_strings,
+                method=method,
+                fuzzy=fuzzy,
+                slop=slop,
+                term_group_size=term_group_size,
+                n_workers=n_workers,
+            )
+            _log_grouped_term_counts(grouped_docs, term_search_strings)
+            if not grouped_docs.empty:
+                all_docs.append(grouped_docs)
+
         # If no documents were found for any term, return an empty DataFrame
         if not all_docs:
             logging.warning("No documents were found for any of the terms.")
@@ -1296,6 +1554,8 @@ def iterative_multi_term_cohort_searcher_no_terms_fuzzy_textual_obs(
     slop: int = 1,
     testing: bool = False,
     testing_elastic: bool = False,
+    term_group_size: int = 25,
+    n_workers: int = 4,
 ) -> pd.DataFrame:
     """Iteratively searches for textual observations matching multiple terms.
 
@@ -1319,6 +1579,9 @@ def iterative_multi_term_cohort_searcher_no_terms_fuzzy_textual_obs(
         testing: Whether to use a dummy searcher for testing.
         testing_elastic: If True, uses the real searcher against the configured ES
                          instance even if `testing` is True.
+        term_group_size: The number of terms combined into a single grouped
+            query.
+        n_workers: The number of term groups searched concurrently.
 
     Returns:
         A DataFrame containing the search results.
@@ -1353,8 +1616,9 @@ def iterative_multi_term_cohort_searcher_no_terms_fuzzy_textual_obs(
             logging.info(f"Loaded existing file and append: {treatment_doc_filename}")
 
         all_docs = []
+        term_search_strings = {}
 
-        for term in tqdm(terms_list):
+        for term in tqdm(dict.fromkeys(terms_list)):
             # Modify the search string for each term
 
             search_string = (
@@ -1472,15 +1736,9 @@ def iterative_multi_term_cohort_searcher_no_terms_fuzzy_textual_obs(
                 ]
 
             if not testing or (testing and testing_elastic):
-                # Perform the search
-                term_docs = cohort_searcher_no_terms_fuzzy(
-                    index_name="basic_observations",
-                    fields_list=field_list,
-                    search_string=search_string,
-                    method=method,
-                    fuzzy=fuzzy,
-                    slop=slop,
-                )
+                # Real searches are grouped and run after the loop.
+                term_search_strings[term] = search_string
+                continue
             else:
 
                 term_docs = cohort_searcher_with_terms_and_search_dummy(
@@ -1501,6 +1759,22 @@ def iterative_multi_term_cohort_searcher_no_terms_fuzzy_textual_obs(
                 term_docs["search_term"] = term
                 all_docs.append(term_docs)
 
+        if term_search_strings:
+            # Perform the grouped search for all terms
+            grouped_docs = cohort_searcher_multi_term_grouped(
+                index_name="basic_observations",
+                fields_list=field_list,
+                term_search_strings=term_search_strings,
+                method=method,
+                fuzzy=fuzzy,
+                slop=slop,
+                term_group_size=term_group_size,
+                n_workers=n_workers,
+            )
+            _log_grouped_term_counts(grouped_docs, term_search_strings)
+            if not grouped_docs.empty:
+                all_docs.append(grouped_docs)
+
         # If no documents were found for any term, return an empty DataFrame
         if not all_docs:
             logging.warning("No documents were found for any of the terms.")
@@ -1,50 +1,138 @@
-import csv
-import multiprocessing
-from multiprocessing import Pool
-from typing import List
+import logging
+import math
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Dict, List, Optional
 
 import pandas as pd
 from tqdm.notebook import tqdm
 
+from pat2vec.pat2vec_search.adaptive_chunking import (
+    MAX_TERMS_CHUNK_SIZE,
+    get_chunk_sizer,
+)
 from pat2vec.pat2vec_search.cogstack_search_methods import (
     cohort_searcher_with_terms_and_search,
 )
+from pat2vec.util.arrow_utils import write_parquet_with_fallback
+
+logger = logging.getLogger(__name__)
+
+
+def plan_search_chunks(
+    entered_list: List[Any],
+    n_workers: int,
+    min_chunk_size: int = 50,
+    max_chunk_size: int = MAX_TERMS_CHUNK_SIZE,
+    chunks_per_worker: int = 4,
+) -> List[List[Any]]:
+    """Splits `entered_list` into chunks sized for parallel searching.
+
+    The chunk size is chosen so that each worker receives roughly
+    `chunks_per_worker` chunks, which keeps all workers busy while limiting the
+    cost of retrying a single failed chunk. The size is clamped between
+    `min_chunk_size` and `max_chunk_size`.
 
+    Args:
+        entered_list: The list of values to split.
+        n_workers: The number of workers that will consume the chunks.
+        min_chunk_size: The smallest chunk size to use.
+        max_chunk_size: The largest chunk size to use.
+        chunks_per_worker: The target number of chunks per worker.
 
-def pull_and_write(index_name, fields_list, term_name, entered_list, search_string):
+    Returns:
+        A list of chunks (lists) covering `entered_list` in order.
     """
-    Pull data from elasticsearch and write to a file.
-
-    Parameters
-    ----------
-    index_name : str
-        The name of the index to search.
-    fields_list : list
-        The list of fields to retrieve.
-    term_name : str
-        The name of the term to search.
-    entered_list : list
-        The list of values to search for.
-    search_string : str
-        The search string to use.
-
-    Notes
-    -----
-    The file is written in append mode, so if the file already exists, data will be appended to it.
-    The header is not written to the file, so if you want a header, you need to add it manually.
+    if not entered_list:
+        return []
+
+    target_chunks = max(1, n_workers * chunks_per_worker)
+    chunk_size = math.ceil(len(entered_list) / target_chunks)
+    chunk_size = max(min_chunk_size, min(max_chunk_size, chunk_size))
+
+    return [
+        entered_list[i : i + chunk_size]
+        for i in range(0, len(entered_list), chunk_size)
+    ]
+
+
+def _write_part_file(df: pd.DataFrame, part_path: str) -> None:
+    """Writes a search result chunk to Parquet."""
+    write_parquet_with_fallback(df, part_path)
+
+
+def pull_and_write(
+    index_name: str,
+    fields_list: List[str],
+    term_name: str,
+    entered_list: List[str],
+    search_string: str,
+    part_path: str,
+    max_retries: int = 3,
+    retry_backoff: float = 2.0,
+) -> Dict[str, Any]:
+    """Pulls one chunk of a cohort search and writes it to its own Parquet file.
+
+    Args:
+        index_name: The name of the index to search.
+        fields_list: The list of fields to retrieve.
+        term_name: The name of the field to filter on.
+        entered_list: The chunk of values to search for.
+        search_string: The search string to use.
+        part_path: The Parquet file this chunk is written to.
+        max_retries: The number of attempts before the chunk is reported as
+            failed.
+        retry_backoff: The base delay in seconds between attempts. The delay
+            doubles after each failed attempt.
+
+    Returns:
+        A dictionary with the chunk's timing and outcome: `part_path`,
+        `n_terms`, `n_hits`, `attempts`, `seconds` and `error`.
     """
-    print(f"running...{len(entered_list)}")
-    file_name = "temp_search_store.csv"
-
-    df_write = cohort_searcher_with_terms_and_search(
-        index_name=index_name,
-        fields_list=fields_list,
-        term_name=term_name,
-        entered_list=entered_list,
-        search_string=search_string,
-    )
+    start_time = time.perf_counter()
+    last_error = None
+
+    for attempt in range(1, max_retries + 1):
+        try:
+            df_write = cohort_searcher_with_terms_and_search(
+                index_name=index_name,
+                fields_list=fields_list,
+                term_name=term_name,
+                entered_list=entered_list,
+                search_string=search_string,
+            )
+            # Chunks of MAX_TERMS_CHUNK_SIZE come back indexed by `_id`.
+            df_write = df_write.reset_index(drop="_id" in df_write.columns)
+            _write_part_file(df_write, part_path)
 
-    df_write.to_csv(file_name, mode="a", index=False, header=False)
+            return {
+                "part_path": part_path,
+                "n_terms": len(entered_list),
+                "n_hits": len(df_write),
+                "attempts": attempt,
+                "seconds": time.perf_counter() - start_time,
+                "error": None,
+            }
+        except Exception as e:
+            last_error = e
+            logger.warning(
+                f"Search chunk of {len(entered_list)} terms failed "
+                f"(attempt {attempt}/{max_retries}): {e}"
+            )
+            if attempt < max_retries:
+                time.sleep(retry_backoff * (2 ** (attempt - 1)))
+
+    return {
+        "part_path": part_path,
+        "n_terms": len(entered_list),
+        "n_hits": 0,
+        "attempts": max_retries,
+        "seconds": time.perf_counter() - start_time,
+        "error": str(last_error),
+    }
 
 
 def cohort_searcher_with_terms_and_search_multi(
@@ -53,13 +141,24 @@ def cohort_searcher_with_terms_and_search_multi(
     term_name: str,
     entered_list: List[str],
     search_string: str,
+    n_workers: Optional[int] = None,
+    max_retries: int = 3,
+    parts_dir: Optional[str] = None,
+    output_path: Optional[str] = None,
+    keep_parts: bool = False,
 ) -> pd.DataFrame:
-    """Searches a cohort in parallel using multiple processes.
+    """Searches a cohort in parallel, chunking `entered_list` across workers.
+
+    `entered_list` is split into chunks sized from the cohort and worker count
+    (see `plan_search_chunks`), capped by the chunk size learned for
+    `index_name` from earlier searches (see `get_chunk_sizer`). Each chunk is searched by a worker thread,
+    retried on failure, and written to its own Parquet part file, so no two
+    workers share an output file. The parts are then merged into a single
+    DataFrame with column names and dtypes preserved. Per-chunk timings are
+    logged and attached to the result as `df.attrs["chunk_timings"]`.
 
-    This function splits a large list of search terms (`entered_list`) into
-    chunks and distributes the search queries across multiple processes. The
-    results from each process are written to a temporary file and then read
-    back into a single DataFrame.
+    Threads are used rather than processes: the work is bound by
+    Elasticsearch I/O and the client is thread-safe.
 
     Args:
         index_name: The name of the index to search.
@@ -67,38 +166,105 @@ def cohort_searcher_with_terms_and_search_multi(
         term_name: The name of the term to filter on.
         entered_list: The list of values to search for.
         search_string: The search string to use.
+        n_workers: The number of concurrent searches. Defaults to
+            `min(8, os.cpu_count())`.
+        max_retries: The number of attempts per chunk.
+        parts_dir: Directory for the Parquet part files. A temporary directory
+            is used if not given. Parts written to a given `parts_dir` are
+            always kept.
+        output_path: If given, the merged result is also written to this
+            Parquet file.
+        keep_parts: If True, the temporary directory used when no `parts_dir`
+            is given, and its part files, are not deleted after merging.
 
     Returns:
         A DataFrame containing the combined results of the parallel search.
+
+    Raises:
+        RuntimeError: If any chunk still fails after `max_retries` attempts.
     """
-    file_name = "temp_search_store.csv"
+    if n_workers is None:
+        n_workers = min(8, os.cpu_count() or 1)
+    n_workers = max(1, int(n_workers))
 
-    with open(file_name, "w", newline="") as outcsv:
-        writer = csv.writer(outcsv)
-        writer.writerow(fields_list)
+    chunk_sizer = get_chunk_sizer(index_name)
+    chunks = plan_search_chunks(
+        entered_list,
+        n_workers=n_workers,
+        max_chunk_size=chunk_sizer.next_size(),
+    )
+    columns = ["_index", "_id", "_score", *fields_list]
 
-    n = multiprocessing.cpu_count()
-    list_to_split = entered_list
+    if not chunks:
+        return pd.DataFrame(columns=columns)
 
-    # Split the list of terms into chunks for each process
-    pat_list_master = [
-        list_to_split[i : i + n] for i in range(0, len(list_to_split), n)
-    ]
-    print(
-        f"Splitting {len(list_to_split)} items into {len(pat_list_master)} chunks for parallel processing."
+    created_parts_dir = parts_dir is None
+    if created_parts_dir:
+        parts_dir = tempfile.mkdtemp(prefix="pat2vec_search_")
+    else:
+        os.makedirs(parts_dir, exist_ok=True)
+
+    logger.info(
+        f"Splitting {len(entered_list)} items into {len(chunks)} chunks "
+        f"for parallel search with {n_workers} workers."
     )
 
-    # Prepare arguments for each process
-    args_list = [
-        (index_name, fields_list, term_name, chunk, search_string)
-        for chunk in pat_list_master
-    ]
+    timings = []
+    try:
+        with ThreadPoolExecutor(max_workers=n_workers) as executor:
+            futures = [
+                executor.submit(
+                    pull_and_write,
+                    index_name,
+                    fields_list,
+                    term_name,
+                    chunk,
+                    search_string,
+                    os.path.join(parts_dir, f"part-{i:05d}.parquet"),
+                    max_retries,
+                )
+                for i, chunk in enumerate(chunks)
+            ]
+            for future in tqdm(as_completed(futures), total=len(futures)):
+                timing = future.result()
+                timings.append(timing)
+                if timing["error"] is None:
+                    chunk_sizer.record(
+                        timing["n_terms"], timing["n_hits"], timing["seconds"]
+                    )
+                logger.debug(
+                    f"Chunk {os.path.basename(timing['part_path'])}: "
+                    f"{timing['n_terms']} terms, {timing['n_hits']} hits, "
+                    f"{timing['seconds']:.2f}s, {timing['attempts']} attempt(s)"
+                )
 
-    with Pool() as pool:
-        print(f"Starting parallel search with {pool._processes} processes...")
-        for _ in tqdm(
-            pool.imap_unordered(pull_and_write, args_list), total=len(args_list)
-        ):
-            pass
+        failed = [timing for timing in timings if timing["error"] is not None]
+        if failed:
+            raise RuntimeError(
+                f"{len(failed)} of {len(chunks)} search chunks failed after "
+                f"{max_retries} attempts. First error: {failed[0]['error']}"
+            )
+
+        part_paths = sorted(timing["part_path"] for timing in timings)
+        parts = [pd.read_parquet(path) for path in part_paths]
+        parts = [part for part in parts if not part.empty]
+
+        if parts:
+            merged_df = pd.concat(parts, ignore_index=True)
+        else:
+            merged_df = pd.DataFrame(columns=columns)
+
+        if output_path:
+            _write_part_file(merged_df, output_path)
+    finally:
+        if created_parts_dir and not keep_parts:
+            shutil.rmtree(parts_dir, ignore_errors=True)
+
+    total_seconds = sum(timing["seconds"] for timing in timings)
+    logger.info(
+        f"Parallel search returned {len(merged_df)} rows from {len(chunks)} chunks "
+        f"({total_seconds:.1f}s of cumulative search time)."
+    )
 
-    return pd.read_csv("temp_search_store.csv")
+    merged_df.attrs["chunk_timings"] = sorted(timings, key=lambda t: t["part_path"])
+    return merged_df
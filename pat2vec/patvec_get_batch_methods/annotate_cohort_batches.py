@@ -0,0 +1,438 @@
+"""
+Annotates the documents of a whole cohort in large cross-patient batches.
+
+The `get_pat_batch_*_annotations` functions annotate one patient's documents
+at a time, so patients with few documents give MedCAT tiny batches and its
+multiprocessing never pays off. `annotate_cohort_batches` pools the raw
+documents of many patients into batches of `annotation_batch_docs` documents,
+annotates each batch with `annotation_n_process` processes, and splits the
+results back per patient into the usual annotation outputs. `pat_maker` then
+reads those outputs instead of annotating.
+"""
+
+import logging
+import os
+import time
+from dataclasses import dataclass, replace
+from typing import Any, Callable, Dict, Iterator, List, Optional, Set, Tuple
+
+import pandas as pd
+import tqdm
+
+from pat2vec.util.annotation_cache import get_entities_multi_texts_cached
+from pat2vec.util.annotation_io import annotation_output_path, find_annotation_output
+from pat2vec.util.helper_functions import get_df_from_db
+from pat2vec.util.incremental_annotation import (
+    is_incremental,
+    read_annotated_guids,
+    select_unannotated_documents,
+)
+from pat2vec.util.methods_annotation import (
+    multi_annots_to_df_mct,
+    multi_annots_to_df_reports,
+    multi_annots_to_df_textual_obs,
+)
+from pat2vec.util.methods_annotation_multi_annots_to_df import multi_annots_to_df
+from pat2vec.util.partitioned_store import read_patient_batch
+
+logger = logging.getLogger(__name__)
+
+#: Default number of documents pooled per MedCAT call.
+DEFAULT_ANNOTATION_BATCH_DOCS = 2000
+#: Default number of documents per MedCAT process batch.
+DEFAULT_ANNOTATION_BATCH_SIZE = 100
+
+
+@dataclass
+class AnnotationSourceConfig:
+    """Configuration for annotating one document source across a cohort."""
+
+    name: str
+    """A human-readable name for the document source (e.g., "EPR documents")."""
+
+    enabled_option: str
+    """The key in the main options config that enables/disables this source."""
+
+    raw_batch_path_attr: str
+    """The config attribute holding the raw document batch path."""
+
+    annotation_batch_path_attr: str
+    """The config attribute holding the annotation output path."""
+
+    raw_table: str
+    """The raw data table of the database backend."""
+
+    annotation_table: str
+    """The annotations table of the database backend."""
+
+    merged_batch: str
+    """The name of the `merged_<merged_batch>_batches` cache of this source."""
+
+    text_columns: List[str]
+    """Columns a document must have non-empty to be annotated. The first is
+    the text passed to MedCAT."""
+
+    to_dataframe: Callable
+    """The `multi_annots_to_df*` function writing this source's output."""
+
+    overwrite_attr: str = "overwrite_stored_pat_docs"
+    """The config flag forcing existing annotations to be recomputed."""
+
+    guid_column: str = "document_guid"
+    """The document identifier column, tracking which documents are annotated."""
+
+    include_text_sample: bool = True
+    """Whether `include_text_sample_in_annots` is passed to `to_dataframe`."""
+
+    n_patients: Optional[int] = None
+    """The number of patients annotated, set by `annotate_cohort_batches`."""
+
+    n_docs: Optional[int] = None
+    """The number of documents annotated, set by `annotate_cohort_batches`."""
+
+    seconds: Optional[float] = None
+    """The time taken to annotate this source, set by `annotate_cohort_batches`."""
+
+    error: Optional[str] = None
+    """The error raised while annotating this source, if any."""
+
+
+ANNOTATION_SOURCE_CONFIGS = [
+    AnnotationSourceConfig(
+        name="EPR documents",
+        enabled_option="annotations",
+        raw_batch_path_attr="pre_document_batch_path",
+        annotation_batch_path_attr="pre_document_annotation_batch_path",
+        raw_table="raw_epr_docs",
+        annotation_table="ann_epr_docs",
+        merged_batch="epr_docs",
+        text_columns=["body_analysed"],
+        to_dataframe=multi_annots_to_df,
+        include_text_sample=False,
+    ),
+    AnnotationSourceConfig(
+        name="MCT documents",
+        enabled_option="annotations_mrc",
+        raw_batch_path_attr="pre_document_batch_path_mct",
+        annotation_batch_path_attr="pre_document_annotation_batch_path_mct",
+        raw_table="raw_mct_docs",
+        annotation_table="ann_mct_docs",
+        merged_batch="mct_docs",
+        text_columns=["observation_valuetext_analysed"],
+        to_dataframe=multi_annots_to_df_mct,
+        guid_column="observation_guid",
+    ),
+    AnnotationSourceConfig(
+        name="textual_obs",
+        enabled_option="textual_obs",
+        raw_batch_path_attr="pre_textual_obs_document_batch_path",
+        annotation_batch_path_attr="pre_textual_obs_annotation_batch_path",
+        raw_table="raw_textual_obs",
+        annotation_table="ann_textual_obs",
+        merged_batch="textual_obs",
+        text_columns=["body_analysed", "textualObs"],
+        to_dataframe=multi_annots_to_df_textual_obs,
+        overwrite_attr="overwrite_stored_pat_observations",
+        guid_column="basicobs_guid",
+    ),
+    AnnotationSourceConfig(
+        name="annotations_reports",
+        enabled_option="annotations_reports",
+        raw_batch_path_attr="pre_document_batch_path_reports",
+        annotation_batch_path_attr="pre_document_annotation_batch_path_reports",
+        raw_table="raw_reports",
+        annotation_table="ann_reports",
+        merged_batch="reports",
+        text_columns=["body_analysed"],
+        to_dataframe=multi_annots_to_df_reports,
+        guid_column="basicobs_guid",
+    ),
+]
+
+
+def get_annotation_n_process(config_obj: Any) -> int:
+    """Returns the number of MedCAT processes used for cohort annotation."""
+    n_process = getattr(config_obj, "annotation_n_process", None)
+    if n_process is None:
+        n_process = min(4, os.cpu_count() or 1)
+    return max(1, int(n_process))
+
+
+def _annotated_patients(
+    source: AnnotationSourceConfig, client_idcode_list: List[str], config_obj: Any
+) -> Set[str]:
+    """Returns the patients whose annotation output for `source` exists."""
+    if getattr(config_obj, source.overwrite_attr, False):
+        return set()
+
+    if config_obj.storage_backend == "database":
+        df = get_df_from_db(
+            config_obj,
+            "annotations",
+            source.annotation_table,
+            patient_ids=client_idcode_list,
+            columns=["client_idcode"],
+        )
+        if df.empty:
+            return set()
+        return set(df["client_idcode"].astype(str))
+
+    annotation_path = getattr(config_obj, source.annotation_batch_path_attr)
+    return {
+        client_idcode
+        for client_idcode in client_idcode_list
+        if find_annotation_output(annotation_path, client_idcode) is not None
+    }
+
+
+def _annotated_guids(
+    source: AnnotationSourceConfig, client_idcode_list: List[str], config_obj: Any
+) -> Dict[str, Set[str]]:
+    """Returns the GUIDs of the documents already annotated, per patient."""
+    if config_obj.storage_backend == "database":
+        df = get_df_from_db(
+            config_obj,
+            "annotations",
+            source.annotation_table,
+            patient_ids=client_idcode_list,
+            columns=["client_idcode", source.guid_column],
+        )
+        if df.empty or source.guid_column not in df.columns:
+            return {}
+        return {
+            client_idcode: set(guids.dropna().astype(str))
+            for client_idcode, guids in df.groupby(df["client_idcode"].astype(str))[
+                source.guid_column
+            ]
+        }
+
+    annotation_path = getattr(config_obj, source.annotation_batch_path_attr)
+    return {
+        client_idcode: read_annotated_guids(
+            find_annotation_output(annotation_path, client_idcode)
+            or annotation_output_path(annotation_path, client_idcode, config_obj),
+            source.guid_column,
+        )
+        for client_idcode in client_idcode_list
+    }
+
+
+def _clean_documents(
+    source: AnnotationSourceConfig, pat_batch: pd.DataFrame
+) -> pd.DataFrame:
+    """Drops documents without text, so results align with the texts sent."""
+    pat_batch = pat_batch.dropna(subset=source.text_columns)
+    for column in source.text_columns:
+        pat_batch = pat_batch[pat_batch[column].astype(str) != ""]
+    return pat_batch.reset_index(drop=True)
+
+
+def _iter_raw_batches(
+    source: AnnotationSourceConfig,
+    client_idcode_list: List[str],
+    config_obj: Any,
+    chunk_size: int = 900,
+) -> Iterator[Tuple[str, pd.DataFrame]]:
+    """Yields each patient's raw documents for `source`.
+
+    Patients without stored documents are skipped, as `pat_maker` skips them.
+    """
+    if config_obj.storage_backend == "database":
+        for i in range(0, len(client_idcode_list), chunk_size):
+            chunk = client_idcode_list[i : i + chunk_size]
+            df = get_df_from_db(
+                config_obj, "raw_data", source.raw_table, patient_ids=chunk
+            )
+            if df.empty:
+                continue
+            pat_batches = dict(
+                tuple(df.groupby(df["client_idcode"].astype(str), sort=False))
+            )
+            for client_idcode in chunk:
+                if client_idcode in pat_batches:
+                    yield client_idcode, pat_batches[client_idcode]
+        return
+
+    raw_batch_path = getattr(config_obj, source.raw_batch_path_attr)
+    for client_idcode in client_idcode_list:
+        try:
+            pat_batch = read_patient_batch(
+                os.path.join(raw_batch_path, f"{client_idcode}.csv"),
+                config_obj,
+                merged_batch=source.merged_batch,
+            )
+        except FileNotFoundError:
+            continue
+        if not pat_batch.empty:
+            yield client_idcode, pat_batch
+
+
+def _annotate_pool(
+    source: AnnotationSourceConfig,
+    pool: List[Tuple[str, pd.DataFrame]],
+    cat: Any,
+    config_obj: Any,
+) -> int:
+    """Annotates a pool of patients' documents in one MedCAT call.
+
+    The results are split back per patient and written by the source's
+    `to_dataframe` function.
+
+    Returns:
+        The number of documents annotated.
+    """
+    texts = [
+        text
+        for _, pat_batch in pool
+        for text in pat_batch[source.text_columns[0]].tolist()
+    ]
+    multi_annots = []
+    if texts:
+        multi_annots = get_entities_multi_texts_cached(
+            cat,
+            texts,
+            config_obj,
+            n_process=get_annotation_n_process(config_obj),
+            batch_size=getattr(
+                config_obj, "annotation_batch_size", DEFAULT_ANNOTATION_BATCH_SIZE
+            ),
+        )
+        if len(multi_annots) != len(texts):
+            raise ValueError(
+                f"MedCAT returned {len(multi_annots)} results for {len(texts)} texts."
+            )
+
+    kwargs = {}
+    if source.include_text_sample:
+        kwargs["include_text_sample"] = config_obj.include_text_sample_in_annots
+
+    offset = 0
+    for client_idcode, pat_batch in pool:
+        pat_annots = multi_annots[offset : offset + len(pat_batch)]
+        offset += len(pat_batch)
+        source.to_dataframe(
+            client_idcode,
+            pat_batch,
+            pat_annots,
+            config_obj=config_obj,
+            t=None,
+            **kwargs,
+        )
+    return len(texts)
+
+
+def annotate_source(
+    source: AnnotationSourceConfig,
+    client_idcode_list: List[str],
+    cat: Any,
+    config_obj: Any,
+    pbar: Optional[tqdm.tqdm] = None,
+) -> None:
+    """Annotates one source for the cohort, recording its outcome on `source`.
+
+    Patients whose annotation output already exists are skipped, or, with
+    `annotation_incremental`, only their documents not yet annotated are
+    annotated and appended. Errors are recorded on `source` rather than raised.
+
+    Args:
+        source: The document source to annotate. Its `n_patients`, `n_docs`,
+            `seconds` and `error` fields are set.
+        client_idcode_list: The patients to annotate.
+        cat: The loaded MedCAT `CAT` object.
+        config_obj: The configuration object.
+        pbar: An optional progress bar, advanced once the source is done.
+    """
+    start_time = time.perf_counter()
+    source.n_patients = 0
+    source.n_docs = 0
+    batch_docs = max(
+        1, getattr(config_obj, "annotation_batch_docs", DEFAULT_ANNOTATION_BATCH_DOCS)
+    )
+    try:
+        incremental = is_incremental(config_obj, source.overwrite_attr)
+        if incremental:
+            pending = client_idcode_list
+            annotated_guids = _annotated_guids(source, pending, config_obj)
+        else:
+            done = _annotated_patients(source, client_idcode_list, config_obj)
+            pending = [
+                client_idcode
+                for client_idcode in client_idcode_list
+                if client_idcode not in done
+            ]
+
+        pool: List[Tuple[str, pd.DataFrame]] = []
+        n_pooled = 0
+        for client_idcode, pat_batch in _iter_raw_batches(source, pending, config_obj):
+            pat_batch = _clean_documents(source, pat_batch)
+            if incremental:
+                pat_batch = select_unannotated_documents(
+                    pat_batch,
+                    annotated_guids.get(client_idcode, set()),
+                    source.guid_column,
+                ).reset_index(drop=True)
+                if pat_batch.empty:
+                    continue
+            pool.append((client_idcode, pat_batch))
+            n_pooled += len(pat_batch)
+            if n_pooled >= batch_docs:
+                source.n_docs += _annotate_pool(source, pool, cat, config_obj)
+                source.n_patients += len(pool)
+                pool, n_pooled = [], 0
+        if pool:
+            source.n_docs += _annotate_pool(source, pool, cat, config_obj)
+            source.n_patients += len(pool)
+    except Exception as e:
+        source.error = str(e)
+        logger.error(f"Error annotating {source.name}: {e}")
+    finally:
+        source.seconds = time.perf_counter() - start_time
+        if pbar is not None:
+            pbar.set_postfix_str(source.name)
+            pbar.update(1)
+
+
+def annotate_cohort_batches(pat2vec_obj: Any) -> List[AnnotationSourceConfig]:
+    """Annotates the cohort's documents in large cross-patient batches.
+
+    For each enabled document source, the raw documents of patients without
+    annotation output are pooled into batches of
+    `config_obj.annotation_batch_docs` documents. Each batch is annotated by a
+    single `cat.get_entities_multi_texts` call using
+    `config_obj.annotation_n_process` processes and
+    `config_obj.annotation_batch_size` documents per process batch. The
+    results are then split per patient and written to the same annotation
+    files or tables as the `get_pat_batch_*_annotations` functions, which
+    read them back during `pat_maker`.
+
+    Run this after the raw document batches have been fetched, e.g. by
+    `prefetch_batches`.
+
+    Args:
+        pat2vec_obj: The main pat2vec object, holding the configuration,
+            the patient list and the loaded MedCAT `CAT` object.
+
+    Returns:
+        A list of the `AnnotationSourceConfig` objects that were processed,
+        with their `n_patients`, `n_docs`, `seconds` and `error` fields set.
+    """
+    config_obj = pat2vec_obj.config_obj
+    client_idcode_list = [str(x) for x in dict.fromkeys(pat2vec_obj.all_patient_list)]
+
+    enabled_sources = [
+        replace(source)
+        for source in ANNOTATION_SOURCE_CONFIGS
+        if config_obj.main_options.get(source.enabled_option, True)
+    ]
+
+    with tqdm.tqdm(total=len(enabled_sources), desc="Annotating sources") as pbar:
+        for source in enabled_sources:
+            annotate_source(
+                source, client_idcode_list, pat2vec_obj.cat, config_obj, pbar
+            )
+            logger.info(
+                f"{source.name}: annotated {source.n_docs} documents for "
+                f"{source.n_patients} patients in {source.seconds:.1f}s"
+            )
+
+    return enabled_sources
@@ -0,0 +1,259 @@
+"""
+A standalone annotation service, run separately from feature building.
+
+Annotation normally happens inside `pat_maker`, through the
+`get_pat_batch_*_annotations` functions, so NER and vectorisation contend
+for the same process. This service instead reads the raw document batches
+already in the store, annotates them in a pool of worker processes that each
+load one MedCAT `CAT`, and writes the usual annotation outputs. `pat_maker`
+then only reads them, and the number of annotation workers can be sized
+independently of feature building.
+
+Each worker loads the run's configuration itself from a `module:attribute`
+spec, so no database engine or model is pickled between processes::
+
+    pat2vec-annotate my_run_config:config_obj --workers 4
+
+or, equivalently::
+
+    python -m pat2vec.patvec_get_batch_methods.annotation_workers \\
+        my_run_config:config_obj --workers 4
+
+`my_run_config.config_obj` is a `config_class` instance, or a callable
+returning one.
+"""
+
+import argparse
+import importlib
+import logging
+import math
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import replace
+from typing import Any, Dict, List, Optional, Sequence
+
+from tqdm import tqdm
+
+from pat2vec.pat2vec_pat_list.get_patient_treatment_list import get_all_patients_list
+from pat2vec.patvec_get_batch_methods.annotate_cohort_batches import (
+    ANNOTATION_SOURCE_CONFIGS,
+    AnnotationSourceConfig,
+    annotate_source,
+)
+from pat2vec.util.methods_get_medcat import get_cat
+
+logger = logging.getLogger(__name__)
+
+# The configuration and MedCAT model of the current worker process.
+_WORKER_STATE: Dict[str, Any] = {}
+
+
+def load_config(config_spec: str) -> Any:
+    """Loads a configuration object from a `module:attribute` spec.
+
+    Args:
+        config_spec: The module and attribute holding the configuration, e.g.
+            'my_run_config:config_obj'. The attribute defaults to
+            'config_obj'. If it is callable, it is called to build the
+            configuration.
+
+    Returns:
+        The configuration object.
+    """
+    module_name, _, attribute = config_spec.partition(":")
+    config_obj = getattr(
+        importlib.import_module(module_name), attribute or "config_obj"
+    )
+    if callable(config_obj):
+        config_obj = config_obj()
+    return config_obj
+
+
+def _init_worker(config_spec: str, single_process: bool = True) -> None:
+    """Loads the configuration and one MedCAT model into a worker process."""
+    config_obj = load_config(config_spec)
+    if single_process:
+        # Parallelism comes from the worker processes, so each runs MedCAT
+        # in a single process.
+        config_obj.annotation_n_process = 1
+    _WORKER_STATE["config_obj"] = config_obj
+    _WORKER_STATE["cat"] = get_cat(config_obj)
+
+
+def _annotate_unit(
+    source: AnnotationSourceConfig, client_idcode_list: List[str]
+) -> AnnotationSourceConfig:
+    """Annotates one source for a chunk of patients in a worker process."""
+    source = replace(source)
+    annotate_source(
+        source,
+        client_idcode_list,
+        _WORKER_STATE["cat"],
+        _WORKER_STATE["config_obj"],
+    )
+    return source
+
+
+def _plan_units(
+    client_idcode_list: List[str], n_workers: int, units_per_worker: int
+) -> List[List[str]]:
+    """Splits the cohort into chunks, several per worker to balance the load."""
+    if not client_idcode_list:
+        return []
+    chunk_size = math.ceil(len(client_idcode_list) / (n_workers * units_per_worker))
+    return [
+        client_idcode_list[i : i + chunk_size]
+        for i in range(0, len(client_idcode_list), chunk_size)
+    ]
+
+
+def _merge_outcomes(
+    source: AnnotationSourceConfig, outcomes: List[AnnotationSourceConfig]
+) -> AnnotationSourceConfig:
+    """Sums the outcomes of a source's units into one `AnnotationSourceConfig`."""
+    errors = [outcome.error for outcome in outcomes if outcome.error is not None]
+    return replace(
+        source,
+        n_patients=sum(outcome.n_patients or 0 for outcome in outcomes),
+        n_docs=sum(outcome.n_docs or 0 for outcome in outcomes),
+        seconds=sum(outcome.seconds or 0.0 for outcome in outcomes),
+        error=errors[0] if errors else None,
+    )
+
+
+def run_annotation_workers(
+    config_spec: str,
+    n_workers: Optional[int] = None,
+    client_idcode_list: Optional[Sequence[str]] = None,
+    units_per_worker: int = 4,
+) -> List[AnnotationSourceConfig]:
+    """Annotates the stored raw documents of a cohort with a pool of workers.
+
+    For each document source enabled in the configuration's `main_options`,
+    the cohort is split into chunks of patients. Each chunk is annotated by a
+    worker process with `annotate_source`, which pools the chunk's documents
+    into `annotation_batch_docs` batches, skips patients whose annotations
+    already exist, and writes the same outputs `pat_maker` reads.
+
+    Args:
+        config_spec: The `module:attribute` spec of the configuration, loaded
+            by the main process and by each worker (see `load_config`).
+        n_workers: The number of worker processes, each holding one MedCAT
+            model. Defaults to `min(4, os.cpu_count())`. With 1, the work is
+            done in the calling process.
+        client_idcode_list: The patients to annotate. Defaults to the cohort
+            of the configuration.
+        units_per_worker: The target number of patient chunks per worker and
+            source.
+
+    Returns:
+        One `AnnotationSourceConfig` per enabled source, with the summed
+        `n_patients`, `n_docs` and worker `seconds`, and the first error.
+    """
+    config_obj = load_config(config_spec)
+    if client_idcode_list is None:
+        client_idcode_list = get_all_patients_list(config_obj)
+    client_idcode_list = [str(x) for x in dict.fromkeys(client_idcode_list)]
+
+    if n_workers is None:
+        n_workers = min(4, os.cpu_count() or 1)
+    n_workers = max(1, int(n_workers))
+
+    sources = [
+        source
+        for source in ANNOTATION_SOURCE_CONFIGS
+        if config_obj.main_options.get(source.enabled_option, True)
+    ]
+    units = [
+        (source, chunk)
+        for source in sources
+        for chunk in _plan_units(client_idcode_list, n_workers, units_per_worker)
+    ]
+    logger.info(
+        f"Annotating {len(client_idcode_list)} patients for {len(sources)} "
+        f"sources in {len(units)} units with {n_workers} workers."
+    )
+
+    outcomes: Dict[str, List[AnnotationSourceConfig]] = {
+        source.name: [] for source in sources
+    }
+    if n_workers == 1:
+        _init_worker(config_spec, single_process=False)
+        for source, chunk in tqdm(units, desc="Annotating"):
+            outcomes[source.name].append(_annotate_unit(source, chunk))
+    else:
+        # MedCAT and torch are not fork-safe, so workers are spawned.
+        with ProcessPoolExecutor(
+            max_workers=n_workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(config_spec, True),
+        ) as executor:
+            futures = [
+                executor.submit(_annotate_unit, source, chunk)
+                for source, chunk in units
+            ]
+            for future in tqdm(
+                as_completed(futures), total=len(futures), desc="Annotating"
+            ):
+                outcome = future.result()
+                outcomes[outcome.name].append(outcome)
+
+    results = [_merge_outcomes(source, outcomes[source.name]) for source in sources]
+    for result in results:
+        status = "failed" if result.error is not None else "done"
+        logger.info(
+            f"{result.name}: {status}, {result.n_docs} documents for "
+            f"{result.n_patients} patients ({result.seconds:.1f}s of worker time)"
+        )
+    return results
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    """Runs the annotation service from the command line.
+
+    Args:
+        argv: The command line arguments. Defaults to `sys.argv[1:]`.
+
+    Returns:
+        The exit code: 0 if every source was annotated, 1 otherwise.
+    """
+    parser = argparse.ArgumentParser(
+        prog="pat2vec-annotate",
+        description=(
+            "Annotate stored raw document batches with a pool of MedCAT workers."
+        ),
+    )
+    parser.add_argument(
+        "config",
+        help="The configuration as 'module:attribute', e.g. my_run_config:config_obj.",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=None,
+        help="The number of worker processes (default: min(4, CPU count)).",
+    )
+    parser.add_argument(
+        "--patients-file",
+        default=None,
+        help="A file with one patient id per line (default: the config's cohort).",
+    )
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+
+    client_idcode_list = None
+    if args.patients_file is not None:
+        with open(args.patients_file) as f:
+            client_idcode_list = [line.strip() for line in f if line.strip()]
+
+    results = run_annotation_workers(
+        args.config, n_workers=args.workers, client_idcode_list=client_idcode_list
+    )
+    return 1 if any(result.error is not None for result in results) else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -10,10 +10,37 @@ from pat2vec.patvec_get_batch_methods.get_merged_batches import (
     get_merged_pat_batch_obs,
     get_merged_pat_batch_reports,
     get_merged_pat_batch_textual_obs_docs,
-    split_and_save_csv,
 )
+from pat2vec.patvec_get_batch_methods.main_get_pat_batch_obs import (
+    get_obs_batch_path,
+)
+from pat2vec.util.merged_batch_cache import remove_merged_batch
+from pat2vec.util.partitioned_store import (
+    DEFAULT_N_BUCKETS,
+    STORE_DIRNAME,
+    drop_store_patients,
+    merge_staged_store,
+    read_store_metadata,
+    write_partitioned_store,
+)
+from pat2vec.util.prefetch_state import (
+    PrefetchState,
+    delta_fetch_config,
+    later_watermark,
+    load_prefetch_state,
+    max_time,
+    rows_after_watermark,
+    save_prefetch_state,
+    split_cohort,
+)
+import os
+import pandas as pd
+import shutil
+import tempfile
+import time
 import tqdm
-from typing import Optional, List, Any
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, Optional, List, Any
 from dataclasses import dataclass
 
 
@@ -39,6 +66,278 @@ class BatchConfig:
     search_term: Optional[str] = None
     """An optional search term required by the `get_function`."""
 
+    time_column: Optional[str] = None
+    """The column used to sort each patient's rows in the partitioned store, and
+    the watermark column of incremental prefetches without an `update_column`."""
+
+    update_column: Optional[str] = None
+    """The column holding when a record was last updated, if the source has one
+    alongside a `guid_column`. Incremental prefetches take their watermark
+    from it, so that records edited since are fetched again and replace their
+    stored versions. Otherwise only records with a `time_column` after the
+    watermark are fetched, and edits to older records are not picked up."""
+
+    merged_batch: Optional[str] = None
+    """The name of the `merged_<merged_batch>_batches` cache of this data type."""
+
+    guid_column: Optional[str] = None
+    """The column identifying a record, so that records updated since an
+    incremental prefetch replace their stored versions."""
+
+    seconds: Optional[float] = None
+    """The time taken to fetch and save this batch type, set by `prefetch_batches`."""
+
+    n_rows: Optional[int] = None
+    """The number of rows fetched for this batch type, set by `prefetch_batches`."""
+
+    error: Optional[str] = None
+    """The error raised while processing this batch type, if any."""
+
+    save_path_by_search_term: bool = False
+    """If True, the batch is saved under the observation directory of its
+    `search_term` (see `get_obs_batch_path`) rather than the save path itself,
+    as the per-term readers of the CORE_* observations expect."""
+
+    def get_save_path(self, config_obj: Any) -> str:
+        """Returns the directory the split patient files are saved in."""
+        if self.save_path_by_search_term:
+            return get_obs_batch_path(config_obj, self.search_term)
+        return getattr(config_obj, self.save_path_attr)
+
+
+def _fetch_incremental(
+    pat2vec_obj: Any, config: BatchConfig, func_kwargs: Dict[str, Any], store_path: str
+) -> pd.DataFrame:
+    """Fetches only what the batch type's prefetch state does not yet hold.
+
+    Patients covered by an earlier incremental prefetch are fetched from the
+    watermark onwards, and new patients in full. The fetched rows are appended
+    to the store, replacing stored versions of the same `guid_column` record,
+    and the state is advanced. Patients fetched in full replace all their
+    stored rows, such as those of an earlier full prefetch, so that sources
+    without a `guid_column` are not stored twice.
+
+    The readers look up the merged batch cache before the store, so the cache,
+    which lacks the appended rows, is removed. The store is complete from the
+    first incremental run onwards and is read from the same batch directory,
+    so the readers then find every patient there.
+
+    Returns:
+        The newly fetched rows.
+    """
+    config_obj = pat2vec_obj.config_obj
+    cohort = list(pat2vec_obj.all_patient_list)
+    state = load_prefetch_state(store_path, config.name)
+
+    frames = []
+    full_patients = cohort
+    if state is None:
+        # First incremental run: fetch everything, bypassing merged caches that
+        # may have been written for a different cohort.
+        state = PrefetchState(time_column=config.update_column or config.time_column)
+        frames.append(
+            config.get_function(
+                **{**func_kwargs, "config_obj": delta_fetch_config(config_obj)}
+            )
+        )
+    else:
+        covered_patients, full_patients = split_cohort(cohort, state)
+        if covered_patients:
+            delta = config.get_function(
+                **{
+                    **func_kwargs,
+                    "client_idcode_list": covered_patients,
+                    "config_obj": delta_fetch_config(
+                        config_obj,
+                        state.watermark,
+                        (
+                            state.time_column
+                            if state.time_column != config.time_column
+                            else None
+                        ),
+                    ),
+                }
+            )
+            frames.append(
+                rows_after_watermark(delta, state.time_column, state.watermark)
+            )
+        if full_patients:
+            frames.append(
+                config.get_function(
+                    **{
+                        **func_kwargs,
+                        "client_idcode_list": full_patients,
+                        "config_obj": delta_fetch_config(config_obj),
+                    }
+                )
+            )
+
+    frames = [frame for frame in frames if frame is not None and not frame.empty]
+    df = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+
+    drop_store_patients(store_path, full_patients)
+    write_partitioned_store(
+        df=df,
+        client_idcode_column=config.id_column,
+        store_path=store_path,
+        time_column=config.time_column,
+        n_buckets=getattr(config_obj, "raw_store_n_buckets", DEFAULT_N_BUCKETS),
+        skip_stored_patients=False,
+        dedup_column=config.guid_column,
+    )
+    if config.merged_batch is not None:
+        remove_merged_batch(
+            os.path.join(
+                config_obj.pre_merged_input_batches_path,
+                f"merged_{config.merged_batch}_batches.csv",
+            )
+        )
+
+    state.watermark = later_watermark(state.watermark, max_time(df, state.time_column))
+    state.patients = sorted(set(state.patients) | {str(p) for p in cohort})
+    save_prefetch_state(store_path, config.name, state)
+    return df
+
+
+def _process_batch_config(pat2vec_obj: Any, config: BatchConfig, verbose: int) -> None:
+    """Fetches and saves a single batch type, recording its outcome on `config`.
+
+    Errors are caught and recorded so that a failing batch type does not stop
+    the others.
+    """
+    start_time = time.perf_counter()
+    staging_path = None
+    try:
+        if verbose > 0:
+            print(f"[INFO] Processing {config.name} batch")
+
+        # Prepare function arguments
+        func_kwargs = {
+            "client_idcode_list": pat2vec_obj.all_patient_list,
+            "config_obj": pat2vec_obj.config_obj,
+            "cohort_searcher_with_terms_and_search": pat2vec_obj.cohort_searcher_with_terms_and_search,
+        }
+
+        # Add search_term if required
+        if config.search_term is not None:
+            func_kwargs["search_term"] = config.search_term
+
+        if getattr(
+            pat2vec_obj.config_obj, "prefetch_incremental", False
+        ) and _incremental_supported(pat2vec_obj.config_obj):
+            store_path = os.path.join(
+                config.get_save_path(pat2vec_obj.config_obj), STORE_DIRNAME
+            )
+            df = _fetch_incremental(pat2vec_obj, config, func_kwargs, store_path)
+            config.n_rows = len(df)
+            if verbose > 0:
+                print(f"[INFO] Incrementally fetched {config.name} batch")
+            return
+
+        # The batch is streamed chunk by chunk, so the whole cohort's data is
+        # never held in memory. With the file backend each chunk is staged
+        # next to the patient-bucketed Parquet store read by the
+        # `get_pat_batch_*` functions, and merged into it once the whole batch
+        # is fetched; with the database backend the get_function saves it.
+        store_path = None
+        if pat2vec_obj.config_obj.storage_backend == "file":
+            save_path = config.get_save_path(pat2vec_obj.config_obj)
+            store_path = os.path.join(save_path, STORE_DIRNAME)
+            os.makedirs(save_path, exist_ok=True)
+            staging_path = tempfile.mkdtemp(
+                prefix=f"{STORE_DIRNAME}_staging_", dir=save_path
+            )
+            # Staged buckets match the store's, so each merges into one part.
+            n_buckets = (read_store_metadata(store_path) or {}).get(
+                "n_buckets",
+                getattr(
+                    pat2vec_obj.config_obj, "raw_store_n_buckets", DEFAULT_N_BUCKETS
+                ),
+            )
+        config.n_rows = 0
+
+        def write_chunk(chunk: pd.DataFrame) -> None:
+            config.n_rows += len(chunk)
+            if staging_path is not None:
+                write_partitioned_store(
+                    df=chunk,
+                    client_idcode_column=config.id_column,
+                    store_path=staging_path,
+                    time_column=config.time_column,
+                    n_buckets=n_buckets,
+                    skip_stored_patients=False,
+                )
+
+        config.get_function(**func_kwargs, chunk_callback=write_chunk, collect=False)
+        if staging_path is not None:
+            merge_staged_store(staging_path, store_path)
+
+        if verbose > 0:
+            print(f"[INFO] Successfully processed and saved {config.name} batch")
+
+    except Exception as e:
+        config.error = str(e)
+        # Always print errors regardless of verbosity
+        print(f"[ERROR] Error processing {config.name} batch: {str(e)}")
+    finally:
+        if staging_path is not None:
+            # Chunks of a failed fetch are discarded with the staging store.
+            shutil.rmtree(staging_path, ignore_errors=True)
+        config.seconds = time.perf_counter() - start_time
+
+
+def _incremental_supported(config_obj: Any) -> bool:
+    """Checks whether incremental prefetching applies to the storage backend.
+
+    The database backend replaces its raw tables on each fetch, so only the
+    'file' backend, whose store can be appended to, prefetches incrementally.
+    """
+    return config_obj.storage_backend == "file"
+
+
+def _process_batch_lane(
+    pat2vec_obj: Any,
+    lane: List[BatchConfig],
+    verbose: int,
+    pbar: Optional[tqdm.tqdm] = None,
+) -> List[BatchConfig]:
+    """Processes batch types that share a save path, one after another."""
+    for config in lane:
+        _process_batch_config(pat2vec_obj, config, verbose)
+        if verbose > 0 or config.error is not None:
+            status = "failed" if config.error is not None else "done"
+            print(
+                f"[INFO] {config.name}: {status} in {config.seconds:.1f}s "
+                f"({config.n_rows or 0} rows)"
+            )
+        if pbar is not None:
+            pbar.set_postfix_str(config.name)
+            pbar.update(1)
+    return lane
+
+
+def _get_prefetch_n_workers(config_obj: Any) -> int:
+    """Returns the number of batch types to fetch concurrently.
+
+    An in-memory SQLite database is shared through a single connection, so it
+    cannot take concurrent writes and prefetching falls back to one worker.
+    """
+    n_workers = max(1, int(getattr(config_obj, "prefetch_n_workers", 1) or 1))
+    engine = getattr(config_obj, "db_engine", None)
+    if (
+        n_workers > 1
+        and config_obj.storage_backend == "database"
+        and engine is not None
+        and engine.url.get_backend_name() == "sqlite"
+        and engine.url.database in (None, "", ":memory:")
+    ):
+        print(
+            "[INFO] In-memory SQLite database does not support concurrent writes; "
+            "prefetching batch types sequentially."
+        )
+        return 1
+    return n_workers
+
 
 def prefetch_batches(pat2vec_obj: Any) -> List[BatchConfig]:
     """Prefetches and processes patient data batches with progress tracking.
@@ -46,17 +345,31 @@ def prefetch_batches(pat2vec_obj: Any) -> List[BatchConfig]:
     This function orchestrates the pre-fetching of data for multiple data types
     (e.g., bloods, drugs, documents) in bulk. For each enabled data type, it
     calls the appropriate `get_merged_pat_batch_*` function to retrieve data for
-    all patients at once. It then splits these large, merged DataFrames into
-    individual patient files and saves them to their respective directories.
+    all patients at once. The data is streamed in chunks of patients, and with
+    the 'file' backend each chunk is written to the partitioned store of its
+    data type.
 
     This approach is often more efficient than fetching data patient-by-patient,
     especially when dealing with a large cohort.
 
+    Batch types query different indices and are independent, so they are
+    processed concurrently by up to `config_obj.prefetch_n_workers` threads.
+    Batch types that share a save path run in order within a single worker.
+    Errors are isolated per batch type. Each processed `BatchConfig` records
+    its timing, row count and error, if any.
+
+    With `config_obj.prefetch_incremental` and the 'file' backend, each batch
+    type records a watermark (the latest value of its `time_column`) and the
+    patients covered. Later runs fetch only rows newer than the watermark for
+    covered patients, plus the full history of new patients, and append them
+    to the store (see `pat2vec.util.prefetch_state`).
+
     Args:
         pat2vec_obj: The patient vector object containing configuration and patient data.
 
     Returns:
-        A list of the `BatchConfig` objects that were processed.
+        A list of the `BatchConfig` objects that were processed, with their
+        `seconds`, `n_rows` and `error` fields set.
     """
     if pat2vec_obj is None:
         print("[ERROR] pat2vec_obj cannot be None")
@@ -72,114 +385,174 @@ def prefetch_batches(pat2vec_obj: Any) -> List[BatchConfig]:
             enabled_option="bloods",
             get_function=get_merged_pat_batch_bloods,
             save_path_attr="pre_bloods_batch_path",
+            time_column=pat2vec_obj.config_obj.bloods_time_field,
             search_term="",  # Search term is not used by the function
+            merged_batch="bloods",
         ),
         BatchConfig(
             name="diagnostics",
             enabled_option="diagnostics",
             get_function=get_merged_pat_batch_diagnostics,
             save_path_attr="pre_diagnostics_batch_path",
+            time_column=pat2vec_obj.config_obj.diagnostic_time_field,
+            merged_batch="diagnostics",
+            guid_column="order_guid",
         ),
         BatchConfig(
             name="drugs",
             enabled_option="drugs",
             get_function=get_merged_pat_batch_drugs,
             save_path_attr="pre_drugs_batch_path",
+            time_column=pat2vec_obj.config_obj.drug_time_field,
+            merged_batch="drugs",
+            guid_column="order_guid",
         ),
         BatchConfig(
             name="EPR documents",
             enabled_option="annotations",
             get_function=get_merged_pat_batch_epr_docs,
             save_path_attr="pre_document_batch_path",
+            time_column="updatetime",
             search_term="",  # Search term is not used by the function
+            merged_batch="epr_docs",
+            guid_column="document_guid",
         ),
         BatchConfig(
             name="MCT documents",
             enabled_option="annotations_mrc",
             get_function=get_merged_pat_batch_mct_docs,
             save_path_attr="pre_document_batch_path_mct",
+            time_column="observationdocument_recordeddtm",
             search_term="",  # Search term is not used by the function
+            merged_batch="mct_docs",
+            guid_column="observation_guid",
         ),
         BatchConfig(
             name="textual_obs",
             enabled_option="textual_obs",
             get_function=get_merged_pat_batch_textual_obs_docs,
             save_path_attr="pre_textual_obs_document_batch_path",
+            time_column="basicobs_entered",
             search_term="",  # Search term is not used by the function
+            merged_batch="textual_obs",
+            guid_column="basicobs_guid",
+            update_column="updatetime",
         ),
         BatchConfig(
             name="CORE_SmokingStatus",
             enabled_option="smoking_status",
             get_function=get_merged_pat_batch_obs,
             save_path_attr="pre_misc_batch_path",
+            save_path_by_search_term=True,
+            time_column="observationdocument_recordeddtm",
             search_term="CORE_SmokingStatus",
+            merged_batch="CORE_SmokingStatus",
+            guid_column="observation_guid",
         ),
         BatchConfig(
             name="CORE_SpO2",
             enabled_option="core_02",
             get_function=get_merged_pat_batch_obs,
             save_path_attr="pre_misc_batch_path",
+            save_path_by_search_term=True,
+            time_column="observationdocument_recordeddtm",
             search_term="CORE_SpO2",
+            merged_batch="CORE_SpO2",
+            guid_column="observation_guid",
         ),
         BatchConfig(
             name="CORE_BedNumber3",
             enabled_option="bed",
             get_function=get_merged_pat_batch_obs,
             save_path_attr="pre_misc_batch_path",
+            save_path_by_search_term=True,
+            time_column="observationdocument_recordeddtm",
             search_term="CORE_BedNumber3",
+            merged_batch="CORE_BedNumber3",
+            guid_column="observation_guid",
         ),
         BatchConfig(
             name="CORE_VTE_STATUS",
             enabled_option="vte_status",
             get_function=get_merged_pat_batch_obs,
             save_path_attr="pre_misc_batch_path",
+            save_path_by_search_term=True,
+            time_column="observationdocument_recordeddtm",
             search_term="CORE_VTE_STATUS",
+            merged_batch="CORE_VTE_STATUS",
+            guid_column="observation_guid",
         ),
         BatchConfig(
             name="CORE_HospitalSite",
             enabled_option="hosp_site",
             get_function=get_merged_pat_batch_obs,
             save_path_attr="pre_misc_batch_path",
+            save_path_by_search_term=True,
+            time_column="observationdocument_recordeddtm",
             search_term="CORE_HospitalSite",
+            merged_batch="CORE_HospitalSite",
+            guid_column="observation_guid",
         ),
         BatchConfig(
             name="CORE_RESUS_STATUS",
             enabled_option="core_resus",
             get_function=get_merged_pat_batch_obs,
             save_path_attr="pre_misc_batch_path",
+            save_path_by_search_term=True,
+            time_column="observationdocument_recordeddtm",
             search_term="CORE_RESUS_STATUS",
+            merged_batch="CORE_RESUS_STATUS",
+            guid_column="observation_guid",
         ),
         BatchConfig(
             name="news",
             enabled_option="news",
             get_function=get_merged_pat_batch_news,
             save_path_attr="pre_news_batch_path",
+            time_column="observationdocument_recordeddtm",
             search_term="",  # Search term is not used by the function
+            merged_batch="news",
+            guid_column="observation_guid",
         ),
         BatchConfig(
             name="annotations_reports",
             enabled_option="annotations_reports",
             get_function=get_merged_pat_batch_reports,
-            save_path_attr="pre_report_batch_path",
+            save_path_attr="pre_document_batch_path_reports",
+            time_column="updatetime",
             search_term="report",  # Assuming 'report' is the intended search term
+            merged_batch="reports",
+            guid_column="basicobs_guid",
         ),
         BatchConfig(
             name="appointments",
             enabled_option="appointments",
             get_function=get_merged_pat_batch_appointments,
             save_path_attr="pre_appointments_batch_path",
+            time_column=pat2vec_obj.config_obj.appointments_time_field,
             id_column="HospitalID",
             search_term="",  # Search term is not used by the function
+            merged_batch="appointments",
         ),
         BatchConfig(
             name="demo",
             enabled_option="demo",
             get_function=get_merged_pat_batch_demo,
             save_path_attr="pre_demo_batch_path",
+            time_column="updatetime",
             search_term="",  # Search term is not used by the function
+            merged_batch="demo",
         ),
     ]
 
+    if getattr(
+        pat2vec_obj.config_obj, "prefetch_incremental", False
+    ) and not _incremental_supported(pat2vec_obj.config_obj):
+        print(
+            "[INFO] Incremental prefetching requires the 'file' storage backend; "
+            "fetching full batches."
+        )
+
     # Get enabled batch configs
     enabled_configs = [
         config
@@ -187,45 +560,26 @@ def prefetch_batches(pat2vec_obj: Any) -> List[BatchConfig]:
         if pat2vec_obj.config_obj.main_options.get(config.enabled_option, True)
     ]
 
-    # Process each enabled batch with progress bar
-    for config in tqdm.tqdm(enabled_configs, desc="Processing batch types"):
-        try:
-            if verbose > 0:
-                print(f"[INFO] Processing {config.name} batch")
-
-            # Prepare function arguments
-            func_kwargs = {
-                "client_idcode_list": pat2vec_obj.all_patient_list,
-                "config_obj": pat2vec_obj.config_obj,
-                "cohort_searcher_with_terms_and_search": pat2vec_obj.cohort_searcher_with_terms_and_search,
-            }
-
-            # Add search_term if required
-            if config.search_term is not None:
-                func_kwargs["search_term"] = config.search_term
-
-            # Get batch data
-            df = config.get_function(**func_kwargs)
-
-            # If using file backend, split and save the merged dataframe.
-            # If using database backend, the get_function has already saved the data.
-            if pat2vec_obj.config_obj.storage_backend == "file":
-                # Get save path from config
-                save_path = getattr(pat2vec_obj.config_obj, config.save_path_attr)
-
-                # Save batch data
-                split_and_save_csv(
-                    df=df,
-                    client_idcode_column=config.id_column,
-                    save_folder=save_path,
-                    num_processes=None,
-                )
+    # Batch types sharing a save path are kept in one lane and run in order,
+    # so they never write the same files at once. The CORE_* observations
+    # share `pre_misc_batch_path` but each save under their own term.
+    lanes: Dict[tuple, List[BatchConfig]] = {}
+    for config in enabled_configs:
+        lane_key = (
+            config.save_path_attr,
+            config.search_term if config.save_path_by_search_term else None,
+        )
+        lanes.setdefault(lane_key, []).append(config)
 
-            if verbose > 0:
-                print(f"[INFO] Successfully processed and saved {config.name} batch")
+    n_workers = min(_get_prefetch_n_workers(pat2vec_obj.config_obj), len(lanes) or 1)
 
-        except Exception as e:
-            # Always print errors regardless of verbosity
-            print(f"[ERROR] Error processing {config.name} batch: {str(e)}")
+    with tqdm.tqdm(total=len(enabled_configs), desc="Processing batch types") as pbar:
+        with ThreadPoolExecutor(max_workers=n_workers) as executor:
+            futures = [
+                executor.submit(_process_batch_lane, pat2vec_obj, lane, verbose, pbar)
+                for lane in lanes.values()
+            ]
+            for future in as_completed(futures):
+                future.result()
 
     return enabled_configs
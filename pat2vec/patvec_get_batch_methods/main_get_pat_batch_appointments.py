@@ -1,5 +1,6 @@
 from pat2vec.util.helper_functions import get_df_from_db
-from pat2vec.util.methods_get import exist_check
+from pat2vec.util.field_projection import get_source_fields
+from pat2vec.util.partitioned_store import patient_batch_exists, read_patient_batch
 
 
 import pandas as pd
@@ -75,7 +76,9 @@ def get_pat_batch_appointments(
     appointments_target_path = os.path.join(
         config_obj.pre_appointments_batch_path, str(current_pat_client_id_code) + ".csv"
     )
-    existence_check = exist_check(appointments_target_path, config_obj)
+    existence_check = patient_batch_exists(
+        appointments_target_path, config_obj, merged_batch="appointments"
+    )
 
     should_fetch = False
     if config_obj.storage_backend == "database":
@@ -91,38 +94,7 @@ def get_pat_batch_appointments(
         if should_fetch:
             batch_target = cohort_searcher_with_terms_and_search(
                 index_name="pims_apps*",
-                fields_list=[
-                    "Popular",
-                    "AppointmentType",
-                    "AttendanceReference",
-                    "ClinicCode",
-                    "ClinicDesc",
-                    "Consultant",
-                    "DateModified",
-                    "DNA",
-                    "HospitalID",
-                    "PatNHSNo",
-                    "Specialty",
-                    "AppointmentDateTime",
-                    "Attended",
-                    "CancDesc",
-                    "CancRefNo",
-                    "ConsultantCode",
-                    "DateCreated",
-                    "Ethnicity",
-                    "Gender",
-                    "NHSNoStatusCode",
-                    "NotSpec",
-                    "PatDateOfBirth",
-                    "PatForename",
-                    "PatPostCode",
-                    "PatSurname",
-                    "PiMsPatRefNo",
-                    "Primarykeyfieldname",
-                    "Primarykeyfieldvalue",
-                    "SessionCode",
-                    "SpecialtyCode",
-                ],
+                fields_list=get_source_fields("appointments", config_obj),
                 term_name="HospitalID.keyword",  # alt HospitalID.keyword #warn non case
                 entered_list=[current_pat_client_id_code],
                 search_string=f"{appointments_time_field}:[{global_start_year}-{global_start_month}-{global_start_day} TO {global_end_year}-{global_end_month}-{global_end_day}]",
@@ -167,7 +139,9 @@ def get_pat_batch_appointments(
                 else:
                     batch_target.to_csv(appointments_target_path)
         else:
-            batch_target = pd.read_csv(appointments_target_path)
+            batch_target = read_patient_batch(
+                appointments_target_path, config_obj, merged_batch="appointments"
+            )
         return batch_target
     except Exception as e:
         """"""
@@ -3,7 +3,8 @@ from pat2vec.util.filter_methods import (
     filter_dataframe_by_fuzzy_terms,
 )
 from pat2vec.util.helper_functions import get_df_from_db
-from pat2vec.util.methods_get import exist_check
+from pat2vec.util.field_projection import get_source_fields
+from pat2vec.util.partitioned_store import patient_batch_exists, read_patient_batch
 
 
 import pandas as pd
@@ -82,7 +83,9 @@ def get_pat_batch_bloods(
         config_obj.pre_bloods_batch_path, str(current_pat_client_id_code) + ".csv"
     )
 
-    existence_check = exist_check(batch_obs_target_path, config_obj)
+    existence_check = patient_batch_exists(
+        batch_obs_target_path, config_obj, merged_batch="bloods"
+    )
 
     should_fetch = False
     if config_obj.storage_backend == "database":
@@ -97,14 +100,7 @@ def get_pat_batch_bloods(
 
             batch_target = cohort_searcher_with_terms_and_search(
                 index_name="basic_observations",
-                fields_list=[
-                    "client_idcode",
-                    "basicobs_itemname_analysed",
-                    "basicobs_value_numeric",
-                    "basicobs_entered",
-                    "clientvisit_serviceguid",
-                    "updatetime",
-                ],
+                fields_list=get_source_fields("bloods", config_obj),
                 term_name=config_obj.client_idcode_term_name,
                 entered_list=[current_pat_client_id_code],
                 search_string=f"basicobs_value_numeric:* AND "
@@ -174,7 +170,9 @@ def get_pat_batch_bloods(
                     batch_target.to_csv(batch_obs_target_path)
 
         else:
-            batch_target = pd.read_csv(batch_obs_target_path)
+            batch_target = read_patient_batch(
+                batch_obs_target_path, config_obj, merged_batch="bloods"
+            )
 
         return batch_target
     except Exception as e:
@@ -1,5 +1,6 @@
 from pat2vec.util.helper_functions import get_df_from_db
-from pat2vec.util.methods_get import exist_check
+from pat2vec.util.field_projection import get_source_fields
+from pat2vec.util.partitioned_store import patient_batch_exists, read_patient_batch
 
 
 import pandas as pd
@@ -76,7 +77,9 @@ def get_pat_batch_demo(
     batch_obs_target_path = os.path.join(
         config_obj.pre_demo_batch_path, str(current_pat_client_id_code) + ".csv"
     )
-    existence_check = exist_check(batch_obs_target_path, config_obj)
+    existence_check = patient_batch_exists(
+        batch_obs_target_path, config_obj, merged_batch="demo"
+    )
 
     should_fetch = False
     if config_obj.storage_backend == "database":
@@ -92,16 +95,7 @@ def get_pat_batch_demo(
         if should_fetch:
             batch_target = cohort_searcher_with_terms_and_search(
                 index_name="epr_documents",
-                fields_list=[
-                    "client_idcode",
-                    "client_firstname",
-                    "client_lastname",
-                    "client_dob",
-                    "client_gendercode",
-                    "client_racecode",
-                    "client_deceaseddtm",
-                    "updatetime",
-                ],
+                fields_list=get_source_fields("demo", config_obj),
                 term_name=config_obj.client_idcode_term_name,
                 entered_list=[current_pat_client_id_code],
                 search_string=f"updatetime:[{global_start_year}-{global_start_month}-{global_start_day} TO {global_end_year}-{global_end_month}-{global_end_day}]",
@@ -145,7 +139,9 @@ def get_pat_batch_demo(
                 else:
                     batch_target.to_csv(batch_obs_target_path)
         else:
-            batch_target = pd.read_csv(batch_obs_target_path)
+            batch_target = read_patient_batch(
+                batch_obs_target_path, config_obj, merged_batch="demo"
+            )
 
         return batch_target
     except Exception as e:
@@ -1,5 +1,6 @@
 from pat2vec.util.helper_functions import get_df_from_db
-from pat2vec.util.methods_get import exist_check
+from pat2vec.util.field_projection import get_source_fields
+from pat2vec.util.partitioned_store import patient_batch_exists, read_patient_batch
 
 
 import pandas as pd
@@ -76,7 +77,9 @@ def get_pat_batch_drugs(
     batch_obs_target_path = os.path.join(
         config_obj.pre_drugs_batch_path, str(current_pat_client_id_code) + ".csv"
     )
-    existence_check = exist_check(batch_obs_target_path, config_obj)
+    existence_check = patient_batch_exists(
+        batch_obs_target_path, config_obj, merged_batch="drugs"
+    )
 
     should_fetch = False
     if config_obj.storage_backend == "database":
@@ -93,7 +96,7 @@ def get_pat_batch_drugs(
         if should_fetch:
             batch_target = cohort_searcher_with_terms_and_search(
                 index_name="order",
-                fields_list="""client_idcode order_guid order_name order_summaryline order_holdreasontext order_entered clientvisit_visitidcode order_performeddtm order_createdwhen""".split(),
+                fields_list=get_source_fields("drugs", config_obj),
                 term_name=config_obj.client_idcode_term_name,
                 entered_list=[current_pat_client_id_code],
                 search_string=f'order_typecode:"medication" AND '
@@ -140,7 +143,9 @@ def get_pat_batch_drugs(
                     batch_target.to_csv(batch_obs_target_path)
 
         else:
-            batch_target = pd.read_csv(batch_obs_target_path)
+            batch_target = read_patient_batch(
+                batch_obs_target_path, config_obj, merged_batch="drugs"
+            )
 
         return batch_target
     except Exception as e:
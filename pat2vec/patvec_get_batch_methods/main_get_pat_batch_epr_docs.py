@@ -3,7 +3,8 @@ from pat2vec.util.filter_dataframe_by_timestamp import filter_dataframe_by_times
 from pat2vec.util.filter_methods import filter_dataframe_by_fuzzy_terms
 from pat2vec.util.helper_functions import get_df_from_db
 from pat2vec.util.methods_annotation_regex import append_regex_term_counts
-from pat2vec.util.methods_get import exist_check
+from pat2vec.util.field_projection import get_source_fields
+from pat2vec.util.partitioned_store import patient_batch_exists, read_patient_batch
 
 
 import pandas as pd
@@ -98,7 +99,9 @@ def get_pat_batch_epr_docs(
         logging.debug("global_start_day: %s", global_start_day)
         logging.debug("global_end_day: %s", global_end_day)
 
-    existence_check = exist_check(batch_epr_target_path, config_obj)
+    existence_check = patient_batch_exists(
+        batch_epr_target_path, config_obj, merged_batch="epr_docs"
+    )
 
     should_fetch = False
     if config_obj.storage_backend == "database":
@@ -112,7 +115,7 @@ def get_pat_batch_epr_docs(
 
             batch_target = cohort_searcher_with_terms_and_search(
                 index_name="epr_documents",
-                fields_list="""client_idcode document_guid document_description body_analysed updatetime clientvisit_visitidcode""".split(),
+                fields_list=get_source_fields("epr_docs", config_obj),
                 term_name=config_obj.client_idcode_term_name,
                 entered_list=[current_pat_client_id_code],
                 search_string=f"updatetime:[{global_start_year}-{global_start_month}-{global_start_day} TO {global_end_year}-{global_end_month}-{global_end_day}]",
@@ -246,7 +249,9 @@ def get_pat_batch_epr_docs(
                     batch_target.to_csv(batch_epr_target_path)
 
         else:
-            batch_target = pd.read_csv(batch_epr_target_path)
+            batch_target = read_patient_batch(
+                batch_epr_target_path, config_obj, merged_batch="epr_docs"
+            )
 
         return batch_target
     except Exception as e:
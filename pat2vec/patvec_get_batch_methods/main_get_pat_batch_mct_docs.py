@@ -1,7 +1,8 @@
 from pat2vec.util.clinical_note_splitter import split_and_append_chunks
 from pat2vec.util.filter_methods import apply_data_type_mct_docs_filters
 from pat2vec.util.helper_functions import get_df_from_db
-from pat2vec.util.methods_get import exist_check
+from pat2vec.util.field_projection import get_source_fields
+from pat2vec.util.partitioned_store import patient_batch_exists, read_patient_batch
 
 
 import pandas as pd
@@ -73,7 +74,9 @@ def get_pat_batch_mct_docs(
                 if not df.empty:
                     return df
 
-        existence_check = exist_check(batch_epr_target_path_mct, config_obj)
+        existence_check = patient_batch_exists(
+            batch_epr_target_path_mct, config_obj, merged_batch="mct_docs"
+        )
 
         should_fetch = False
         if config_obj.storage_backend == "database":
@@ -84,9 +87,7 @@ def get_pat_batch_mct_docs(
         if should_fetch:
             batch_target = cohort_searcher_with_terms_and_search(
                 index_name="observations",
-                fields_list="""observation_guid client_idcode obscatalogmasteritem_displayname
-                                    observation_valuetext_analysed observationdocument_recordeddtm
-                                    clientvisit_visitidcode""".split(),
+                fields_list=get_source_fields("mct_docs", config_obj),
                 term_name=config_obj.client_idcode_term_name,
                 entered_list=[current_pat_client_id_code],
                 search_string=f'obscatalogmasteritem_displayname:("AoMRC_ClinicalSummary_FT") AND '
@@ -147,7 +148,9 @@ def get_pat_batch_mct_docs(
                 else:
                     batch_target.to_csv(batch_epr_target_path_mct, index=False)
         else:
-            batch_target = pd.read_csv(batch_epr_target_path_mct)
+            batch_target = read_patient_batch(
+                batch_epr_target_path_mct, config_obj, merged_batch="mct_docs"
+            )
         return batch_target
     except Exception as e:
         """"""
@@ -3,6 +3,18 @@ from pat2vec.util.methods_annotation_get_pat_document_annotation_batch import (
     get_pat_document_annotation_batch_mct,
 )
 from pat2vec.util.methods_get import exist_check
+from pat2vec.util.annotation_io import (
+    annotation_output_path,
+    find_annotation_output,
+    read_annotation_output,
+)
+from pat2vec.util.incremental_annotation import (
+    combine_annotations,
+    is_incremental,
+    read_annotated_guids,
+    select_unannotated_documents,
+)
+from pat2vec.util.partitioned_store import read_patient_batch
 
 
 import pandas as pd
@@ -25,6 +37,10 @@ def get_pat_batch_mct_docs_annotations(
     batch, generates annotations using the provided MedCAT model, and saves
     the result.
 
+    With `annotation_incremental`, existing annotations are extended instead:
+    only documents whose GUID they do not cover yet are annotated and
+    appended.
+
     Args:
         current_pat_client_id_code: The patient's unique identifier.
         config_obj: The main configuration object.
@@ -34,6 +50,9 @@ def get_pat_batch_mct_docs_annotations(
     Returns:
         A DataFrame containing the annotations for the patient's MCT documents.
     """
+    incremental = is_incremental(config_obj, "overwrite_stored_pat_docs")
+    existing_annotations = None
+
     if config_obj.storage_backend == "database":
         table_name = "ann_mct_docs"
         schema_name = "annotations"
@@ -46,7 +65,9 @@ def get_pat_batch_mct_docs_annotations(
                 patient_ids=[current_pat_client_id_code],
             )
             if not df.empty:
-                return df
+                if not incremental:
+                    return df
+                existing_annotations = df
 
     batch_epr_target_path_mct = os.path.join(
         config_obj.pre_document_batch_path_mct, str(current_pat_client_id_code) + ".csv"
@@ -56,17 +77,34 @@ def get_pat_batch_mct_docs_annotations(
         config_obj.pre_document_annotation_batch_path_mct
     )
 
-    current_pat_document_annotation_batch_path = os.path.join(
-        pre_document_annotation_batch_path_mct, current_pat_client_id_code + ".csv"
+    current_pat_document_annotation_batch_path = find_annotation_output(
+        pre_document_annotation_batch_path_mct, current_pat_client_id_code
+    ) or annotation_output_path(
+        pre_document_annotation_batch_path_mct, current_pat_client_id_code, config_obj
     )
 
-    if exist_check(current_pat_document_annotation_batch_path, config_obj=config_obj):
+    if not incremental and exist_check(
+        current_pat_document_annotation_batch_path, config_obj=config_obj
+    ):
 
         # if annotation batch already created, read it
 
-        batch_target = pd.read_csv(current_pat_document_annotation_batch_path)
+        batch_target = read_annotation_output(
+            current_pat_document_annotation_batch_path
+        )
 
     else:
+        if (
+            incremental
+            and existing_annotations is None
+            and exist_check(
+                current_pat_document_annotation_batch_path, config_obj=config_obj
+            )
+        ):
+            existing_annotations = read_annotation_output(
+                current_pat_document_annotation_batch_path
+            )
+
         if config_obj.storage_backend == "database":
             # Use the helper function which handles table existence checks
             pat_batch = get_df_from_db(
@@ -76,15 +114,30 @@ def get_pat_batch_mct_docs_annotations(
                 patient_ids=[current_pat_client_id_code],
             )
         else:
-            pat_batch = pd.read_csv(batch_epr_target_path_mct)
+            pat_batch = read_patient_batch(
+                batch_epr_target_path_mct, config_obj, merged_batch="mct_docs"
+            )
 
         if pat_batch.empty:
-            return None
+            return existing_annotations
 
         pat_batch.dropna(
             subset=["observation_valuetext_analysed"], axis=0, inplace=True
         )
 
+        if existing_annotations is not None:
+            pat_batch = select_unannotated_documents(
+                pat_batch,
+                read_annotated_guids(
+                    current_pat_document_annotation_batch_path,
+                    "observation_guid",
+                    existing=existing_annotations,
+                ),
+                "observation_guid",
+            )
+            if pat_batch.empty:
+                return existing_annotations
+
         batch_target = get_pat_document_annotation_batch_mct(
             current_pat_client_idcode=current_pat_client_id_code,
             pat_batch=pat_batch,
@@ -108,7 +161,7 @@ def get_pat_batch_mct_docs_annotations(
                 logging.error(
                     "Database engine not initialized in config_obj for textual obs annotations."
                 )
-                return batch_target
+                return combine_annotations(existing_annotations, batch_target)
 
             with engine.begin() as connection:
                 table_name = "ann_mct_docs"
@@ -153,4 +206,4 @@ def get_pat_batch_mct_docs_annotations(
             logging.error(
                 f"Could not write MCT annotations to DB for patient {current_pat_client_id_code}: {e}"
             )
-    return batch_target
+    return combine_annotations(existing_annotations, batch_target)
@@ -1,5 +1,6 @@
 from pat2vec.util.helper_functions import get_df_from_db
-from pat2vec.util.methods_get import exist_check
+from pat2vec.util.field_projection import get_source_fields
+from pat2vec.util.partitioned_store import patient_batch_exists, read_patient_batch
 
 
 import pandas as pd
@@ -70,7 +71,9 @@ def get_pat_batch_news(
     batch_obs_target_path = os.path.join(
         config_obj.pre_news_batch_path, str(current_pat_client_id_code) + ".csv"
     )
-    existence_check = exist_check(batch_obs_target_path, config_obj)
+    existence_check = patient_batch_exists(
+        batch_obs_target_path, config_obj, merged_batch="news"
+    )
 
     should_fetch = False
     if config_obj.storage_backend == "database":
@@ -86,9 +89,7 @@ def get_pat_batch_news(
         if should_fetch:
             batch_target = cohort_searcher_with_terms_and_search(
                 index_name="observations",
-                fields_list="""observation_guid client_idcode obscatalogmasteritem_displayname
-                                observation_valuetext_analysed observationdocument_recordeddtm
-                                clientvisit_visitidcode""".split(),
+                fields_list=get_source_fields("news", config_obj),
                 term_name=config_obj.client_idcode_term_name,
                 entered_list=[current_pat_client_id_code],
                 search_string=f"obscatalogmasteritem_displayname:(NEWS*) AND "
@@ -134,7 +135,9 @@ def get_pat_batch_news(
                 else:
                     batch_target.to_csv(batch_obs_target_path)
         else:
-            batch_target = pd.read_csv(batch_obs_target_path)
+            batch_target = read_patient_batch(
+                batch_obs_target_path, config_obj, merged_batch="news"
+            )
 
         return batch_target
     except Exception as e:
@@ -3,7 +3,8 @@ from pat2vec.util.helper_functions import (
     save_raw_patient_batch,
     sanitize_for_path,
 )
-from pat2vec.util.methods_get import exist_check
+from pat2vec.util.field_projection import get_source_fields
+from pat2vec.util.partitioned_store import patient_batch_exists, read_patient_batch
 
 
 import pandas as pd
@@ -14,6 +15,17 @@ import os
 from typing import Any
 
 
+def get_obs_batch_path(config_obj: Any, search_term: str) -> str:
+    """Returns the directory holding the patient batches of an observation term.
+
+    Each term has its own directory, `pre_misc_batch_path` with 'misc'
+    replaced by the sanitized term, and so its own partitioned store.
+    """
+    return config_obj.pre_misc_batch_path.replace(
+        "misc", sanitize_for_path(search_term)
+    )
+
+
 def get_pat_batch_obs(
     current_pat_client_id_code: str,
     search_term: str,
@@ -85,12 +97,13 @@ def get_pat_batch_obs(
             )
             return pd.DataFrame()
 
-    sanitized_search_term = sanitize_for_path(search_term)
     batch_obs_target_path = os.path.join(
-        config_obj.pre_misc_batch_path.replace("misc", sanitized_search_term),
+        get_obs_batch_path(config_obj, search_term),
         str(current_pat_client_id_code) + ".csv",
     )
-    existence_check = exist_check(batch_obs_target_path, config_obj)
+    existence_check = patient_batch_exists(
+        batch_obs_target_path, config_obj, merged_batch=search_term
+    )
 
     should_fetch = False
     if config_obj.storage_backend == "database":
@@ -106,9 +119,7 @@ def get_pat_batch_obs(
         if should_fetch:
             batch_target = cohort_searcher_with_terms_and_search(
                 index_name="observations",
-                fields_list="""observation_guid client_idcode	obscatalogmasteritem_displayname
-                                observation_valuetext_analysed observationdocument_recordeddtm
-                                clientvisit_visitidcode""".split(),
+                fields_list=get_source_fields("obs", config_obj),
                 term_name=config_obj.client_idcode_term_name,
                 entered_list=[current_pat_client_id_code],
                 search_string=f'obscatalogmasteritem_displayname:("{search_term}") AND '
@@ -131,15 +142,15 @@ def get_pat_batch_obs(
                         config_obj,
                     )
                 else:
-                    directory_path = config_obj.pre_misc_batch_path.replace(
-                        "misc", sanitized_search_term
-                    )
+                    directory_path = get_obs_batch_path(config_obj, search_term)
 
                     if not os.path.exists(directory_path):
                         os.makedirs(directory_path)
                     batch_target.to_csv(batch_obs_target_path)
         else:
-            batch_target = pd.read_csv(batch_obs_target_path)
+            batch_target = read_patient_batch(
+                batch_obs_target_path, config_obj, merged_batch=search_term
+            )
 
         return batch_target
     except Exception as e:
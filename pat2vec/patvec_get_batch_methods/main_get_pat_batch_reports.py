@@ -1,7 +1,8 @@
 import os
 
 from pat2vec.util.helper_functions import get_df_from_db
-from pat2vec.util.methods_get import exist_check
+from pat2vec.util.field_projection import get_source_fields
+from pat2vec.util.partitioned_store import patient_batch_exists, read_patient_batch
 
 
 import pandas as pd
@@ -80,7 +81,9 @@ def get_pat_batch_reports(
             )
             return pd.DataFrame()
 
-    existence_check = exist_check(batch_obs_target_path, config_obj)
+    existence_check = patient_batch_exists(
+        batch_obs_target_path, config_obj, merged_batch="reports"
+    )
 
     should_fetch = False
     if config_obj.storage_backend == "database":
@@ -95,14 +98,7 @@ def get_pat_batch_reports(
 
             batch_target = cohort_searcher_with_terms_and_search(
                 index_name="basic_observations",
-                fields_list=[
-                    "client_idcode",
-                    "updatetime",
-                    "textualObs",
-                    "basicobs_guid",
-                    "basicobs_value_analysed",
-                    "basicobs_itemname_analysed",
-                ],
+                fields_list=get_source_fields("reports", config_obj),
                 term_name=config_obj.client_idcode_term_name,
                 entered_list=[current_pat_client_id_code],
                 search_string=f"basicobs_itemname_analysed:{search_term} AND "
@@ -153,7 +149,9 @@ def get_pat_batch_reports(
 
         else:
 
-            batch_target = pd.read_csv(batch_obs_target_path)
+            batch_target = read_patient_batch(
+                batch_obs_target_path, config_obj, merged_batch="reports"
+            )
 
         return batch_target
     except Exception as e:
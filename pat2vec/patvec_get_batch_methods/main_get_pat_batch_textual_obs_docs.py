@@ -1,5 +1,6 @@
 from pat2vec.util.helper_functions import get_df_from_db
-from pat2vec.util.methods_get import exist_check
+from pat2vec.util.field_projection import get_source_fields
+from pat2vec.util.partitioned_store import patient_batch_exists, read_patient_batch
 
 
 import pandas as pd
@@ -79,7 +80,9 @@ def get_pat_batch_textual_obs_docs(
             )
             return pd.DataFrame()
 
-    existence_check = exist_check(batch_obs_target_path, config_obj)
+    existence_check = patient_batch_exists(
+        batch_obs_target_path, config_obj, merged_batch="textual_obs"
+    )
 
     should_fetch = False
     if config_obj.storage_backend == "database":
@@ -94,17 +97,7 @@ def get_pat_batch_textual_obs_docs(
 
             batch_target = cohort_searcher_with_terms_and_search(
                 index_name="basic_observations",
-                fields_list=[
-                    "client_idcode",
-                    "basicobs_itemname_analysed",
-                    "basicobs_value_numeric",
-                    "basicobs_value_analysed",
-                    "basicobs_entered",
-                    "clientvisit_serviceguid",
-                    "basicobs_guid",
-                    "updatetime",
-                    "textualObs",
-                ],
+                fields_list=get_source_fields("textual_obs_docs", config_obj),
                 term_name=config_obj.client_idcode_term_name,
                 entered_list=[current_pat_client_id_code],
                 search_string=""
@@ -156,7 +149,9 @@ def get_pat_batch_textual_obs_docs(
 
         else:
 
-            batch_target = pd.read_csv(batch_obs_target_path)
+            batch_target = read_patient_batch(
+                batch_obs_target_path, config_obj, merged_batch="textual_obs"
+            )
 
         return batch_target
     except Exception as e:
@@ -0,0 +1,650 @@
+"""
+A streaming fetcher for the merged raw data batches of a whole cohort.
+
+Each data source is described by a `MergedBatchSpec`: the index and query to
+search, the time field of the global time window, the patient id columns,
+the storage names and a per-chunk transform holding its filters. A single
+engine, `fetch_merged_batch`, serves every source:
+
+1. A stored batch (database table or merged batch cache) is reused unless
+   overwriting is enabled.
+2. Otherwise the cohort is searched in chunks of `merged_batch_chunk_size`
+   patients. Each chunk is transformed and handed to an optional
+   `chunk_callback`, and staged to a temporary Parquet part file.
+3. The staged parts are appended to the database table or assembled into
+   the merged batch cache one part at a time.
+
+With `collect=False` no chunk is kept in memory, so peak memory is bounded by
+the chunk size rather than the cohort size.
+"""
+
+import logging
+import os
+import shutil
+import tempfile
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+import pandas as pd
+import pyarrow.parquet as pq
+
+from pat2vec.util.arrow_utils import (
+    conform_arrow_table,
+    unify_arrow_schemas,
+    write_parquet_with_fallback,
+)
+from pat2vec.util.clinical_note_splitter import split_and_append_chunks
+from pat2vec.util.field_projection import get_source_fields
+from pat2vec.util.filter_dataframe_by_timestamp import filter_dataframe_by_timestamp
+from pat2vec.util.filter_methods import (
+    apply_bloods_data_type_filter,
+    apply_data_type_mct_docs_filters,
+    filter_dataframe_by_fuzzy_terms,
+)
+from pat2vec.util.helper_functions import get_df_from_db
+from pat2vec.util.merged_batch_cache import (
+    iter_merged_batch,
+    load_merged_batch,
+    merged_batch_exists,
+    save_merged_batch,
+    write_merged_batch_parts,
+)
+from pat2vec.util.methods_annotation_regex import append_regex_term_counts
+
+logger = logging.getLogger(__name__)
+
+#: Default number of patients searched per chunk.
+DEFAULT_MERGED_BATCH_CHUNK_SIZE = 5000
+#: Database schema of the raw data tables.
+RAW_DATA_SCHEMA = "raw_data"
+
+
+def _filter_term_list(config_obj: Any, key: str) -> Optional[List[str]]:
+    """Returns `config_obj.data_type_filter_dict['filter_term_lists'][key]`."""
+    data_type_filter_dict = config_obj.data_type_filter_dict or {}
+    return (data_type_filter_dict.get("filter_term_lists") or {}).get(key)
+
+
+def _fuzzy_filter(
+    df: pd.DataFrame, config_obj: Any, key: str, column_name: str
+) -> pd.DataFrame:
+    filter_term_list = _filter_term_list(config_obj, key)
+    if filter_term_list is None:
+        return df
+    if config_obj.verbosity >= 1:
+        logger.info(f"Applying doc type filter to {key}")
+    return filter_dataframe_by_fuzzy_terms(
+        df, filter_term_list, column_name=column_name, verbose=config_obj.verbosity
+    )
+
+
+def _transform_bloods(df: pd.DataFrame, config_obj: Any) -> pd.DataFrame:
+    df = _fuzzy_filter(df, config_obj, "bloods", "basicobs_itemname_analysed")
+    return apply_bloods_data_type_filter(config_obj, df)
+
+
+def _transform_drugs(df: pd.DataFrame, config_obj: Any) -> pd.DataFrame:
+    return _fuzzy_filter(df, config_obj, "drugs", "order_name")
+
+
+def _transform_diagnostics(df: pd.DataFrame, config_obj: Any) -> pd.DataFrame:
+    return _fuzzy_filter(df, config_obj, "diagnostics", "order_name")
+
+
+def _transform_mct_docs(df: pd.DataFrame, config_obj: Any) -> pd.DataFrame:
+    df = apply_data_type_mct_docs_filters(config_obj, df)
+    df = df.dropna(
+        subset=[
+            "observation_valuetext_analysed",
+            "observationdocument_recordeddtm",
+            "client_idcode",
+        ]
+    ).copy()
+    if config_obj.split_clinical_notes:
+        df = split_and_append_chunks(df, epr=False, mct=True)
+    return df
+
+
+def _transform_epr_docs(df: pd.DataFrame, config_obj: Any) -> pd.DataFrame:
+    df = _fuzzy_filter(df, config_obj, "epr_docs", "document_description")
+    regex_terms = _filter_term_list(config_obj, "epr_docs_term_regex")
+    if regex_terms is not None:
+        df = append_regex_term_counts(
+            df=df,
+            terms=regex_terms,
+            text_column="body_analysed",
+            debug=config_obj.verbosity > 5,
+        )
+
+    df = df.dropna(subset=["body_analysed", "updatetime", "client_idcode"]).copy()
+
+    if config_obj.split_clinical_notes:
+        df = split_and_append_chunks(df, epr=True)
+        if config_obj.filter_split_notes:
+            df = filter_dataframe_by_timestamp(
+                df=df,
+                start_year=int(config_obj.global_start_year),
+                start_month=int(config_obj.global_start_month),
+                end_year=int(config_obj.global_end_year),
+                end_month=int(config_obj.global_end_month),
+                start_day=int(config_obj.global_start_day),
+                end_day=int(config_obj.global_end_day),
+                timestamp_string="updatetime",
+                dropna=False,
+            )
+    return df
+
+
+def _transform_textual_obs(df: pd.DataFrame, config_obj: Any) -> pd.DataFrame:
+    df = df.dropna(subset=["textualObs"])
+    df = df[df["textualObs"] != ""].copy()
+    df["body_analysed"] = df["textualObs"].astype(str)
+    return df
+
+
+def _transform_reports(df: pd.DataFrame, config_obj: Any) -> pd.DataFrame:
+    df = df.copy()
+    df["body_analysed"] = (
+        df["textualObs"].astype(str) + "\n" + df["basicobs_value_analysed"].astype(str)
+    )
+    return df
+
+
+@dataclass
+class MergedBatchSpec:
+    """Describes how to fetch and store the merged batch of one data source."""
+
+    name: str
+    """A human-readable name used in log messages (e.g., "bloods")."""
+
+    source: str
+    """The data source key of `pat2vec.util.field_projection`."""
+
+    index_name: str
+    """The Elasticsearch index to search."""
+
+    time_field: str
+    """The field the global time window is applied to."""
+
+    db_table: str
+    """The raw data table name. May contain `{safe_search_term}`."""
+
+    merged_batch: str
+    """The name of the `merged_<merged_batch>_batches` cache. May contain
+    `{search_term}`."""
+
+    time_field_attr: Optional[str] = None
+    """A config attribute holding the time field, overriding `time_field`."""
+
+    query: Optional[str] = None
+    """A Lucene query combined with the time window. May contain `{search_term}`."""
+
+    term_name: Optional[str] = None
+    """The field holding the patient id. Defaults to
+    `config_obj.client_idcode_term_name`."""
+
+    id_column: str = "client_idcode"
+    """The patient id column of the fetched rows."""
+
+    db_patient_id_column: str = "client_idcode"
+    """The patient id column used to read the batch back from the database."""
+
+    db_extra_fields: List[str] = field(default_factory=list)
+    """Fields requested in addition to the source fields with the database
+    backend."""
+
+    docs: bool = False
+    """If True, the `*_pat_docs` rather than `*_pat_observations` store and
+    overwrite flags apply."""
+
+    transform: Optional[Callable[[pd.DataFrame, Any], pd.DataFrame]] = None
+    """Filters and derived columns applied to each fetched chunk."""
+
+    def get_time_field(self, config_obj: Any) -> str:
+        if self.time_field_attr is not None:
+            return getattr(config_obj, self.time_field_attr)
+        return self.time_field
+
+    def get_db_table(self, search_term: str = "") -> str:
+        safe_search_term = "".join(
+            e for e in search_term if e.isalnum() or e == "_"
+        ).lower()
+        return self.db_table.format(safe_search_term=safe_search_term)
+
+    def get_merged_batch(self, search_term: str = "") -> str:
+        return self.merged_batch.format(search_term=search_term)
+
+
+# Specs of the merged batch sources, keyed by `get_merged_pat_batch_*` suffix.
+MERGED_BATCH_SPECS: Dict[str, MergedBatchSpec] = {
+    "bloods": MergedBatchSpec(
+        name="bloods",
+        source="bloods",
+        index_name="basic_observations",
+        query="basicobs_value_numeric:*",
+        time_field="basicobs_entered",
+        time_field_attr="bloods_time_field",
+        db_table="raw_bloods",
+        merged_batch="bloods",
+        transform=_transform_bloods,
+    ),
+    "drugs": MergedBatchSpec(
+        name="drugs",
+        source="drugs",
+        index_name="order",
+        query='order_typecode:"medication"',
+        time_field="order_createdwhen",
+        time_field_attr="drug_time_field",
+        db_table="raw_drugs",
+        merged_batch="drugs",
+        transform=_transform_drugs,
+    ),
+    "diagnostics": MergedBatchSpec(
+        name="diagnostics",
+        source="diagnostics",
+        index_name="order",
+        query='order_typecode:"diagnostic"',
+        time_field="order_createdwhen",
+        time_field_attr="diagnostic_time_field",
+        db_table="raw_diagnostics",
+        merged_batch="diagnostics",
+        transform=_transform_diagnostics,
+    ),
+    "mct_docs": MergedBatchSpec(
+        name="MCT docs",
+        source="mct_docs",
+        index_name="observations",
+        query='obscatalogmasteritem_displayname:("AoMRC_ClinicalSummary_FT")',
+        time_field="observationdocument_recordeddtm",
+        db_table="raw_mct_docs",
+        merged_batch="mct_docs",
+        docs=True,
+        transform=_transform_mct_docs,
+    ),
+    "epr_docs": MergedBatchSpec(
+        name="EPR docs",
+        source="epr_docs",
+        index_name="epr_documents",
+        time_field="updatetime",
+        db_table="raw_epr_docs",
+        merged_batch="epr_docs",
+        docs=True,
+        transform=_transform_epr_docs,
+    ),
+    "textual_obs_docs": MergedBatchSpec(
+        name="textual obs",
+        source="textual_obs_docs",
+        index_name="basic_observations",
+        time_field="basicobs_entered",
+        time_field_attr="bloods_time_field",
+        db_table="raw_textual_obs",
+        merged_batch="textual_obs",
+        transform=_transform_textual_obs,
+    ),
+    "appointments": MergedBatchSpec(
+        name="appointments",
+        source="appointments",
+        index_name="pims_apps*",
+        time_field="AppointmentDateTime",
+        time_field_attr="appointments_time_field",
+        term_name="HospitalID.keyword",
+        id_column="HospitalID",
+        db_patient_id_column="HospitalID",
+        db_table="raw_appointments",
+        merged_batch="appointments",
+    ),
+    "demo": MergedBatchSpec(
+        name="demographics",
+        source="demo",
+        index_name="epr_documents",
+        time_field="updatetime",
+        db_table="raw_demographics",
+        merged_batch="demo",
+    ),
+    "bmi": MergedBatchSpec(
+        name="BMI",
+        source="bmi",
+        index_name="observations",
+        query='obscatalogmasteritem_displayname:("OBS BMI" OR "OBS Weight" OR "OBS height")',
+        time_field="observationdocument_recordeddtm",
+        db_table="raw_bmi",
+        merged_batch="bmi",
+    ),
+    "obs": MergedBatchSpec(
+        name="observations",
+        source="obs",
+        index_name="observations",
+        query='obscatalogmasteritem_displayname:("{search_term}")',
+        time_field="observationdocument_recordeddtm",
+        db_table="raw_obs_{safe_search_term}",
+        merged_batch="{search_term}",
+    ),
+    "news": MergedBatchSpec(
+        name="NEWS",
+        source="news",
+        index_name="observations",
+        query="obscatalogmasteritem_displayname:(NEWS*)",
+        time_field="observationdocument_recordeddtm",
+        db_table="raw_news",
+        merged_batch="news",
+    ),
+    "reports": MergedBatchSpec(
+        name="reports",
+        source="reports",
+        index_name="basic_observations",
+        query="basicobs_itemname_analysed:{search_term}",
+        time_field="updatetime",
+        db_patient_id_column="HospitalID",
+        db_extra_fields=["HospitalID"],
+        db_table="raw_reports",
+        merged_batch="reports",
+        transform=_transform_reports,
+    ),
+}
+
+
+def build_search_string(
+    spec: MergedBatchSpec, config_obj: Any, search_term: str = ""
+) -> str:
+    """Builds the search string of a spec for the global time window.
+
+    Incremental prefetches may further restrict the search to records whose
+    `config_obj.delta_fetch_field` is on or after `config_obj.delta_fetch_start`
+    (see `pat2vec.util.prefetch_state.delta_fetch_config`).
+
+    Args:
+        spec: The data source spec.
+        config_obj: The configuration object.
+        search_term: The search term substituted into `spec.query`.
+
+    Returns:
+        The Lucene search string.
+    """
+    start = (
+        f"{str(config_obj.global_start_year).zfill(4)}-"
+        f"{str(config_obj.global_start_month).zfill(2)}-"
+        f"{str(config_obj.global_start_day).zfill(2)}"
+    )
+    end = (
+        f"{str(config_obj.global_end_year).zfill(4)}-"
+        f"{str(config_obj.global_end_month).zfill(2)}-"
+        f"{str(config_obj.global_end_day).zfill(2)}"
+    )
+    time_range = f"{spec.get_time_field(config_obj)}:[{start} TO {end}]"
+    delta_fetch_field = getattr(config_obj, "delta_fetch_field", None)
+    if delta_fetch_field is not None:
+        time_range += f" AND {delta_fetch_field}:[{config_obj.delta_fetch_start} TO *]"
+    if spec.query is None:
+        return time_range
+    return f"{spec.query.format(search_term=search_term)} AND {time_range}"
+
+
+def iter_merged_batch_chunks(
+    spec: MergedBatchSpec,
+    client_idcode_list: List[str],
+    config_obj: Any,
+    cohort_searcher_with_terms_and_search: Any,
+    search_term: str = "",
+) -> Iterator[pd.DataFrame]:
+    """Searches a cohort in patient chunks and yields each transformed chunk.
+
+    Args:
+        spec: The data source spec.
+        client_idcode_list: The cohort's patient ids.
+        config_obj: The configuration object. `merged_batch_chunk_size` sets
+            the number of patients per chunk.
+        cohort_searcher_with_terms_and_search: The search function to use.
+        search_term: The search term substituted into `spec.query`.
+
+    Yields:
+        The non-empty, transformed rows of each chunk of patients.
+    """
+    chunk_size = max(
+        1,
+        int(
+            getattr(config_obj, "merged_batch_chunk_size", None)
+            or DEFAULT_MERGED_BATCH_CHUNK_SIZE
+        ),
+    )
+    # A patient searched in two chunks would have its rows split across parts.
+    client_idcode_list = list(dict.fromkeys(client_idcode_list))
+
+    fields_list = get_source_fields(spec.source, config_obj)
+    if config_obj.storage_backend == "database":
+        fields_list = fields_list + [
+            f for f in spec.db_extra_fields if f not in fields_list
+        ]
+    search_string = build_search_string(spec, config_obj, search_term)
+    term_name = spec.term_name or config_obj.client_idcode_term_name
+
+    for start in range(0, len(client_idcode_list), chunk_size):
+        chunk = cohort_searcher_with_terms_and_search(
+            index_name=spec.index_name,
+            fields_list=fields_list,
+            term_name=term_name,
+            entered_list=client_idcode_list[start : start + chunk_size],
+            search_string=search_string,
+        )
+        if chunk is None or chunk.empty:
+            continue
+        if spec.transform is not None:
+            chunk = spec.transform(chunk, config_obj)
+        if not chunk.empty:
+            yield chunk
+
+
+def _sort_by_patient(df: pd.DataFrame, id_column: str) -> pd.DataFrame:
+    if id_column not in df.columns:
+        return df
+    return df.sort_values(id_column, kind="mergesort")
+
+
+def _write_parts_to_db(part_paths: List[str], config_obj: Any, table_name: str) -> int:
+    """Replaces a raw data table with the staged parts, one part at a time."""
+    engine = config_obj.db_engine
+    db_table_name = (
+        f"{RAW_DATA_SCHEMA}_{table_name}" if engine.name == "sqlite" else table_name
+    )
+    db_schema = None if engine.name == "sqlite" else RAW_DATA_SCHEMA
+    schema = unify_arrow_schemas([pq.read_schema(p) for p in part_paths])
+
+    logger.info(f"Writing to database table '{db_schema}.{db_table_name}'...")
+    n_rows = 0
+    for i, part_path in enumerate(part_paths):
+        df = conform_arrow_table(pq.read_table(part_path), schema).to_pandas()
+        df.to_sql(
+            name=db_table_name,
+            con=engine,
+            schema=db_schema,
+            if_exists="replace" if i == 0 else "append",
+            index=False,
+            chunksize=10000,
+        )
+        n_rows += len(df)
+    logger.info(f"Finished writing {n_rows} records to database.")
+    return n_rows
+
+
+def _load_stored_batch(
+    spec: MergedBatchSpec,
+    client_idcode_list: List[str],
+    config_obj: Any,
+    search_term: str,
+    merged_batches_path: Optional[str],
+    chunk_callback: Optional[Callable[[pd.DataFrame], None]],
+    collect: bool,
+) -> Optional[pd.DataFrame]:
+    """Returns the stored batch, or None if it must be fetched."""
+    if config_obj.storage_backend == "database":
+        table_name = spec.get_db_table(search_term)
+        logger.info(
+            f"Attempting to load {spec.name} data for {len(client_idcode_list)} "
+            f"patients from database '{RAW_DATA_SCHEMA}.{table_name}'."
+        )
+        df = get_df_from_db(
+            config_obj,
+            RAW_DATA_SCHEMA,
+            table_name,
+            patient_ids=client_idcode_list,
+            patient_id_column=spec.db_patient_id_column,
+        )
+        if df.empty:
+            return None
+        # If any data is stored, it is taken to be complete for this run.
+        logger.info(f"Successfully loaded {len(df)} records from database cache.")
+        if chunk_callback is not None:
+            chunk_callback(df)
+        return df if collect else pd.DataFrame()
+
+    if not merged_batch_exists(merged_batches_path):
+        return None
+    logger.info(
+        f"Merged batches file already exists at {merged_batches_path}. Loading from disk."
+    )
+    if chunk_callback is None:
+        return load_merged_batch(merged_batches_path) if collect else pd.DataFrame()
+    chunks = []
+    for chunk in iter_merged_batch(merged_batches_path, spec.id_column):
+        chunk_callback(chunk)
+        if collect:
+            chunks.append(chunk)
+    return pd.concat(chunks, ignore_index=True) if chunks else pd.DataFrame()
+
+
+def fetch_merged_batch(
+    spec: MergedBatchSpec,
+    client_idcode_list: List[str],
+    config_obj: Any,
+    cohort_searcher_with_terms_and_search: Any,
+    search_term: str = "",
+    chunk_callback: Optional[Callable[[pd.DataFrame], None]] = None,
+    collect: bool = True,
+) -> pd.DataFrame:
+    """Fetches, filters and stores the merged batch of a data source.
+
+    Args:
+        spec: The data source spec, usually from `MERGED_BATCH_SPECS`.
+        client_idcode_list: The cohort's patient ids.
+        config_obj: The configuration object.
+        cohort_searcher_with_terms_and_search: The search function to use.
+        search_term: The search term substituted into the spec's query and
+            storage names.
+        chunk_callback: An optional function called with each chunk of the
+            batch, whether it is fetched or read from storage. A chunk holds
+            all rows of the patients it contains.
+        collect: If False, the chunks are not accumulated and an empty
+            DataFrame is returned; use `chunk_callback` to consume them.
+
+    Returns:
+        The merged batch, or an empty DataFrame on error or if `collect` is
+        False.
+
+    Raises:
+        ValueError: If `config_obj` is missing the time window or backend.
+        Exception: Errors while fetching or storing are re-raised rather than
+            returning an empty DataFrame if a `chunk_callback` is given.
+    """
+    if config_obj is None or not all(
+        hasattr(config_obj, attr)
+        for attr in [
+            "global_start_year",
+            "global_start_month",
+            "global_end_year",
+            "global_end_month",
+            "storage_backend",
+        ]
+    ):
+        raise ValueError("Invalid or missing configuration object.")
+
+    if spec.docs:
+        overwrite = config_obj.overwrite_stored_pat_docs
+        store = config_obj.store_pat_batch_docs or overwrite
+    else:
+        overwrite = config_obj.overwrite_stored_pat_observations
+        store = config_obj.store_pat_batch_observations or overwrite
+
+    merged_batches_path = None
+    if config_obj.storage_backend == "file":
+        input_directory = config_obj.pre_merged_input_batches_path
+        os.makedirs(input_directory, exist_ok=True)
+        merged_batches_path = os.path.join(
+            input_directory,
+            f"merged_{spec.get_merged_batch(search_term)}_batches.csv",
+        )
+
+    parts_dir = None
+    try:
+        if not overwrite:
+            stored = _load_stored_batch(
+                spec,
+                client_idcode_list,
+                config_obj,
+                search_term,
+                merged_batches_path,
+                chunk_callback,
+                collect,
+            )
+            if stored is not None:
+                return stored
+
+        logger.info(f"Fetching {spec.name} data from Elasticsearch.")
+        if store:
+            parts_dir = tempfile.mkdtemp(prefix="pat2vec_merged_")
+        part_paths = []
+        chunks = []
+        for chunk in iter_merged_batch_chunks(
+            spec,
+            client_idcode_list,
+            config_obj,
+            cohort_searcher_with_terms_and_search,
+            search_term,
+        ):
+            chunk = _sort_by_patient(chunk, spec.id_column)
+            if chunk_callback is not None:
+                chunk_callback(chunk)
+            if parts_dir is not None:
+                part_path = os.path.join(
+                    parts_dir, f"part-{len(part_paths):05d}.parquet"
+                )
+                write_parquet_with_fallback(chunk, part_path)
+                part_paths.append(part_path)
+            if collect:
+                chunks.append(chunk)
+
+        if store and config_obj.storage_backend == "file" and not part_paths:
+            # An empty cache records that the cohort has no data for the source.
+            save_merged_batch(pd.DataFrame(), merged_batches_path, config_obj)
+        elif part_paths:
+            if config_obj.storage_backend == "database":
+                if not config_obj.db_engine:
+                    logger.error(
+                        f"DB engine not initialized, cannot save merged {spec.name}."
+                    )
+                else:
+                    _write_parts_to_db(
+                        part_paths, config_obj, spec.get_db_table(search_term)
+                    )
+            else:
+                saved_path = write_merged_batch_parts(
+                    part_paths,
+                    merged_batches_path,
+                    config_obj,
+                    client_idcode_column=spec.id_column,
+                )
+                if config_obj.verbosity >= 1:
+                    logger.info(f"Merged batches saved to {saved_path}")
+
+        if not chunks:
+            return pd.DataFrame()
+        return pd.concat(chunks, ignore_index=True)
+
+    except Exception as e:
+        logger.error(f"Error retrieving batch {spec.name}: {e}")
+        if chunk_callback is not None:
+            # The callback may hold a partial batch, which its caller must
+            # be able to discard.
+            raise
+        return pd.DataFrame()
+    finally:
+        if parts_dir is not None:
+            shutil.rmtree(parts_dir, ignore_errors=True)
@@ -0,0 +1,117 @@
+import unittest
+from unittest.mock import MagicMock, patch
+
+import pandas as pd
+
+import pat2vec.pat2vec_search.cogstack_search_methods as csm
+from pat2vec.pat2vec_search.adaptive_chunking import (
+    AdaptiveChunkSizer,
+    get_chunk_sizer,
+    reset_chunk_sizers,
+)
+
+
+class TestAdaptiveChunkSizer(unittest.TestCase):
+    """Unit tests for AdaptiveChunkSizer."""
+
+    def test_first_chunk_uses_initial_size(self):
+        sizer = AdaptiveChunkSizer(initial_chunk_size=10000)
+        self.assertEqual(sizer.next_size(), 10000)
+
+    def test_dense_cohort_shrinks_chunks(self):
+        sizer = AdaptiveChunkSizer(target_hits=1000, target_seconds=1000)
+        sizer.record(n_ids=100, n_hits=5000, seconds=1.0)
+        self.assertEqual(sizer.next_size(), 50)
+
+    def test_slow_responses_shrink_chunks(self):
+        sizer = AdaptiveChunkSizer(target_hits=100000, target_seconds=10)
+        sizer.record(n_ids=1000, n_hits=1000, seconds=20.0)
+        self.assertEqual(sizer.next_size(), 500)
+
+    def test_sparse_cohort_growth_is_capped(self):
+        sizer = AdaptiveChunkSizer(initial_chunk_size=100, max_growth=2.0)
+        sizer.record(n_ids=100, n_hits=1, seconds=0.1)
+        self.assertEqual(sizer.next_size(), 200)
+        self.assertEqual(sizer.next_size(), 400)
+
+    def test_seed_sets_first_chunk_size(self):
+        sizer = AdaptiveChunkSizer(target_hits=2000)
+        sizer.seed(n_ids=100, n_hits=2000)
+        self.assertEqual(sizer.next_size(), 100)
+
+    def test_iter_chunks_covers_list_in_order(self):
+        sizer = AdaptiveChunkSizer(initial_chunk_size=60, min_chunk_size=10)
+        entered_list = list(range(1000))
+        chunks = list(sizer.iter_chunks(entered_list))
+        self.assertEqual([x for chunk in chunks for x in chunk], entered_list)
+
+    def test_shared_sizer_per_index(self):
+        reset_chunk_sizers()
+        self.assertIs(get_chunk_sizer("bloods"), get_chunk_sizer("bloods"))
+        self.assertIsNot(get_chunk_sizer("bloods"), get_chunk_sizer("appointments"))
+
+
+class TestChunkedCohortSearch(unittest.TestCase):
+    """Tests the adaptive chunked path of cohort_searcher_with_terms_and_search."""
+
+    def setUp(self):
+        self.mock_cs = MagicMock()
+        self.mock_cs.cogstack2df.side_effect = self._fake_cogstack2df
+        self.mock_cs.elastic.count.return_value = {"count": 500}
+
+    def _fake_cogstack2df(self, query, index, column_headers):
+        """Returns ten hits per requested id."""
+        ids = query["query"]["bool"]["filter"]["terms"]["client_idcode"]
+        rows = [
+            {"_index": index, "_id": f"{i}_{n}", "_score": 1.0, "client_idcode": i}
+            for i in ids
+            for n in range(10)
+        ]
+        return pd.DataFrame(rows, columns=["_index", "_id", "_score", *column_headers])
+
+    def _search(self, entered_list, **kwargs):
+        with patch.object(csm, "cs", self.mock_cs):
+            return csm.cohort_searcher_with_terms_and_search(
+                index_name="basic_observations",
+                fields_list=["client_idcode"],
+                term_name="client_idcode",
+                entered_list=entered_list,
+                search_string="*",
+                **kwargs,
+            )
+
+    def test_chunks_adapt_to_hits_per_id(self):
+        sizer = AdaptiveChunkSizer(
+            initial_chunk_size=100, min_chunk_size=10, target_hits=200
+        )
+        df = self._search([f"P{i}" for i in range(300)], chunk_sizer=sizer)
+
+        chunk_sizes = [
+            len(c.kwargs["query"]["query"]["bool"]["filter"]["terms"]["client_idcode"])
+            for c in self.mock_cs.cogstack2df.call_args_list
+        ]
+        self.assertEqual(chunk_sizes[0], 100)
+        self.assertEqual(set(chunk_sizes[1:]), {20})
+        self.assertEqual(len(df), 3000)
+        self.assertEqual(df.index.name, "_id")
+
+    def test_count_query_seeds_first_chunk(self):
+        sizer = AdaptiveChunkSizer(min_chunk_size=10, target_hits=200)
+        self._search(
+            [f"P{i}" for i in range(100)],
+            chunk_sizer=sizer,
+            count_seed_sample_size=50,
+        )
+        self.mock_cs.elastic.count.assert_called_once()
+        first_query = self.mock_cs.cogstack2df.call_args_list[0].kwargs["query"]
+        self.assertEqual(
+            len(first_query["query"]["bool"]["filter"]["terms"]["client_idcode"]), 20
+        )
+
+    def test_small_cohort_uses_single_query(self):
+        self._search([f"P{i}" for i in range(5)])
+        self.assertEqual(self.mock_cs.cogstack2df.call_count, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
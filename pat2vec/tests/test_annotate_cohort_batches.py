@@ -0,0 +1,176 @@
+import os
+import shutil
+import tempfile
+import unittest
+from datetime import datetime
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+import pandas as pd
+
+from pat2vec.patvec_get_batch_methods.annotate_cohort_batches import (
+    annotate_cohort_batches,
+)
+from pat2vec.util.annotation_io import find_annotation_output, read_patient_annotations
+
+
+def _entity(text, i):
+    return {
+        "pretty_name": text.split()[0],
+        "cui": f"C{i:07d}",
+        "type_ids": ["T047"],
+        "types": ["Disease"],
+        "source_value": text.split()[0],
+        "detected_name": text.split()[0],
+        "acc": 1.0,
+        "context_similarity": 1.0,
+        "start": 0,
+        "end": len(text.split()[0]),
+        "icd10": [],
+        "ontologies": [],
+        "snomed": [],
+        "id": i,
+        "meta_anns": {},
+    }
+
+
+class FakeCAT:
+    """Annotates every text with one entity named after its first word."""
+
+    def __init__(self):
+        self.calls = []
+
+    def get_entities_multi_texts(self, texts, n_process=None, batch_size=None):
+        self.calls.append((list(texts), n_process, batch_size))
+        return [{"entities": {0: _entity(text, 0)}, "tokens": []} for text in texts]
+
+
+class TestAnnotateCohortBatches(unittest.TestCase):
+    """Unit tests for cross-patient batched annotation."""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.raw_path = os.path.join(self.tmp_dir, "raw")
+        self.annot_path = os.path.join(self.tmp_dir, "annots")
+        os.makedirs(self.raw_path)
+        os.makedirs(self.annot_path)
+
+        self.config_obj = SimpleNamespace(
+            main_options={
+                "annotations": True,
+                "annotations_mrc": False,
+                "textual_obs": False,
+                "annotations_reports": False,
+            },
+            storage_backend="file",
+            remote_dump=False,
+            pre_merged_input_batches_path=None,
+            pre_document_batch_path=self.raw_path,
+            pre_document_annotation_batch_path=self.annot_path,
+            overwrite_stored_pat_docs=False,
+            annotation_batch_docs=3,
+            annotation_n_process=2,
+            annotation_batch_size=50,
+            include_text_sample_in_annots=False,
+            add_icd10=False,
+            add_opc4s=False,
+            verbosity=0,
+            start_time=datetime.now(),
+        )
+        docs = {
+            "P1": ["fever today", "cough again", None],
+            "P2": ["rash"],
+            "P3": ["headache now", "nausea", "fatigue"],
+        }
+        for client_idcode, texts in docs.items():
+            pd.DataFrame(
+                {
+                    "client_idcode": client_idcode,
+                    "updatetime": "2020-01-01",
+                    "document_guid": [
+                        f"{client_idcode}-{i}" for i in range(len(texts))
+                    ],
+                    "body_analysed": texts,
+                }
+            ).to_csv(os.path.join(self.raw_path, f"{client_idcode}.csv"), index=False)
+
+        self.cat = FakeCAT()
+        self.pat2vec_obj = SimpleNamespace(
+            config_obj=self.config_obj,
+            all_patient_list=["P1", "P2", "P3", "P4"],
+            cat=self.cat,
+        )
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def _read_annots(self, client_idcode):
+        return read_patient_annotations(self.annot_path, client_idcode)
+
+    def test_documents_pooled_across_patients_and_demultiplexed(self):
+        sources = annotate_cohort_batches(self.pat2vec_obj)
+
+        self.assertEqual(len(sources), 1)
+        self.assertIsNone(sources[0].error)
+        self.assertEqual(sources[0].n_patients, 3)
+        self.assertEqual(sources[0].n_docs, 6)
+
+        # P1 and P2 fill the first pool, P3 the second.
+        self.assertEqual(
+            [texts for texts, _, _ in self.cat.calls],
+            [
+                ["fever today", "cough again", "rash"],
+                ["headache now", "nausea", "fatigue"],
+            ],
+        )
+        self.assertEqual({call[1:] for call in self.cat.calls}, {(2, 50)})
+
+        self.assertEqual(
+            self._read_annots("P1")["pretty_name"].tolist(), ["fever", "cough"]
+        )
+        self.assertEqual(self._read_annots("P2")["document_guid"].tolist(), ["P2-0"])
+        self.assertEqual(
+            self._read_annots("P3")["pretty_name"].tolist(),
+            ["headache", "nausea", "fatigue"],
+        )
+        self.assertIsNone(find_annotation_output(self.annot_path, "P4"))
+
+    def test_annotated_patients_are_skipped(self):
+        annotate_cohort_batches(self.pat2vec_obj)
+        self.cat.calls.clear()
+
+        sources = annotate_cohort_batches(self.pat2vec_obj)
+        self.assertEqual(self.cat.calls, [])
+        self.assertEqual(sources[0].n_patients, 0)
+
+    def test_incremental_run_annotates_only_new_documents(self):
+        annotate_cohort_batches(self.pat2vec_obj)
+        self.cat.calls.clear()
+
+        self.config_obj.annotation_incremental = True
+        pd.DataFrame(
+            {
+                "client_idcode": "P2",
+                "updatetime": "2020-02-01",
+                "document_guid": ["P2-0", "P2-1"],
+                "body_analysed": ["rash", "wheeze"],
+            }
+        ).to_csv(os.path.join(self.raw_path, "P2.csv"), index=False)
+
+        sources = annotate_cohort_batches(self.pat2vec_obj)
+        self.assertEqual([texts for texts, _, _ in self.cat.calls], [["wheeze"]])
+        self.assertEqual(sources[0].n_patients, 1)
+        self.assertEqual(
+            self._read_annots("P2")["pretty_name"].tolist(), ["rash", "wheeze"]
+        )
+
+    def test_errors_are_recorded_per_source(self):
+        self.pat2vec_obj.cat = MagicMock()
+        self.pat2vec_obj.cat.get_entities_multi_texts.return_value = []
+
+        sources = annotate_cohort_batches(self.pat2vec_obj)
+        self.assertIn("MedCAT returned 0 results", sources[0].error)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,115 @@
+import os
+import shutil
+import sqlite3
+import tempfile
+import unittest
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+from pat2vec.util import annotation_cache
+from pat2vec.util.annotation_cache import (
+    AnnotationCache,
+    get_annotation_cache,
+    get_entities_multi_texts_cached,
+    get_model_key,
+)
+
+
+class FakeCAT:
+    """Returns an entity named after each text and records what it annotated."""
+
+    def __init__(self, model_id="pack-1", cuis=None):
+        self.config = SimpleNamespace(
+            version=SimpleNamespace(id=model_id),
+            linking=SimpleNamespace(filters={"cuis": set(cuis or [])}),
+        )
+        self.annotated = []
+
+    def get_entities_multi_texts(self, texts, **kwargs):
+        texts = list(texts)
+        self.annotated.extend(texts)
+        return [{"entities": {0: {"pretty_name": text}}} for text in texts]
+
+
+class TestAnnotationCache(unittest.TestCase):
+    """Unit tests for the content-hash annotation cache."""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.config_obj = SimpleNamespace(
+            annotation_cache_path=os.path.join(self.tmp_dir, "annots.sqlite"),
+            annotation_cache_max_mb=64,
+            verbosity=0,
+        )
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def test_identical_texts_annotated_once_across_calls(self):
+        cat = FakeCAT()
+        texts = ["letter template", "note", "letter template"]
+
+        first = get_entities_multi_texts_cached(cat, texts, self.config_obj)
+        self.assertEqual(cat.annotated, ["letter template", "note"])
+        self.assertEqual(
+            [annots["entities"][0]["pretty_name"] for annots in first], texts
+        )
+
+        cat.annotated.clear()
+        second = get_entities_multi_texts_cached(
+            cat, ["note", "new note"], self.config_obj
+        )
+        self.assertEqual(cat.annotated, ["new note"])
+        # Integer entity ids survive the round trip.
+        self.assertEqual(second[0], {"entities": {0: {"pretty_name": "note"}}})
+
+    def test_model_and_cui_filter_are_part_of_the_key(self):
+        base = get_model_key(FakeCAT())
+        self.assertEqual(base, get_model_key(FakeCAT()))
+        self.assertNotEqual(base, get_model_key(FakeCAT(model_id="pack-2")))
+        self.assertNotEqual(base, get_model_key(FakeCAT(cuis=["C1"])))
+        self.assertNotEqual(base, get_model_key(FakeCAT(), model_id="explicit"))
+
+        get_entities_multi_texts_cached(FakeCAT(), ["note"], self.config_obj)
+        other_model = FakeCAT(model_id="pack-2")
+        get_entities_multi_texts_cached(other_model, ["note"], self.config_obj)
+        self.assertEqual(other_model.annotated, ["note"])
+
+    def test_least_recently_used_entries_are_evicted(self):
+        cache = AnnotationCache(self.config_obj.annotation_cache_path, max_mb=64)
+        cache.put_many({"a": {"entities": {}}, "b": {"entities": {}}})
+        cache.get_many(["a"])
+
+        with sqlite3.connect(cache.path) as connection:
+            entry_size = connection.execute(
+                "SELECT size FROM annotations WHERE key = 'a'"
+            ).fetchone()[0]
+        cache.max_bytes = 2 * entry_size
+        cache.put_many({"c": {"entities": {}}})
+
+        self.assertEqual(set(cache.get_many(["a", "b", "c"])), {"a", "c"})
+
+    def test_cache_is_opened_once_per_path(self):
+        with patch.object(
+            annotation_cache, "AnnotationCache", side_effect=AnnotationCache
+        ) as mock_cache:
+            cache = get_annotation_cache(self.config_obj)
+            self.assertIs(get_annotation_cache(self.config_obj), cache)
+            self.assertEqual(mock_cache.call_count, 1)
+
+            os.remove(self.config_obj.annotation_cache_path)
+            self.assertIsNot(get_annotation_cache(self.config_obj), cache)
+            self.assertEqual(mock_cache.call_count, 2)
+
+    def test_disabled_cache_calls_medcat_directly(self):
+        cat = MagicMock()
+        cat.get_entities_multi_texts.return_value = [{"entities": {}}]
+        config_obj = SimpleNamespace(annotation_cache_path=None)
+
+        result = get_entities_multi_texts_cached(cat, ["note"], config_obj, n_process=2)
+        cat.get_entities_multi_texts.assert_called_once_with(["note"], n_process=2)
+        self.assertEqual(result, [{"entities": {}}])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,102 @@
+import unittest
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+
+from pat2vec.pat2vec_get_methods.get_method_pat_annotations import (
+    get_current_pat_annotations,
+)
+from pat2vec.util import annotation_count_index
+from pat2vec.util.annotation_count_index import (
+    AnnotationCountIndex,
+    get_annotation_count_index,
+)
+from pat2vec.util.filter_dataframe_by_timestamp import filter_dataframe_by_timestamp
+from pat2vec.util.methods_annotation import calculate_pretty_name_count_features
+
+
+class TestAnnotationCountIndex(unittest.TestCase):
+    """Unit tests for per-slice annotation counts from prefix rows."""
+
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        n = 300
+        self.annots = pd.DataFrame(
+            {
+                "client_idcode": "P1",
+                "updatetime": (
+                    pd.Timestamp("2020-01-01")
+                    + pd.to_timedelta(rng.integers(0, 700, n), unit="D")
+                    + pd.to_timedelta(rng.integers(0, 86400, n), unit="s")
+                ).astype(str),
+                "pretty_name": rng.choice(["Fever", "Cough", "Rash", None], n),
+            }
+        )
+        self.annots.loc[::29, "updatetime"] = "not a date"
+
+    def _expected(self, annots, date_range):
+        filtered = filter_dataframe_by_timestamp(
+            annots, *date_range, "updatetime", dropna=True
+        )
+        if filtered.empty:
+            return None
+        expected = calculate_pretty_name_count_features(filtered)
+        expected.columns = expected.columns.astype(str)
+        return expected[sorted(expected.columns)]
+
+    def test_counts_match_filtered_groupby(self):
+        for categorical in [False, True]:
+            annots = self.annots.copy()
+            if categorical:
+                annots["pretty_name"] = annots["pretty_name"].astype("category")
+            index = AnnotationCountIndex(annots, "updatetime")
+
+            # (start_year, start_month, end_year, end_month, start_day, end_day)
+            for date_range in [
+                (2020, 1, 2020, 3, 1, 1),
+                (2021, 5, 2020, 2, 3, 2),
+                (2020, 6, 2020, 6, 6, 6),
+                (2019, 1, 2019, 2, 1, 1),
+            ]:
+                result = index.count_features(*date_range)
+                expected = self._expected(annots, date_range)
+                if expected is None:
+                    self.assertIsNone(result)
+                    continue
+                pd.testing.assert_frame_equal(result, expected, check_names=False)
+
+    def test_index_is_reused_for_the_same_batch(self):
+        index = get_annotation_count_index(self.annots, "updatetime")
+        self.assertIs(get_annotation_count_index(self.annots, "updatetime"), index)
+        self.assertIsNot(
+            get_annotation_count_index(self.annots.copy(), "updatetime"), index
+        )
+
+        n_indexes = len(annotation_count_index._COUNT_INDEXES)
+        del self.annots
+        self.assertEqual(len(annotation_count_index._COUNT_INDEXES), n_indexes - 1)
+
+    def test_get_current_pat_annotations(self):
+        config_obj = SimpleNamespace(
+            start_time=None,
+            skipped_counter=0,
+            verbosity=0,
+            multi_process=True,
+            lookback=False,
+            time_window_interval_delta=pd.DateOffset(months=1),
+        )
+        date_range = (2020, 3, 1)
+        result = get_current_pat_annotations(
+            "P1", date_range, self.annots, config_obj=config_obj
+        )
+        self.assertTrue(all(result.iloc[0] > 0))
+
+        empty = get_current_pat_annotations(
+            "P1", (2010, 1, 1), self.annots, config_obj=config_obj
+        )
+        self.assertEqual(empty.columns.tolist(), ["client_idcode"])
+
+
+if __name__ == "__main__":
+    unittest.main()
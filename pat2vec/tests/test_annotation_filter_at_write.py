@@ -0,0 +1,106 @@
+import os
+import shutil
+import tempfile
+import unittest
+from types import SimpleNamespace
+
+import pandas as pd
+
+from pat2vec.util.annotation_io import (
+    ANNOTATION_FILTER_COLUMN,
+    UNFILTERED_ANNOTATIONS_DIR,
+    read_patient_annotations,
+)
+from pat2vec.util.incremental_annotation import (
+    get_write_filter_arguments,
+    write_annotation_output,
+)
+from pat2vec.util.post_processing import filter_annot_dataframe2
+
+
+class TestAnnotationFilterAtWrite(unittest.TestCase):
+    """Unit tests for filtering annotations once, when they are written."""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.filter_args = {"Presence_Value": ["True"], "acc": 0.5}
+        self.config_obj = SimpleNamespace(
+            storage_backend="file",
+            annotation_filter_at_write=True,
+            annotation_keep_unfiltered=False,
+            annot_filter_options=self.filter_args,
+        )
+        self.annots = pd.DataFrame(
+            {
+                "client_idcode": "P1",
+                "document_guid": ["G0", "G0", "G1"],
+                "pretty_name": ["Fever", "Cough", "Rash"],
+                "cui": ["C0015967", "C0010200", "C0015230"],
+                "acc": [0.9, 0.9, 0.2],
+                "Presence_Value": ["True", "False", "True"],
+            }
+        )
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def _write(self):
+        return write_annotation_output(
+            self.annots,
+            self.annots[["document_guid"]],
+            "P1",
+            self.tmp_dir,
+            "ann_epr_docs",
+            self.config_obj,
+            guid_column="document_guid",
+        )
+
+    def test_filter_arguments(self):
+        self.assertEqual(get_write_filter_arguments(self.config_obj), self.filter_args)
+
+        self.config_obj.annot_filter_options = None
+        self.config_obj.filter_arguments = {"acc": 0.8}
+        self.assertEqual(get_write_filter_arguments(self.config_obj), {"acc": 0.8})
+
+        self.config_obj.annotation_filter_at_write = False
+        self.assertIsNone(get_write_filter_arguments(self.config_obj))
+
+    def test_only_filtered_annotations_are_stored(self):
+        stored = self._write()
+        self.assertEqual(stored["pretty_name"].tolist(), ["Fever"])
+
+        df = read_patient_annotations(self.tmp_dir, "P1")
+        self.assertEqual(df["pretty_name"].tolist(), ["Fever"])
+        # The CUIs are stored as they were, not as coerced by the filter.
+        self.assertEqual(df["cui"].tolist(), ["C0015967"])
+        self.assertFalse(
+            os.path.exists(os.path.join(self.tmp_dir, UNFILTERED_ANNOTATIONS_DIR))
+        )
+
+    def test_reads_with_the_same_filter_skip_filtering(self):
+        self._write()
+        df = read_patient_annotations(self.tmp_dir, "P1")
+        self.assertIs(filter_annot_dataframe2(df, dict(self.filter_args)), df)
+
+        # A different filter is still applied.
+        refiltered = filter_annot_dataframe2(df.copy(), {"acc": 0.95})
+        self.assertTrue(refiltered.empty)
+        self.assertIn(ANNOTATION_FILTER_COLUMN, df.columns)
+
+    def test_unfiltered_annotations_are_kept_alongside(self):
+        self.config_obj.annotation_keep_unfiltered = True
+        self._write()
+
+        unfiltered = read_patient_annotations(
+            os.path.join(self.tmp_dir, UNFILTERED_ANNOTATIONS_DIR), "P1"
+        )
+        self.assertEqual(unfiltered["pretty_name"].tolist(), ["Fever", "Cough", "Rash"])
+        self.assertNotIn(ANNOTATION_FILTER_COLUMN, unfiltered.columns)
+        self.assertEqual(
+            read_patient_annotations(self.tmp_dir, "P1")["pretty_name"].tolist(),
+            ["Fever"],
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
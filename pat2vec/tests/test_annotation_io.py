@@ -0,0 +1,118 @@
+import os
+import shutil
+import tempfile
+import unittest
+from types import SimpleNamespace
+
+import pandas as pd
+
+from pat2vec.util.annotation_io import (
+    annotation_output_path,
+    find_annotation_output,
+    read_annotation_output,
+    read_patient_annotations,
+    write_annotation_frame,
+)
+from pat2vec.util.incremental_annotation import write_annotation_output
+from pat2vec.util.methods_annotation import calculate_pretty_name_count_features
+from pat2vec.util.post_processing import extract_types_from_csv, filter_and_update_csv
+
+
+class TestAnnotationIO(unittest.TestCase):
+    """Unit tests for typed Parquet annotation outputs."""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.annots = pd.DataFrame(
+            {
+                "client_idcode": ["P1", "P1"],
+                "document_guid": ["G0", "G1"],
+                "updatetime": ["2020-01-01 10:00:00", "2020-02-01"],
+                "pretty_name": ["Fever", "Cough"],
+                "cui": ["C0015967", "C0010200"],
+                "types": [["Finding"], ["Finding", "Symptom"]],
+                "icd10": [[], [{"code": "R05"}]],
+                "acc": [0.9, 0.8],
+                "Presence_Value": ["True", None],
+            }
+        )
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def test_parquet_outputs_are_typed(self):
+        path = os.path.join(self.tmp_dir, "P1.parquet")
+        write_annotation_frame(self.annots, path)
+        df = read_annotation_output(path)
+
+        self.assertEqual(list(df["types"].iloc[1]), ["Finding", "Symptom"])
+        self.assertEqual(list(df["icd10"].iloc[1]), ['{"code": "R05"}'])
+        for column in ["pretty_name", "cui", "Presence_Value"]:
+            self.assertEqual(df[column].dtype, "category")
+        self.assertTrue(pd.isna(df["Presence_Value"].iloc[1]))
+        self.assertEqual(str(df["updatetime"].dtype), "datetime64[ns, UTC]")
+        self.assertEqual(df["acc"].tolist(), [0.9, 0.8])
+
+        self.assertEqual(
+            read_annotation_output(path, columns=["cui", "missing"]).columns.tolist(),
+            ["cui"],
+        )
+
+    def test_csv_outputs_remain_readable(self):
+        self.annots.to_csv(os.path.join(self.tmp_dir, "P1.csv"), index=False)
+        self.assertEqual(
+            find_annotation_output(self.tmp_dir, "P1"),
+            os.path.join(self.tmp_dir, "P1.csv"),
+        )
+        df = read_patient_annotations(self.tmp_dir, "P1", columns=["pretty_name"])
+        self.assertEqual(df["pretty_name"].tolist(), ["Fever", "Cough"])
+        self.assertIsNone(read_patient_annotations(self.tmp_dir, "P2"))
+
+    def test_rewritten_output_replaces_csv(self):
+        self.annots.to_csv(os.path.join(self.tmp_dir, "P1.csv"), index=False)
+        config_obj = SimpleNamespace(storage_backend="file")
+
+        write_annotation_output(
+            self.annots.head(1),
+            self.annots.head(1),
+            "P1",
+            self.tmp_dir,
+            "ann_epr_docs",
+            config_obj,
+            guid_column="document_guid",
+        )
+        self.assertEqual(
+            find_annotation_output(self.tmp_dir, "P1"),
+            annotation_output_path(self.tmp_dir, "P1", config_obj),
+        )
+        self.assertFalse(os.path.exists(os.path.join(self.tmp_dir, "P1.csv")))
+
+    def test_counts_ignore_unobserved_categories(self):
+        path = os.path.join(self.tmp_dir, "P1.parquet")
+        write_annotation_frame(self.annots, path)
+        df = read_annotation_output(path)
+
+        counts = calculate_pretty_name_count_features(df[df["pretty_name"] == "Fever"])
+        self.assertEqual(counts.columns.tolist(), ["Fever"])
+
+    def test_post_processing_reads_parquet_outputs(self):
+        write_annotation_frame(self.annots, os.path.join(self.tmp_dir, "P1.parquet"))
+        self.annots.assign(client_idcode="P2").to_csv(
+            os.path.join(self.tmp_dir, "P2.csv"), index=False
+        )
+        self.assertEqual(
+            sorted(extract_types_from_csv(self.tmp_dir)),
+            ["['Finding', 'Symptom']", "['Finding']"],
+        )
+
+        ipw = pd.DataFrame(
+            {"client_idcode": ["P1", "P2"], "updatetime": ["2020-01-15"] * 2}
+        )
+        filter_and_update_csv(self.tmp_dir, ipw, filter_type="after")
+        for path in ["P1.parquet", "P2.csv"]:
+            df = read_annotation_output(os.path.join(self.tmp_dir, path))
+            self.assertEqual(df["document_guid"].tolist(), ["G1"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,140 @@
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+import uuid
+from unittest.mock import patch
+
+import pandas as pd
+
+from pat2vec.patvec_get_batch_methods import annotation_workers
+from pat2vec.patvec_get_batch_methods.annotation_workers import (
+    _plan_units,
+    load_config,
+    main,
+    run_annotation_workers,
+)
+from pat2vec.tests.test_annotate_cohort_batches import FakeCAT
+from pat2vec.util.annotation_io import find_annotation_output
+
+CONFIG_MODULE = """
+from datetime import datetime
+from types import SimpleNamespace
+
+config_obj = SimpleNamespace(
+    main_options={{
+        "annotations": True,
+        "annotations_mrc": False,
+        "textual_obs": False,
+        "annotations_reports": False,
+    }},
+    storage_backend="file",
+    remote_dump=False,
+    pre_merged_input_batches_path=None,
+    pre_document_batch_path={raw_path!r},
+    pre_document_annotation_batch_path={annot_path!r},
+    overwrite_stored_pat_docs=False,
+    annotation_batch_docs=2,
+    annotation_n_process=3,
+    annotation_batch_size=50,
+    include_text_sample_in_annots=False,
+    add_icd10=False,
+    add_opc4s=False,
+    verbosity=0,
+    start_time=datetime.now(),
+)
+
+
+def build_config():
+    return config_obj
+"""
+
+
+class TestAnnotationWorkers(unittest.TestCase):
+    """Unit tests for the standalone annotation service."""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.raw_path = os.path.join(self.tmp_dir, "raw")
+        self.annot_path = os.path.join(self.tmp_dir, "annots")
+        os.makedirs(self.raw_path)
+        os.makedirs(self.annot_path)
+
+        self.module_name = f"annotation_run_config_{uuid.uuid4().hex}"
+        with open(os.path.join(self.tmp_dir, f"{self.module_name}.py"), "w") as f:
+            f.write(
+                CONFIG_MODULE.format(raw_path=self.raw_path, annot_path=self.annot_path)
+            )
+        sys.path.insert(0, self.tmp_dir)
+
+        docs = {"P1": ["fever today", "cough"], "P2": ["rash"], "P3": ["nausea"]}
+        for client_idcode, texts in docs.items():
+            pd.DataFrame(
+                {
+                    "client_idcode": client_idcode,
+                    "updatetime": "2020-01-01",
+                    "document_guid": [
+                        f"{client_idcode}-{i}" for i in range(len(texts))
+                    ],
+                    "body_analysed": texts,
+                }
+            ).to_csv(os.path.join(self.raw_path, f"{client_idcode}.csv"), index=False)
+
+        self.cat = FakeCAT()
+
+    def tearDown(self):
+        sys.path.remove(self.tmp_dir)
+        sys.modules.pop(self.module_name, None)
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def test_load_config(self):
+        config_obj = load_config(self.module_name)
+        self.assertEqual(config_obj.pre_document_batch_path, self.raw_path)
+        self.assertIs(load_config(f"{self.module_name}:build_config"), config_obj)
+
+    def test_plan_units(self):
+        patients = [f"P{i}" for i in range(10)]
+        units = _plan_units(patients, n_workers=2, units_per_worker=2)
+        self.assertEqual(len(units), 4)
+        self.assertEqual(sum(units, []), patients)
+        self.assertEqual(_plan_units([], n_workers=2, units_per_worker=2), [])
+
+    def test_in_process_worker_annotates_the_cohort(self):
+        with patch.object(annotation_workers, "get_cat", return_value=self.cat):
+            results = run_annotation_workers(
+                self.module_name,
+                n_workers=1,
+                client_idcode_list=["P1", "P2", "P3", "P4"],
+                units_per_worker=2,
+            )
+
+        self.assertEqual(len(results), 1)
+        self.assertIsNone(results[0].error)
+        self.assertEqual(results[0].n_patients, 3)
+        self.assertEqual(results[0].n_docs, 4)
+        # In-process, MedCAT keeps the configured number of processes.
+        self.assertEqual({call[1] for call in self.cat.calls}, {3})
+        for client_idcode in ["P1", "P2", "P3"]:
+            self.assertIsNotNone(find_annotation_output(self.annot_path, client_idcode))
+
+    def test_main_reads_patients_file(self):
+        patients_file = os.path.join(self.tmp_dir, "patients.txt")
+        with open(patients_file, "w") as f:
+            f.write("P2\n\nP3\n")
+
+        with patch.object(annotation_workers, "get_cat", return_value=self.cat):
+            exit_code = main(
+                [self.module_name, "--workers", "1", "--patients-file", patients_file]
+            )
+
+        self.assertEqual(exit_code, 0)
+        self.assertEqual(
+            sorted(text for texts, _, _ in self.cat.calls for text in texts),
+            ["nausea", "rash"],
+        )
+        self.assertIsNone(find_annotation_output(self.annot_path, "P1"))
+
+
+if __name__ == "__main__":
+    unittest.main()
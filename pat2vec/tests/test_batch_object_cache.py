@@ -0,0 +1,46 @@
+import unittest
+
+import pandas as pd
+
+from pat2vec.util.batch_object_cache import BatchObjectCache
+
+
+class TestBatchObjectCache(unittest.TestCase):
+    """Unit tests for the cache of values derived from batch objects."""
+
+    def setUp(self):
+        self.calls = []
+
+    def _build(self, batch, *args):
+        self.calls.append(args)
+        return (len(batch), *args)
+
+    def test_value_is_reused_for_the_same_batch(self):
+        cache = BatchObjectCache(max_size=8)
+        batch = pd.DataFrame({"a": [1, 2]})
+        value = cache.get(batch, self._build, "x")
+        self.assertIs(cache.get(batch, self._build, "x"), value)
+        self.assertEqual(cache.get(batch, self._build, "y"), (2, "y"))
+        self.assertEqual(cache.get(batch.copy(), self._build, "x"), value)
+        self.assertEqual(self.calls, [("x",), ("y",), ("x",)])
+
+    def test_values_are_dropped_with_their_batch(self):
+        cache = BatchObjectCache(max_size=8)
+        batch = pd.DataFrame({"a": [1]})
+        cache.get(batch, self._build)
+        self.assertEqual(len(cache), 1)
+        del batch
+        self.assertEqual(len(cache), 0)
+
+    def test_cache_is_cleared_when_full(self):
+        cache = BatchObjectCache(max_size=2)
+        batches = [pd.DataFrame({"a": [i]}) for i in range(3)]
+        for batch in batches:
+            cache.get(batch, self._build)
+        self.assertEqual(len(cache), 1)
+        cache.get(batches[0], self._build)
+        self.assertEqual(len(self.calls), 4)
+
+
+if __name__ == "__main__":
+    unittest.main()
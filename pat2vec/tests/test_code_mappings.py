@@ -0,0 +1,88 @@
+import os
+import shutil
+import tempfile
+import unittest
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import pandas as pd
+
+from pat2vec.util import code_mappings
+from pat2vec.util.code_mappings import CodeMap, load_code_map
+from pat2vec.util.post_processing import join_icd10_codes_to_annot
+
+
+class TestCodeMappings(unittest.TestCase):
+    """Unit tests for the cached ICD-10/OPCS-4 mapping tables."""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.map_path = os.path.join(self.tmp_dir, "icd10.tsv")
+        self.mapping = pd.DataFrame(
+            {
+                "id": ["m1", "m2", "m3", "m4"],
+                "referencedComponentId": [22298006, 386661006, 22298006, 1234],
+                "mapTarget": ["I21.9", "R50.9", "I22.9", "Z00"],
+            }
+        )
+        self.mapping.to_csv(self.map_path, sep="\t", index=False)
+        self.annots = pd.DataFrame(
+            {
+                "id": [0, 1, 2, 3],
+                "cui": ["386661006", "22298006", "99999", "22298006"],
+                "pretty_name": ["Fever", "MI", "Other", "MI"],
+            }
+        )
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+        code_mappings._CODE_MAPS.clear()
+
+    def test_join_matches_merge(self):
+        code_map = CodeMap(self.mapping, "referencedComponentId")
+        mapping = self.mapping.astype({"referencedComponentId": str})
+        for how in ["left", "inner"]:
+            expected = pd.merge(
+                self.annots,
+                mapping,
+                left_on="cui",
+                right_on="referencedComponentId",
+                how=how,
+            )
+            result = code_map.join(self.annots, inner=how == "inner")
+            self.assertEqual(result.columns.tolist(), expected.columns.tolist())
+            self.assertEqual(
+                result["mapTarget"].fillna("").tolist(),
+                expected["mapTarget"].fillna("").tolist(),
+            )
+            self.assertEqual(result["id_x"].tolist(), expected["id_x"].tolist())
+
+    def test_maps_are_loaded_once(self):
+        config_obj = SimpleNamespace(
+            icd10_map_path=self.map_path, code_map_cache_dir=None
+        )
+        with patch.object(
+            code_mappings.pd, "read_csv", wraps=pd.read_csv
+        ) as mock_read_csv:
+            first = join_icd10_codes_to_annot(self.annots, config_obj=config_obj)
+            second = join_icd10_codes_to_annot(self.annots, config_obj=config_obj)
+        mock_read_csv.assert_called_once()
+        pd.testing.assert_frame_equal(first, second)
+        self.assertEqual(len(first), 6)
+
+    def test_arrow_cache_is_shared(self):
+        cache_dir = os.path.join(self.tmp_dir, "cache")
+        load_code_map(self.map_path, "referencedComponentId", "\t", cache_dir)
+        self.assertEqual(len(os.listdir(cache_dir)), 1)
+
+        code_mappings._CODE_MAPS.clear()
+        with patch.object(code_mappings.pd, "read_csv") as mock_read_csv:
+            code_map = load_code_map(
+                self.map_path, "referencedComponentId", "\t", cache_dir
+            )
+        mock_read_csv.assert_not_called()
+        self.assertEqual(len(code_map.table), 4)
+
+
+if __name__ == "__main__":
+    unittest.main()
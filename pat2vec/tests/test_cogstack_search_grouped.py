@@ -0,0 +1,95 @@
+import unittest
+from unittest.mock import MagicMock, patch
+
+import pandas as pd
+
+import pat2vec.pat2vec_search.cogstack_search_methods as csm
+
+
+class TestCohortSearcherMultiTermGrouped(unittest.TestCase):
+    """Unit tests for cohort_searcher_multi_term_grouped."""
+
+    def setUp(self):
+        self.fields_list = ["client_idcode", "body_analysed"]
+        self.term_search_strings = {
+            "aspirin": '"aspirin" AND updatetime:[2020-01-01 TO 2021-01-01]',
+            "warfarin": '"warfarin" AND updatetime:[2020-01-01 TO 2021-01-01]',
+            "heparin": '"heparin" AND updatetime:[2020-01-01 TO 2021-01-01]',
+        }
+        self.mock_cs = MagicMock()
+        self.mock_cs.cogstack2df.side_effect = self._fake_cogstack2df
+
+    def _fake_cogstack2df(self, query, index, column_headers, **kwargs):
+        """Returns hits for whichever named clauses are present in the query."""
+        names = [clause["bool"]["_name"] for clause in query["query"]["bool"]["should"]]
+        hits = {
+            "aspirin": [("doc1", "P1"), ("doc2", "P2")],
+            "warfarin": [("doc1", "P1")],
+            "heparin": [],
+        }
+        rows = {}
+        for name in names:
+            for doc_id, client_id in hits[name]:
+                row = rows.setdefault(
+                    doc_id,
+                    {
+                        "_index": index,
+                        "_id": doc_id,
+                        "_score": 1.0,
+                        "client_idcode": client_id,
+                        "body_analysed": f"text {doc_id}",
+                        "matched_queries": [],
+                    },
+                )
+                row["matched_queries"].append(name)
+        return pd.DataFrame(
+            list(rows.values()),
+            columns=["_index", "_id", "_score", *column_headers, "matched_queries"],
+        )
+
+    def _search(self, term_group_size):
+        with patch.object(csm, "cs", self.mock_cs):
+            return csm.cohort_searcher_multi_term_grouped(
+                index_name="epr_documents",
+                fields_list=self.fields_list,
+                term_search_strings=self.term_search_strings,
+                term_group_size=term_group_size,
+                n_workers=2,
+            )
+
+    def test_terms_are_grouped_into_named_queries(self):
+        self._search(term_group_size=2)
+        self.assertEqual(self.mock_cs.cogstack2df.call_count, 2)
+        first_query = self.mock_cs.cogstack2df.call_args_list[0].kwargs["query"]
+        self.assertEqual(first_query["query"]["bool"]["minimum_should_match"], 1)
+        for clause in first_query["query"]["bool"]["should"]:
+            self.assertIn(clause["bool"]["_name"], self.term_search_strings)
+
+    def test_one_row_per_document_and_matched_term(self):
+        docs = self._search(term_group_size=3)
+        pairs = set(zip(docs["_id"], docs["search_term"]))
+        self.assertEqual(
+            pairs, {("doc1", "aspirin"), ("doc2", "aspirin"), ("doc1", "warfarin")}
+        )
+        self.assertEqual(docs.columns[-1], "search_term")
+        self.assertNotIn("matched_queries", docs.columns)
+
+    def test_group_size_does_not_change_results(self):
+        grouped = self._search(term_group_size=3)
+        single = self._search(term_group_size=1)
+        key = ["_id", "search_term"]
+        pd.testing.assert_frame_equal(
+            grouped.sort_values(key).reset_index(drop=True),
+            single.sort_values(key).reset_index(drop=True),
+        )
+
+    def test_no_hits_keeps_search_term_column(self):
+        self.term_search_strings = {"heparin": self.term_search_strings["heparin"]}
+        docs = self._search(term_group_size=3)
+        self.assertTrue(docs.empty)
+        self.assertEqual(docs.columns[-1], "search_term")
+        self.assertEqual(docs["search_term"].value_counts().to_dict(), {})
+
+
+if __name__ == "__main__":
+    unittest.main()
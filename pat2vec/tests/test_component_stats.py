@@ -0,0 +1,102 @@
+import unittest
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+
+from pat2vec.pat2vec_get_methods.get_method_bmi import get_bmi_features
+from pat2vec.pat2vec_get_methods.get_method_news import get_news
+from pat2vec.util.observation_features import (
+    OBSERVATION_STATS,
+    calculate_component_stats,
+)
+
+
+def observations(rows):
+    """Returns observations from (item, value) pairs."""
+    items, values = zip(*rows)
+    return pd.DataFrame(
+        {
+            "client_idcode": "P1",
+            "obscatalogmasteritem_displayname": items,
+            "observation_valuetext_analysed": values,
+            "observationdocument_recordeddtm": "2020-01-15",
+        }
+    )
+
+
+class TestComponentStats(unittest.TestCase):
+    """Unit tests for the grouped NEWS and BMI statistics."""
+
+    def setUp(self):
+        self.config_obj = SimpleNamespace(
+            batch_mode=True,
+            negate_biochem=False,
+            verbosity=0,
+            lookback=False,
+            time_window_interval_delta=pd.DateOffset(months=1),
+        )
+
+    def test_stats_of_each_component(self):
+        data = observations(
+            [
+                ("B", "4"),
+                ("A", "1"),
+                ("A", "x"),
+                ("A", "3"),
+                ("A", "50"),
+                ("C", "2"),
+                ("B", None),
+            ]
+        )
+        stats = calculate_component_stats(
+            data, {"A": "a", "B": "b", "D": "d"}, bounds={"a": (0, 10)}
+        )
+        self.assertEqual(stats.index.tolist(), ["a", "b"])
+        self.assertEqual(stats.columns.tolist(), list(OBSERVATION_STATS))
+        self.assertEqual(stats.loc["a"].tolist(), [2, 2, np.sqrt(2), 3, 1, 2])
+        self.assertEqual(stats.loc["b", "n"], 1)
+        self.assertTrue(np.isnan(stats.loc["b", "std"]))
+
+    def test_get_news(self):
+        data = observations(
+            [("NEWS2_Score", "3"), ("NEWS2_Score", "25"), ("NEWS_Heart_Rate", "80")]
+        )
+        result = get_news("P1", (2020, 1, 1), data, config_obj=self.config_obj)
+        self.assertEqual(result["news_score_n"].iloc[0], 1)
+        self.assertEqual(result["news_heart_rate_mean"].iloc[0], 80)
+        self.assertNotIn("news_avpu_mean", result.columns)
+
+        self.config_obj.negate_biochem = True
+        result = get_news("P1", (2020, 1, 1), data, config_obj=self.config_obj)
+        self.assertEqual(len(result.columns), 1 + 15 * len(OBSERVATION_STATS))
+        self.assertTrue(np.isnan(result["news_avpu_mean"].iloc[0]))
+
+    def test_get_bmi_features(self):
+        data = observations(
+            [
+                ("OBS BMI Calculation", "31"),
+                ("OBS BMI Calculation", "33"),
+                ("OBS BMI Calculation", "250"),
+                ("OBS Weight", "90"),
+            ]
+        )
+        result = get_bmi_features("P1", (2020, 1, 1), data, config_obj=self.config_obj)
+        row = result.iloc[0]
+        self.assertEqual(row["bmi_median"], 32)
+        self.assertEqual(row["bmi_max"], 33)
+        self.assertEqual(
+            [row["bmi_high"], row["bmi_low"], row["bmi_extreme"]], [1, 0, 1]
+        )
+        self.assertEqual(row["weight_mean"], 90)
+        self.assertFalse(any(column.startswith("height") for column in result))
+
+        # Without BMI calculations there are no features.
+        result = get_bmi_features(
+            "P1", (2020, 1, 1), data.iloc[3:], config_obj=self.config_obj
+        )
+        self.assertEqual(result.columns.tolist(), ["client_idcode"])
+
+
+if __name__ == "__main__":
+    unittest.main()
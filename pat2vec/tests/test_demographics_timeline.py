@@ -0,0 +1,87 @@
+import unittest
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+
+from pat2vec.pat2vec_get_methods.get_method_demographics import get_demo
+from pat2vec.util import demographics_timeline
+from pat2vec.util.demographics_timeline import (
+    DEMOGRAPHICS_FEATURES,
+    get_demographics_timeline,
+)
+
+
+class TestDemographicsTimeline(unittest.TestCase):
+    """Unit tests for the per-patient demographics timeline."""
+
+    def setUp(self):
+        self.demographics = pd.DataFrame(
+            {
+                "client_idcode": "P1",
+                "client_firstname": "A",
+                "client_lastname": "B",
+                "client_dob": ["1980-05-20T00:00:00.000", None, None],
+                "client_gendercode": ["Male", None, "Male"],
+                "client_racecode": ["White British", None, "Pakistani"],
+                "client_deceaseddtm": [None, None, "2021-04-01T00:00:00"],
+                "updatetime": [
+                    "2021-03-01T00:00:00",
+                    "2020-01-05T10:00:00",
+                    "2020-01-20T00:00:00",
+                ],
+            }
+        )
+        self.config_obj = SimpleNamespace(
+            batch_mode=True,
+            verbosity=0,
+            lookback=False,
+            time_window_interval_delta=pd.DateOffset(months=1),
+        )
+
+    def test_latest_record_of_each_slice(self):
+        result = get_demo(
+            "P1", (2020, 1, 1), self.demographics, config_obj=self.config_obj
+        )
+        self.assertEqual(
+            result.columns.tolist(), ["client_idcode"] + DEMOGRAPHICS_FEATURES
+        )
+        row = result.iloc[0]
+        self.assertEqual(row["male"], 1)
+        self.assertEqual(row["dead"], 1)
+        self.assertEqual(row["census_asian_or_asian_british"], 1)
+        self.assertEqual(row["census_white"], 0)
+        # The date of birth is missing from the slice's records.
+        self.assertTrue(np.isnan(row["age"]))
+
+        result = get_demo(
+            "P1", (2021, 3, 1), self.demographics, config_obj=self.config_obj
+        )
+        row = result.iloc[0]
+        self.assertEqual(row["age"], 40)
+        self.assertEqual(row["census_white"], 1)
+        # Earlier records fill the deceased date in later ones.
+        self.assertEqual(row["dead"], 1)
+
+    def test_slice_without_records(self):
+        result = get_demo(
+            "P1", (2019, 1, 1), self.demographics, config_obj=self.config_obj
+        )
+        self.assertEqual(result["client_idcode"].iloc[0], "P1")
+        self.assertEqual(result["dead"].iloc[0], 0)
+        self.assertTrue(
+            result.drop(columns=["client_idcode", "dead"]).isna().all(axis=None)
+        )
+
+    def test_timeline_is_reused_for_the_same_batch(self):
+        timeline = get_demographics_timeline(self.demographics)
+        self.assertIs(get_demographics_timeline(self.demographics), timeline)
+        self.assertIsNot(get_demographics_timeline(self.demographics.copy()), timeline)
+
+        n_timelines = len(demographics_timeline._TIMELINES)
+        del self.demographics
+        self.assertEqual(len(demographics_timeline._TIMELINES), n_timelines - 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
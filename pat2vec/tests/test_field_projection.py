@@ -0,0 +1,131 @@
+import unittest
+from types import SimpleNamespace
+
+import pandas as pd
+
+from pat2vec.util.clinical_note_splitter import split_and_append_chunks
+from pat2vec.util.field_projection import (
+    BATCH_SOURCE_DEFAULT_FIELDS,
+    BATCH_SOURCE_GET_METHODS,
+    get_source_fields,
+    plan_source_fields,
+)
+from pat2vec.util.get_method_default_fields_map import GET_METHOD_DEFAULT_FIELDS_MAP
+
+
+class TestFieldProjection(unittest.TestCase):
+    """Unit tests for the data source field planner."""
+
+    def setUp(self):
+        self.config = SimpleNamespace(
+            field_projection=True,
+            field_projection_extra_fields={},
+            drug_time_field="order_createdwhen",
+            diagnostic_time_field="order_createdwhen",
+            bloods_time_field="basicobs_entered",
+            appointments_time_field="AppointmentDateTime",
+            data_type_filter_dict=None,
+            split_clinical_notes=False,
+            main_options={"bloods": True, "drugs": False, "core_02": True},
+        )
+
+    def test_defaults_returned_when_projection_disabled(self):
+        self.config.field_projection = False
+        for source, fields in BATCH_SOURCE_DEFAULT_FIELDS.items():
+            self.assertEqual(get_source_fields(source, self.config), fields)
+
+    def test_plan_is_ordered_subset_of_defaults(self):
+        fields = plan_source_fields("drugs", self.config)
+        self.assertEqual(fields, ["client_idcode", "order_name", "order_createdwhen"])
+
+    def test_configured_time_field_is_added(self):
+        self.config.bloods_time_field = "updatetime"
+        fields = plan_source_fields("bloods", self.config)
+        self.assertIn("updatetime", fields)
+        self.assertNotIn("basicobs_entered", fields)
+
+    def test_epr_docs_keeps_description_only_when_filtered(self):
+        self.assertNotIn(
+            "document_description", plan_source_fields("epr_docs", self.config)
+        )
+        self.config.data_type_filter_dict = {
+            "filter_term_lists": {"epr_docs": ["Clinical Note"]}
+        }
+        self.assertIn(
+            "document_description", plan_source_fields("epr_docs", self.config)
+        )
+
+    def test_projected_documents_can_be_split(self):
+        self.config.split_clinical_notes = True
+        note = (
+            "First entry. Entered on - 01-Feb-2020 10:00 "
+            "Second entry. Entered on - 02-Feb-2020 11:00"
+        )
+        values = {
+            "client_idcode": "P1",
+            "document_guid": "G1",
+            "observation_guid": "G1",
+            "body_analysed": note,
+            "observation_valuetext_analysed": note,
+            "updatetime": "2020-03-01T00:00:00",
+            "observationdocument_recordeddtm": "2020-03-01T00:00:00",
+            "document_description": "Clinical Note",
+            "obscatalogmasteritem_displayname": "AoMRC_ClinicalSummary_FT",
+            "clientvisit_visitidcode": "V1",
+        }
+        for source, flags in [
+            ("epr_docs", {"epr": True}),
+            ("mct_docs", {"epr": False, "mct": True}),
+        ]:
+            with self.subTest(source=source):
+                fields = plan_source_fields(source, self.config)
+                # The searcher adds the hit metadata to every row.
+                docs = pd.DataFrame(
+                    [
+                        {
+                            "_index": "index",
+                            "_id": "1",
+                            **{field: values[field] for field in fields},
+                        }
+                    ]
+                )
+                split = split_and_append_chunks(docs, **flags)
+                self.assertEqual(len(split), 2)
+                self.assertEqual(split["clientvisit_visitidcode"].tolist(), ["V1"] * 2)
+
+    def test_incremental_prefetch_keeps_update_time(self):
+        self.assertNotIn("updatetime", plan_source_fields("bloods", self.config))
+        self.config.prefetch_incremental = True
+        self.assertIn("updatetime", plan_source_fields("bloods", self.config))
+        self.assertNotIn("updatetime", plan_source_fields("drugs", self.config))
+
+    def test_extra_fields_are_appended(self):
+        self.config.field_projection_extra_fields = {
+            "drugs": ["order_summaryline", "custom_field"]
+        }
+        fields = plan_source_fields("drugs", self.config)
+        self.assertEqual(
+            fields,
+            [
+                "client_idcode",
+                "order_name",
+                "order_summaryline",
+                "order_createdwhen",
+                "custom_field",
+            ],
+        )
+
+    def test_defaults_are_the_get_method_defaults(self):
+        for source, method_name in BATCH_SOURCE_GET_METHODS.items():
+            self.assertIs(
+                BATCH_SOURCE_DEFAULT_FIELDS[source],
+                GET_METHOD_DEFAULT_FIELDS_MAP[method_name],
+            )
+
+    def test_unknown_source_raises(self):
+        with self.assertRaises(ValueError):
+            plan_source_fields("unknown", self.config)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,84 @@
+import unittest
+from unittest.mock import patch
+
+import numpy as np
+import pandas as pd
+
+from pat2vec.util import filter_methods
+from pat2vec.util.filter_methods import (
+    clear_fuzzy_match_cache,
+    filter_dataframe_by_fuzzy_terms,
+)
+
+
+class TestFuzzyTermFilter(unittest.TestCase):
+    """Unit tests for `filter_dataframe_by_fuzzy_terms`."""
+
+    def setUp(self):
+        clear_fuzzy_match_cache()
+        self.df = pd.DataFrame(
+            {
+                "document_description": [
+                    "Clinical Note",
+                    "Discharge letter",
+                    None,
+                    "Letter",
+                    "Radiology report",
+                ]
+                * 3,
+                "body": range(15),
+            }
+        )
+
+    def tearDown(self):
+        clear_fuzzy_match_cache()
+
+    def test_keeps_every_matching_row(self):
+        filtered = filter_dataframe_by_fuzzy_terms(self.df, ["letter"])
+        self.assertEqual(filtered["body"].tolist(), [1, 3, 6, 8, 11, 13])
+        self.assertEqual(
+            set(filtered["document_description"]), {"Discharge letter", "Letter"}
+        )
+
+    def test_no_terms_or_rows_returns_empty(self):
+        self.assertTrue(filter_dataframe_by_fuzzy_terms(self.df, []).empty)
+        empty = filter_dataframe_by_fuzzy_terms(self.df.iloc[0:0], ["letter"])
+        self.assertTrue(empty.empty)
+        self.assertEqual(list(empty.columns), list(self.df.columns))
+
+    def test_distinct_values_scored_once_and_cached(self):
+        cdist = filter_methods.process.cdist
+        with patch.object(
+            filter_methods.process, "cdist", side_effect=cdist
+        ) as mock_cdist:
+            filter_dataframe_by_fuzzy_terms(self.df, ["letter", "note"])
+            self.assertEqual(mock_cdist.call_count, 1)
+            self.assertEqual(len(mock_cdist.call_args.args[1]), 4)
+
+            # A later batch only scores values not seen before.
+            batch = pd.DataFrame(
+                {"document_description": ["Letter", "Clinic letter", np.nan]}
+            )
+            filtered = filter_dataframe_by_fuzzy_terms(batch, ["letter", "note"])
+            self.assertEqual(mock_cdist.call_count, 2)
+            self.assertEqual(mock_cdist.call_args.args[1], ["Clinic letter"])
+            self.assertEqual(len(filtered), 2)
+
+    def test_cache_is_bounded(self):
+        with (
+            patch.object(filter_methods, "FUZZY_MATCH_CACHE_SIZE", 2),
+            patch.object(filter_methods, "FUZZY_MATCH_CACHE_TERM_LISTS", 1),
+        ):
+            matches = filter_methods.fuzzy_match_values(
+                ["Letter", "Note", "Report"], ["letter"]
+            )
+            self.assertEqual(matches, {"Letter": True, "Note": False, "Report": False})
+            cache = filter_methods._FUZZY_MATCH_CACHE
+            self.assertEqual(list(cache[(("letter",), 80)]), ["Note", "Report"])
+
+            filter_methods.fuzzy_match_values(["Letter"], ["note"])
+            self.assertEqual(list(cache), [(("note",), 80)])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,114 @@
+import unittest
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+
+from pat2vec.pat2vec_get_methods.get_method_bloods import (
+    BLOODS_FEATURES,
+    calculate_bloods_features,
+    get_current_pat_bloods,
+)
+
+
+class TestGetCurrentPatBloods(unittest.TestCase):
+    """Unit tests for the bloods feature kernel."""
+
+    def setUp(self):
+        self.bloods = pd.DataFrame(
+            {
+                "client_idcode": "P1",
+                "basicobs_itemname_analysed": ["Hb", "Hb", "WBC", "Hb", "Hb", "Na"],
+                "basicobs_value_numeric": [12.0, 10.0, 5.0, 14.0, 10.0, 140.0],
+                "basicobs_entered": [
+                    "2020-01-10",
+                    "2020-01-01",
+                    "2020-01-05",
+                    "2020-01-31",
+                    "2020-01-20",
+                    "2020-01-02",
+                ],
+                "clientvisit_serviceguid": "S1",
+                "updatetime": "2020-02-01",
+            }
+        )
+        self.config_obj = SimpleNamespace(
+            batch_mode=True,
+            bloods_time_field="basicobs_entered",
+            verbosity=0,
+            lookback=False,
+            time_window_interval_delta=pd.DateOffset(months=1),
+        )
+
+    def test_features_of_each_test(self):
+        bloods = self.bloods.assign(
+            datetime=pd.to_datetime(self.bloods["basicobs_entered"], utc=True)
+        )
+        today = datetime(2020, 3, 1, tzinfo=timezone.utc)
+        result = calculate_bloods_features(bloods, today)
+
+        self.assertEqual(
+            result.columns.tolist(),
+            ["client_idcode"]
+            + [
+                f"{item}_{feature}"
+                for item in ["Hb", "WBC", "Na"]
+                for feature in BLOODS_FEATURES
+            ],
+        )
+        row = result.iloc[0]
+        self.assertEqual(row["client_idcode"], "P1")
+        self.assertEqual(row["Hb_mean"], 11.5)
+        self.assertEqual(row["Hb_median"], 11.0)
+        self.assertEqual(row["Hb_mode"], 10.0)
+        self.assertAlmostEqual(row["Hb_std"], np.std([12, 10, 14, 10], ddof=1))
+        self.assertEqual(row["Hb_num-tests"], 4)
+        self.assertEqual(row["Hb_min"], 10.0)
+        self.assertEqual(row["Hb_max"], 14.0)
+        self.assertEqual(row["Hb_earliest-test"], 10.0)
+        self.assertEqual(row["Hb_most-recent"], 14.0)
+        self.assertEqual(row["Hb_days-since-last-test"], 30)
+        self.assertEqual(row["Hb_days-between-first-last"], 30)
+        self.assertEqual(row["Hb_contains-extreme-low"], 0)
+        self.assertEqual(row["Hb_contains-extreme-high"], 0)
+
+        # A single result only has a mean.
+        self.assertEqual(row["WBC_mean"], 5.0)
+        self.assertTrue(
+            all(pd.isna(row[f"WBC_{feature}"]) for feature in BLOODS_FEATURES[1:])
+        )
+
+    def test_missing_values_are_ignored(self):
+        bloods = self.bloods.assign(
+            datetime=pd.to_datetime(self.bloods["basicobs_entered"], utc=True)
+        )
+        bloods.loc[[0, 1], "basicobs_value_numeric"] = np.nan
+        today = datetime(2020, 3, 1, tzinfo=timezone.utc)
+        row = calculate_bloods_features(bloods, today).iloc[0]
+
+        # The missing results are counted but not part of the statistics,
+        # whatever their position in time.
+        self.assertEqual(row["Hb_num-tests"], 4)
+        self.assertEqual(row["Hb_mean"], 12.0)
+        self.assertEqual(row["Hb_max"], 14.0)
+        self.assertEqual(row["Hb_min"], 10.0)
+        self.assertEqual(row["Hb_mode"], 10.0)
+
+    def test_get_current_pat_bloods(self):
+        result = get_current_pat_bloods(
+            "P1", (2020, 1, 1), self.bloods, config_obj=self.config_obj
+        )
+        self.assertEqual(len(result), 1)
+        self.assertEqual(result["Hb_num-tests"].iloc[0], 4)
+        self.assertEqual(result["Na_mean"].iloc[0], 140.0)
+
+        empty = get_current_pat_bloods(
+            "P1", (2019, 1, 1), self.bloods, config_obj=self.config_obj
+        )
+        self.assertTrue(empty.empty)
+        self.assertEqual(empty.columns.tolist(), ["client_idcode"])
+
+
+if __name__ == "__main__":
+    unittest.main()
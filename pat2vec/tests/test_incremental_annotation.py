@@ -0,0 +1,122 @@
+import os
+import shutil
+import tempfile
+import unittest
+from datetime import datetime
+from types import SimpleNamespace
+
+import pandas as pd
+
+from pat2vec.patvec_get_batch_methods.main_get_pat_batch_epr_docs_annotations import (
+    get_pat_batch_epr_docs_annotations,
+)
+from pat2vec.tests.test_annotate_cohort_batches import _entity
+from pat2vec.util.incremental_annotation import guids_path, read_annotated_guids
+
+
+class FakeCAT:
+    """Annotates texts with one entity, except texts starting with 'empty'."""
+
+    def __init__(self):
+        self.annotated = []
+
+    def get_entities_multi_texts(self, texts, **kwargs):
+        texts = list(texts)
+        self.annotated.extend(texts)
+        return [
+            {"entities": {} if text.startswith("empty") else {0: _entity(text, 0)}}
+            for text in texts
+        ]
+
+
+class TestIncrementalAnnotation(unittest.TestCase):
+    """Unit tests for annotating only documents not yet annotated."""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.raw_path = os.path.join(self.tmp_dir, "raw")
+        self.annot_path = os.path.join(self.tmp_dir, "annots")
+        os.makedirs(self.raw_path)
+        os.makedirs(self.annot_path)
+        self.annot_file = os.path.join(self.annot_path, "P1.parquet")
+
+        self.config_obj = SimpleNamespace(
+            storage_backend="file",
+            remote_dump=False,
+            pre_merged_input_batches_path=None,
+            pre_document_batch_path=self.raw_path,
+            pre_document_annotation_batch_path=self.annot_path,
+            overwrite_stored_pat_docs=False,
+            store_pat_batch_docs=True,
+            annotation_incremental=True,
+            add_icd10=False,
+            add_opc4s=False,
+            verbosity=0,
+            start_time=datetime.now(),
+        )
+        self.cat = FakeCAT()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def _write_raw(self, texts):
+        pd.DataFrame(
+            {
+                "client_idcode": "P1",
+                "updatetime": "2020-01-01",
+                "document_guid": [f"G{i}" for i in range(len(texts))],
+                "body_analysed": texts,
+            }
+        ).to_csv(os.path.join(self.raw_path, "P1.csv"), index=False)
+
+    def _annotate(self):
+        return get_pat_batch_epr_docs_annotations("P1", self.config_obj, self.cat, None)
+
+    def test_only_new_documents_are_annotated_and_appended(self):
+        self._write_raw(["fever today", "empty note"])
+        first = self._annotate()
+        self.assertEqual(self.cat.annotated, ["fever today", "empty note"])
+        self.assertEqual(first["pretty_name"].tolist(), ["fever"])
+        # The document without entities is tracked as annotated too.
+        self.assertEqual(
+            read_annotated_guids(self.annot_file, "document_guid"), {"G0", "G1"}
+        )
+
+        self.cat.annotated.clear()
+        self._write_raw(["fever today", "empty note", "cough again"])
+        second = self._annotate()
+        self.assertEqual(self.cat.annotated, ["cough again"])
+        self.assertEqual(second["pretty_name"].tolist(), ["fever", "cough"])
+        self.assertEqual(
+            pd.read_parquet(self.annot_file)["document_guid"].tolist(), ["G0", "G2"]
+        )
+
+        self.cat.annotated.clear()
+        third = self._annotate()
+        self.assertEqual(self.cat.annotated, [])
+        self.assertEqual(len(third), 2)
+
+    def test_outputs_without_tracking_file_use_their_guid_column(self):
+        self._write_raw(["fever today", "empty note"])
+        self._annotate()
+        os.remove(guids_path(self.annot_file))
+
+        self.cat.annotated.clear()
+        self._annotate()
+        # Only the document without entities is annotated again.
+        self.assertEqual(self.cat.annotated, ["empty note"])
+
+    def test_existing_output_is_reused_when_not_incremental(self):
+        self._write_raw(["fever today"])
+        self._annotate()
+
+        self.config_obj.annotation_incremental = False
+        self.cat.annotated.clear()
+        self._write_raw(["fever today", "cough again"])
+        result = self._annotate()
+        self.assertEqual(self.cat.annotated, [])
+        self.assertEqual(result["pretty_name"].tolist(), ["fever"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,158 @@
+import os
+import shutil
+import tempfile
+import unittest
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import pandas as pd
+
+from pat2vec.util import merged_batch_cache
+from pat2vec.util.merged_batch_cache import (
+    find_merged_batch,
+    get_merged_batch_index,
+    load_merged_batch,
+    merged_batch_exists,
+    merged_batch_index_path,
+    merged_batch_path,
+    read_patient_from_merged_batch,
+    save_merged_batch,
+)
+from pat2vec.util.partitioned_store import patient_batch_exists, read_patient_batch
+
+
+class TestMergedBatchCache(unittest.TestCase):
+    """Unit tests for the Arrow-backed merged batch caches."""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.csv_path = os.path.join(self.tmp_dir, "merged_bloods_batches.csv")
+        self.df = pd.DataFrame(
+            {
+                "client_idcode": ["P1", "P2"],
+                "basicobs_value_numeric": [1.5, 2.5],
+                "basicobs_entered": pd.to_datetime(["2020-01-01", "2020-02-01"]),
+            }
+        )
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def test_round_trip_preserves_dtypes(self):
+        for fmt in ["parquet", "feather"]:
+            with self.subTest(fmt=fmt):
+                config_obj = SimpleNamespace(merged_batch_format=fmt)
+                path = save_merged_batch(self.df, self.csv_path, config_obj)
+                self.assertTrue(path.endswith(f".{fmt}"))
+                loaded = load_merged_batch(self.csv_path)
+                pd.testing.assert_frame_equal(loaded, self.df)
+
+    def test_column_projection(self):
+        for fmt in ["parquet", "feather", "csv"]:
+            with self.subTest(fmt=fmt):
+                save_merged_batch(
+                    self.df, self.csv_path, SimpleNamespace(merged_batch_format=fmt)
+                )
+                loaded = load_merged_batch(
+                    self.csv_path, columns=["client_idcode", "missing_column"]
+                )
+                self.assertEqual(list(loaded.columns), ["client_idcode"])
+
+    def test_legacy_csv_cache_is_read(self):
+        self.df.to_csv(self.csv_path, index=False)
+        self.assertTrue(merged_batch_exists(self.csv_path))
+        self.assertEqual(len(load_merged_batch(self.csv_path)), 2)
+
+    def test_new_cache_replaces_legacy_csv(self):
+        self.df.to_csv(self.csv_path, index=False)
+        save_merged_batch(self.df, self.csv_path)
+        self.assertEqual(
+            find_merged_batch(self.csv_path),
+            merged_batch_path(self.csv_path, "parquet"),
+        )
+        self.assertFalse(os.path.exists(self.csv_path))
+
+    def test_missing_cache(self):
+        self.assertFalse(merged_batch_exists(self.csv_path))
+        with self.assertRaises(FileNotFoundError):
+            load_merged_batch(self.csv_path)
+
+    def test_unknown_format_raises(self):
+        with self.assertRaises(ValueError):
+            merged_batch_path(self.csv_path, "xlsx")
+
+
+class TestMergedBatchIndex(unittest.TestCase):
+    """Unit tests for per-patient reads through the merged batch index."""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.csv_path = os.path.join(self.tmp_dir, "merged_bloods_batches.csv")
+        # Interleaved patients, so the save has to sort them into runs.
+        self.df = pd.DataFrame(
+            {
+                "client_idcode": ["P3", "P1", "P2", "P1", "P3", "P1", "P2", "P3"],
+                "basicobs_value_numeric": [float(i) for i in range(8)],
+            }
+        )
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def _expected(self, client_idcode):
+        return self.df[self.df["client_idcode"] == client_idcode].reset_index(drop=True)
+
+    def test_patient_reads_span_row_groups(self):
+        for fmt in ["parquet", "feather"]:
+            with (
+                self.subTest(fmt=fmt),
+                patch.object(merged_batch_cache, "MERGED_ROW_GROUP_SIZE", 2),
+            ):
+                save_merged_batch(
+                    self.df, self.csv_path, SimpleNamespace(merged_batch_format=fmt)
+                )
+                index = get_merged_batch_index(self.csv_path)
+                self.assertEqual(set(index), {"P1", "P2", "P3"})
+                for client_idcode in ["P1", "P2", "P3"]:
+                    pd.testing.assert_frame_equal(
+                        read_patient_from_merged_batch(self.csv_path, client_idcode),
+                        self._expected(client_idcode),
+                    )
+
+    def test_column_projection_and_missing_patient(self):
+        save_merged_batch(self.df, self.csv_path)
+        patient = read_patient_from_merged_batch(
+            self.csv_path, "P2", columns=["basicobs_value_numeric"]
+        )
+        self.assertEqual(list(patient.columns), ["basicobs_value_numeric"])
+        self.assertEqual(patient["basicobs_value_numeric"].tolist(), [2.0, 6.0])
+        self.assertIsNone(read_patient_from_merged_batch(self.csv_path, "P9"))
+
+    def test_csv_cache_has_no_index(self):
+        save_merged_batch(self.df, self.csv_path)
+        save_merged_batch(
+            self.df, self.csv_path, SimpleNamespace(merged_batch_format="csv")
+        )
+        self.assertFalse(os.path.exists(merged_batch_index_path(self.csv_path)))
+        self.assertIsNone(read_patient_from_merged_batch(self.csv_path, "P1"))
+
+    def test_patient_batch_readers_use_index(self):
+        save_merged_batch(self.df, self.csv_path)
+        config_obj = SimpleNamespace(
+            pre_merged_input_batches_path=self.tmp_dir,
+            remote_dump=False,
+            root_path=self.tmp_dir,
+        )
+        target_path = os.path.join(self.tmp_dir, "bloods", "P3.csv")
+        self.assertTrue(
+            patient_batch_exists(target_path, config_obj, merged_batch="bloods")
+        )
+        self.assertFalse(patient_batch_exists(target_path, config_obj))
+        pd.testing.assert_frame_equal(
+            read_patient_batch(target_path, config_obj, merged_batch="bloods"),
+            self._expected("P3"),
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,187 @@
+import os
+import shutil
+import tempfile
+import unittest
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+import pandas as pd
+
+from pat2vec.patvec_get_batch_methods.merged_batch_fetcher import (
+    MERGED_BATCH_SPECS,
+    build_search_string,
+    fetch_merged_batch,
+)
+from pat2vec.util.merged_batch_cache import (
+    find_merged_batch,
+    read_patient_from_merged_batch,
+)
+
+
+class TestMergedBatchFetcher(unittest.TestCase):
+    """Unit tests for the spec-driven streaming merged batch fetcher."""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.config_obj = SimpleNamespace(
+            global_start_year=2020,
+            global_start_month=1,
+            global_start_day=1,
+            global_end_year=2021,
+            global_end_month=12,
+            global_end_day=31,
+            storage_backend="file",
+            pre_merged_input_batches_path=self.tmp_dir,
+            overwrite_stored_pat_observations=False,
+            store_pat_batch_observations=True,
+            overwrite_stored_pat_docs=False,
+            store_pat_batch_docs=True,
+            client_idcode_term_name="client_idcode.keyword",
+            drug_time_field="order_createdwhen",
+            data_type_filter_dict=None,
+            merged_batch_chunk_size=2,
+            merged_batch_format="parquet",
+            verbosity=0,
+        )
+        self.spec = MERGED_BATCH_SPECS["drugs"]
+        self.patients = ["P1", "P2", "P3", "P4", "P5"]
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def _searcher(self):
+        def search(entered_list, **kwargs):
+            rows = []
+            for client_idcode in entered_list:
+                if client_idcode == "P4":
+                    continue
+                for i in range(2):
+                    rows.append(
+                        {
+                            "client_idcode": client_idcode,
+                            "order_name": ["Aspirin", "Paracetamol"][i],
+                            # All-null in the first chunk, strings later.
+                            "order_summaryline": (
+                                None if client_idcode in ("P1", "P2") else "x"
+                            ),
+                        }
+                    )
+            return pd.DataFrame(rows)
+
+        return MagicMock(side_effect=search)
+
+    def test_search_string_pads_dates_and_formats_query(self):
+        self.assertEqual(
+            build_search_string(self.spec, self.config_obj),
+            'order_typecode:"medication" AND '
+            "order_createdwhen:[2020-01-01 TO 2021-12-31]",
+        )
+        self.assertEqual(
+            build_search_string(
+                MERGED_BATCH_SPECS["obs"], self.config_obj, "CORE_SpO2"
+            ),
+            'obscatalogmasteritem_displayname:("CORE_SpO2") AND '
+            "observationdocument_recordeddtm:[2020-01-01 TO 2021-12-31]",
+        )
+        self.config_obj.delta_fetch_field = "updatetime"
+        self.config_obj.delta_fetch_start = "2021-06-01"
+        self.assertEqual(
+            build_search_string(self.spec, self.config_obj),
+            'order_typecode:"medication" AND '
+            "order_createdwhen:[2020-01-01 TO 2021-12-31] AND "
+            "updatetime:[2021-06-01 TO *]",
+        )
+
+    def test_cohort_is_searched_in_chunks_and_cached(self):
+        searcher = self._searcher()
+        df = fetch_merged_batch(self.spec, self.patients, self.config_obj, searcher)
+
+        self.assertEqual(searcher.call_count, 3)
+        self.assertEqual(
+            [call.kwargs["entered_list"] for call in searcher.call_args_list],
+            [["P1", "P2"], ["P3", "P4"], ["P5"]],
+        )
+        self.assertEqual(len(df), 8)
+
+        csv_path = os.path.join(self.tmp_dir, "merged_drugs_batches.csv")
+        self.assertTrue(find_merged_batch(csv_path).endswith(".parquet"))
+        p3 = read_patient_from_merged_batch(csv_path, "P3")
+        self.assertEqual(p3["order_summaryline"].tolist(), ["x", "x"])
+        p1 = read_patient_from_merged_batch(csv_path, "P1")
+        self.assertTrue(p1["order_summaryline"].isna().all())
+
+    def test_streaming_without_collecting(self):
+        chunks = []
+        df = fetch_merged_batch(
+            self.spec,
+            self.patients,
+            self.config_obj,
+            self._searcher(),
+            chunk_callback=chunks.append,
+            collect=False,
+        )
+        self.assertTrue(df.empty)
+        self.assertEqual([len(chunk) for chunk in chunks], [4, 2, 2])
+
+        # A second run streams the cache without searching, one patient run
+        # never split across chunks.
+        searcher = self._searcher()
+        cached_chunks = []
+        fetch_merged_batch(
+            self.spec,
+            self.patients,
+            self.config_obj,
+            searcher,
+            chunk_callback=cached_chunks.append,
+            collect=False,
+        )
+        searcher.assert_not_called()
+        cached = pd.concat(cached_chunks)
+        self.assertEqual(len(cached), 8)
+        self.assertEqual(
+            sorted(cached["client_idcode"].unique()), ["P1", "P2", "P3", "P5"]
+        )
+
+    def test_transform_runs_per_chunk(self):
+        self.config_obj.data_type_filter_dict = {
+            "filter_term_lists": {"drugs": ["Paracetamol"]}
+        }
+        df = fetch_merged_batch(
+            self.spec, self.patients, self.config_obj, self._searcher()
+        )
+        self.assertEqual(set(df["order_name"]), {"Paracetamol"})
+
+    def test_search_errors_return_empty(self):
+        searcher = MagicMock(side_effect=RuntimeError("index unavailable"))
+        df = fetch_merged_batch(self.spec, self.patients, self.config_obj, searcher)
+        self.assertTrue(df.empty)
+
+    def test_streaming_errors_are_raised_without_a_partial_cache(self):
+        searcher = self._searcher()
+        search = searcher.side_effect
+
+        def fail_on_last_chunk(entered_list, **kwargs):
+            if "P5" in entered_list:
+                raise RuntimeError("index unavailable")
+            return search(entered_list, **kwargs)
+
+        searcher.side_effect = fail_on_last_chunk
+        chunks = []
+        with self.assertRaises(RuntimeError):
+            fetch_merged_batch(
+                self.spec,
+                self.patients,
+                self.config_obj,
+                searcher,
+                chunk_callback=chunks.append,
+                collect=False,
+            )
+        self.assertEqual(len(chunks), 2)
+        self.assertIsNone(
+            find_merged_batch(os.path.join(self.tmp_dir, "merged_drugs_batches.csv"))
+        )
+        self.assertEqual(os.listdir(self.tmp_dir), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
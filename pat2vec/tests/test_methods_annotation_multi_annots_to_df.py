@@ -7,6 +7,12 @@ from datetime import datetime
 import numpy as np
 import ast
 
+from pat2vec.util.methods_annotation_json_to_dataframe import (
+    ENTITY_FIELDS,
+    annotation_columns,
+    annots_to_dataframe,
+    json_to_dataframe,
+)
 from pat2vec.util.methods_annotation_multi_annots_to_df import multi_annots_to_df
 
 
@@ -24,6 +30,8 @@ class TestMultiAnnotsToDf(unittest.TestCase):
         self.mock_config.verbosity = 0
         self.mock_config.add_icd10 = False
         self.mock_config.add_opc4s = False
+        self.mock_config.annotation_output_format = "csv"
+        self.mock_config.annotation_filter_at_write = False
         self.mock_t = MagicMock()
 
         # Sample data
@@ -36,10 +44,6 @@ class TestMultiAnnotsToDf(unittest.TestCase):
                 "client_idcode": [self.pat_id, self.pat_id],
             }
         )
-        self.multi_annots = [
-            {"entities": {"ent1": {"cui": "C0015967", "pretty_name": "Fever"}}},
-            {"entities": {"ent2": {"cui": "C0010200", "pretty_name": "Cough"}}},
-        ]
         self.df_from_json_1 = pd.DataFrame(
             {
                 "client_idcode": [self.pat_id],
@@ -98,15 +102,35 @@ class TestMultiAnnotsToDf(unittest.TestCase):
                 "document_guid": ["doc2"],
             }
         )
+        self.multi_annots = [
+            self._medcat_output(self.df_from_json_1),
+            self._medcat_output(self.df_from_json_2),
+        ]
+
+    @staticmethod
+    def _medcat_output(expected_df):
+        """Builds the MedCAT output that flattens to `expected_df`."""
+        row = expected_df.iloc[0]
+        entity = {field: row[field] for field in ENTITY_FIELDS}
+        entity["meta_anns"] = {
+            "Time": {"value": row["Time_Value"], "confidence": row["Time_Confidence"]},
+            "Presence": {
+                "value": row["Presence_Value"],
+                "confidence": row["Presence_Confidence"],
+            },
+            "Subject/Experiencer": {
+                "value": row["Subject_Value"],
+                "confidence": row["Subject_Confidence"],
+            },
+        }
+        return {"entities": {row["id"]: entity}, "tokens": []}
 
     def tearDown(self):
         shutil.rmtree(self.test_dir, ignore_errors=True)
 
-    @patch("pat2vec.util.methods_annotation_multi_annots_to_df.json_to_dataframe")
-    def test_basic_dataframe_creation(self, mock_json_to_df):
+    def test_basic_dataframe_creation(self):
         """Test that a CSV is created correctly from annotations."""
         # Arrange
-        mock_json_to_df.side_effect = [self.df_from_json_1, self.df_from_json_2]
         expected_df = pd.concat(
             [self.df_from_json_1, self.df_from_json_2], ignore_index=True
         )
@@ -118,6 +142,7 @@ class TestMultiAnnotsToDf(unittest.TestCase):
             self.multi_annots,
             config_obj=self.mock_config,
             t=self.mock_t,
+            include_text_sample=True,
         )
 
         # Assert
@@ -145,10 +170,8 @@ class TestMultiAnnotsToDf(unittest.TestCase):
         #    It correctly handles NaN values and provides detailed error messages.
         pd.testing.assert_frame_equal(result_df, expected_df)
 
-    @patch("pat2vec.util.methods_annotation_multi_annots_to_df.json_to_dataframe")
-    def test_empty_annotations(self, mock_json_to_df):
+    def test_empty_annotations(self):
         """Test handling of empty annotations."""
-        mock_json_to_df.return_value = pd.DataFrame(columns=self.df_from_json_1.columns)
         empty_annots = [{"entities": {}}, {"entities": {}}]
 
         multi_annots_to_df(
@@ -168,16 +191,34 @@ class TestMultiAnnotsToDf(unittest.TestCase):
         result_df = pd.read_csv(expected_dest_path)
         self.assertEqual(len(result_df), 0)
 
-    @patch("pat2vec.util.methods_annotation_multi_annots_to_df.json_to_dataframe")
-    def test_nan_filtering(self, mock_json_to_df):
+    def test_nan_filtering(self):
         """Test that rows with NaN in critical columns are filtered out."""
-        df_with_nan = self.df_from_json_1.copy()
-        df_with_nan.loc[0, "client_idcode"] = np.nan
-        mock_json_to_df.return_value = df_with_nan
+        # The annotation rows take their client_idcode from the patient id.
+        multi_annots_to_df(
+            np.nan,
+            self.pat_batch.head(1),
+            [self.multi_annots[0]],
+            config_obj=self.mock_config,
+            t=self.mock_t,
+        )
+
+        expected_dest_path = os.path.join(self.test_dir, "nan.csv")
+
+        # Assert that the file IS created.
+        self.assertTrue(os.path.exists(expected_dest_path))
+
+        # Check that the created file is empty (has 0 rows).
+        result_df = pd.read_csv(expected_dest_path)
+        self.assertEqual(len(result_df), 0)
+
+    def test_nat_updatetime_filtering(self):
+        """Test that documents without a timestamp are filtered out."""
+        pat_batch = self.pat_batch.head(1).copy()
+        pat_batch.loc[0, "updatetime"] = pd.NaT
 
         multi_annots_to_df(
             self.pat_id,
-            self.pat_batch.head(1),
+            pat_batch,
             [self.multi_annots[0]],
             config_obj=self.mock_config,
             t=self.mock_t,
@@ -195,13 +236,13 @@ class TestMultiAnnotsToDf(unittest.TestCase):
     @patch(
         "pat2vec.util.methods_annotation_multi_annots_to_df.join_icd10_codes_to_annot"
     )
-    @patch("pat2vec.util.methods_annotation_multi_annots_to_df.json_to_dataframe")
-    def test_icd10_join_logic(self, mock_json_to_df, mock_join_icd10):
+    def test_icd10_join_logic(self, mock_join_icd10):
         """Test that ICD10 codes are joined when add_icd10 is True."""
         # Arrange
         self.mock_config.add_icd10 = True
         self.mock_config.add_opc4s = False
-        mock_json_to_df.return_value = self.df_from_json_1
+        self.mock_config.annotation_output_format = "csv"
+        self.mock_config.annotation_filter_at_write = False
         mock_join_icd10.return_value = self.df_from_json_1.copy()
 
         # Act
@@ -219,13 +260,11 @@ class TestMultiAnnotsToDf(unittest.TestCase):
     @patch(
         "pat2vec.util.methods_annotation_multi_annots_to_df.join_icd10_OPC4S_codes_to_annot"
     )
-    @patch("pat2vec.util.methods_annotation_multi_annots_to_df.json_to_dataframe")
-    def test_icd10_opcs4_join_logic(self, mock_json_to_df, mock_join_opcs4):
+    def test_icd10_opcs4_join_logic(self, mock_join_opcs4):
         """Test that ICD10 and OPC4S codes are joined when both flags are True."""
         # Arrange
         self.mock_config.add_icd10 = True
         self.mock_config.add_opc4s = True
-        mock_json_to_df.return_value = self.df_from_json_1
         mock_join_opcs4.return_value = self.df_from_json_1.copy()
 
         # Act
@@ -240,14 +279,13 @@ class TestMultiAnnotsToDf(unittest.TestCase):
         # Assert
         mock_join_opcs4.assert_called_once()
 
-    @patch("pat2vec.util.methods_annotation_multi_annots_to_df.json_to_dataframe")
-    def test_error_in_one_document_does_not_stop_processing(self, mock_json_to_df):
+    def test_error_in_one_document_does_not_stop_processing(self):
         """Test that an error in one document doesn't halt processing of others."""
         # Arrange
-        # First call raises an error, second call returns a valid DataFrame
-        mock_json_to_df.side_effect = [
-            Exception("Simulated processing error"),
-            self.df_from_json_2,
+        # The first document's entity is missing its fields.
+        multi_annots = [
+            {"entities": {"ent1": {"cui": "C0015967"}}},
+            self.multi_annots[1],
         ]
         self.mock_config.verbosity = (
             1  # To cover the print statement in the except block
@@ -257,15 +295,51 @@ class TestMultiAnnotsToDf(unittest.TestCase):
         with self.assertLogs(
             "pat2vec.util.methods_annotation_multi_annots_to_df", level="WARNING"
         ) as cm:
-            multi_annots_to_df(
+            result_df = multi_annots_to_df(
                 self.pat_id,
                 self.pat_batch,
-                self.multi_annots,
+                multi_annots,
                 config_obj=self.mock_config,
                 t=self.mock_t,
             )
 
         # Assert
-        self.assertIn(
-            "Error processing document 0: Simulated processing error", cm.output[0]
+        self.assertIn("Error processing document 0: 'pretty_name'", cm.output[0])
+        self.assertEqual(result_df["document_guid"].tolist(), ["doc2"])
+
+    def test_columnar_flattening_matches_per_document(self):
+        """Test that batch flattening matches flattening each document."""
+        two_entities = {
+            "entities": {
+                **self.multi_annots[0]["entities"],
+                "ent3": {
+                    **self.multi_annots[0]["entities"]["ent1"],
+                    "id": "ent3",
+                    "start": 0,
+                    "end": 4,
+                },
+            }
+        }
+        multi_annots = [two_entities, self.multi_annots[1]]
+
+        batch_df = annots_to_dataframe(
+            multi_annots, self.pat_batch, self.pat_id, full_doc=True, window=5
+        )
+        per_doc_df = pd.concat(
+            [
+                json_to_dataframe(
+                    multi_annots[i],
+                    self.pat_batch.iloc[i],
+                    self.pat_id,
+                    full_doc=True,
+                    window=5,
+                )
+                for i in range(2)
+            ],
+            ignore_index=True,
         )
+
+        self.assertEqual(list(batch_df.columns), annotation_columns())
+        self.assertEqual(batch_df["id"].tolist(), ["ent1", "ent3", "ent2"])
+        self.assertEqual(batch_df["full_doc"].notna().tolist(), [True, False, True])
+        pd.testing.assert_frame_equal(batch_df, per_doc_df, check_dtype=False)
@@ -0,0 +1,140 @@
+import unittest
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+
+from pat2vec.pat2vec_get_methods.get_method_core02 import get_core_02
+from pat2vec.pat2vec_get_methods.get_method_core_resus import get_core_resus
+from pat2vec.pat2vec_get_methods.get_method_covid import COVID_SPEC
+from pat2vec.pat2vec_get_methods.get_method_smoking import get_smoking
+from pat2vec.pat2vec_get_methods.get_method_vte_status import VTE_SPEC
+from pat2vec.util.observation_features import (
+    ObservationFeatureSpec,
+    calculate_observation_features,
+)
+
+
+def observations(term, values, other_values=()):
+    """Returns observations of `term` with `values`, and of another term."""
+    return pd.DataFrame(
+        {
+            "client_idcode": "P1",
+            "obscatalogmasteritem_displayname": [term] * len(values)
+            + ["OTHER"] * len(other_values),
+            "observation_valuetext_analysed": list(values) + list(other_values),
+            "observationdocument_recordeddtm": "2020-01-15",
+            "clientvisit_visitidcode": None,
+        }
+    )
+
+
+class TestObservationFeatures(unittest.TestCase):
+    """Unit tests for the categorical observation feature kernel."""
+
+    def setUp(self):
+        self.config_obj = SimpleNamespace(
+            batch_mode=True,
+            negate_biochem=False,
+            verbosity=0,
+            lookback=False,
+            time_window_interval_delta=pd.DateOffset(months=1),
+        )
+
+    def test_presence(self):
+        result = get_core_02(
+            "P1",
+            (2020, 1, 1),
+            observations("CORE_SpO2", ["95%", "9-8", "95%", None], ["99%"]),
+            config_obj=self.config_obj,
+        )
+        self.assertEqual(result.columns.tolist(), ["client_idcode", "95pct", "9_8"])
+        self.assertEqual(result.iloc[0].tolist(), ["P1", 1, 1])
+
+    def test_count(self):
+        resus = "For cardiopulmonary resuscitation"
+        not_resus = "Not for cardiopulmonary resuscitation"
+        result = get_core_resus(
+            "P1",
+            (2020, 1, 1),
+            observations("CORE_RESUS_STATUS", [resus, resus, not_resus, None]),
+            config_obj=self.config_obj,
+        )
+        self.assertEqual(result[f"core_resus_status_{resus}"].iloc[0], 2)
+        self.assertEqual(result[f"core_resus_status_{not_resus}"].iloc[0], 1)
+
+        # An empty slice only has the client_idcode, even if negated.
+        self.config_obj.negate_biochem = True
+        result = get_core_resus(
+            "P1",
+            (2019, 1, 1),
+            observations("CORE_RESUS_STATUS", [resus]),
+            config_obj=self.config_obj,
+        )
+        self.assertEqual(result.columns.tolist(), ["client_idcode"])
+
+    def test_contains_flags_any_observation(self):
+        # The second observation's status is flagged, not only the first's.
+        result = get_smoking(
+            "P1",
+            (2020, 1, 1),
+            observations("CORE_SmokingStatus", ["Ex-smoker", "Current Smoker"]),
+            config_obj=self.config_obj,
+        )
+        self.assertEqual(result["smoking_status_current"].iloc[0], 1)
+        self.assertEqual(result["smoking_status_non"].iloc[0], 0)
+
+    def test_stats(self):
+        data = observations(
+            "CORE_VTE_STATUS",
+            [
+                "High risk of VTE High risk of bleeding",
+                "High risk of VTE Low risk of bleeding",
+                "High risk of VTE Low risk of bleeding",
+                "Unknown",
+            ],
+        )
+        features = calculate_observation_features(data, VTE_SPEC)
+        self.assertEqual(features["vte_status_mean"], 1 / 3)
+        self.assertEqual(features["vte_status_median"], 0)
+        self.assertEqual(features["vte_status_max"], 1)
+        self.assertEqual(features["vte_status_n"], 3)
+
+    def test_first_match(self):
+        def covid(values):
+            data = pd.DataFrame(
+                {
+                    "basicobs_itemname_analysed": COVID_SPEC.search_term,
+                    "basicobs_value_analysed": values,
+                }
+            )
+            return calculate_observation_features(data, COVID_SPEC)["covid_positive"]
+
+        self.assertEqual(covid(["NEGATIVE", "Positive"]), 1)
+        self.assertEqual(covid(["Negative"]), 0)
+        self.assertTrue(np.isnan(covid(["Inconclusive"])))
+
+    def test_missing_observations(self):
+        spec = ObservationFeatureSpec(
+            "CORE_X", "contains", prefix="x_", values={"a": "A"}
+        )
+        empty = observations("CORE_X", [], ["A"])
+        self.assertEqual(calculate_observation_features(empty, spec), {})
+        features = calculate_observation_features(empty, spec, negate_biochem=True)
+        self.assertEqual(list(features), ["x_a"])
+        self.assertTrue(np.isnan(features["x_a"]))
+
+        features = calculate_observation_features(empty, COVID_SPEC)
+        self.assertTrue(np.isnan(features["covid_positive"]))
+        features = calculate_observation_features(
+            empty, COVID_SPEC, negate_biochem=True
+        )
+        self.assertEqual(features["covid_positive"], 0)
+
+    def test_unknown_kind(self):
+        with self.assertRaises(ValueError):
+            ObservationFeatureSpec("CORE_X", "mode")
+
+
+if __name__ == "__main__":
+    unittest.main()
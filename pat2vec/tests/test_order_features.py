@@ -0,0 +1,131 @@
+import unittest
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+import pandas as pd
+
+from pat2vec.pat2vec_get_methods.get_method_diagnostics import (
+    get_current_pat_diagnostics,
+)
+from pat2vec.pat2vec_get_methods.get_method_drugs import (
+    calculate_drug_features,
+    get_current_pat_drugs,
+)
+from pat2vec.util.order_features import order_features, summarise_orders
+
+
+class TestOrderFeatures(unittest.TestCase):
+    """Unit tests for the vectorized drug and diagnostic order features."""
+
+    def setUp(self):
+        self.orders = pd.DataFrame(
+            {
+                "client_idcode": "P1",
+                "order_guid": ["O1", "O2", "O3", "O4"],
+                "order_name": ["Aspirin", "Heparin", "Aspirin", "Aspirin"],
+                "order_createdwhen": [
+                    "2020-01-10",
+                    "2020-01-05",
+                    "2020-01-01",
+                    "2020-01-21",
+                ],
+                "order_performeddtm": "2020-01-01",
+                "clientvisit_visitidcode": "V1",
+            }
+        )
+        self.config_obj = SimpleNamespace(
+            batch_mode=True,
+            drug_time_field="order_createdwhen",
+            diagnostic_time_field="order_createdwhen",
+            verbosity=0,
+            lookback=False,
+            time_window_interval_delta=pd.DateOffset(months=1),
+            feature_engineering_arg_dict={
+                "drugs": {
+                    "_num-drug-order": True,
+                    "_days-since-last-drug-order": False,
+                    "_days-between-first-last-drug": True,
+                }
+            },
+        )
+
+    def test_summarise_orders(self):
+        orders = self.orders.assign(
+            datetime=pd.to_datetime(self.orders["order_createdwhen"], utc=True)
+        )
+        summary = summarise_orders(orders, datetime(2020, 2, 1, tzinfo=timezone.utc))
+        self.assertEqual(summary.index.tolist(), ["Aspirin", "Heparin"])
+        self.assertEqual(summary["n"].tolist(), [3, 1])
+        self.assertEqual(summary["days_since_last"].tolist(), [11, 27])
+        self.assertEqual(summary["days_between_first_last"].tolist(), [20, 0])
+
+        features = order_features(summary, "_n", None, "_span")
+        self.assertEqual(features, {"Aspirin_n": 3, "Aspirin_span": 20, "Heparin_n": 1})
+
+    def test_get_current_pat_drugs(self):
+        result = get_current_pat_drugs(
+            "P1", (2020, 1, 1), self.orders, config_obj=self.config_obj
+        )
+        self.assertEqual(
+            result.columns.tolist(),
+            [
+                "client_idcode",
+                "Aspirin_num-drug-order",
+                "Aspirin_days-between-first-last-drug",
+                "Heparin_num-drug-order",
+            ],
+        )
+        self.assertEqual(result.iloc[0].tolist(), ["P1", 3, 20, 1])
+
+    def test_get_current_pat_diagnostics(self):
+        result = get_current_pat_diagnostics(
+            "P1", (2020, 1, 1), self.orders, config_obj=self.config_obj
+        )
+        self.assertEqual(len(result), 1)
+        self.assertEqual(result["Aspirin_num-diagnostic-order"].iloc[0], 3)
+        self.assertEqual(
+            result["Aspirin_days-between-first-last-diagnostic"].iloc[0], 20
+        )
+        self.assertIn("Heparin_days-since-last-diagnostic-order", result.columns)
+        self.assertNotIn("Heparin_days-between-first-last-diagnostic", result.columns)
+
+    def test_orders_without_a_name_are_ignored(self):
+        orders = self.orders.assign(order_name=["Aspirin", None, "Aspirin", None])
+        result = get_current_pat_drugs(
+            "P1", (2020, 1, 1), orders, config_obj=self.config_obj
+        )
+        self.assertEqual(
+            result.columns.tolist(),
+            [
+                "client_idcode",
+                "Aspirin_num-drug-order",
+                "Aspirin_days-between-first-last-drug",
+            ],
+        )
+
+    def test_calculate_drug_features_takes_orders_by_name(self):
+        orders = self.orders.assign(
+            datetime=pd.to_datetime(self.orders["order_createdwhen"], utc=True)
+        )
+        order_name_list = ["Heparin", "Aspirin"]
+        order_name_df_dict = {
+            name: orders[orders["order_name"] == name] for name in order_name_list
+        }
+        features = calculate_drug_features(
+            order_name_df_dict,
+            order_name_list,
+            self.config_obj.feature_engineering_arg_dict["drugs"],
+            batch_mode=True,
+        )
+        self.assertEqual(
+            features,
+            {
+                "Heparin_num-drug-order": 1,
+                "Aspirin_num-drug-order": 3,
+                "Aspirin_days-between-first-last-drug": 20,
+            },
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,174 @@
+import os
+import shutil
+import tempfile
+import unittest
+from types import SimpleNamespace
+
+import pandas as pd
+import pyarrow.parquet as pq
+
+from pat2vec.util.partitioned_store import (
+    STORE_DIRNAME,
+    compact_partitioned_store,
+    list_store_patients,
+    merge_staged_store,
+    patient_batch_exists,
+    patient_buckets,
+    read_patient_batch,
+    read_patient_from_store,
+    write_partitioned_store,
+)
+
+
+class TestPartitionedStore(unittest.TestCase):
+    """Unit tests for the patient-bucketed Parquet store."""
+
+    def setUp(self):
+        self.batch_dir = tempfile.mkdtemp()
+        self.store_path = os.path.join(self.batch_dir, STORE_DIRNAME)
+        self.config_obj = SimpleNamespace(remote_dump=False)
+        self.df = pd.DataFrame(
+            {
+                "client_idcode": ["P2", "P1", "P2", "P3", "P1"],
+                "basicobs_value_numeric": [2.0, 1.0, 3.0, 4.0, 0.5],
+                "basicobs_entered": pd.to_datetime(
+                    [
+                        "2020-01-02",
+                        "2020-01-03",
+                        "2020-01-01",
+                        "2020-01-01",
+                        "2020-01-01",
+                    ]
+                ),
+            }
+        )
+
+    def tearDown(self):
+        shutil.rmtree(self.batch_dir, ignore_errors=True)
+
+    def _write(self, df=None, **kwargs):
+        return write_partitioned_store(
+            self.df if df is None else df,
+            "client_idcode",
+            self.store_path,
+            time_column="basicobs_entered",
+            **kwargs,
+        )
+
+    def test_buckets_are_stable(self):
+        first = patient_buckets(["P1", "P2", "P3"], 16)
+        second = patient_buckets(["P1", "P2", "P3"], 16)
+        self.assertEqual(list(first), list(second))
+        self.assertTrue(((first >= 0) & (first < 16)).all())
+
+    def test_reads_one_patient_sorted_by_time_with_dtypes(self):
+        self._write(n_buckets=4)
+        df = read_patient_from_store(self.store_path, "P1")
+        self.assertEqual(list(df["basicobs_value_numeric"]), [0.5, 1.0])
+        self.assertTrue(pd.api.types.is_datetime64_any_dtype(df["basicobs_entered"]))
+
+    def test_missing_patient_returns_none(self):
+        self._write()
+        self.assertIsNone(read_patient_from_store(self.store_path, "P9"))
+        self.assertIsNone(read_patient_from_store(self.batch_dir, "P1"))
+
+    def test_row_groups_carry_statistics(self):
+        self._write(n_buckets=1, row_group_size=2)
+        bucket_dir = os.path.join(self.store_path, "bucket=0000")
+        part = pq.ParquetFile(os.path.join(bucket_dir, os.listdir(bucket_dir)[0]))
+        self.assertGreater(part.metadata.num_row_groups, 1)
+        stats = part.metadata.row_group(0).column(0).statistics
+        self.assertTrue(stats.has_min_max)
+
+    def test_stored_patients_are_not_written_again(self):
+        self._write()
+        extra = pd.DataFrame(
+            {
+                "client_idcode": ["P1", "P4"],
+                "basicobs_value_numeric": [9.0, 9.0],
+                "basicobs_entered": pd.to_datetime(["2021-01-01", "2021-01-01"]),
+            }
+        )
+        self.assertEqual(self._write(extra), 1)
+        self.assertEqual(len(read_patient_from_store(self.store_path, "P1")), 2)
+        self.assertEqual(list_store_patients(self.store_path), ["P1", "P2", "P3", "P4"])
+
+    def test_appended_records_replace_stored_versions(self):
+        df = self.df.assign(basicobs_guid=["g1", "g2", "g3", "g4", "g5"])
+        self._write(df, n_buckets=1)
+        updated = pd.DataFrame(
+            {
+                "client_idcode": ["P1", "P1", "P1"],
+                "basicobs_value_numeric": [7.0, 8.0, 9.0],
+                "basicobs_entered": pd.to_datetime(
+                    ["2021-01-02", "2021-01-03", "2021-01-01"]
+                ),
+                "basicobs_guid": ["g2", "g2", "g6"],
+            }
+        )
+        n_written = self._write(
+            updated, skip_stored_patients=False, dedup_column="basicobs_guid"
+        )
+        self.assertEqual(n_written, 2)
+        p1 = read_patient_from_store(self.store_path, "P1")
+        self.assertEqual(p1["basicobs_guid"].tolist(), ["g5", "g6", "g2"])
+        self.assertEqual(p1["basicobs_value_numeric"].tolist(), [0.5, 9.0, 8.0])
+        self.assertEqual(len(read_patient_from_store(self.store_path, "P2")), 2)
+
+    def _n_parts(self, store_path):
+        return sum(
+            name.endswith(".parquet")
+            for _, _, files in os.walk(store_path)
+            for name in files
+        )
+
+    def test_staged_chunks_merge_into_one_part_per_bucket(self):
+        staging_path = os.path.join(self.batch_dir, "staging")
+        for _, chunk in self.df.groupby("client_idcode"):
+            write_partitioned_store(
+                chunk,
+                "client_idcode",
+                staging_path,
+                time_column="basicobs_entered",
+                n_buckets=1,
+            )
+        self.assertEqual(self._n_parts(staging_path), 3)
+
+        self.assertEqual(merge_staged_store(staging_path, self.store_path), 5)
+        self.assertFalse(os.path.exists(staging_path))
+        self.assertEqual(self._n_parts(self.store_path), 1)
+        self.assertEqual(list_store_patients(self.store_path), ["P1", "P2", "P3"])
+
+    def test_compaction_keeps_rows_in_time_order(self):
+        self._write(n_buckets=1)
+        extra = self.df.iloc[:2].assign(
+            basicobs_entered=pd.to_datetime(["2019-01-01", "2021-01-01"])
+        )
+        self._write(extra, skip_stored_patients=False)
+        self.assertEqual(self._n_parts(self.store_path), 2)
+
+        self.assertEqual(compact_partitioned_store(self.store_path), 1)
+        self.assertEqual(self._n_parts(self.store_path), 1)
+        p2 = read_patient_from_store(self.store_path, "P2")
+        self.assertEqual(p2["basicobs_value_numeric"].tolist(), [2.0, 3.0, 2.0])
+        self.assertEqual(len(read_patient_from_store(self.store_path, "P1")), 3)
+
+    def test_patient_batch_helpers_fall_back_to_store(self):
+        self._write()
+        target_path = os.path.join(self.batch_dir, "P2.csv")
+        self.assertTrue(patient_batch_exists(target_path, self.config_obj))
+        self.assertFalse(
+            patient_batch_exists(
+                os.path.join(self.batch_dir, "P9.csv"), self.config_obj
+            )
+        )
+        self.assertEqual(len(read_patient_batch(target_path, self.config_obj)), 2)
+
+        pd.DataFrame({"client_idcode": ["P2"], "value": [1]}).to_csv(
+            target_path, index=False
+        )
+        self.assertEqual(len(read_patient_batch(target_path, self.config_obj)), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -105,7 +105,8 @@ class TestGetPatIpwRecord(unittest.TestCase):
                 return empty_textual_df
             return pd.DataFrame()
 
-        mock_exists.return_value = True
+        # Legacy CSV annotation outputs.
+        mock_exists.side_effect = lambda path: path.endswith(".csv")
         mock_read_csv.side_effect = side_effect
         mock_filter_annot.side_effect = lambda df, _: df if not df.empty else df
         # Fix: Make filter_and_select_rows return the dataframe as-is instead of filtering
@@ -145,7 +146,8 @@ class TestGetPatIpwRecord(unittest.TestCase):
                 return empty_textual_df
             return pd.DataFrame()
 
-        mock_exists.return_value = True
+        # Legacy CSV annotation outputs.
+        mock_exists.side_effect = lambda path: path.endswith(".csv")
         mock_read_csv.side_effect = side_effect
         mock_filter_annot.side_effect = lambda df, _: df if not df.empty else df
         mock_filter_select.side_effect = lambda df, *args, **kwargs: (
@@ -188,7 +190,8 @@ class TestGetPatIpwRecord(unittest.TestCase):
                 return textual_obs_df
             return pd.DataFrame()
 
-        mock_exists.return_value = True
+        # Legacy CSV annotation outputs.
+        mock_exists.side_effect = lambda path: path.endswith(".csv")
         mock_read_csv.side_effect = side_effect
         mock_filter_annot.side_effect = lambda df, _: df if not df.empty else df
         mock_filter_select.side_effect = lambda df, *args, **kwargs: (
@@ -227,7 +230,8 @@ class TestGetPatIpwRecord(unittest.TestCase):
                 return self.textual_obs_df_with_updatetime
             return pd.DataFrame()
 
-        mock_exists.return_value = True
+        # Legacy CSV annotation outputs.
+        mock_exists.side_effect = lambda path: path.endswith(".csv")
         mock_read_csv.side_effect = side_effect
         mock_filter_annot.side_effect = lambda df, _: df if not df.empty else df
         mock_filter_select.side_effect = lambda df, *args, **kwargs: (
@@ -315,7 +319,8 @@ class TestGetPatIpwRecord(unittest.TestCase):
                 return empty_textual_df
             return pd.DataFrame()
 
-        mock_exists.return_value = True
+        # Legacy CSV annotation outputs.
+        mock_exists.side_effect = lambda path: path.endswith(".csv")
         mock_read_csv.side_effect = side_effect
         mock_filter_annot.side_effect = lambda df, _: df if not df.empty else df
         mock_filter_select.side_effect = lambda df, *args, **kwargs: (
@@ -353,7 +358,8 @@ class TestGetPatIpwRecord(unittest.TestCase):
                 return self.textual_obs_df
             return pd.DataFrame()
 
-        mock_exists.return_value = True
+        # Legacy CSV annotation outputs.
+        mock_exists.side_effect = lambda path: path.endswith(".csv")
         mock_read_csv.side_effect = side_effect
         mock_filter_annot.side_effect = lambda df, _: df if not df.empty else df
         mock_filter_select.side_effect = lambda df, *args, **kwargs: (
@@ -396,7 +402,8 @@ class TestGetPatIpwRecord(unittest.TestCase):
                 return empty_textual_df
             return pd.DataFrame()
 
-        mock_exists.return_value = True
+        # Legacy CSV annotation outputs.
+        mock_exists.side_effect = lambda path: path.endswith(".csv")
         mock_read_csv.side_effect = side_effect
         mock_filter_annot.side_effect = lambda df, _: df if not df.empty else df
         mock_filter_select.side_effect = lambda df, *args, **kwargs: (
@@ -437,7 +444,8 @@ class TestGetPatIpwRecord(unittest.TestCase):
                 return empty_textual_df
             return pd.DataFrame()
 
-        mock_exists.return_value = True
+        # Legacy CSV annotation outputs.
+        mock_exists.side_effect = lambda path: path.endswith(".csv")
         mock_read_csv.side_effect = side_effect
         # Fix: Make sure filter_annot_dataframe2 returns a DataFrame with same structure
         mock_filter_annot.side_effect = lambda df, _: df.copy() if not df.empty else df
@@ -0,0 +1,441 @@
+import os
+import threading
+import time
+import unittest
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import pandas as pd
+
+import pat2vec.patvec_get_batch_methods.get_prefetch_batches as gpb
+
+
+class TestPrefetchBatches(unittest.TestCase):
+    """Unit tests for concurrent prefetch_batches."""
+
+    def setUp(self):
+        self.config_obj = SimpleNamespace(
+            main_options={
+                "bloods": True,
+                "drugs": True,
+                "diagnostics": False,
+                "annotations": False,
+                "annotations_mrc": False,
+                "textual_obs": False,
+                "smoking_status": False,
+                "core_02": True,
+                "bed": True,
+                "vte_status": False,
+                "hosp_site": False,
+                "core_resus": False,
+                "news": False,
+                "annotations_reports": False,
+                "appointments": False,
+                "demo": False,
+            },
+            storage_backend="database",
+            db_engine=None,
+            prefetch_n_workers=4,
+            bloods_time_field="basicobs_entered",
+            drug_time_field="order_createdwhen",
+            diagnostic_time_field="order_createdwhen",
+            appointments_time_field="AppointmentDateTime",
+        )
+        self.pat2vec_obj = SimpleNamespace(
+            config_obj=self.config_obj,
+            all_patient_list=["P1", "P2"],
+            cohort_searcher_with_terms_and_search=None,
+        )
+        self.calls = []
+        self.lock = threading.Lock()
+
+    def _fake_get(self, delay=0.0, fail=False):
+        def get(
+            client_idcode_list,
+            config_obj,
+            cohort_searcher_with_terms_and_search,
+            search_term=None,
+            chunk_callback=None,
+            collect=True,
+        ):
+            with self.lock:
+                self.calls.append(("start", search_term))
+            time.sleep(delay)
+            with self.lock:
+                self.calls.append(("end", search_term))
+            if fail:
+                raise ValueError("index unavailable")
+            df = pd.DataFrame(
+                {"client_idcode": client_idcode_list, "search_term": search_term}
+            )
+            chunk_callback(df)
+            return df if collect else pd.DataFrame()
+
+        return get
+
+    def _run(self, bloods, drugs, obs):
+        with (
+            patch.object(gpb, "get_merged_pat_batch_bloods", bloods),
+            patch.object(gpb, "get_merged_pat_batch_drugs", drugs),
+            patch.object(gpb, "get_merged_pat_batch_obs", obs),
+            patch("builtins.print"),
+        ):
+            return gpb.prefetch_batches(self.pat2vec_obj)
+
+    def test_batch_types_run_concurrently(self):
+        start = time.perf_counter()
+        configs = self._run(
+            self._fake_get(delay=0.3), self._fake_get(delay=0.3), self._fake_get()
+        )
+        self.assertLess(time.perf_counter() - start, 0.55)
+        self.assertEqual(len(configs), 4)
+        for config in configs:
+            self.assertIsNone(config.error)
+            self.assertEqual(config.n_rows, 2)
+            self.assertIsNotNone(config.seconds)
+
+    def test_errors_are_isolated_per_batch_type(self):
+        configs = self._run(
+            self._fake_get(fail=True), self._fake_get(), self._fake_get()
+        )
+        errors = {config.name: config.error for config in configs}
+        self.assertEqual(errors["bloods"], "index unavailable")
+        self.assertIsNone(errors["drugs"])
+        self.assertIsNone(errors["CORE_SpO2"])
+
+    def test_core_observations_run_in_their_own_lanes(self):
+        start = time.perf_counter()
+        self._run(self._fake_get(), self._fake_get(), self._fake_get(delay=0.3))
+        self.assertLess(time.perf_counter() - start, 0.55)
+
+    def test_core_observations_are_stored_per_search_term(self):
+        import shutil
+        import tempfile
+
+        from pat2vec.patvec_get_batch_methods.main_get_pat_batch_obs import (
+            get_obs_batch_path,
+        )
+        from pat2vec.util.partitioned_store import read_patient_batch
+
+        batch_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, batch_dir, ignore_errors=True)
+        self.config_obj.storage_backend = "file"
+        self.config_obj.remote_dump = False
+        self.config_obj.pre_merged_input_batches_path = None
+        for attr in [
+            "pre_bloods_batch_path",
+            "pre_drugs_batch_path",
+            "pre_misc_batch_path",
+        ]:
+            setattr(self.config_obj, attr, os.path.join(batch_dir, attr))
+
+        self._run(self._fake_get(), self._fake_get(), self._fake_get())
+
+        # Both CORE_* types hold rows for P1, each in its own store.
+        for search_term in ["CORE_SpO2", "CORE_BedNumber3"]:
+            target_path = os.path.join(
+                get_obs_batch_path(self.config_obj, search_term), "P1.csv"
+            )
+            df = read_patient_batch(target_path, self.config_obj)
+            self.assertEqual(df["search_term"].tolist(), [search_term])
+
+    def test_file_backend_writes_partitioned_store(self):
+        import shutil
+        import tempfile
+
+        from pat2vec.util.partitioned_store import read_patient_from_store
+
+        batch_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, batch_dir, ignore_errors=True)
+        self.config_obj.storage_backend = "file"
+        for attr in [
+            "pre_bloods_batch_path",
+            "pre_drugs_batch_path",
+            "pre_misc_batch_path",
+        ]:
+            setattr(self.config_obj, attr, os.path.join(batch_dir, attr))
+
+        self._run(self._fake_get(), self._fake_get(), self._fake_get())
+
+        store_path = os.path.join(batch_dir, "pre_bloods_batch_path", "_store")
+        self.assertEqual(len(read_patient_from_store(store_path, "P1")), 1)
+
+    def test_failed_file_backend_fetch_leaves_no_partial_store(self):
+        import shutil
+        import tempfile
+
+        batch_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, batch_dir, ignore_errors=True)
+        self.config_obj.storage_backend = "file"
+        for attr in [
+            "pre_bloods_batch_path",
+            "pre_drugs_batch_path",
+            "pre_misc_batch_path",
+        ]:
+            setattr(self.config_obj, attr, os.path.join(batch_dir, attr))
+
+        def get(client_idcode_list, config_obj, *args, chunk_callback, **kwargs):
+            chunk_callback(pd.DataFrame({"client_idcode": client_idcode_list[:1]}))
+            raise ValueError("index unavailable")
+
+        self._run(get, self._fake_get(), self._fake_get())
+
+        # Only the staging directory was written to, and it is removed.
+        self.assertEqual(
+            os.listdir(os.path.join(batch_dir, "pre_bloods_batch_path")), []
+        )
+
+    def test_incremental_prefetch_fetches_delta_and_new_patients(self):
+        import shutil
+        import tempfile
+
+        from pat2vec.util.partitioned_store import read_patient_from_store
+        from pat2vec.util.prefetch_state import load_prefetch_state
+
+        batch_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, batch_dir, ignore_errors=True)
+        self.config_obj.main_options = {
+            option: option == "bloods" for option in self.config_obj.main_options
+        }
+        self.config_obj.storage_backend = "file"
+        self.config_obj.prefetch_incremental = True
+        self.config_obj.pre_bloods_batch_path = os.path.join(batch_dir, "bloods")
+        self.config_obj.pre_merged_input_batches_path = batch_dir
+        self.config_obj.global_start_year = "1995"
+        self.config_obj.global_start_month = "01"
+        self.config_obj.global_start_day = "01"
+        self.config_obj.overwrite_stored_pat_observations = False
+        self.config_obj.overwrite_stored_pat_docs = False
+
+        rows = pd.DataFrame(
+            {
+                "client_idcode": ["P1", "P2", "P1", "P3"],
+                "basicobs_entered": [
+                    "2020-01-01T10:00:00",
+                    "2020-03-01T10:00:00",
+                    "2020-03-01T12:00:00",
+                    "2019-05-01T00:00:00",
+                ],
+            }
+        )
+        requests = []
+
+        def get(client_idcode_list, config_obj, search_term=None, **kwargs):
+            start = (
+                f"{config_obj.global_start_year}-{config_obj.global_start_month}-"
+                f"{config_obj.global_start_day}"
+            )
+            requests.append((list(client_idcode_list), start))
+            df = rows[rows["client_idcode"].isin(client_idcode_list)]
+            return df[df["basicobs_entered"] >= start]
+
+        store_path = os.path.join(batch_dir, "bloods", "_store")
+        first_rows = rows.iloc[:2]
+        with (
+            patch.object(gpb, "get_merged_pat_batch_bloods", lambda **kw: first_rows),
+            patch("builtins.print"),
+        ):
+            gpb.prefetch_batches(self.pat2vec_obj)
+        state = load_prefetch_state(store_path, "bloods")
+        self.assertEqual(state.patients, ["P1", "P2"])
+        self.assertEqual(state.watermark, "2020-03-01T10:00:00+00:00")
+
+        self.pat2vec_obj.all_patient_list = ["P1", "P2", "P3"]
+        with (
+            patch.object(gpb, "get_merged_pat_batch_bloods", get),
+            patch("builtins.print"),
+        ):
+            configs = gpb.prefetch_batches(self.pat2vec_obj)
+
+        self.assertEqual(
+            requests, [(["P1", "P2"], "2020-03-01"), (["P3"], "1995-01-01")]
+        )
+        self.assertEqual(configs[0].n_rows, 2)
+        self.assertEqual(
+            read_patient_from_store(store_path, "P1")["basicobs_entered"].tolist(),
+            ["2020-01-01T10:00:00", "2020-03-01T12:00:00"],
+        )
+        self.assertEqual(len(read_patient_from_store(store_path, "P2")), 1)
+        self.assertEqual(len(read_patient_from_store(store_path, "P3")), 1)
+        state = load_prefetch_state(store_path, "bloods")
+        self.assertEqual(state.patients, ["P1", "P2", "P3"])
+        self.assertEqual(state.watermark, "2020-03-01T12:00:00+00:00")
+
+    def test_first_incremental_prefetch_replaces_a_full_prefetch(self):
+        import shutil
+        import tempfile
+
+        from pat2vec.util.partitioned_store import read_patient_from_store
+
+        batch_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, batch_dir, ignore_errors=True)
+        self.config_obj.main_options = {
+            option: option == "bloods" for option in self.config_obj.main_options
+        }
+        self.config_obj.storage_backend = "file"
+        self.config_obj.pre_bloods_batch_path = os.path.join(batch_dir, "bloods")
+        self.config_obj.pre_merged_input_batches_path = batch_dir
+        self.config_obj.overwrite_stored_pat_observations = False
+        self.config_obj.overwrite_stored_pat_docs = False
+        self.pat2vec_obj.all_patient_list = ["P1"]
+        rows = pd.DataFrame(
+            {
+                "client_idcode": "P1",
+                "basicobs_entered": ["2020-01-01T10:00:00", "2020-02-01T10:00:00"],
+            }
+        )
+
+        def get(chunk_callback=None, collect=True, **kwargs):
+            if chunk_callback is not None:
+                chunk_callback(rows)
+            return rows
+
+        store_path = os.path.join(batch_dir, "bloods", "_store")
+        for incremental in [False, True]:
+            self.config_obj.prefetch_incremental = incremental
+            with (
+                patch.object(gpb, "get_merged_pat_batch_bloods", get),
+                patch("builtins.print"),
+            ):
+                gpb.prefetch_batches(self.pat2vec_obj)
+            # Bloods have no GUID column, so only replacing the patient's
+            # stored rows keeps them from being stored twice.
+            self.assertEqual(len(read_patient_from_store(store_path, "P1")), 2)
+
+    def test_incremental_prefetch_replaces_updated_observations(self):
+        import shutil
+        import tempfile
+
+        from pat2vec.patvec_get_batch_methods.main_get_pat_batch_obs import (
+            get_obs_batch_path,
+        )
+        from pat2vec.util.partitioned_store import (
+            patient_batch_exists,
+            read_patient_batch,
+        )
+
+        batch_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, batch_dir, ignore_errors=True)
+        self.config_obj.main_options = {
+            option: option == "core_02" for option in self.config_obj.main_options
+        }
+        self.config_obj.storage_backend = "file"
+        self.config_obj.prefetch_incremental = True
+        self.config_obj.remote_dump = False
+        self.config_obj.pre_misc_batch_path = os.path.join(batch_dir, "misc")
+        self.config_obj.pre_merged_input_batches_path = batch_dir
+        self.config_obj.global_start_year = "1995"
+        self.config_obj.global_start_month = "01"
+        self.config_obj.global_start_day = "01"
+        self.config_obj.overwrite_stored_pat_observations = False
+        self.config_obj.overwrite_stored_pat_docs = False
+        self.pat2vec_obj.all_patient_list = ["P1"]
+
+        def rows(guids, times):
+            return pd.DataFrame(
+                {
+                    "client_idcode": "P1",
+                    "observation_guid": guids,
+                    "observationdocument_recordeddtm": times,
+                }
+            )
+
+        first_rows = rows(["o1", "o2"], ["2020-01-01", "2020-02-01"])
+        # An updated version of o2, recorded after the watermark.
+        second_rows = rows(["o2"], ["2020-03-01"])
+        for fetched in [first_rows, second_rows]:
+            with (
+                patch.object(gpb, "get_merged_pat_batch_obs", lambda **kw: fetched),
+                patch("builtins.print"),
+            ):
+                gpb.prefetch_batches(self.pat2vec_obj)
+
+        merged_path = os.path.join(batch_dir, "merged_CORE_SpO2_batches.csv")
+        self.assertFalse(os.path.exists(merged_path))
+        target_path = os.path.join(
+            get_obs_batch_path(self.config_obj, "CORE_SpO2"), "P1.csv"
+        )
+        self.assertTrue(
+            patient_batch_exists(target_path, self.config_obj, merged_batch="CORE_SpO2")
+        )
+        df = read_patient_batch(target_path, self.config_obj, merged_batch="CORE_SpO2")
+        self.assertEqual(df["observation_guid"].tolist(), ["o1", "o2"])
+        self.assertEqual(
+            df["observationdocument_recordeddtm"].tolist(),
+            ["2020-01-01", "2020-03-01"],
+        )
+
+    def test_incremental_prefetch_refetches_edited_documents(self):
+        import shutil
+        import tempfile
+
+        from pat2vec.util.partitioned_store import read_patient_from_store
+        from pat2vec.util.prefetch_state import load_prefetch_state
+
+        batch_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, batch_dir, ignore_errors=True)
+        self.config_obj.main_options = {
+            option: option == "textual_obs" for option in self.config_obj.main_options
+        }
+        self.config_obj.storage_backend = "file"
+        self.config_obj.prefetch_incremental = True
+        self.config_obj.pre_textual_obs_document_batch_path = os.path.join(
+            batch_dir, "textual_obs"
+        )
+        self.config_obj.pre_merged_input_batches_path = batch_dir
+        self.config_obj.global_start_year = "1995"
+        self.config_obj.global_start_month = "01"
+        self.config_obj.global_start_day = "01"
+        self.config_obj.overwrite_stored_pat_observations = False
+        self.config_obj.overwrite_stored_pat_docs = False
+        self.pat2vec_obj.all_patient_list = ["P1"]
+
+        def rows(guids, entered, updated):
+            return pd.DataFrame(
+                {
+                    "client_idcode": "P1",
+                    "basicobs_guid": guids,
+                    "basicobs_entered": entered,
+                    "updatetime": updated,
+                    "textualObs": "text",
+                }
+            )
+
+        first_rows = rows(["b1", "b2"], ["2020-01-01", "2020-02-01"], "2020-02-01")
+        # b1 was entered before the watermark but edited after it.
+        second_rows = rows(["b1"], ["2020-01-01"], "2020-04-01")
+        configs = []
+        for fetched in [first_rows, second_rows]:
+
+            def get(config_obj, fetched=fetched, **kwargs):
+                configs.append(config_obj)
+                return fetched
+
+            with (
+                patch.object(gpb, "get_merged_pat_batch_textual_obs_docs", get),
+                patch("builtins.print"),
+            ):
+                gpb.prefetch_batches(self.pat2vec_obj)
+
+        # The delta keeps the global window and searches by update time.
+        self.assertEqual(configs[1].global_start_year, "1995")
+        self.assertEqual(configs[1].delta_fetch_field, "updatetime")
+        self.assertEqual(configs[1].delta_fetch_start, "2020-02-01")
+        store_path = os.path.join(batch_dir, "textual_obs", "_store")
+        self.assertEqual(
+            load_prefetch_state(store_path, "textual_obs").time_column, "updatetime"
+        )
+        df = read_patient_from_store(store_path, "P1")
+        self.assertEqual(df["basicobs_guid"].tolist(), ["b1", "b2"])
+        self.assertEqual(df["updatetime"].tolist(), ["2020-04-01", "2020-02-01"])
+
+    def test_in_memory_sqlite_runs_sequentially(self):
+        from sqlalchemy import create_engine
+
+        self.config_obj.db_engine = create_engine("sqlite:///:memory:")
+        with patch("builtins.print"):
+            self.assertEqual(gpb._get_prefetch_n_workers(self.config_obj), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,110 @@
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import pandas as pd
+
+import pat2vec.pat2vec_search.search_multiprocess as smp
+from pat2vec.pat2vec_search.adaptive_chunking import reset_chunk_sizers
+
+
+def _fake_search(index_name, fields_list, term_name, entered_list, search_string):
+    """Returns two typed hits per entered id."""
+    rows = []
+    for client_id in entered_list:
+        for n in range(2):
+            rows.append(
+                {
+                    "_index": index_name,
+                    "_id": f"{client_id}_{n}",
+                    "_score": 1.0,
+                    "client_idcode": client_id,
+                    "basicobs_value_numeric": float(n),
+                    "basicobs_entered": pd.Timestamp("2020-01-01")
+                    + pd.Timedelta(days=n),
+                }
+            )
+    return pd.DataFrame(rows, columns=["_index", "_id", "_score", *fields_list])
+
+
+class TestCohortSearcherWithTermsAndSearchMulti(unittest.TestCase):
+    def setUp(self):
+        reset_chunk_sizers()
+        self.fields_list = [
+            "client_idcode",
+            "basicobs_value_numeric",
+            "basicobs_entered",
+        ]
+        self.entered_list = [f"P{i:04d}" for i in range(250)]
+
+    def _run(self, **kwargs):
+        return smp.cohort_searcher_with_terms_and_search_multi(
+            index_name="basic_observations",
+            fields_list=self.fields_list,
+            term_name="client_idcode.keyword",
+            entered_list=self.entered_list,
+            search_string="*",
+            n_workers=3,
+            **kwargs,
+        )
+
+    @patch.object(
+        smp, "cohort_searcher_with_terms_and_search", side_effect=_fake_search
+    )
+    def test_merges_all_parts_with_schema(self, _mock_search):
+        df = self._run()
+        self.assertEqual(len(df), 2 * len(self.entered_list))
+        self.assertEqual(
+            list(df.columns), ["_index", "_id", "_score", *self.fields_list]
+        )
+        self.assertTrue(pd.api.types.is_datetime64_any_dtype(df["basicobs_entered"]))
+        self.assertTrue(pd.api.types.is_float_dtype(df["basicobs_value_numeric"]))
+        self.assertEqual(
+            sum(t["n_terms"] for t in df.attrs["chunk_timings"]), len(self.entered_list)
+        )
+
+    @patch.object(smp.time, "sleep")
+    def test_failed_chunk_is_retried(self, _mock_sleep):
+        calls = {"n": 0}
+
+        def flaky_search(*args, **kwargs):
+            calls["n"] += 1
+            if calls["n"] == 1:
+                raise ConnectionError("transient")
+            return _fake_search(*args, **kwargs)
+
+        with patch.object(
+            smp, "cohort_searcher_with_terms_and_search", side_effect=flaky_search
+        ):
+            df = self._run()
+        self.assertEqual(len(df), 2 * len(self.entered_list))
+        self.assertEqual(max(t["attempts"] for t in df.attrs["chunk_timings"]), 2)
+
+    @patch.object(smp.time, "sleep")
+    @patch.object(
+        smp,
+        "cohort_searcher_with_terms_and_search",
+        side_effect=ConnectionError("down"),
+    )
+    def test_persistent_failure_raises(self, _mock_search, _mock_sleep):
+        with self.assertRaises(RuntimeError):
+            self._run(max_retries=2)
+
+    @patch.object(
+        smp, "cohort_searcher_with_terms_and_search", side_effect=_fake_search
+    )
+    def test_parts_are_kept_in_parts_dir(self, _mock_search):
+        with tempfile.TemporaryDirectory() as parts_dir:
+            self._run(parts_dir=parts_dir, keep_parts=True)
+            part_files = [f for f in os.listdir(parts_dir) if f.endswith(".parquet")]
+            self.assertGreater(len(part_files), 1)
+
+    def test_plan_search_chunks_covers_list_in_order(self):
+        chunks = smp.plan_search_chunks(self.entered_list, n_workers=4)
+        self.assertEqual([x for chunk in chunks for x in chunk], self.entered_list)
+        self.assertTrue(all(len(chunk) <= smp.MAX_TERMS_CHUNK_SIZE for chunk in chunks))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,279 @@
+"""
+A cache of MedCAT annotations keyed by document content.
+
+EPR and MCT corpora hold many byte-identical documents (templated letters,
+copies forwarded across encounters, re-indexed notes). Annotations depend
+only on the model and the text, so each text is annotated once: the cache
+maps a hash of (model pack id, CUI filter, document text) to the entity
+dictionary MedCAT returned for it.
+
+The cache is a SQLite database at `config_obj.annotation_cache_path`, shared
+by all processes of a run. Entries are evicted least recently used first once
+the cache exceeds `config_obj.annotation_cache_max_mb`.
+"""
+
+import hashlib
+import logging
+import os
+import pickle
+import sqlite3
+import threading
+import time
+import weakref
+import zlib
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+#: Default maximum size of the annotation cache, in megabytes.
+DEFAULT_ANNOTATION_CACHE_MAX_MB = 2048
+
+# SQLite limits the number of bound parameters per statement.
+_SQL_CHUNK_SIZE = 900
+
+_MODEL_IDS: "weakref.WeakKeyDictionary[Any, str]" = weakref.WeakKeyDictionary()
+
+# Opened caches by (path, max_mb, process id), so that the schema and PRAGMA
+# setup runs once per process rather than once per annotated batch.
+_CACHES: Dict[Tuple[str, float, int], "AnnotationCache"] = {}
+_CACHES_LOCK = threading.Lock()
+
+
+def _model_id(cat: Any) -> str:
+    """Returns an identifier of the model pack loaded in `cat`."""
+    try:
+        return _MODEL_IDS[cat]
+    except (KeyError, TypeError):
+        pass
+
+    version = getattr(getattr(cat, "config", None), "version", None)
+    model_id = getattr(version, "id", None)
+    if not model_id and callable(getattr(cat, "get_hash", None)):
+        model_id = cat.get_hash()
+    model_id = str(model_id or type(cat).__name__)
+    try:
+        _MODEL_IDS[cat] = model_id
+    except TypeError:
+        pass
+    return model_id
+
+
+def _cui_filter(cat: Any) -> List[str]:
+    """Returns the sorted CUI filter applied by `cat`, if any."""
+    linking = getattr(getattr(cat, "config", None), "linking", None)
+    filters = getattr(linking, "filters", None)
+    if hasattr(filters, "get"):
+        cuis = filters.get("cuis")
+    else:
+        cuis = getattr(filters, "cuis", None)
+    return sorted(str(cui) for cui in (cuis or []))
+
+
+def get_model_key(cat: Any, model_id: Optional[str] = None) -> str:
+    """Returns the part of the cache key identifying the model and CUI filter.
+
+    Args:
+        cat: The MedCAT `CAT` object.
+        model_id: An explicit model pack id. Defaults to the pack's version
+            id, or its hash if the pack has no id.
+
+    Returns:
+        A hex digest of the model pack id, the CUI filter and the number of
+        concepts in the CDB, which changes when the CDB is filtered in place.
+    """
+    cui2names = getattr(getattr(cat, "cdb", None), "cui2names", None)
+    parts = [
+        model_id or _model_id(cat),
+        ",".join(_cui_filter(cat)),
+        str(len(cui2names)) if cui2names is not None else "",
+    ]
+    return hashlib.sha256("\x1f".join(parts).encode("utf-8")).hexdigest()
+
+
+def text_key(model_key: str, text: str) -> str:
+    """Returns the cache key of `text` annotated by the model `model_key`."""
+    digest = hashlib.sha256(model_key.encode("utf-8"))
+    digest.update(b"\x1f")
+    digest.update(str(text).encode("utf-8", "surrogatepass"))
+    return digest.hexdigest()
+
+
+class AnnotationCache:
+    """A size-bounded SQLite cache of MedCAT annotations.
+
+    Args:
+        path: The SQLite database file.
+        max_mb: The maximum total size of the cached annotations, in megabytes.
+    """
+
+    def __init__(self, path: str, max_mb: float = DEFAULT_ANNOTATION_CACHE_MAX_MB):
+        self.path = path
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        with self._connect() as connection:
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS annotations ("
+                "key TEXT PRIMARY KEY, value BLOB NOT NULL, "
+                "size INTEGER NOT NULL, last_used REAL NOT NULL)"
+            )
+            connection.execute(
+                "CREATE INDEX IF NOT EXISTS annotations_last_used "
+                "ON annotations (last_used)"
+            )
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        """Yields a connection, committing on success and always closing it."""
+        connection = sqlite3.connect(self.path, timeout=60)
+        try:
+            with connection:
+                yield connection
+        finally:
+            connection.close()
+
+    def get_many(self, keys: Sequence[str]) -> Dict[str, Dict[str, Any]]:
+        """Returns the cached annotations of the given keys that are present."""
+        found = {}
+        now = time.time()
+        with self._connect() as connection:
+            for i in range(0, len(keys), _SQL_CHUNK_SIZE):
+                chunk = list(dict.fromkeys(keys[i : i + _SQL_CHUNK_SIZE]))
+                placeholders = ",".join("?" * len(chunk))
+                rows = connection.execute(
+                    f"SELECT key, value FROM annotations WHERE key IN ({placeholders})",
+                    chunk,
+                ).fetchall()
+                for key, value in rows:
+                    found[key] = pickle.loads(zlib.decompress(value))
+                if rows:
+                    hit_keys = [key for key, _ in rows]
+                    connection.execute(
+                        "UPDATE annotations SET last_used = ? "
+                        f"WHERE key IN ({','.join('?' * len(hit_keys))})",
+                        [now, *hit_keys],
+                    )
+        return found
+
+    def put_many(self, items: Dict[str, Dict[str, Any]]) -> None:
+        """Stores annotations and evicts old entries if the cache is too big."""
+        if not items:
+            return
+        now = time.time()
+        rows = []
+        for key, annots in items.items():
+            value = zlib.compress(pickle.dumps(annots, pickle.HIGHEST_PROTOCOL))
+            rows.append((key, value, len(value), now))
+        with self._connect() as connection:
+            connection.executemany(
+                "INSERT OR REPLACE INTO annotations (key, value, size, last_used) "
+                "VALUES (?, ?, ?, ?)",
+                rows,
+            )
+            self._evict(connection)
+
+    def _evict(self, connection: sqlite3.Connection) -> None:
+        """Deletes least recently used entries until the cache fits `max_bytes`."""
+        total = connection.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM annotations"
+        ).fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        excess = total - self.max_bytes
+        freed = 0
+        stale_keys = []
+        for key, size in connection.execute(
+            "SELECT key, size FROM annotations ORDER BY last_used"
+        ):
+            stale_keys.append(key)
+            freed += size
+            if freed >= excess:
+                break
+        for i in range(0, len(stale_keys), _SQL_CHUNK_SIZE):
+            chunk = stale_keys[i : i + _SQL_CHUNK_SIZE]
+            connection.execute(
+                f"DELETE FROM annotations WHERE key IN ({','.join('?' * len(chunk))})",
+                chunk,
+            )
+        logger.info(
+            f"Evicted {len(stale_keys)} entries ({freed} bytes) from the "
+            f"annotation cache {self.path}."
+        )
+
+
+def get_annotation_cache(config_obj: Any) -> Optional[AnnotationCache]:
+    """Returns the annotation cache configured in `config_obj`, if enabled.
+
+    The cache is opened once per path and process, and again if its database
+    file has been removed since.
+    """
+    path = getattr(config_obj, "annotation_cache_path", None)
+    if not path:
+        return None
+    max_mb = getattr(
+        config_obj, "annotation_cache_max_mb", DEFAULT_ANNOTATION_CACHE_MAX_MB
+    )
+    key = (os.path.abspath(path), max_mb, os.getpid())
+    with _CACHES_LOCK:
+        cache = _CACHES.get(key)
+        if cache is None or not os.path.exists(path):
+            cache = _CACHES[key] = AnnotationCache(path, max_mb=max_mb)
+    return cache
+
+
+def get_entities_multi_texts_cached(
+    cat: Any, texts: Sequence[str], config_obj: Any, **kwargs: Any
+) -> List[Dict[str, Any]]:
+    """Annotates `texts` with `cat`, reusing cached annotations.
+
+    Texts found in the annotation cache are not annotated again; the others
+    are annotated in a single `cat.get_entities_multi_texts` call and added
+    to the cache. Identical texts in `texts` are annotated once. Without a
+    configured cache this is a plain `get_entities_multi_texts` call.
+
+    Args:
+        cat: The MedCAT `CAT` object.
+        texts: The texts to annotate.
+        config_obj: The configuration object.
+        **kwargs: Passed to `cat.get_entities_multi_texts`, e.g. `n_process`
+            and `batch_size`.
+
+    Returns:
+        One annotation dictionary per text, in order.
+    """
+    cache = get_annotation_cache(config_obj)
+    texts = list(texts)
+    if cache is None:
+        return cat.get_entities_multi_texts(texts, **kwargs)
+
+    model_key = get_model_key(
+        cat, model_id=getattr(config_obj, "annotation_cache_model_id", None)
+    )
+    keys = [text_key(model_key, text) for text in texts]
+    annots_by_key = cache.get_many(keys)
+
+    miss_positions = {}
+    for i, key in enumerate(keys):
+        if key not in annots_by_key:
+            miss_positions.setdefault(key, i)
+
+    if miss_positions:
+        miss_texts = [texts[i] for i in miss_positions.values()]
+        miss_annots = cat.get_entities_multi_texts(miss_texts, **kwargs)
+        if len(miss_annots) != len(miss_texts):
+            raise ValueError(
+                f"MedCAT returned {len(miss_annots)} results for "
+                f"{len(miss_texts)} texts."
+            )
+        new_items = dict(zip(miss_positions.keys(), miss_annots))
+        cache.put_many(new_items)
+        annots_by_key.update(new_items)
+
+    if getattr(config_obj, "verbosity", 0) >= 1:
+        logger.info(
+            f"Annotation cache: annotated {len(miss_positions)} of "
+            f"{len(texts)} texts, reused the rest."
+        )
+    return [annots_by_key[key] for key in keys]
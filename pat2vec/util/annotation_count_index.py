@@ -0,0 +1,117 @@
+"""
+Per-patient count index for the `pretty_name_count_*` annotation features.
+
+The annotation features of each time slice used to filter the patient's whole
+annotation batch by timestamp, copying it and re-parsing its timestamps, and
+then group the matching rows by `pretty_name`. Across many slices, that
+repeats the same work once per slice.
+
+`AnnotationCountIndex` does it once per patient instead. It sorts the
+annotations by timestamp and keeps the cumulative count matrix (time x
+`pretty_name`) in sparse form: the column of each name is stored as the
+sorted positions at which its count steps. A slice's counts are then the
+difference of two prefix rows of the matrix, found by binary search.
+
+Indexes are built on first use and kept for as long as the annotation batch
+they were built from.
+"""
+
+from typing import Optional, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+from pat2vec.util.batch_object_cache import BatchObjectCache
+from pat2vec.util.filter_dataframe_by_timestamp import get_timestamp_range
+
+#: The number of indexes kept, e.g. one per annotation source of a patient.
+MAX_COUNT_INDEXES = 8
+
+_COUNT_INDEXES = BatchObjectCache(MAX_COUNT_INDEXES)
+
+
+class AnnotationCountIndex:
+    """Counts a patient's annotations by `pretty_name` over time ranges.
+
+    Args:
+        annotations: The patient's annotations, with a `pretty_name` column.
+        timestamp_column: The column holding the document timestamps.
+            Annotations without a valid timestamp are ignored.
+    """
+
+    def __init__(self, annotations: pd.DataFrame, timestamp_column: str):
+        times = (
+            pd.to_datetime(annotations[timestamp_column], utc=True, errors="coerce")
+            .dt.tz_convert(None)
+            .to_numpy()
+        )
+        valid = ~pd.isna(times)
+        order = np.argsort(times[valid], kind="stable")
+        self.times = times[valid][order]
+
+        codes, names = pd.factorize(annotations["pretty_name"], sort=True)
+        codes = codes[valid][order]
+        self.names = pd.Index(np.asarray(names, dtype=object))
+
+        # Each event is keyed by its name and time position, so that the
+        # events of a name are contiguous and sorted by time.
+        positions = np.arange(len(codes))
+        named = codes >= 0
+        self._stride = len(codes) + 1
+        self._keys = np.sort(codes[named] * self._stride + positions[named])
+        self._column_offsets = np.arange(len(self.names)) * self._stride
+
+    def prefix_counts(self, position: int) -> np.ndarray:
+        """Returns the counts of each name among the first `position` events."""
+        return np.searchsorted(self._keys, self._column_offsets + position)
+
+    def position_range(self, start: pd.Timestamp, end: pd.Timestamp) -> Tuple[int, int]:
+        """Returns the positions of the events between `start` and `end`."""
+        return (
+            int(np.searchsorted(self.times, start.to_datetime64(), side="left")),
+            int(np.searchsorted(self.times, end.to_datetime64(), side="right")),
+        )
+
+    def count_features(
+        self,
+        start_year: Union[int, str],
+        start_month: Union[int, str],
+        end_year: Union[int, str],
+        end_month: Union[int, str],
+        start_day: Union[int, str],
+        end_day: Union[int, str],
+    ) -> Optional[pd.DataFrame]:
+        """Returns the `pretty_name` counts of a date range.
+
+        The range is inclusive, as in `filter_dataframe_by_timestamp`.
+
+        Returns:
+            A single-row DataFrame with the counts of each name seen in the
+            range, as `calculate_pretty_name_count_features` but with the
+            names sorted, or None if there are no annotations in the range.
+        """
+        start, end = get_timestamp_range(
+            start_year, start_month, end_year, end_month, start_day, end_day
+        )
+        lo, hi = self.position_range(start, end)
+        if hi <= lo:
+            return None
+
+        counts = self.prefix_counts(hi) - self.prefix_counts(lo)
+        seen = counts > 0
+        result_vector = pd.DataFrame(
+            counts[seen].astype(float).reshape(1, -1),
+            columns=pd.Index(self.names[seen], name="pretty_name"),
+        )
+        result_vector.index = pd.RangeIndex(1)
+        return result_vector
+
+
+def get_annotation_count_index(
+    annotations: pd.DataFrame, timestamp_column: str
+) -> AnnotationCountIndex:
+    """Returns the count index of an annotation batch, building it if needed.
+
+    See `BatchObjectCache.get` for when the index is reused.
+    """
+    return _COUNT_INDEXES.get(annotations, AnnotationCountIndex, timestamp_column)
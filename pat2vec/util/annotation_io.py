@@ -0,0 +1,191 @@
+"""
+Reading and writing per-patient annotation outputs with the 'file' backend.
+
+Annotation outputs used to be CSV files, so the list columns (`types`,
+`type_ids`, `icd10`, `ontologies`, `snomed`) were stringified and every
+consumer re-parsed them, along with the timestamps. They are now written in
+`config_obj.annotation_output_format`, Parquet by default, with list-typed
+list columns, categorical `pretty_name`, `cui` and meta-annotation `*_Value`
+columns, and native UTC timestamps.
+
+CSV outputs remain readable: readers look for `<client_idcode>.parquet` and
+then `<client_idcode>.csv`.
+"""
+
+import ast
+import json
+import logging
+import os
+from typing import Any, Dict, Iterable, List, Optional
+
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+
+logger = logging.getLogger(__name__)
+
+#: The supported annotation output formats, in the order readers look for them.
+ANNOTATION_OUTPUT_FORMATS = ("parquet", "csv")
+
+#: Columns holding a list of strings per annotation.
+ANNOTATION_LIST_COLUMNS = ["types", "type_ids", "icd10", "ontologies", "snomed"]
+
+#: Low-cardinality columns stored as categoricals, besides the `*_Value` columns.
+ANNOTATION_CATEGORICAL_COLUMNS = ["pretty_name", "cui"]
+
+#: The suffix of the files tracking the annotated document GUIDs.
+GUIDS_SUFFIX = ".guids"
+
+#: The column recording the filter applied when annotations were written.
+ANNOTATION_FILTER_COLUMN = "annotation_filter"
+
+#: The subdirectory holding the unfiltered annotations kept alongside.
+UNFILTERED_ANNOTATIONS_DIR = "unfiltered"
+
+#: The document timestamp columns of the annotation sources.
+ANNOTATION_TIME_COLUMNS = [
+    "updatetime",
+    "observationdocument_recordeddtm",
+    "basicobs_entered",
+    "observationannotation_recordeddtm",
+]
+
+
+def get_annotation_output_format(config_obj: Any = None) -> str:
+    """Returns the configured annotation output format.
+
+    Raises:
+        ValueError: If the format is not supported.
+    """
+    fmt = getattr(config_obj, "annotation_output_format", "parquet") or "parquet"
+    if fmt not in ANNOTATION_OUTPUT_FORMATS:
+        raise ValueError(
+            f"Unsupported annotation_output_format '{fmt}', "
+            f"expected one of {ANNOTATION_OUTPUT_FORMATS}."
+        )
+    return fmt
+
+
+def annotation_output_path(
+    annotation_batch_path: str, client_idcode: str, config_obj: Any = None
+) -> str:
+    """Returns the path a patient's annotations are written to."""
+    return os.path.join(
+        annotation_batch_path,
+        f"{client_idcode}.{get_annotation_output_format(config_obj)}",
+    )
+
+
+def find_annotation_output(
+    annotation_batch_path: str, client_idcode: str
+) -> Optional[str]:
+    """Returns the path of a patient's existing annotation output, if any."""
+    for fmt in ANNOTATION_OUTPUT_FORMATS:
+        path = os.path.join(annotation_batch_path, f"{client_idcode}.{fmt}")
+        if os.path.exists(path):
+            return path
+    return None
+
+
+def read_annotation_output(
+    path: str, columns: Optional[Iterable[str]] = None
+) -> pd.DataFrame:
+    """Reads an annotation output written in any supported format.
+
+    Args:
+        path: The Parquet or CSV file.
+        columns: The columns to read. Columns the file lacks are ignored.
+
+    Returns:
+        The annotations.
+    """
+    if path.endswith(".parquet"):
+        if columns is not None:
+            names = set(pq.read_schema(path).names)
+            columns = [column for column in columns if column in names]
+        return pd.read_parquet(path, columns=columns)
+
+    if columns is not None:
+        wanted = set(columns)
+        return pd.read_csv(path, usecols=lambda column: column in wanted)
+    return pd.read_csv(path)
+
+
+def read_patient_annotations(
+    annotation_batch_path: str,
+    client_idcode: str,
+    columns: Optional[Iterable[str]] = None,
+) -> Optional[pd.DataFrame]:
+    """Reads a patient's annotation output, or returns None if there is none."""
+    path = find_annotation_output(annotation_batch_path, client_idcode)
+    if path is None:
+        return None
+    return read_annotation_output(path, columns=columns)
+
+
+def annotation_filter_provenance(filter_args: Dict[str, Any]) -> str:
+    """Returns the canonical JSON of filter arguments, recorded as provenance."""
+    return json.dumps(filter_args, sort_keys=True, default=str)
+
+
+def _to_string_list(value: Any) -> Optional[List[str]]:
+    """Converts a list, or its CSV string representation, to a list of strings."""
+    if isinstance(value, str):
+        try:
+            value = ast.literal_eval(value)
+        except (ValueError, SyntaxError):
+            return [value]
+    if isinstance(value, (list, tuple, np.ndarray)):
+        return [
+            item if isinstance(item, str) else json.dumps(item, default=str)
+            for item in value
+        ]
+    return None
+
+
+def to_typed_annotations(df: pd.DataFrame) -> pd.DataFrame:
+    """Returns a copy of `df` with the typed columns of annotation outputs.
+
+    List columns become lists of strings, `pretty_name`, `cui` and `*_Value`
+    columns categoricals, and timestamp columns UTC datetimes.
+    """
+    df = df.copy()
+    for column in ANNOTATION_LIST_COLUMNS:
+        if column in df.columns:
+            df[column] = df[column].map(_to_string_list)
+    for column in df.columns:
+        if column in ANNOTATION_CATEGORICAL_COLUMNS or column.endswith("_Value"):
+            df[column] = (
+                df[column].astype(str).where(df[column].notna()).astype("category")
+            )
+        elif column in ANNOTATION_TIME_COLUMNS:
+            df[column] = pd.to_datetime(df[column], utc=True, errors="coerce")
+        elif column not in ANNOTATION_LIST_COLUMNS and pd.api.types.infer_dtype(
+            df[column], skipna=True
+        ).startswith("mixed"):
+            # e.g. GUIDs read as integers from one CSV and strings from another.
+            df[column] = df[column].astype(str).where(df[column].notna())
+    return df
+
+
+def write_annotation_frame(df: pd.DataFrame, path: str) -> None:
+    """Writes annotations to `path`, typed if it is a Parquet file."""
+    if path.endswith(".parquet"):
+        to_typed_annotations(df).to_parquet(path, index=False)
+    else:
+        df.to_csv(path, index=False)
+
+
+def annotation_lists_to_json(df: pd.DataFrame) -> pd.DataFrame:
+    """Serializes list columns to JSON strings, e.g. before writing to SQL."""
+    df = df.copy()
+    for column in ANNOTATION_LIST_COLUMNS:
+        if column in df.columns:
+            df[column] = df[column].map(
+                lambda x: (
+                    json.dumps(list(x), default=str)
+                    if isinstance(x, (list, tuple, np.ndarray))
+                    else x
+                )
+            )
+    return df
@@ -0,0 +1,100 @@
+"""
+Helpers for converting DataFrames to Arrow tables and Parquet files, and for
+reassembling DataFrames written in chunks.
+"""
+
+import logging
+from typing import Any, Dict, List
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+logger = logging.getLogger(__name__)
+
+
+def dataframe_to_arrow_table(df: pd.DataFrame) -> pa.Table:
+    """Converts a DataFrame to an Arrow table without its index.
+
+    Object columns holding mixed Python types cannot be stored by Arrow, so on
+    failure they are converted to strings (keeping missing values) and the
+    conversion is retried.
+
+    Args:
+        df: The DataFrame to convert.
+
+    Returns:
+        The Arrow table.
+    """
+    try:
+        return pa.Table.from_pandas(df, preserve_index=False)
+    except (pa.ArrowInvalid, pa.ArrowTypeError) as e:
+        logger.debug(f"Retrying Arrow conversion with string columns: {e}")
+        df = df.copy()
+        for col in df.select_dtypes(include="object").columns:
+            df[col] = df[col].where(df[col].isna(), df[col].astype(str))
+        return pa.Table.from_pandas(df, preserve_index=False)
+
+
+def write_parquet_with_fallback(df: pd.DataFrame, path: str, **kwargs: Any) -> None:
+    """Writes a DataFrame to Parquet using `dataframe_to_arrow_table`.
+
+    Args:
+        df: The DataFrame to write.
+        path: The Parquet file to write.
+        **kwargs: Additional arguments for `pyarrow.parquet.write_table`.
+    """
+    pq.write_table(dataframe_to_arrow_table(df), path, **kwargs)
+
+
+def _common_arrow_type(types: List[pa.DataType]) -> pa.DataType:
+    """Returns a type that all of `types` can be cast to."""
+    types = [t for t in dict.fromkeys(types) if not pa.types.is_null(t)]
+    if not types:
+        return pa.null()
+    if len(types) == 1:
+        return types[0]
+    if all(pa.types.is_integer(t) or pa.types.is_floating(t) for t in types):
+        return pa.float64()
+    return pa.string()
+
+
+def unify_arrow_schemas(schemas: List[pa.Schema]) -> pa.Schema:
+    """Merges the schemas of chunks of one DataFrame written separately.
+
+    Columns keep their first-seen order. A column that is all-null in some
+    chunks takes its type from the others, mixed integer and float columns
+    become float64, and any other type conflict falls back to string.
+
+    Args:
+        schemas: The chunk schemas.
+
+    Returns:
+        A schema every chunk can be conformed to with `conform_arrow_table`.
+    """
+    field_types: Dict[str, List[pa.DataType]] = {}
+    for schema in schemas:
+        for field in schema:
+            field_types.setdefault(field.name, []).append(field.type)
+    return pa.schema(
+        [(name, _common_arrow_type(types)) for name, types in field_types.items()]
+    )
+
+
+def conform_arrow_table(table: pa.Table, schema: pa.Schema) -> pa.Table:
+    """Casts `table` to `schema`, adding missing columns as nulls.
+
+    Args:
+        table: A chunk table.
+        schema: The unified schema, see `unify_arrow_schemas`.
+
+    Returns:
+        The table with exactly the columns and types of `schema`.
+    """
+    columns = []
+    for field in schema:
+        if field.name in table.column_names:
+            columns.append(table.column(field.name).cast(field.type))
+        else:
+            columns.append(pa.nulls(table.num_rows, type=field.type))
+    return pa.Table.from_arrays(columns, schema=schema)
@@ -0,0 +1,62 @@
+"""
+A small cache of values derived from patient batch DataFrames.
+
+Per-patient structures such as the annotation count index and the
+demographics timeline are built from a batch on the first time slice and
+reused for the patient's other slices. `BatchObjectCache` keys them by the
+identity of the batch object and drops them once the batch is garbage
+collected, so no batch is kept alive by the cache.
+"""
+
+import weakref
+from typing import Any, Callable, Dict, Hashable, Tuple
+
+import pandas as pd
+
+
+class BatchObjectCache:
+    """Caches values built from batch objects, for as long as the batch lives.
+
+    Args:
+        max_size: The number of values kept, e.g. one per source of a patient.
+            The cache is cleared when full, since a patient's batches are used
+            together and then discarded.
+    """
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._entries: Dict[Tuple[Hashable, ...], Tuple["weakref.ref", Any]] = {}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(
+        self,
+        batch: pd.DataFrame,
+        build: Callable[..., Any],
+        *args: Hashable,
+    ) -> Any:
+        """Returns the value built from `batch` and `args`, building it if needed.
+
+        The value is reused for as long as the same batch object is passed,
+        i.e. across the time slices of a patient. Batches must not be
+        modified in place in the meantime.
+
+        Args:
+            batch: The batch the value is built from.
+            build: Builds the value, called as `build(batch, *args)`.
+            *args: Further arguments of `build`, part of the cache key.
+        """
+        key = (id(batch), *args)
+        entry = self._entries.get(key)
+        if entry is not None and entry[0]() is batch:
+            return entry[1]
+
+        if len(self._entries) >= self.max_size:
+            self._entries.clear()
+        value = build(batch, *args)
+        self._entries[key] = (
+            weakref.ref(batch, lambda _, key=key: self._entries.pop(key, None)),
+            value,
+        )
+        return value
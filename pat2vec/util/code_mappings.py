@@ -0,0 +1,172 @@
+"""
+SNOMED CT to ICD-10 and OPCS-4 mapping tables for annotation joins.
+
+`join_icd10_codes_to_annot` and `join_icd10_OPC4S_codes_to_annot` used to
+re-read their mapping file for every call, i.e. once per patient and
+annotation source with `add_icd10`. Each mapping file is now parsed once per
+process into a `CodeMap`, indexed by the CUI it maps from, and joined to
+annotations by a vectorized lookup.
+
+The mapping files are set by `config_obj.icd10_map_path` and
+`config_obj.icd10_opcs4_map_path`. With `config_obj.code_map_cache_dir`, the
+parsed tables are also kept there as Arrow (Feather) files, so that other
+processes skip parsing the source files.
+"""
+
+import hashlib
+import logging
+import os
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+logger = logging.getLogger(__name__)
+
+#: The default SNOMED CT to ICD-10 map, keyed by `referencedComponentId`.
+DEFAULT_ICD10_MAP_PATH = (
+    "../../snomed_icd10_map/data/tls_Icd10cmHumanReadableMap_US1000124_20230901.tsv"
+)
+
+#: The default SNOMED CT to ICD-10 and OPCS-4 map, keyed by `conceptId`.
+DEFAULT_ICD10_OPCS4_MAP_PATH = "../../snomed_to_icd10_opcs4/map.csv"
+
+_CODE_MAPS: Dict[Tuple[str, str, int, int], "CodeMap"] = {}
+
+
+def _cui_strings(cuis: pd.Series) -> np.ndarray:
+    """Returns CUIs as strings, with numeric CUIs written as integers."""
+    if pd.api.types.is_float_dtype(cuis):
+        cuis = cuis.astype("Int64")
+    return cuis.astype(str).to_numpy()
+
+
+class CodeMap:
+    """A mapping table indexed by the CUI it maps from.
+
+    Args:
+        table: The mapping table, with one or more rows per CUI.
+        key_column: The column holding the CUIs.
+    """
+
+    def __init__(self, table: pd.DataFrame, key_column: str):
+        keys = _cui_strings(table[key_column])
+        order = np.argsort(keys, kind="stable")
+        self.table = table.iloc[order].reset_index(drop=True)
+        self.key_column = key_column
+
+        unique_keys, self._starts, self._counts = np.unique(
+            keys[order], return_index=True, return_counts=True
+        )
+        self.index = pd.Index(unique_keys)
+
+    def join(
+        self, df: pd.DataFrame, cui_column: str = "cui", inner: bool = False
+    ) -> pd.DataFrame:
+        """Joins the mapping rows of each annotation's CUI to `df`.
+
+        The result is that of merging `df` with the table on `cui_column`:
+        rows follow `df`, each repeated per mapping row of its CUI, and
+        columns of both have the suffixes '_x' and '_y'.
+
+        Args:
+            df: The annotations.
+            cui_column: The column of `df` holding the CUIs.
+            inner: If True, annotations without mapping rows are dropped.
+                Otherwise they are kept, with missing mapping columns.
+
+        Returns:
+            The annotations joined with their mapping rows.
+        """
+        groups = self.index.get_indexer(_cui_strings(df[cui_column]))
+        matched = groups >= 0
+        n_rows = np.where(matched, self._counts[groups], 0 if inner else 1)
+
+        left_rows = np.repeat(np.arange(len(df)), n_rows)
+        groups = np.repeat(groups, n_rows)
+        offsets = np.arange(len(left_rows)) - np.repeat(
+            np.cumsum(n_rows) - n_rows, n_rows
+        )
+        right_rows = np.where(groups >= 0, self._starts[groups] + offsets, -1)
+
+        left = df.iloc[left_rows].reset_index(drop=True)
+        # Missing rows are reindexed from the RangeIndex as all-NaN rows.
+        right = self.table.reindex(right_rows).reset_index(drop=True)
+
+        overlap = [column for column in left.columns if column in right.columns]
+        left = left.rename(columns={column: f"{column}_x" for column in overlap})
+        right = right.rename(columns={column: f"{column}_y" for column in overlap})
+        return pd.concat([left, right], axis=1)
+
+
+def _arrow_cache_path(cache_dir: str, path: str, stat: os.stat_result) -> str:
+    """Returns the Arrow cache file of a mapping file's current version."""
+    digest = hashlib.sha1(
+        f"{path}:{stat.st_mtime_ns}:{stat.st_size}".encode()
+    ).hexdigest()[:16]
+    return os.path.join(cache_dir, f"{os.path.basename(path)}.{digest}.feather")
+
+
+def load_code_map(
+    path: str,
+    key_column: str,
+    sep: str = ",",
+    cache_dir: Optional[str] = None,
+) -> CodeMap:
+    """Loads a mapping file once per process.
+
+    The mapping is reloaded if the file changes.
+
+    Args:
+        path: The mapping file.
+        key_column: The column holding the CUIs.
+        sep: The field separator of the file.
+        cache_dir: A directory to keep the parsed table in as an Arrow file,
+            or None.
+
+    Returns:
+        The indexed mapping.
+    """
+    path = os.path.abspath(path)
+    stat = os.stat(path)
+    key = (path, key_column, stat.st_mtime_ns, stat.st_size)
+    if key in _CODE_MAPS:
+        return _CODE_MAPS[key]
+
+    table = None
+    arrow_path = _arrow_cache_path(cache_dir, path, stat) if cache_dir else None
+    if arrow_path is not None and os.path.exists(arrow_path):
+        table = pd.read_feather(arrow_path)
+    if table is None:
+        table = pd.read_csv(path, sep=sep)
+        if arrow_path is not None:
+            try:
+                os.makedirs(cache_dir, exist_ok=True)
+                table.to_feather(arrow_path)
+            except (pa.ArrowException, ValueError, OSError) as e:
+                logger.warning(f"Could not cache mapping {path} as Arrow: {e}")
+
+    code_map = CodeMap(table, key_column)
+    _CODE_MAPS[key] = code_map
+    return code_map
+
+
+def get_icd10_map(config_obj: Any = None) -> CodeMap:
+    """Returns the configured SNOMED CT to ICD-10 map."""
+    return load_code_map(
+        getattr(config_obj, "icd10_map_path", None) or DEFAULT_ICD10_MAP_PATH,
+        "referencedComponentId",
+        sep="\t",
+        cache_dir=getattr(config_obj, "code_map_cache_dir", None),
+    )
+
+
+def get_icd10_opcs4_map(config_obj: Any = None) -> CodeMap:
+    """Returns the configured SNOMED CT to ICD-10 and OPCS-4 map."""
+    return load_code_map(
+        getattr(config_obj, "icd10_opcs4_map_path", None)
+        or DEFAULT_ICD10_OPCS4_MAP_PATH,
+        "conceptId",
+        cache_dir=getattr(config_obj, "code_map_cache_dir", None),
+    )
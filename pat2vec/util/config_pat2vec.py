@@ -99,6 +99,26 @@ class config_class:
         check_patient_existence: bool = True,
         testing_elastic: bool = False,
         include_text_sample_in_annots: bool = False,
+        field_projection: bool = False,
+        field_projection_extra_fields: Optional[Dict[str, List[str]]] = None,
+        prefetch_n_workers: int = 4,
+        raw_store_n_buckets: int = 64,
+        merged_batch_format: str = "parquet",
+        prefetch_incremental: bool = False,
+        merged_batch_chunk_size: int = 5000,
+        annotation_batch_docs: int = 2000,
+        annotation_n_process: Optional[int] = None,
+        annotation_batch_size: int = 100,
+        annotation_cache_path: Optional[str] = None,
+        annotation_cache_max_mb: float = 2048,
+        annotation_cache_model_id: Optional[str] = None,
+        annotation_incremental: bool = False,
+        annotation_output_format: str = "parquet",
+        annotation_filter_at_write: bool = False,
+        annotation_keep_unfiltered: bool = False,
+        icd10_map_path: Optional[str] = None,
+        icd10_opcs4_map_path: Optional[str] = None,
+        code_map_cache_dir: Optional[str] = None,
     ) -> None:
         """Initializes the configuration object for the pat2vec pipeline.
         This class holds all configuration parameters for a pat2vec run, including
@@ -207,6 +227,66 @@ class config_class:
                 Defaults to `True`.
             testing_elastic: If `True`, testing mode will interact with a real (mocked/test)
                 Elasticsearch instance instead of using dummy data generators.
+            field_projection: If `True`, each data source only requests the
+                fields read by the enabled features and filters (see
+                `pat2vec.util.field_projection`). Cached batches fetched with
+                the full field set are still read as before.
+            field_projection_extra_fields: A dictionary mapping a data source
+                key (e.g., 'bloods') to additional fields to keep when
+                `field_projection` is enabled.
+            prefetch_n_workers: The number of batch types fetched concurrently
+                when `prefetch_pat_batches` is `True`.
+            raw_store_n_buckets: The number of patient hash buckets in the
+                Parquet store written by prefetching with the 'file' backend.
+            merged_batch_format: The format of the `merged_*_batches` caches
+                written with the 'file' backend: 'parquet' (default),
+                'feather' or 'csv'.
+            prefetch_incremental: If `True`, prefetching with the 'file'
+                backend fetches only documents newer than the time watermark
+                recorded by the previous prefetch, plus the full history of
+                patients new to the cohort, and appends them to the store.
+            merged_batch_chunk_size: The number of patients searched per chunk
+                by the `get_merged_pat_batch_*` functions. Chunks are filtered
+                and stored as they arrive, which bounds prefetch memory use.
+            annotation_batch_docs: The number of documents, pooled across
+                patients, passed to MedCAT per call by
+                `annotate_cohort_batches`.
+            annotation_n_process: The number of MedCAT processes used by
+                `annotate_cohort_batches`. Defaults to `min(4, os.cpu_count())`.
+            annotation_batch_size: The number of documents per MedCAT process
+                batch used by `annotate_cohort_batches`.
+            annotation_cache_path: Path to a SQLite file caching MedCAT
+                annotations by document text, model pack and CUI filter.
+                Identical documents are then annotated only once, across
+                patients and runs. Disabled if `None`.
+            annotation_cache_max_mb: The size above which least recently used
+                entries are evicted from the annotation cache.
+            annotation_cache_model_id: Identifies the MedCAT model pack in
+                annotation cache keys. Defaults to the pack's version id.
+            annotation_incremental: If `True`, existing annotation outputs
+                are extended rather than reused as they are: only documents
+                whose GUID the output does not yet cover are annotated, and
+                their entities are appended. Pairs with
+                `prefetch_incremental` for monthly refreshes.
+            annotation_output_format: The format of the per-patient
+                annotation outputs written with the 'file' backend: 'parquet'
+                (default), with list, categorical and timestamp columns
+                typed, or 'csv'. Outputs in either format are read.
+            annotation_filter_at_write: If `True`, `annot_filter_options`
+                (or the default `filter_arguments`) are applied once when
+                annotations are written, and only the matching annotations
+                are stored, tagged with the filter. Reads with the same
+                filter then skip filtering.
+            annotation_keep_unfiltered: If `True` in filter-at-write mode,
+                the full annotations are also stored, in an `unfiltered`
+                subdirectory or `<table>_unfiltered` table.
+            icd10_map_path: The SNOMED CT to ICD-10 map (TSV) joined with
+                `add_icd10`. Defaults to the map of the deployment layout.
+            icd10_opcs4_map_path: The SNOMED CT to ICD-10/OPCS-4 map (CSV)
+                joined with `add_icd10` and `add_opc4s`.
+            code_map_cache_dir: A directory to cache the parsed mapping
+                tables in as Arrow files, shared across processes. Disabled
+                if `None`.
         """
 
         if prefetch_pat_batches and individual_patient_window:
@@ -223,6 +303,42 @@ class config_class:
 
         #: If `True`, fetches all raw data for all patients before processing. May use significant memory.
         self.prefetch_pat_batches = prefetch_pat_batches
+        #: The number of batch types fetched concurrently during prefetching.
+        self.prefetch_n_workers = prefetch_n_workers
+        #: The number of patient hash buckets in the prefetched raw data store.
+        self.raw_store_n_buckets = raw_store_n_buckets
+        #: The format of the merged batch caches ('parquet', 'feather' or 'csv').
+        self.merged_batch_format = merged_batch_format
+        #: If `True`, prefetching only fetches data newer than the last prefetch and new patients.
+        self.prefetch_incremental = prefetch_incremental
+        #: The number of patients searched per chunk when fetching merged batches.
+        self.merged_batch_chunk_size = merged_batch_chunk_size
+        #: The number of documents pooled across patients per MedCAT call.
+        self.annotation_batch_docs = annotation_batch_docs
+        #: The number of MedCAT processes used for cohort annotation.
+        self.annotation_n_process = annotation_n_process
+        #: The number of documents per MedCAT process batch.
+        self.annotation_batch_size = annotation_batch_size
+        #: The SQLite annotation cache path, or `None` to disable the cache.
+        self.annotation_cache_path = annotation_cache_path
+        #: The maximum size of the annotation cache in megabytes.
+        self.annotation_cache_max_mb = annotation_cache_max_mb
+        #: An explicit model pack id for annotation cache keys.
+        self.annotation_cache_model_id = annotation_cache_model_id
+        #: If `True`, only documents not yet annotated are annotated and appended.
+        self.annotation_incremental = annotation_incremental
+        #: The format of the annotation outputs ('parquet' or 'csv').
+        self.annotation_output_format = annotation_output_format
+        #: If `True`, annotations are filtered once, when they are written.
+        self.annotation_filter_at_write = annotation_filter_at_write
+        #: If `True`, the unfiltered annotations are stored alongside the filtered ones.
+        self.annotation_keep_unfiltered = annotation_keep_unfiltered
+        #: The SNOMED CT to ICD-10 map, or `None` for the default path.
+        self.icd10_map_path = icd10_map_path
+        #: The SNOMED CT to ICD-10/OPCS-4 map, or `None` for the default path.
+        self.icd10_opcs4_map_path = icd10_opcs4_map_path
+        #: The directory of the Arrow cache of the mapping tables, if any.
+        self.code_map_cache_dir = code_map_cache_dir
 
         #: If `True`, calculates feature vectors. If `False`, only extracts batches.
         self.calculate_vectors = calculate_vectors  # Calculate vectors for each patient else just extract batches
@@ -251,6 +367,11 @@ class config_class:
         #: If `True`, includes the 'text_sample' column in annotation outputs.
         self.include_text_sample_in_annots = include_text_sample_in_annots
 
+        #: If `True`, data sources only request the fields the enabled features read.
+        self.field_projection = field_projection
+        #: Additional fields per data source to keep when `field_projection` is enabled.
+        self.field_projection_extra_fields = field_projection_extra_fields or {}
+
         #: The root directory for the project.
         self.root_path = root_path
         if self.root_path is None:
@@ -283,6 +404,12 @@ class config_class:
                     connect_args={"check_same_thread": False},
                     poolclass=StaticPool,
                 )
+            elif self.db_connection_string.startswith("sqlite"):
+                # Concurrent prefetch workers wait for each other's writes
+                # instead of failing with "database is locked".
+                self.db_engine = create_engine(
+                    self.db_connection_string, connect_args={"timeout": 300}
+                )
             else:
                 self.db_engine = create_engine(self.db_connection_string)
 
@@ -0,0 +1,222 @@
+"""
+Per-patient timeline of the demographic features of `get_demo`.
+
+`get_demo` used to re-derive the same record for every time slice: it
+forward-filled and filtered the patient's whole demographics batch, then
+parsed the date of birth, mapped sex and deceased status and ran
+`EthnicityAbstractor` on the latest record in the slice.
+
+`DemographicsTimeline` does that work once per patient. It forward-fills the
+batch, sorts its records by time and derives the features of every record at
+once, running the ethnicity abstraction once per distinct race code. A slice
+then takes the features of its latest record.
+
+Timelines are built on first use and kept for as long as the demographics
+batch they were built from.
+"""
+
+from datetime import datetime
+from typing import Optional, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+from pat2vec.util.batch_object_cache import BatchObjectCache
+from pat2vec.util.ethnicity_abstractor import EthnicityAbstractor
+from pat2vec.util.filter_dataframe_by_timestamp import get_timestamp_range
+
+#: The number of timelines kept.
+MAX_DEMOGRAPHICS_TIMELINES = 8
+
+#: The fields forward-filled from a patient's earlier records.
+DEMOGRAPHICS_FILL_FIELDS = [
+    "client_firstname",
+    "client_lastname",
+    "client_dob",
+    "client_gendercode",
+    "client_racecode",
+    "client_deceaseddtm",
+]
+
+#: The census ethnicity features, in column order.
+CENSUS_FEATURES = [
+    "census_white",
+    "census_asian_or_asian_british",
+    "census_black_african_caribbean_or_black_british",
+    "census_mixed_or_multiple_ethnic_groups",
+    "census_other_ethnic_group",
+]
+
+#: The demographic features of `get_demo`, in column order.
+DEMOGRAPHICS_FEATURES = ["male", "age", "dead"] + CENSUS_FEATURES
+
+SEX_MAP = {"Male": 1, "Female": 0, "male": 1, "female": 0}
+
+_TIMELINES = BatchObjectCache(MAX_DEMOGRAPHICS_TIMELINES)
+
+
+def _parse_dob(value) -> Optional[datetime]:
+    """Parses a date of birth as `append_age_at_record_series` does."""
+    try:
+        return datetime.strptime(str(value).split(".")[0], "%Y-%m-%dT%H:%M:%S")
+    except ValueError:
+        return None
+
+
+def census_features(race_codes: pd.Series) -> np.ndarray:
+    """One-hot encodes the census ethnicity of race codes.
+
+    Args:
+        race_codes: The race codes. Each distinct code is abstracted once.
+
+    Returns:
+        An array with a row per race code and a column per `CENSUS_FEATURES`.
+        Rows of missing race codes are NaN.
+    """
+    codes, uniques = pd.factorize(race_codes)
+    features = np.full((len(codes), len(CENSUS_FEATURES)), np.nan)
+    if len(uniques) == 0:
+        return features
+
+    census = EthnicityAbstractor.abstractEthnicity(
+        pd.DataFrame(
+            {
+                "client_idcode": None,
+                "client_racecode": np.asarray(uniques, dtype=object),
+            }
+        ),
+        outputNameString="_census",
+        ethnicityColumnString="client_racecode",
+    )["census"]
+    encoded = (
+        pd.get_dummies(census, prefix="census")
+        .reindex(columns=CENSUS_FEATURES, fill_value=0)
+        .to_numpy(dtype=float)
+    )
+    features[codes >= 0] = encoded[codes[codes >= 0]]
+    return features
+
+
+def ages_at(dobs: pd.Series, times: pd.Series) -> np.ndarray:
+    """Returns the age in whole years at each time, NaN without a valid dob.
+
+    Args:
+        dobs: Dates of birth, as '%Y-%m-%dT%H:%M:%S' strings. Each distinct
+            value is parsed once.
+        times: UTC times to calculate the ages at.
+    """
+    codes, uniques = pd.factorize(dobs)
+    born = pd.to_datetime(
+        pd.Series([_parse_dob(value) for value in uniques], dtype=object)
+    )
+    born = born.reindex(codes).reset_index(drop=True)
+    dates = pd.Series(pd.DatetimeIndex(times).tz_convert("UTC").tz_localize(None))
+
+    # The years between the dates, less one if the birthday is yet to come.
+    before_birthday = (dates.dt.month < born.dt.month) | (
+        (dates.dt.month == born.dt.month) & (dates.dt.day < born.dt.day)
+    )
+    ages = dates.dt.year - born.dt.year - before_birthday.astype(int)
+    return ages.where(born.notna()).to_numpy(dtype=float)
+
+
+class DemographicsTimeline:
+    """The demographic features of a patient's records over time.
+
+    Args:
+        demographics: The patient's demographic records, with an `updatetime`
+            column. Missing `DEMOGRAPHICS_FILL_FIELDS` are filled from the
+            patient's earlier records. Records without a valid time are
+            ignored.
+    """
+
+    def __init__(self, demographics: pd.DataFrame):
+        demographics = demographics.sort_values(["client_idcode", "updatetime"])
+        demographics = demographics.reset_index(drop=True)
+        filled = demographics.groupby("client_idcode")[DEMOGRAPHICS_FILL_FIELDS].ffill()
+
+        times = pd.to_datetime(demographics["updatetime"], utc=True, errors="coerce")
+        valid = times.notna().to_numpy()
+        # Records are ordered by patient and then time, so that the latest
+        # record of a range is the last, as in `get_demographics3_batch`.
+        order = np.lexsort(
+            (
+                times.dt.tz_convert(None).to_numpy()[valid],
+                demographics["client_idcode"].to_numpy()[valid],
+            )
+        )
+        rows = np.flatnonzero(valid)[order]
+        filled = filled.iloc[rows].reset_index(drop=True)
+        times = times.iloc[rows].reset_index(drop=True)
+
+        self.client_idcodes = demographics["client_idcode"].to_numpy()[rows]
+        self.times = times.dt.tz_convert(None).to_numpy()
+        self.features = np.column_stack(
+            [
+                filled["client_gendercode"].map(SEX_MAP).to_numpy(dtype=float),
+                ages_at(filled["client_dob"], times),
+                [
+                    float(isinstance(value, str))
+                    for value in filled["client_deceaseddtm"]
+                ],
+                census_features(filled["client_racecode"]),
+            ]
+        )
+
+    def latest_features(
+        self, start: pd.Timestamp, end: pd.Timestamp
+    ) -> Optional[Tuple[object, np.ndarray]]:
+        """Returns the client ID and features of the latest record in a range.
+
+        Returns None if there are no records between `start` and `end`. With
+        several patients, the latest record of the last patient is returned.
+        """
+        in_range = (self.times >= start.tz_convert(None).to_datetime64()) & (
+            self.times <= end.tz_convert(None).to_datetime64()
+        )
+        if not in_range.any():
+            return None
+        latest = np.flatnonzero(in_range)[-1]
+        return self.client_idcodes[latest], self.features[latest]
+
+    def demographic_features(
+        self,
+        current_pat_client_id_code: str,
+        start_year: Union[int, str],
+        start_month: Union[int, str],
+        end_year: Union[int, str],
+        end_month: Union[int, str],
+        start_day: Union[int, str],
+        end_day: Union[int, str],
+    ) -> pd.DataFrame:
+        """Returns the demographic features of a date range.
+
+        The range is inclusive, as in `filter_dataframe_by_timestamp`.
+
+        Returns:
+            A single-row DataFrame with the `client_idcode` and the float
+            `DEMOGRAPHICS_FEATURES` of the latest record in the range. Without
+            records, the features are missing, except `dead` which is 0.
+        """
+        start, end = get_timestamp_range(
+            start_year, start_month, end_year, end_month, start_day, end_day
+        )
+        latest = self.latest_features(start, end)
+        if latest is None:
+            client_idcode = current_pat_client_id_code
+            features = np.full(len(DEMOGRAPHICS_FEATURES), np.nan)
+            features[DEMOGRAPHICS_FEATURES.index("dead")] = 0
+        else:
+            client_idcode, features = latest
+
+        result = pd.DataFrame(features.reshape(1, -1), columns=DEMOGRAPHICS_FEATURES)
+        result.insert(0, "client_idcode", [client_idcode])
+        return result
+
+
+def get_demographics_timeline(demographics: pd.DataFrame) -> DemographicsTimeline:
+    """Returns the timeline of a demographics batch, building it if needed.
+
+    See `BatchObjectCache.get` for when the timeline is reused.
+    """
+    return _TIMELINES.get(demographics, DemographicsTimeline)
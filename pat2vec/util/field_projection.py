@@ -0,0 +1,211 @@
+"""
+Plans the `_source` fields requested for each raw data source.
+
+Each `get_pat_batch_*` and `get_merged_pat_batch_*` function requests the
+default fields of the `get` method reading its source, as listed in
+`GET_METHOD_DEFAULT_FIELDS_MAP`. When `config_obj.field_projection` is enabled, the list is reduced
+to the fields the enabled features and data type filters actually read,
+which shrinks Elasticsearch responses and the resulting DataFrames.
+"""
+
+from typing import Any, Callable, Dict, List
+
+from pat2vec.util.get_method_default_fields_map import get_default_fields_for_method
+
+# The `get` method whose default fields each raw data source requests. All
+# CORE_* observation methods share the fields of `get_core_02`.
+BATCH_SOURCE_GET_METHODS: Dict[str, str] = {
+    "epr_docs": "get_current_pat_annotations",
+    "mct_docs": "get_current_pat_annotations_mrc_cs",
+    "textual_obs_docs": "get_current_pat_textual_obs_annotations",
+    "reports": "get_current_pat_report_annotations",
+    "obs": "get_core_02",
+    "news": "get_news",
+    "bmi": "get_bmi_features",
+    "diagnostics": "get_current_pat_diagnostics",
+    "drugs": "get_current_pat_drugs",
+    "demo": "get_demo",
+    "bloods": "get_current_pat_bloods",
+    "appointments": "get_appointments",
+}
+
+# Default `_source` fields requested for each raw data source.
+BATCH_SOURCE_DEFAULT_FIELDS: Dict[str, List[str]] = {
+    source: get_default_fields_for_method(method_name)
+    for source, method_name in BATCH_SOURCE_GET_METHODS.items()
+}
+
+_OBSERVATION_REQUIRED_FIELDS = [
+    "client_idcode",
+    "obscatalogmasteritem_displayname",
+    "observation_valuetext_analysed",
+    "observationdocument_recordeddtm",
+]
+
+
+def _filter_term_lists(config_obj: Any) -> Dict[str, Any]:
+    """Returns the `filter_term_lists` of the data type filter, if any."""
+    data_type_filter_dict = getattr(config_obj, "data_type_filter_dict", None) or {}
+    return data_type_filter_dict.get("filter_term_lists") or {}
+
+
+def _split_clinical_notes(config_obj: Any) -> bool:
+    """Returns whether `split_and_append_chunks` runs on document batches.
+
+    The splitter also reads the `_id` and `_index` of each hit, which the
+    searcher adds to every row whatever the `_source` fields.
+    """
+    return getattr(config_obj, "split_clinical_notes", True)
+
+
+def _epr_docs_required_fields(config_obj: Any) -> List[str]:
+    fields = ["client_idcode", "document_guid", "body_analysed", "updatetime"]
+    if _split_clinical_notes(config_obj):
+        fields += ["document_description", "clientvisit_visitidcode"]
+    elif _filter_term_lists(config_obj).get("epr_docs") is not None:
+        fields.append("document_description")
+    return fields
+
+
+def _mct_docs_required_fields(config_obj: Any) -> List[str]:
+    fields = ["observation_guid", *_OBSERVATION_REQUIRED_FIELDS]
+    if _split_clinical_notes(config_obj):
+        fields.append("clientvisit_visitidcode")
+    return fields
+
+
+def _textual_obs_docs_required_fields(config_obj: Any) -> List[str]:
+    return [
+        "client_idcode",
+        "basicobs_guid",
+        "basicobs_entered",
+        config_obj.bloods_time_field,
+        "textualObs",
+    ]
+
+
+def _reports_required_fields(config_obj: Any) -> List[str]:
+    return [
+        "client_idcode",
+        "updatetime",
+        "textualObs",
+        "basicobs_guid",
+        "basicobs_value_analysed",
+    ]
+
+
+def _observation_required_fields(config_obj: Any) -> List[str]:
+    return list(_OBSERVATION_REQUIRED_FIELDS)
+
+
+def _diagnostics_required_fields(config_obj: Any) -> List[str]:
+    return ["client_idcode", "order_name", config_obj.diagnostic_time_field]
+
+
+def _drugs_required_fields(config_obj: Any) -> List[str]:
+    return ["client_idcode", "order_name", config_obj.drug_time_field]
+
+
+def _demo_required_fields(config_obj: Any) -> List[str]:
+    # `get_demographics3_batch` forward-fills the name fields, so all are read.
+    return [
+        "client_idcode",
+        "client_firstname",
+        "client_lastname",
+        "client_dob",
+        "client_gendercode",
+        "client_racecode",
+        "client_deceaseddtm",
+        "updatetime",
+    ]
+
+
+def _bloods_required_fields(config_obj: Any) -> List[str]:
+    return [
+        "client_idcode",
+        "basicobs_itemname_analysed",
+        "basicobs_value_numeric",
+        config_obj.bloods_time_field,
+    ]
+
+
+def _appointments_required_fields(config_obj: Any) -> List[str]:
+    return [
+        "HospitalID",
+        "Attended",
+        "ConsultantCode",
+        "ClinicCode",
+        "AppointmentType",
+        config_obj.appointments_time_field,
+    ]
+
+
+# Functions returning the fields the enabled features of each source read.
+BATCH_SOURCE_REQUIRED_FIELDS: Dict[str, Callable[[Any], List[str]]] = {
+    "epr_docs": _epr_docs_required_fields,
+    "mct_docs": _mct_docs_required_fields,
+    "textual_obs_docs": _textual_obs_docs_required_fields,
+    "reports": _reports_required_fields,
+    "obs": _observation_required_fields,
+    "news": _observation_required_fields,
+    "bmi": _observation_required_fields,
+    "diagnostics": _diagnostics_required_fields,
+    "drugs": _drugs_required_fields,
+    "demo": _demo_required_fields,
+    "bloods": _bloods_required_fields,
+    "appointments": _appointments_required_fields,
+}
+
+
+def plan_source_fields(source: str, config_obj: Any) -> List[str]:
+    """Computes the minimal `_source` field set for a raw data source.
+
+    The plan keeps the order of the source's default field list, adds any
+    configured time field that is not in the defaults, and then appends
+    user-supplied `config_obj.field_projection_extra_fields[source]`.
+
+    Args:
+        source: The data source key (e.g., 'bloods', 'epr_docs').
+        config_obj: The configuration object.
+
+    Returns:
+        The list of fields to request for `source`.
+
+    Raises:
+        ValueError: If `source` is not a known data source.
+    """
+    if source not in BATCH_SOURCE_REQUIRED_FIELDS:
+        raise ValueError(
+            f"Unknown data source '{source}'. "
+            f"Expected one of {sorted(BATCH_SOURCE_REQUIRED_FIELDS)}."
+        )
+
+    required = BATCH_SOURCE_REQUIRED_FIELDS[source](config_obj)
+    extra_fields = getattr(config_obj, "field_projection_extra_fields", None) or {}
+    required = required + list(extra_fields.get(source, []))
+
+    default_fields = BATCH_SOURCE_DEFAULT_FIELDS[source]
+    if getattr(config_obj, "prefetch_incremental", False):
+        # Incremental prefetches take their watermark from the update time.
+        required = required + [
+            field for field in default_fields if field == "updatetime"
+        ]
+    planned = [field for field in default_fields if field in required]
+    planned += [field for field in dict.fromkeys(required) if field not in planned]
+    return planned
+
+
+def get_source_fields(source: str, config_obj: Any) -> List[str]:
+    """Returns the `_source` fields to request for a raw data source.
+
+    Args:
+        source: The data source key (e.g., 'bloods', 'epr_docs').
+        config_obj: The configuration object. If `field_projection` is not
+            enabled, the source's default field list is returned unchanged.
+
+    Returns:
+        The list of fields to request for `source`.
+    """
+    if not getattr(config_obj, "field_projection", False):
+        return list(BATCH_SOURCE_DEFAULT_FIELDS[source])
+    return plan_source_fields(source, config_obj)
@@ -2,7 +2,48 @@ import pandas as pd
 
 
 from datetime import datetime
-from typing import Union
+from typing import Tuple, Union
+
+
+def get_timestamp_range(
+    start_year: Union[int, str],
+    start_month: Union[int, str],
+    end_year: Union[int, str],
+    end_month: Union[int, str],
+    start_day: Union[int, str],
+    end_day: Union[int, str],
+) -> Tuple[pd.Timestamp, pd.Timestamp]:
+    """Returns the inclusive UTC bounds of a date range.
+
+    The start is the beginning of its day and the end the end of its day.
+    Dates given in reverse order are swapped.
+    """
+    # Create start and end datetime objects
+    start_datetime = pd.Timestamp(
+        datetime(int(start_year), int(start_month), int(start_day), 0, 0, 0), tz="UTC"
+    )
+    end_datetime = pd.Timestamp(
+        datetime(int(end_year), int(end_month), int(end_day), 23, 59, 59, 999999),
+        tz="UTC",
+    )
+
+    # Ensure start date is earlier than end date
+    if start_datetime.replace(
+        hour=0, minute=0, second=0, microsecond=0
+    ) > end_datetime.replace(hour=0, minute=0, second=0, microsecond=0):
+        # Swap the entire dates, keeping the time components
+        start_temp = pd.Timestamp(
+            datetime(int(end_year), int(end_month), int(end_day), 0, 0, 0), tz="UTC"
+        )
+        end_temp = pd.Timestamp(
+            datetime(
+                int(start_year), int(start_month), int(start_day), 23, 59, 59, 999999
+            ),
+            tz="UTC",
+        )
+        start_datetime, end_datetime = start_temp, end_temp
+
+    return start_datetime, end_datetime
 
 
 def filter_dataframe_by_timestamp(
@@ -52,30 +93,9 @@ def filter_dataframe_by_timestamp(
     if dropna:
         df_copy = df_copy.dropna(subset=[timestamp_string])
 
-    # Create start and end datetime objects
-    start_datetime = pd.Timestamp(
-        datetime(int(start_year), int(start_month), int(start_day), 0, 0, 0), tz="UTC"
+    start_datetime, end_datetime = get_timestamp_range(
+        start_year, start_month, end_year, end_month, start_day, end_day
     )
-    end_datetime = pd.Timestamp(
-        datetime(int(end_year), int(end_month), int(end_day), 23, 59, 59, 999999),
-        tz="UTC",
-    )
-
-    # Ensure start date is earlier than end date
-    if start_datetime.replace(
-        hour=0, minute=0, second=0, microsecond=0
-    ) > end_datetime.replace(hour=0, minute=0, second=0, microsecond=0):
-        # Swap the entire dates, keeping the time components
-        start_temp = pd.Timestamp(
-            datetime(int(end_year), int(end_month), int(end_day), 0, 0, 0), tz="UTC"
-        )
-        end_temp = pd.Timestamp(
-            datetime(
-                int(start_year), int(start_month), int(start_day), 23, 59, 59, 999999
-            ),
-            tz="UTC",
-        )
-        start_datetime, end_datetime = start_temp, end_temp
 
     # Filter based on datetime range (this will automatically exclude NaN values)
     filtered_df = df_copy[
@@ -1,11 +1,98 @@
 import pandas as pd
-from typing import Any, List
+from typing import Any, Dict, Iterable, List, Tuple
 import logging
-from fuzzywuzzy import process
+import threading
+from collections import OrderedDict
+from rapidfuzz import fuzz, process, utils
 from pat2vec.util.methods_annotation_regex import append_regex_term_counts
 
 logger = logging.getLogger(__name__)
 
+#: Minimum WRatio score for a value to match a filter term.
+FUZZY_SCORE_CUTOFF = 80
+
+#: The number of scored values kept per filter term list.
+FUZZY_MATCH_CACHE_SIZE = 100_000
+
+#: The number of filter term lists scored values are kept for.
+FUZZY_MATCH_CACHE_TERM_LISTS = 16
+
+# Maps (filter terms, score cutoff) to {column value: matched}. Column values
+# repeat across batches, so each distinct value is scored once per term list
+# while it is cached. Both levels are kept in least recently used order and
+# evicted from the front once over their size. The cache lives in memory only
+# and is not kept between processes.
+_FUZZY_MATCH_CACHE: (
+    "OrderedDict[Tuple[Tuple[str, ...], int], OrderedDict[str, bool]]"
+) = OrderedDict()
+_FUZZY_MATCH_CACHE_LOCK = threading.Lock()
+
+
+def clear_fuzzy_match_cache() -> None:
+    """Clears the cache of fuzzy matched column values."""
+    with _FUZZY_MATCH_CACHE_LOCK:
+        _FUZZY_MATCH_CACHE.clear()
+
+
+def fuzzy_match_values(
+    values: Iterable[str],
+    filter_term_list: List[str],
+    score_cutoff: int = FUZZY_SCORE_CUTOFF,
+) -> Dict[str, bool]:
+    """Returns whether each value fuzzy matches any of the filter terms.
+
+    Values not already in the match cache are scored against all terms in a
+    single `rapidfuzz.process.cdist` call, using the same WRatio scorer and
+    string preprocessing as `fuzzywuzzy.process`. The cache keeps the
+    `FUZZY_MATCH_CACHE_SIZE` most recently used values of each of the
+    `FUZZY_MATCH_CACHE_TERM_LISTS` most recently used term lists.
+
+    Args:
+        values: The distinct column values to match.
+        filter_term_list: The terms to match against.
+        score_cutoff: The minimum score for a match.
+
+    Returns:
+        A dictionary mapping each value to True if it matched a term.
+    """
+    key = (tuple(str(term) for term in filter_term_list), score_cutoff)
+    result = {}
+    unseen = []
+    with _FUZZY_MATCH_CACHE_LOCK:
+        matches = _FUZZY_MATCH_CACHE.get(key)
+        if matches is None:
+            matches = _FUZZY_MATCH_CACHE[key] = OrderedDict()
+            if len(_FUZZY_MATCH_CACHE) > FUZZY_MATCH_CACHE_TERM_LISTS:
+                _FUZZY_MATCH_CACHE.popitem(last=False)
+        else:
+            _FUZZY_MATCH_CACHE.move_to_end(key)
+        for value in dict.fromkeys(values):
+            if value in matches:
+                matches.move_to_end(value)
+                result[value] = matches[value]
+            else:
+                unseen.append(value)
+
+    if unseen:
+        if key[0]:
+            scores = process.cdist(
+                key[0],
+                unseen,
+                scorer=fuzz.WRatio,
+                processor=utils.default_process,
+                score_cutoff=score_cutoff,
+                workers=-1,
+            )
+            matched = (scores >= score_cutoff).any(axis=0).tolist()
+        else:
+            matched = [False] * len(unseen)
+        result.update(zip(unseen, matched))
+        with _FUZZY_MATCH_CACHE_LOCK:
+            matches.update(zip(unseen, matched))
+            while len(matches) > FUZZY_MATCH_CACHE_SIZE:
+                matches.popitem(last=False)
+    return result
+
 
 def filter_dataframe_by_fuzzy_terms(
     df: pd.DataFrame,
@@ -15,9 +102,10 @@ def filter_dataframe_by_fuzzy_terms(
 ) -> pd.DataFrame:
     """Filters a DataFrame by fuzzy matching terms in a specified column.
 
-    This function iterates through a list of terms and finds the best fuzzy
-    matches in a DataFrame column. It returns a new DataFrame containing only
-    the rows that have a match score above a certain threshold (80).
+    Matching is done once per distinct value of the column (see
+    `fuzzy_match_values`) and the result is broadcast back to the rows. It
+    returns a new DataFrame containing only the rows whose value matches any
+    term with a score above a certain threshold (80).
 
     Args:
         df: The DataFrame to filter.
@@ -31,20 +119,23 @@ def filter_dataframe_by_fuzzy_terms(
     if verbose >= 1:
         logger.info("Filtering DataFrame by fuzzy terms...")
 
-    matched_indices = set()
-    for term in filter_term_list:
-        if verbose >= 1:
-            logger.info(f"Processing term: {term}")
-        matches = process.extractBests(term, df[column_name], score_cutoff=80)
-        for match, score, idx in matches:
-            if verbose >= 2:
-                logger.debug(f"Found match: {match} with similarity score: {score}")
-            matched_indices.add(idx)
+    column = df[column_name]
+    present = column.notna()
+    values = column[present].astype(str)
+    matches = fuzzy_match_values(values.unique(), filter_term_list)
+    matched_values = [value for value in values.unique() if matches[value]]
+
+    if verbose >= 2:
+        for value in matched_values:
+            logger.debug(f"Found match: {value}")
+
+    mask = present.copy()
+    mask[present] = values.isin(matched_values)
 
     if verbose >= 1:
         logger.info("Filtering complete.")
 
-    filtered_df = df[df.index.isin(matched_indices)]
+    filtered_df = df[mask]
     return filtered_df
 
 
@@ -12,11 +12,20 @@ from pat2vec.pat2vec_get_methods.get_method_bloods import BLOODS_FIELDS
 from pat2vec.pat2vec_get_methods.get_method_bmi import BMI_FIELDS
 from pat2vec.pat2vec_get_methods.get_method_core02 import CORE_O2_FIELDS
 from pat2vec.pat2vec_get_methods.get_method_core_resus import CORE_RESUS_FIELDS
+from pat2vec.pat2vec_get_methods.get_method_current_pat_annotations_mrc_cs import (
+    MCT_DOCS_FIELDS,
+)
 from pat2vec.pat2vec_get_methods.get_method_demo import DEMOGRAPHICS_FIELDS
 from pat2vec.pat2vec_get_methods.get_method_diagnostics import DIAGNOSTICS_FIELDS
 from pat2vec.pat2vec_get_methods.get_method_drugs import DRUG_FIELDS
 from pat2vec.pat2vec_get_methods.get_method_hosp_site import HOSP_SITE_FIELDS
+from pat2vec.pat2vec_get_methods.get_method_news import NEWS_FIELDS
+from pat2vec.pat2vec_get_methods.get_method_pat_annotations import EPR_DOCS_FIELDS
+from pat2vec.pat2vec_get_methods.get_method_report_annotations import REPORTS_FIELDS
 from pat2vec.pat2vec_get_methods.get_method_smoking import SMOKING_FIELDS
+from pat2vec.pat2vec_get_methods.get_method_textual_obs_annotations import (
+    TEXTUAL_OBS_DOCS_FIELDS,
+)
 from pat2vec.pat2vec_get_methods.get_method_vte_status import VTE_FIELDS
 
 # This dictionary maps the name of the 'get' function to the default
@@ -35,6 +44,11 @@ GET_METHOD_DEFAULT_FIELDS_MAP: Dict[str, List[str]] = {
     "get_hosp_site": HOSP_SITE_FIELDS,
     "get_smoking": SMOKING_FIELDS,
     "get_vte_status": VTE_FIELDS,
+    "get_news": NEWS_FIELDS,
+    "get_current_pat_annotations": EPR_DOCS_FIELDS,
+    "get_current_pat_annotations_mrc_cs": MCT_DOCS_FIELDS,
+    "get_current_pat_textual_obs_annotations": TEXTUAL_OBS_DOCS_FIELDS,
+    "get_current_pat_report_annotations": REPORTS_FIELDS,
 }
 
 
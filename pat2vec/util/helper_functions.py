@@ -595,8 +595,12 @@ def save_annotations_to_db(
     config_obj: Any,
     id_column: str = "client_idcode",
     schema_name: str = "annotations",
+    append: bool = False,
 ) -> None:
-    """Saves an annotation DataFrame to the database."""
+    """Saves an annotation DataFrame to the database.
+
+    The patient's existing rows are replaced, unless `append` is True.
+    """
     if getattr(config_obj, "storage_backend", "file") != "database":
         return
 
@@ -623,7 +627,7 @@ def save_annotations_to_db(
                     connection.execute(CreateSchema(schema_name))
 
             inspector = inspect(connection)
-            if inspector.has_table(target_table, schema=target_schema):
+            if not append and inspector.has_table(target_table, schema=target_schema):
                 connection.execute(del_query, {"pat_id": patient_id})
 
             # Convert list-like columns to JSON strings for database compatibility
@@ -0,0 +1,279 @@
+"""
+Incremental annotation of the documents a patient gains between runs.
+
+Annotation outputs are otherwise all-or-nothing: an existing output is read
+as it is, so documents fetched since it was written are never annotated, and
+the only alternative is to overwrite it and re-annotate everything. With
+`config_obj.annotation_incremental`, each output instead tracks the GUIDs of
+the documents it covers. A later run annotates only documents whose GUID is
+not tracked and appends their entities, so a refresh costs in proportion to
+the new text.
+
+With the 'file' backend, the GUIDs of all annotated documents, including
+those MedCAT found no entities in, are kept in a `<client_idcode>.guids` file
+next to the annotation output. With the 'database' backend, the GUID column of
+the stored annotations is used, so documents without entities are annotated
+again; the annotation cache makes that cheap.
+
+With `config_obj.annotation_filter_at_write`, the annotation filter is applied
+once here rather than on every read. The stored annotations record the filter
+in an `annotation_filter` column, so readers filtering with the same arguments
+skip the second pass. With `config_obj.annotation_keep_unfiltered`, the full
+annotations are kept alongside, in the `unfiltered` subdirectory of the 'file'
+backend or the `<table_name>_unfiltered` table of the 'database' backend.
+"""
+
+import os
+from typing import Any, Dict, Iterable, Optional, Set
+
+import pandas as pd
+
+from pat2vec.util.annotation_io import (
+    ANNOTATION_FILTER_COLUMN,
+    GUIDS_SUFFIX,
+    UNFILTERED_ANNOTATIONS_DIR,
+    annotation_filter_provenance,
+    annotation_output_path,
+    find_annotation_output,
+    read_annotation_output,
+    write_annotation_frame,
+)
+from pat2vec.util.helper_functions import save_annotations_to_db
+from pat2vec.util.post_processing import filter_annot_dataframe2
+
+
+def is_incremental(
+    config_obj: Any, overwrite_attr: str = "overwrite_stored_pat_docs"
+) -> bool:
+    """Returns whether existing annotation outputs are extended incrementally.
+
+    Args:
+        config_obj: The configuration object.
+        overwrite_attr: The config flag forcing the source's annotations to
+            be recomputed, which takes precedence.
+    """
+    return bool(getattr(config_obj, "annotation_incremental", False)) and not bool(
+        getattr(config_obj, overwrite_attr, False)
+    )
+
+
+def guids_path(annotation_path: str) -> str:
+    """Returns the GUID tracking file of an annotation output."""
+    return os.path.splitext(annotation_path)[0] + GUIDS_SUFFIX
+
+
+def read_annotated_guids(
+    annotation_path: str,
+    guid_column: str,
+    existing: Optional[pd.DataFrame] = None,
+) -> Set[str]:
+    """Returns the GUIDs of the documents an annotation output covers.
+
+    Args:
+        annotation_path: The patient's annotation output.
+        guid_column: The document identifier column of the source.
+        existing: The annotations already loaded, if any. Otherwise the GUID
+            column is read from `annotation_path`, if it exists.
+
+    Returns:
+        The GUIDs in the annotations and in the tracking file.
+    """
+    if existing is None and os.path.exists(annotation_path):
+        existing = read_annotation_output(annotation_path, columns=[guid_column])
+
+    guids: Set[str] = set()
+    if existing is not None and guid_column in existing.columns:
+        guids.update(existing[guid_column].dropna().astype(str))
+
+    tracking_path = guids_path(annotation_path)
+    if os.path.exists(tracking_path):
+        with open(tracking_path) as f:
+            guids.update(line.strip() for line in f if line.strip())
+    return guids
+
+
+def select_unannotated_documents(
+    pat_batch: pd.DataFrame, annotated_guids: Set[str], guid_column: str
+) -> pd.DataFrame:
+    """Returns the documents of `pat_batch` whose GUID is not yet annotated.
+
+    Documents are kept if the batch has no `guid_column`, as they cannot be
+    tracked.
+    """
+    if guid_column not in pat_batch.columns or not annotated_guids:
+        return pat_batch
+    return pat_batch[~pat_batch[guid_column].astype(str).isin(annotated_guids)]
+
+
+def get_write_filter_arguments(config_obj: Any) -> Optional[Dict[str, Any]]:
+    """Returns the filter applied when annotations are written, if any.
+
+    This is `config_obj.annot_filter_options`, or the default
+    `config_obj.filter_arguments` when no options are given, provided
+    `config_obj.annotation_filter_at_write` is set.
+    """
+    if not getattr(config_obj, "annotation_filter_at_write", False):
+        return None
+    filter_args = getattr(config_obj, "annot_filter_options", None)
+    if filter_args is None:
+        filter_args = getattr(config_obj, "filter_arguments", None)
+    return filter_args or None
+
+
+def filter_annotations_at_write(
+    final_df: pd.DataFrame, filter_args: Dict[str, Any]
+) -> pd.DataFrame:
+    """Filters annotations and records the filter as their provenance.
+
+    The filter is applied to a copy, as it coerces some columns, and the
+    matching rows of `final_df` are returned unchanged otherwise.
+    """
+    original = final_df.reset_index(drop=True)
+    kept = filter_annot_dataframe2(original.copy(), filter_args).index
+    filtered = original.loc[kept].reset_index(drop=True)
+    filtered[ANNOTATION_FILTER_COLUMN] = annotation_filter_provenance(filter_args)
+    return filtered
+
+
+def _record_annotated_guids(
+    annotation_path: str, guids: Iterable[str], append: bool
+) -> None:
+    """Writes or appends the GUIDs of newly annotated documents."""
+    with open(guids_path(annotation_path), "a" if append else "w") as f:
+        for guid in dict.fromkeys(str(guid) for guid in guids):
+            f.write(f"{guid}\n")
+
+
+def _append_output(
+    existing_path: str, annotation_path: str, final_df: pd.DataFrame
+) -> None:
+    """Appends annotations to an existing output.
+
+    CSV outputs with the same columns are appended to in place. Otherwise the
+    output is rewritten to `annotation_path`, in the configured format.
+    """
+    if existing_path == annotation_path and annotation_path.endswith(".csv"):
+        header = pd.read_csv(annotation_path, nrows=0).columns.tolist()
+        if header == final_df.columns.tolist():
+            final_df.to_csv(annotation_path, mode="a", header=False, index=False)
+            return
+
+    combined = pd.concat(
+        [read_annotation_output(existing_path), final_df], ignore_index=True
+    )
+    write_annotation_frame(combined, annotation_path)
+    if existing_path != annotation_path:
+        os.remove(existing_path)
+
+
+def write_annotation_output(
+    final_df: pd.DataFrame,
+    pat_batch: pd.DataFrame,
+    current_pat_client_idcode: str,
+    annotation_batch_path: str,
+    table_name: str,
+    config_obj: Any,
+    guid_column: str,
+    overwrite_attr: str = "overwrite_stored_pat_docs",
+) -> pd.DataFrame:
+    """Writes a patient's annotations to the configured storage backend.
+
+    In incremental mode, the annotations are appended to the patient's
+    existing output, otherwise they replace it. With the 'file' backend, the
+    GUIDs of all documents in `pat_batch` are tracked as annotated. In
+    filter-at-write mode, only the annotations passing the filter are stored.
+
+    Args:
+        final_df: The annotations of the documents in `pat_batch`.
+        pat_batch: The documents that were annotated.
+        current_pat_client_idcode: The patient's ID code.
+        annotation_batch_path: The annotation output directory of the source.
+        table_name: The annotations table of the 'database' backend.
+        config_obj: The configuration object.
+        guid_column: The document identifier column of the source.
+        overwrite_attr: The config flag forcing the source's annotations to
+            be recomputed.
+
+    Returns:
+        The stored annotations.
+    """
+    append = is_incremental(config_obj, overwrite_attr)
+
+    filter_args = get_write_filter_arguments(config_obj)
+    if filter_args is not None:
+        if getattr(config_obj, "annotation_keep_unfiltered", False):
+            _store_annotations(
+                final_df,
+                pat_batch,
+                current_pat_client_idcode,
+                os.path.join(annotation_batch_path, UNFILTERED_ANNOTATIONS_DIR),
+                f"{table_name}_unfiltered",
+                config_obj,
+                guid_column,
+                append,
+            )
+        final_df = filter_annotations_at_write(final_df, filter_args)
+
+    _store_annotations(
+        final_df,
+        pat_batch,
+        current_pat_client_idcode,
+        annotation_batch_path,
+        table_name,
+        config_obj,
+        guid_column,
+        append,
+    )
+    return final_df
+
+
+def _store_annotations(
+    final_df: pd.DataFrame,
+    pat_batch: pd.DataFrame,
+    current_pat_client_idcode: str,
+    annotation_batch_path: str,
+    table_name: str,
+    config_obj: Any,
+    guid_column: str,
+    append: bool,
+) -> None:
+    """Writes or appends annotations to one output of the storage backend."""
+    if getattr(config_obj, "storage_backend", "file") == "database":
+        save_annotations_to_db(
+            final_df, current_pat_client_idcode, table_name, config_obj, append=append
+        )
+        return
+
+    os.makedirs(annotation_batch_path, exist_ok=True)
+    annotation_path = annotation_output_path(
+        annotation_batch_path, current_pat_client_idcode, config_obj
+    )
+    existing_path = find_annotation_output(
+        annotation_batch_path, current_pat_client_idcode
+    )
+    exists = existing_path is not None
+    if append and exists:
+        _append_output(existing_path, annotation_path, final_df)
+    else:
+        write_annotation_frame(final_df, annotation_path)
+        if exists and existing_path != annotation_path:
+            # Do not leave a stale output in another format behind.
+            os.remove(existing_path)
+
+    if guid_column in pat_batch.columns:
+        _record_annotated_guids(
+            annotation_path,
+            pat_batch[guid_column].dropna(),
+            append=append and exists,
+        )
+
+
+def combine_annotations(
+    existing: Optional[pd.DataFrame], new: Optional[pd.DataFrame]
+) -> Optional[pd.DataFrame]:
+    """Returns the existing annotations extended by the newly created ones."""
+    if existing is None or existing.empty:
+        return new
+    if new is None or new.empty:
+        return existing
+    return pd.concat([existing, new], ignore_index=True)
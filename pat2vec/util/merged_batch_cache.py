@@ -0,0 +1,509 @@
+"""
+Reads and writes the `merged_*_batches` caches of the 'file' storage backend.
+
+The caches were CSV files, which are slow to parse and lose dtypes. They are
+now written as Parquet (default) or Feather files next to the legacy CSV
+path, and read memory-mapped with optional column projection. A legacy CSV
+cache is still read if no Arrow cache exists.
+"""
+
+import logging
+import os
+from functools import lru_cache
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+import pyarrow.parquet as pq
+
+from pat2vec.util.arrow_utils import (
+    conform_arrow_table,
+    dataframe_to_arrow_table,
+    unify_arrow_schemas,
+)
+
+logger = logging.getLogger(__name__)
+
+#: File extension for each supported merged batch format.
+MERGED_BATCH_EXTENSIONS = {"parquet": ".parquet", "feather": ".feather", "csv": ".csv"}
+#: Suffix of the patient index sidecar written next to a merged batch.
+MERGED_INDEX_SUFFIX = ".index.parquet"
+#: Number of rows per Parquet row group or Feather record batch.
+MERGED_ROW_GROUP_SIZE = 65536
+
+
+def merged_batch_path(csv_path: str, fmt: str) -> str:
+    """Returns the cache path for `fmt` given the legacy CSV cache path.
+
+    Args:
+        csv_path: The legacy `merged_*_batches.csv` path.
+        fmt: One of 'parquet', 'feather' or 'csv'.
+
+    Returns:
+        The cache path with the extension for `fmt`.
+
+    Raises:
+        ValueError: If `fmt` is not a supported format.
+    """
+    if fmt not in MERGED_BATCH_EXTENSIONS:
+        raise ValueError(
+            f"Unsupported merged batch format '{fmt}'. "
+            f"Expected one of {list(MERGED_BATCH_EXTENSIONS)}."
+        )
+    return os.path.splitext(csv_path)[0] + MERGED_BATCH_EXTENSIONS[fmt]
+
+
+def find_merged_batch(csv_path: str) -> Optional[str]:
+    """Returns the path of an existing cache, preferring Arrow formats.
+
+    Args:
+        csv_path: The legacy `merged_*_batches.csv` path.
+
+    Returns:
+        The path of the Parquet, Feather or CSV cache, or None if none exist.
+    """
+    for fmt in MERGED_BATCH_EXTENSIONS:
+        path = merged_batch_path(csv_path, fmt)
+        if os.path.exists(path):
+            return path
+    return None
+
+
+def merged_batch_exists(csv_path: str) -> bool:
+    """Checks whether any cache exists for a merged batch."""
+    return find_merged_batch(csv_path) is not None
+
+
+def merged_batch_index_path(csv_path: str) -> str:
+    """Returns the patient index sidecar path for a merged batch."""
+    return os.path.splitext(csv_path)[0] + MERGED_INDEX_SUFFIX
+
+
+def _row_group_starts(path: str) -> np.ndarray:
+    """Returns the first row of each Parquet row group or Feather record batch."""
+    if path.endswith(".feather"):
+        with pa.memory_map(path) as source:
+            reader = pa.ipc.open_file(source)
+            lengths = [
+                reader.get_batch(i).num_rows for i in range(reader.num_record_batches)
+            ]
+    else:
+        metadata = pq.ParquetFile(path).metadata
+        lengths = [
+            metadata.row_group(i).num_rows for i in range(metadata.num_row_groups)
+        ]
+    return np.concatenate([[0], np.cumsum(lengths)[:-1]]).astype(np.int64)
+
+
+def build_merged_batch_index(
+    df: pd.DataFrame, path: str, client_idcode_column: str
+) -> pd.DataFrame:
+    """Builds the patient index of a merged batch sorted by patient.
+
+    Args:
+        df: The merged batch, in the row order it was written to `path`.
+        path: The Parquet or Feather file `df` was written to.
+        client_idcode_column: The name of the patient id column.
+
+    Returns:
+        A DataFrame with one row per patient: `client_idcode`, `row_group`
+        (the row group or record batch holding the patient's first row),
+        `offset` (the first row's position within it) and `length`.
+    """
+    keys = df[client_idcode_column].astype(str).to_numpy()
+    if len(keys) == 0:
+        return pd.DataFrame(columns=["client_idcode", "row_group", "offset", "length"])
+
+    starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+    lengths = np.diff(np.r_[starts, len(keys)])
+    group_starts = _row_group_starts(path)
+    row_groups = np.searchsorted(group_starts, starts, side="right") - 1
+
+    return pd.DataFrame(
+        {
+            "client_idcode": keys[starts],
+            "row_group": row_groups,
+            "offset": starts - group_starts[row_groups],
+            "length": lengths,
+        }
+    )
+
+
+def save_merged_batch(
+    df: pd.DataFrame,
+    csv_path: str,
+    config_obj: Any = None,
+    client_idcode_column: str = "client_idcode",
+) -> str:
+    """Writes a merged batch cache in the configured format.
+
+    For the Parquet and Feather formats the rows are sorted by patient and a
+    patient index sidecar is written next to the cache (see
+    `read_patient_from_merged_batch`). Caches of the other formats for the
+    same batch are removed so that a stale cache is never preferred on the
+    next load.
+
+    Args:
+        df: The merged batch.
+        csv_path: The legacy `merged_*_batches.csv` path.
+        config_obj: The configuration object. `config_obj.merged_batch_format`
+            selects the format and defaults to 'parquet'.
+        client_idcode_column: The name of the patient id column to index.
+
+    Returns:
+        The path written.
+    """
+    fmt = getattr(config_obj, "merged_batch_format", "parquet") or "parquet"
+    path = merged_batch_path(csv_path, fmt)
+    index_path = merged_batch_index_path(csv_path)
+    indexed = fmt != "csv" and client_idcode_column in df.columns
+
+    if indexed:
+        df = df.sort_values(client_idcode_column, kind="mergesort")
+
+    if fmt == "csv":
+        df.to_csv(path, index=False)
+    elif fmt == "feather":
+        # Uncompressed Feather files can be memory-mapped without a copy.
+        feather.write_feather(
+            dataframe_to_arrow_table(df),
+            path,
+            compression="uncompressed",
+            chunksize=MERGED_ROW_GROUP_SIZE,
+        )
+    else:
+        pq.write_table(
+            dataframe_to_arrow_table(df), path, row_group_size=MERGED_ROW_GROUP_SIZE
+        )
+
+    if indexed:
+        index = build_merged_batch_index(df, path, client_idcode_column)
+        pq.write_table(pa.Table.from_pandas(index, preserve_index=False), index_path)
+    elif os.path.exists(index_path):
+        os.remove(index_path)
+
+    _remove_other_formats(csv_path, fmt)
+    return path
+
+
+def _remove_other_formats(csv_path: str, fmt: str) -> None:
+    for other_fmt in MERGED_BATCH_EXTENSIONS:
+        other_path = merged_batch_path(csv_path, other_fmt)
+        if other_fmt != fmt and os.path.exists(other_path):
+            os.remove(other_path)
+
+
+def _tmp_path(path: str) -> str:
+    """Returns the temporary name a file is written under, keeping its extension."""
+    root, ext = os.path.splitext(path)
+    return f"{root}.tmp{ext}"
+
+
+def _assemble_merged_batch(
+    part_paths: List[str],
+    path: str,
+    index_path: str,
+    fmt: str,
+    client_idcode_column: str,
+) -> bool:
+    """Writes the parts of `write_merged_batch_parts` to `path` and its index.
+
+    Returns:
+        True if the index was written to `index_path`.
+    """
+    schema = unify_arrow_schemas([pq.read_schema(p) for p in part_paths])
+    indexed = fmt != "csv" and client_idcode_column in schema.names
+
+    keys, starts, lengths = [], [], []
+    n_rows = 0
+    writer = None
+    try:
+        if fmt == "parquet":
+            writer = pq.ParquetWriter(path, schema)
+        elif fmt == "feather":
+            writer = pa.ipc.new_file(
+                path, schema, options=pa.ipc.IpcWriteOptions(compression=None)
+            )
+        elif os.path.exists(path):
+            os.remove(path)
+
+        for part_path in part_paths:
+            table = conform_arrow_table(pq.read_table(part_path), schema)
+            if fmt == "parquet":
+                writer.write_table(table, row_group_size=MERGED_ROW_GROUP_SIZE)
+            elif fmt == "feather":
+                writer.write_table(table, max_chunksize=MERGED_ROW_GROUP_SIZE)
+            else:
+                table.to_pandas().to_csv(
+                    path, mode="a", header=n_rows == 0, index=False
+                )
+
+            if indexed and table.num_rows:
+                part_keys = table.column(client_idcode_column).to_pandas()
+                part_keys = part_keys.astype(str).to_numpy()
+                part_starts = np.flatnonzero(
+                    np.r_[True, part_keys[1:] != part_keys[:-1]]
+                )
+                keys.append(part_keys[part_starts])
+                starts.append(part_starts + n_rows)
+                lengths.append(np.diff(np.r_[part_starts, len(part_keys)]))
+            n_rows += table.num_rows
+    finally:
+        if writer is not None:
+            writer.close()
+
+    if fmt == "csv" and n_rows == 0:
+        pd.DataFrame(columns=schema.names).to_csv(path, index=False)
+
+    if indexed:
+        starts_array = np.concatenate(starts) if starts else np.array([], np.int64)
+        group_starts = _row_group_starts(path)
+        row_groups = np.searchsorted(group_starts, starts_array, side="right") - 1
+        index = pd.DataFrame(
+            {
+                "client_idcode": np.concatenate(keys) if keys else [],
+                "row_group": row_groups,
+                "offset": starts_array - group_starts[row_groups],
+                "length": np.concatenate(lengths) if lengths else [],
+            }
+        )
+        pq.write_table(pa.Table.from_pandas(index, preserve_index=False), index_path)
+    return indexed
+
+
+def write_merged_batch_parts(
+    part_paths: List[str],
+    csv_path: str,
+    config_obj: Any = None,
+    client_idcode_column: str = "client_idcode",
+) -> str:
+    """Assembles a merged batch cache from Parquet part files, one at a time.
+
+    This is the streaming counterpart of `save_merged_batch`: only one part is
+    held in memory. Parts are conformed to their unified schema (see
+    `pat2vec.util.arrow_utils.unify_arrow_schemas`). Each part must be sorted
+    by patient and no patient may span two parts, as is the case for parts
+    fetched by patient chunk; the patient index is then built as the parts
+    are written.
+
+    The cache and its index are written under temporary names and renamed
+    into place once complete, so an error never leaves a partial cache that
+    later runs would reuse.
+
+    Args:
+        part_paths: The Parquet part files, in order.
+        csv_path: The legacy `merged_*_batches.csv` path.
+        config_obj: The configuration object. `config_obj.merged_batch_format`
+            selects the format and defaults to 'parquet'.
+        client_idcode_column: The name of the patient id column to index.
+
+    Returns:
+        The path written.
+    """
+    fmt = getattr(config_obj, "merged_batch_format", "parquet") or "parquet"
+    path = merged_batch_path(csv_path, fmt)
+    index_path = merged_batch_index_path(csv_path)
+    tmp_path = _tmp_path(path)
+    tmp_index_path = _tmp_path(index_path)
+    try:
+        indexed = _assemble_merged_batch(
+            part_paths, tmp_path, tmp_index_path, fmt, client_idcode_column
+        )
+    except BaseException:
+        for leftover in (tmp_path, tmp_index_path):
+            if os.path.exists(leftover):
+                os.remove(leftover)
+        raise
+
+    os.replace(tmp_path, path)
+    if indexed:
+        os.replace(tmp_index_path, index_path)
+    elif os.path.exists(index_path):
+        os.remove(index_path)
+    _remove_other_formats(csv_path, fmt)
+    return path
+
+
+@lru_cache(maxsize=32)
+def _load_merged_batch_index(
+    index_path: str, mtime_ns: int
+) -> Dict[str, Tuple[int, int, int]]:
+    """Loads an index sidecar as a dict, cached until the file changes."""
+    index = pq.read_table(index_path).to_pandas()
+    return {
+        key: (int(row_group), int(offset), int(length))
+        for key, row_group, offset, length in zip(
+            index["client_idcode"], index["row_group"], index["offset"], index["length"]
+        )
+    }
+
+
+def get_merged_batch_index(csv_path: str) -> Optional[Dict[str, Tuple[int, int, int]]]:
+    """Returns the patient index of a merged batch, or None if it has none.
+
+    Args:
+        csv_path: The legacy `merged_*_batches.csv` path.
+
+    Returns:
+        A dict mapping each `client_idcode` to `(row_group, offset, length)`.
+    """
+    index_path = merged_batch_index_path(csv_path)
+    if not os.path.exists(index_path):
+        return None
+    return _load_merged_batch_index(index_path, os.stat(index_path).st_mtime_ns)
+
+
+def read_patient_from_merged_batch(
+    csv_path: str, client_idcode: str, columns: Optional[List[str]] = None
+) -> Optional[pd.DataFrame]:
+    """Reads one patient's rows from an indexed merged batch.
+
+    The index gives the row group (or record batch) and offset of the
+    patient's first row, so only the row groups holding the patient are read.
+
+    Args:
+        csv_path: The legacy `merged_*_batches.csv` path.
+        client_idcode: The patient id to read.
+        columns: An optional list of columns to read.
+
+    Returns:
+        The patient's rows, or None if the batch has no index or the patient
+        is not in it.
+    """
+    index = get_merged_batch_index(csv_path)
+    if index is None or str(client_idcode) not in index:
+        return None
+    path = find_merged_batch(csv_path)
+    if path is None or path.endswith(".csv"):
+        return None
+
+    row_group, offset, length = index[str(client_idcode)]
+    group_starts = _row_group_starts(path)
+    last_group = (
+        np.searchsorted(
+            group_starts, group_starts[row_group] + offset + length - 1, side="right"
+        )
+        - 1
+    )
+    row_groups = list(range(row_group, last_group + 1))
+
+    if path.endswith(".feather"):
+        with pa.memory_map(path) as source:
+            reader = pa.ipc.open_file(source)
+            table = pa.Table.from_batches([reader.get_batch(i) for i in row_groups])
+            table = table.slice(offset, length)
+            if columns is not None:
+                table = table.select([c for c in columns if c in table.column_names])
+            return table.to_pandas()
+
+    parquet_file = pq.ParquetFile(path, memory_map=True)
+    if columns is not None:
+        columns = [c for c in columns if c in parquet_file.schema_arrow.names]
+    table = parquet_file.read_row_groups(row_groups, columns=columns)
+    return table.slice(offset, length).to_pandas()
+
+
+def iter_merged_batch(
+    csv_path: str,
+    client_idcode_column: str = "client_idcode",
+    batch_size: int = MERGED_ROW_GROUP_SIZE,
+) -> Iterator[pd.DataFrame]:
+    """Yields a merged batch cache in chunks that never split a patient.
+
+    Parquet and Feather caches are sorted by patient and are read a record
+    batch at a time; the rows of the last patient in a batch are held back
+    until the patient's run ends. A legacy CSV cache is read in one chunk.
+
+    Args:
+        csv_path: The legacy `merged_*_batches.csv` path.
+        client_idcode_column: The name of the patient id column.
+        batch_size: The number of rows to read at a time.
+
+    Yields:
+        DataFrames holding all rows of the patients they contain.
+
+    Raises:
+        FileNotFoundError: If no cache exists.
+    """
+    path = find_merged_batch(csv_path)
+    if path is None:
+        raise FileNotFoundError(f"No merged batch cache found for {csv_path}")
+    if path.endswith(".csv"):
+        yield pd.read_csv(path)
+        return
+
+    if path.endswith(".feather"):
+        batches = feather.read_table(path, memory_map=True).to_batches(batch_size)
+    else:
+        batches = pq.ParquetFile(path, memory_map=True).iter_batches(batch_size)
+
+    carry = None
+    for batch in batches:
+        df = batch.to_pandas()
+        if carry is not None:
+            df = pd.concat([carry, df], ignore_index=True)
+            carry = None
+        if df.empty:
+            continue
+        if client_idcode_column not in df.columns:
+            yield df
+            continue
+        ids = df[client_idcode_column].astype(str)
+        last_run = ids == ids.iloc[-1]
+        carry = df[last_run]
+        if (~last_run).any():
+            yield df[~last_run].reset_index(drop=True)
+    if carry is not None and not carry.empty:
+        yield carry.reset_index(drop=True)
+
+
+def remove_merged_batch(csv_path: str) -> None:
+    """Removes every cache of a merged batch, and its patient index.
+
+    Args:
+        csv_path: The legacy `merged_*_batches.csv` path.
+    """
+    paths = [merged_batch_path(csv_path, fmt) for fmt in MERGED_BATCH_EXTENSIONS]
+    for path in [*paths, merged_batch_index_path(csv_path)]:
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def load_merged_batch(
+    csv_path: str, columns: Optional[List[str]] = None
+) -> pd.DataFrame:
+    """Loads a merged batch cache, memory-mapped where the format allows.
+
+    Args:
+        csv_path: The legacy `merged_*_batches.csv` path.
+        columns: An optional list of columns to read. Columns missing from the
+            cache are ignored.
+
+    Returns:
+        The merged batch.
+
+    Raises:
+        FileNotFoundError: If no cache exists.
+    """
+    path = find_merged_batch(csv_path)
+    if path is None:
+        raise FileNotFoundError(f"No merged batch cache found for {csv_path}")
+
+    if path.endswith(".csv"):
+        logger.info(f"Loading legacy CSV merged batch {path}.")
+        if columns is None:
+            return pd.read_csv(path)
+        return pd.read_csv(path, usecols=lambda col: col in columns)
+
+    if path.endswith(".feather"):
+        table = feather.read_table(path, memory_map=True)
+        if columns is not None:
+            table = table.select([col for col in columns if col in table.column_names])
+        return table.to_pandas()
+
+    if columns is not None:
+        schema_names = pq.read_schema(path).names
+        columns = [col for col in columns if col in schema_names]
+    return pq.read_table(path, columns=columns, memory_map=True).to_pandas()
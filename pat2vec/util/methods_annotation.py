@@ -1,11 +1,12 @@
-import os
 import logging
 import pandas as pd
 from typing import Any, Dict, List, Optional
 from sqlalchemy import text
-from pat2vec.util.helper_functions import save_annotations_to_db
-from pat2vec.util.methods_annotation_json_to_dataframe import json_to_dataframe
-from pat2vec.util.methods_get import exist_check, update_pbar
+from pat2vec.util.annotation_cache import get_entities_multi_texts_cached
+from pat2vec.util.annotation_io import find_annotation_output
+from pat2vec.util.incremental_annotation import write_annotation_output
+from pat2vec.util.methods_annotation_json_to_dataframe import annots_to_dataframe
+from pat2vec.util.methods_get import update_pbar
 from pat2vec.util.post_processing import (
     join_icd10_codes_to_annot,
     join_icd10_OPC4S_codes_to_annot,
@@ -50,16 +51,13 @@ def check_pat_document_annotation_complete(
         except Exception:
             return False
 
-    pre_document_annotation_batch_path = config_obj.pre_document_annotation_batch_path
-
-    current_pat_batch_annot_path = os.path.join(
-        pre_document_annotation_batch_path, current_pat_client_id_code + ".csv"
+    return (
+        find_annotation_output(
+            config_obj.pre_document_annotation_batch_path, current_pat_client_id_code
+        )
+        is not None
     )
 
-    bool1 = exist_check(current_pat_batch_annot_path, config_obj=config_obj)
-
-    return bool1
-
 
 def annot_pat_batch_docs(
     current_pat_client_idcode: str,
@@ -98,7 +96,9 @@ def annot_pat_batch_docs(
         config_obj=config_obj,
     )
 
-    multi_annots = cat.get_entities_multi_texts(pat_batch[text_column].dropna())
+    multi_annots = get_entities_multi_texts_cached(
+        cat, pat_batch[text_column].dropna(), config_obj
+    )
 
     return multi_annots
 
@@ -142,10 +142,6 @@ def multi_annots_to_df_textual_obs(
         config_obj.pre_textual_obs_annotation_batch_path
     )
 
-    current_pat_document_annotation_batch_path = os.path.join(
-        pre_document_annotation_batch_path, current_pat_client_idcode + ".csv"
-    )
-
     update_pbar(
         current_pat_client_idcode,
         start_time,
@@ -156,83 +152,34 @@ def multi_annots_to_df_textual_obs(
         config_obj=config_obj,
     )
 
-    col_list = [
-        "client_idcode",
-        time_column,
-        "pretty_name",
-        "cui",
-        "type_ids",
-        "types",
-        "source_value",
-        "detected_name",
-        "acc",
-        "context_similarity",
-        "start",
-        "end",
-        "icd10",
-        "ontologies",
-        "snomed",
-        "id",
-        "Time_Value",
-        "Time_Confidence",
-        "Presence_Value",
-        "Presence_Confidence",
-        "Subject_Value",
-        "Subject_Confidence",
-        "text_sample",
-        "full_doc",
-        guid_column,
-    ]
-
-    all_annot_dfs = []
-
-    for i in range(0, len(pat_batch)):
-
-        doc_to_annot_df = json_to_dataframe(
-            json_data=multi_annots[i],
-            doc=pat_batch.iloc[i],
-            current_pat_client_id_code=current_pat_client_idcode,
-            text_column=text_column,
-            time_column=time_column,
-            guid_column=guid_column,
-            include_text_sample=include_text_sample,
-        )
-
-        # drop nan rows
-        # Check for NaN values in any column of the specified list
-        col_list_drop_nan = [
-            "client_idcode",
-            time_column,
-        ]
-
-        if config_obj.verbosity >= 14:
-            logger.debug(f"multi_annots_to_df_textualObs: {len(doc_to_annot_df)}")
-        rows_with_nan = doc_to_annot_df[
-            doc_to_annot_df[col_list_drop_nan].isna().any(axis=1)
-        ]
-
-        # Drop rows with NaN values
-        doc_to_annot_df = doc_to_annot_df.drop(rows_with_nan.index).copy()
-        if config_obj.verbosity >= 14:
-            logger.debug(f"multi_annots_to_df_textualObs: {len(doc_to_annot_df)}")
-
-        all_annot_dfs.append(doc_to_annot_df)
-
-    if all_annot_dfs:
-        final_df = pd.concat(all_annot_dfs, ignore_index=True)
-    else:
-        final_df = pd.DataFrame(columns=col_list)
+    final_df = annots_to_dataframe(
+        multi_annots,
+        pat_batch,
+        current_pat_client_idcode,
+        text_column=text_column,
+        time_column=time_column,
+        guid_column=guid_column,
+        include_text_sample=include_text_sample,
+    )
 
     if config_obj.add_icd10 and config_obj.add_opc4s:
-        final_df = join_icd10_OPC4S_codes_to_annot(df=final_df, inner=False)
+        final_df = join_icd10_OPC4S_codes_to_annot(
+            df=final_df, inner=False, config_obj=config_obj
+        )
     elif config_obj.add_icd10:
-        final_df = join_icd10_codes_to_annot(df=final_df, inner=False)
-
-    if getattr(config_obj, "storage_backend", "file") == "file":
-        final_df.to_csv(current_pat_document_annotation_batch_path, index=False)
+        final_df = join_icd10_codes_to_annot(
+            df=final_df, inner=False, config_obj=config_obj
+        )
 
-    save_annotations_to_db(
-        final_df, current_pat_client_idcode, "ann_textual_obs", config_obj
+    final_df = write_annotation_output(
+        final_df,
+        pat_batch,
+        current_pat_client_idcode,
+        pre_document_annotation_batch_path,
+        "ann_textual_obs",
+        config_obj,
+        guid_column=guid_column,
+        overwrite_attr="overwrite_stored_pat_observations",
     )
 
     return final_df
@@ -277,10 +224,6 @@ def multi_annots_to_df_reports(
         config_obj.pre_document_annotation_batch_path_reports
     )
 
-    current_pat_document_annotation_batch_path = os.path.join(
-        pre_document_annotation_batch_path, current_pat_client_idcode + ".csv"
-    )
-
     update_pbar(
         current_pat_client_idcode,
         start_time,
@@ -291,83 +234,33 @@ def multi_annots_to_df_reports(
         config_obj=config_obj,
     )
 
-    col_list = [
-        "client_idcode",
-        time_column,
-        "pretty_name",
-        "cui",
-        "type_ids",
-        "types",
-        "source_value",
-        "detected_name",
-        "acc",
-        "context_similarity",
-        "start",
-        "end",
-        "icd10",
-        "ontologies",
-        "snomed",
-        "id",
-        "Time_Value",
-        "Time_Confidence",
-        "Presence_Value",
-        "Presence_Confidence",
-        "Subject_Value",
-        "Subject_Confidence",
-        "text_sample",
-        "full_doc",
-        guid_column,
-    ]
-
-    all_annot_dfs = []
-
-    for i in range(0, len(pat_batch)):
-
-        doc_to_annot_df = json_to_dataframe(
-            json_data=multi_annots[i],
-            doc=pat_batch.iloc[i],
-            current_pat_client_id_code=current_pat_client_idcode,
-            text_column=text_column,
-            time_column=time_column,
-            guid_column=guid_column,
-            include_text_sample=include_text_sample,
-        )
-
-        # drop nan rows
-        # Check for NaN values in any column of the specified list
-        col_list_drop_nan = [
-            "client_idcode",
-            time_column,
-        ]
-
-        if config_obj.verbosity >= 14:
-            logger.debug(f"multi_annots_to_df_reports: {len(doc_to_annot_df)}")
-        rows_with_nan = doc_to_annot_df[
-            doc_to_annot_df[col_list_drop_nan].isna().any(axis=1)
-        ]
-
-        # Drop rows with NaN values
-        doc_to_annot_df = doc_to_annot_df.drop(rows_with_nan.index).copy()
-        if config_obj.verbosity >= 14:
-            logger.debug(f"multi_annots_to_df_reports: {len(doc_to_annot_df)}")
-
-        all_annot_dfs.append(doc_to_annot_df)
-
-    if all_annot_dfs:
-        final_df = pd.concat(all_annot_dfs, ignore_index=True)
-    else:
-        final_df = pd.DataFrame(columns=col_list)
+    final_df = annots_to_dataframe(
+        multi_annots,
+        pat_batch,
+        current_pat_client_idcode,
+        text_column=text_column,
+        time_column=time_column,
+        guid_column=guid_column,
+        include_text_sample=include_text_sample,
+    )
 
     if config_obj.add_icd10 and config_obj.add_opc4s:
-        final_df = join_icd10_OPC4S_codes_to_annot(df=final_df, inner=False)
+        final_df = join_icd10_OPC4S_codes_to_annot(
+            df=final_df, inner=False, config_obj=config_obj
+        )
     elif config_obj.add_icd10:
-        final_df = join_icd10_codes_to_annot(df=final_df, inner=False)
-
-    if getattr(config_obj, "storage_backend", "file") == "file":
-        final_df.to_csv(current_pat_document_annotation_batch_path, index=False)
+        final_df = join_icd10_codes_to_annot(
+            df=final_df, inner=False, config_obj=config_obj
+        )
 
-    save_annotations_to_db(
-        final_df, current_pat_client_idcode, "ann_reports", config_obj
+    final_df = write_annotation_output(
+        final_df,
+        pat_batch,
+        current_pat_client_idcode,
+        pre_document_annotation_batch_path,
+        "ann_reports",
+        config_obj,
+        guid_column=guid_column,
     )
 
     return final_df
@@ -412,10 +305,6 @@ def multi_annots_to_df_mct(
         config_obj.pre_document_annotation_batch_path_mct
     )
 
-    current_pat_document_annotation_batch_path = os.path.join(
-        pre_document_annotation_batch_path, current_pat_client_idcode + ".csv"
-    )
-
     update_pbar(
         current_pat_client_idcode,
         start_time,
@@ -426,83 +315,33 @@ def multi_annots_to_df_mct(
         config_obj=config_obj,
     )
 
-    col_list = [
-        "client_idcode",
-        time_column,
-        "pretty_name",
-        "cui",
-        "type_ids",
-        "types",
-        "source_value",
-        "detected_name",
-        "acc",
-        "context_similarity",
-        "start",
-        "end",
-        "icd10",
-        "ontologies",
-        "snomed",
-        "id",
-        "Time_Value",
-        "Time_Confidence",
-        "Presence_Value",
-        "Presence_Confidence",
-        "Subject_Value",
-        "Subject_Confidence",
-        "text_sample",
-        "full_doc",
-        guid_column,
-    ]
-
-    all_annot_dfs = []
-
-    for i in range(0, len(pat_batch)):
-
-        doc_to_annot_df = json_to_dataframe(
-            json_data=multi_annots[i],
-            doc=pat_batch.iloc[i],
-            current_pat_client_id_code=current_pat_client_idcode,
-            text_column=text_column,
-            time_column=time_column,
-            guid_column=guid_column,
-            include_text_sample=include_text_sample,
-        )
-
-        # drop nan rows
-        # Check for NaN values in any column of the specified list
-        col_list_drop_nan = [
-            "client_idcode",
-            time_column,
-        ]
-
-        if config_obj.verbosity >= 3:
-            logger.debug(f"multi_annots_to_df: {len(doc_to_annot_df)}")
-        rows_with_nan = doc_to_annot_df[
-            doc_to_annot_df[col_list_drop_nan].isna().any(axis=1)
-        ]
-
-        # Drop rows with NaN values
-        doc_to_annot_df = doc_to_annot_df.drop(rows_with_nan.index).copy()
-        if config_obj.verbosity >= 3:
-            logger.debug(f"multi_annots_to_df: {len(doc_to_annot_df)}")
-
-        all_annot_dfs.append(doc_to_annot_df)
-
-    if all_annot_dfs:
-        final_df = pd.concat(all_annot_dfs, ignore_index=True)
-    else:
-        final_df = pd.DataFrame(columns=col_list)
+    final_df = annots_to_dataframe(
+        multi_annots,
+        pat_batch,
+        current_pat_client_idcode,
+        text_column=text_column,
+        time_column=time_column,
+        guid_column=guid_column,
+        include_text_sample=include_text_sample,
+    )
 
     if config_obj.add_icd10 and config_obj.add_opc4s:
-        final_df = join_icd10_OPC4S_codes_to_annot(df=final_df, inner=False)
+        final_df = join_icd10_OPC4S_codes_to_annot(
+            df=final_df, inner=False, config_obj=config_obj
+        )
     elif config_obj.add_icd10:
-        final_df = join_icd10_codes_to_annot(df=final_df, inner=False)
-
-    if getattr(config_obj, "storage_backend", "file") == "file":
-        final_df.to_csv(current_pat_document_annotation_batch_path, index=False)
+        final_df = join_icd10_codes_to_annot(
+            df=final_df, inner=False, config_obj=config_obj
+        )
 
-    save_annotations_to_db(
-        final_df, current_pat_client_idcode, "ann_mct_docs", config_obj
+    final_df = write_annotation_output(
+        final_df,
+        pat_batch,
+        current_pat_client_idcode,
+        pre_document_annotation_batch_path,
+        "ann_mct_docs",
+        config_obj,
+        guid_column=guid_column,
     )
 
     return final_df
@@ -526,8 +365,9 @@ def calculate_pretty_name_count_features(
     """
     if len(df_copy) > 0:
         # Group by 'pretty_name' and apply the additional features
+        # observed=True, as categorical names may have no rows in this slice.
         result_vector = (
-            df_copy.groupby("pretty_name")
+            df_copy.groupby("pretty_name", observed=True)
             .size()
             .to_frame(name=f"pretty_name_count_{suffix}")
             .T
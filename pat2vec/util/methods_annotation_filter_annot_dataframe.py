@@ -1,3 +1,4 @@
+import numpy as np
 import pandas as pd
 from typing import Any, Dict
 import ast
@@ -36,8 +37,13 @@ def filter_annot_dataframe(
                 # This function safely parses the string representation of a list
                 def check_type(row_str):
                     try:
-                        # Parse the string like "['disease', 'finding']" into a list
-                        type_list = ast.literal_eval(row_str)
+                        # Parquet outputs hold lists; CSV outputs strings like
+                        # "['disease', 'finding']", which are parsed into a list.
+                        type_list = (
+                            row_str
+                            if isinstance(row_str, (list, tuple, np.ndarray))
+                            else ast.literal_eval(row_str)
+                        )
                         # Check if any of the desired types are in the parsed list
                         return any(
                             item.lower() in [t.lower() for t in type_list]
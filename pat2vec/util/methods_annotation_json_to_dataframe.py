@@ -1,7 +1,183 @@
 import numpy as np
 import pandas as pd
-import logging
-from typing import Any, Dict
+from typing import Any, Callable, Dict, List, Optional
+
+#: Fields copied from each MedCAT entity, in output column order.
+ENTITY_FIELDS = [
+    "pretty_name",
+    "cui",
+    "type_ids",
+    "types",
+    "source_value",
+    "detected_name",
+    "acc",
+    "context_similarity",
+    "start",
+    "end",
+    "icd10",
+    "ontologies",
+    "snomed",
+    "id",
+]
+
+#: Meta-annotation columns produced by `parse_meta_anns`.
+META_ANN_COLUMNS = [
+    "Time_Value",
+    "Time_Confidence",
+    "Presence_Value",
+    "Presence_Confidence",
+    "Subject_Value",
+    "Subject_Confidence",
+]
+
+
+def annotation_columns(
+    time_column: str = "updatetime", guid_column: str = "document_guid"
+) -> List[str]:
+    """Returns the columns of a flattened annotation DataFrame, in order.
+
+    Args:
+        time_column: The name of the document timestamp column.
+        guid_column: The name of the document GUID column.
+
+    Returns:
+        The list of column names.
+    """
+    return [
+        "client_idcode",
+        time_column,
+        *ENTITY_FIELDS,
+        *META_ANN_COLUMNS,
+        "text_sample",
+        "full_doc",
+        guid_column,
+    ]
+
+
+def _flatten_document(
+    json_data: Dict[str, Any],
+    current_pat_client_id_code: str,
+    time_value: Any,
+    guid_value: Any,
+    text: Any,
+    full_doc: bool,
+    window: int,
+    include_text_sample: bool,
+) -> List[List[Any]]:
+    """Flattens one document's entities into value lists, one per column."""
+    entities = list((json_data.get("entities") or {}).values())
+    n_entities = len(entities)
+
+    entity_values = [[entity[field] for entity in entities] for field in ENTITY_FIELDS]
+    meta_anns = [parse_meta_anns(entity["meta_anns"]) for entity in entities]
+    meta_values = [[meta[column] for meta in meta_anns] for column in META_ANN_COLUMNS]
+
+    if include_text_sample:
+        text_samples = [
+            text[
+                max(0, entity["start"] - window) : min(
+                    len(text), entity["end"] + window
+                )
+            ]
+            for entity in entities
+        ]
+    else:
+        text_samples = [np.nan] * n_entities
+
+    full_docs = [np.nan] * n_entities
+    if full_doc and n_entities:
+        full_docs[0] = text
+
+    return [
+        [current_pat_client_id_code] * n_entities,
+        [time_value] * n_entities,
+        *entity_values,
+        *meta_values,
+        text_samples,
+        full_docs,
+        [guid_value] * n_entities,
+    ]
+
+
+def annots_to_dataframe(
+    multi_annots: List[Dict[str, Any]],
+    pat_batch: pd.DataFrame,
+    current_pat_client_id_code: str,
+    full_doc: bool = False,
+    window: int = 300,
+    text_column: str = "body_analysed",
+    time_column: str = "updatetime",
+    guid_column: str = "document_guid",
+    include_text_sample: bool = False,
+    dropna: bool = True,
+    on_error: Optional[Callable[[int, Exception], None]] = None,
+) -> pd.DataFrame:
+    """Flattens the MedCAT output for a batch of documents into one DataFrame.
+
+    Entity fields of all documents are appended to per-column lists and the
+    DataFrame is constructed once, rather than building a DataFrame per
+    entity and concatenating them. `multi_annots[i]` holds the annotations of
+    `pat_batch.iloc[i]`.
+
+    Args:
+        multi_annots: The MedCAT output, one dictionary per document.
+        pat_batch: The annotated documents.
+        current_pat_client_id_code: The patient's unique identifier.
+        full_doc: If True, includes the full document text in the first
+            annotation row of each document. Defaults to False.
+        window: The number of characters to include on either side of the
+            annotation for the 'text_sample'. Defaults to 300.
+        text_column: The name of the column in `pat_batch` containing the text.
+        time_column: The name of the column in `pat_batch` containing the
+            timestamp.
+        guid_column: The name of the column in `pat_batch` containing the
+            document GUID.
+        include_text_sample: If True, includes a text sample around each
+            annotation.
+        dropna: If True, documents with a missing timestamp (or a missing
+            patient id) are skipped.
+        on_error: If given, called with the document position and exception
+            when a document cannot be flattened, and the document is skipped.
+            Otherwise the exception is raised.
+
+    Returns:
+        A DataFrame with one row per annotation and the columns of
+        `annotation_columns`.
+    """
+    columns = annotation_columns(time_column, guid_column)
+    data = [[] for _ in columns]
+
+    n_docs = len(pat_batch)
+    times = pat_batch[time_column].tolist()
+    guids = pat_batch[guid_column].tolist()
+    if include_text_sample or full_doc:
+        texts = pat_batch[text_column].tolist()
+    else:
+        texts = [None] * n_docs
+
+    for i in range(n_docs):
+        if dropna and (pd.isna(current_pat_client_id_code) or pd.isna(times[i])):
+            continue
+        try:
+            doc_values = _flatten_document(
+                multi_annots[i],
+                current_pat_client_id_code,
+                times[i],
+                guids[i],
+                texts[i],
+                full_doc=full_doc,
+                window=window,
+                include_text_sample=include_text_sample,
+            )
+        except Exception as e:
+            if on_error is None:
+                raise
+            on_error(i, e)
+            continue
+        for values, doc_column_values in zip(data, doc_values):
+            values.extend(doc_column_values)
+
+    return pd.DataFrame(dict(zip(columns, data)), columns=columns)
 
 
 def json_to_dataframe(
@@ -21,7 +197,7 @@ def json_to_dataframe(
     single document and transforms it into a structured DataFrame. Each row in
     the resulting DataFrame represents a single annotation (entity). It also
     extracts a text sample around the annotation and includes document-level
-    metadata.
+    metadata. Batches of documents are flattened with `annots_to_dataframe`.
 
     Args:
         json_data: The 'entities' dictionary from MedCAT's output.
@@ -41,169 +217,18 @@ def json_to_dataframe(
         A pandas DataFrame where each row is a single annotation, or an empty
         DataFrame if no entities are present in the input.
     """
-    logger = logging.getLogger(__name__)
-
-    if any(json_data.values()):
-        done = False
-
-        df_parts = []
-
-        keys = list(json_data["entities"].keys())
-
-        columns = [
-            "client_idcode",
-            time_column,
-            "pretty_name",
-            "cui",
-            "type_ids",
-            "types",
-            "source_value",
-            "detected_name",
-            "acc",
-            "context_similarity",
-            "start",
-            "end",
-            "icd10",
-            "ontologies",
-            "snomed",
-            "id",
-            "Time_Value",
-            "Time_Confidence",
-            "Presence_Value",
-            "Presence_Confidence",
-            "Subject_Value",
-            "Subject_Confidence",
-            "text_sample",
-            "full_doc",
-            guid_column,
-        ]
-
-        for i in range(0, len(keys)):
-
-            entities_data = json_data["entities"][keys[i]]
-            pretty_name = entities_data["pretty_name"]
-            cui = entities_data["cui"]
-            type_ids = entities_data["type_ids"]
-            types = entities_data["types"]
-            source_value = entities_data["source_value"]
-            detected_name = entities_data["detected_name"]
-            acc = entities_data["acc"]
-            context_similarity = entities_data["context_similarity"]
-            start = entities_data["start"]
-            end = entities_data["end"]
-            icd10 = entities_data["icd10"]
-            ontologies = entities_data["ontologies"]
-            snomed = entities_data["snomed"]
-            id = entities_data["id"]
-            meta_anns = entities_data["meta_anns"]
-
-            # Parse meta annotations
-            parsed_meta_anns = parse_meta_anns(meta_anns)
-
-            mapped_annot_doc_entity = doc[text_column]
-
-            document_len = len(mapped_annot_doc_entity)
-
-            virtual_start = max(0, start - window)
-
-            virtual_end = min(document_len, end + window)
-
-            text_sample_value = np.nan
-            if include_text_sample:
-                text_sample_value = mapped_annot_doc_entity[virtual_start:virtual_end]
-
-            updatetime = doc[time_column]
-
-            document_guid_value = doc[guid_column]
-
-            full_doc_value = np.nan
-
-            if full_doc and not done:
-                full_doc_value = mapped_annot_doc_entity
-                done = True
-            else:
-                full_doc_value = np.nan
-
-            # Define DataFrame columns and create the DataFrame
-
-            data = [
-                [
-                    current_pat_client_id_code,
-                    updatetime,
-                    pretty_name,
-                    cui,
-                    type_ids,
-                    types,
-                    source_value,
-                    detected_name,
-                    acc,
-                    context_similarity,
-                    start,
-                    end,
-                    icd10,
-                    ontologies,
-                    snomed,
-                    id,
-                    parsed_meta_anns["Time_Value"],
-                    parsed_meta_anns["Time_Confidence"],
-                    parsed_meta_anns["Presence_Value"],
-                    parsed_meta_anns["Presence_Confidence"],
-                    parsed_meta_anns["Subject_Value"],
-                    parsed_meta_anns["Subject_Confidence"],
-                    text_sample_value,
-                    full_doc_value,
-                    document_guid_value,
-                ]
-            ]
-
-            df = pd.DataFrame(data, columns=columns)
-
-            df_parts.append(df)
-
-        try:
-
-            super_df = pd.concat(df_parts)
-            super_df.reset_index(drop=True, inplace=True)
-            return super_df
-
-        except Exception as e:
-            logger.error(e)
-            logger.error(f"json_date: {json_data}")
-            logger.error(f"type(json_data): {type(json_data)}")
-            logger.error(f"len(json_data): {len(json_data)}")
-            raise e
-
-    else:
-        columns = [
-            "client_idcode",
-            time_column,
-            "pretty_name",
-            "cui",
-            "type_ids",
-            "types",
-            "source_value",
-            "detected_name",
-            "acc",
-            "context_similarity",
-            "start",
-            "end",
-            "icd10",
-            "ontologies",
-            "snomed",
-            "id",
-            "Time_Value",
-            "Time_Confidence",
-            "Presence_Value",
-            "Presence_Confidence",
-            "Subject_Value",
-            "Subject_Confidence",
-            "text_sample",
-            "full_doc",
-            guid_column,
-        ]
-
-        empty_df = pd.DataFrame(data=None, columns=columns)
-        return empty_df
+    return annots_to_dataframe(
+        [json_data],
+        doc.to_frame().T,
+        current_pat_client_id_code,
+        full_doc=full_doc,
+        window=window,
+        text_column=text_column,
+        time_column=time_column,
+        guid_column=guid_column,
+        include_text_sample=include_text_sample,
+        dropna=False,
+    )
 
 
 def parse_meta_anns(meta_anns: Dict[str, Any]) -> Dict[str, Any]:
@@ -1,4 +1,4 @@
-from pat2vec.util.methods_annotation_json_to_dataframe import json_to_dataframe
+from pat2vec.util.methods_annotation_json_to_dataframe import annots_to_dataframe
 import logging
 from pat2vec.util.post_processing import (
     join_icd10_OPC4S_codes_to_annot,
@@ -10,7 +10,7 @@ import os
 import tempfile
 from contextlib import contextmanager
 from typing import Any, Dict, Iterator, List
-from pat2vec.util.helper_functions import save_annotations_to_db
+from pat2vec.util.incremental_annotation import write_annotation_output
 
 logger = logging.getLogger(__name__)
 
@@ -49,16 +49,18 @@ def multi_annots_to_df(
     """Processes MedCAT annotations for a batch of documents, creating and saving a DataFrame (file or DB).
 
     This function takes a list of MedCAT annotation results, corresponding to a
-    batch of documents for a single patient. It iterates through each document's
-    annotations, converts them from JSON-like dictionary format into a structured
-    pandas DataFrame using `json_to_dataframe`, and concatenates them into a
-    single master DataFrame for the patient.
+    batch of documents for a single patient. The annotations of all documents
+    are flattened into a single master DataFrame for the patient by
+    `annots_to_dataframe`, which builds the frame once from per-column lists.
+    Documents that cannot be flattened are skipped.
 
     The function can optionally enrich the annotation data by joining it with
     ICD-10 and OPCS-4 codes based on settings in the configuration object.
 
-    Finally, the resulting DataFrame is saved as a CSV file in the patient's
-    designated annotation directory or written to the configured database.
+    Finally, the resulting DataFrame is saved in the configured
+    `annotation_output_format` (Parquet by default, or CSV) in the patient's
+    designated annotation directory or written to the configured database,
+    appended to the existing annotations with `annotation_incremental`.
 
     Args:
         current_pat_client_idcode: The unique identifier for the patient.
@@ -88,62 +90,20 @@ def multi_annots_to_df(
     if config_obj is None:
         raise ValueError("config_obj is required")
 
-    processed_dfs = []
-    for i in range(len(pat_batch)):
-        try:
-            doc_to_annot_df = json_to_dataframe(
-                json_data=multi_annots[i],
-                doc=pat_batch.iloc[i],
-                current_pat_client_id_code=current_pat_client_idcode,
-                text_column=text_column,
-                time_column=time_column,
-                guid_column=guid_column,
-                include_text_sample=include_text_sample,
-            )
-
-            if not doc_to_annot_df.empty:
-                doc_to_annot_df.dropna(
-                    subset=["client_idcode", time_column], inplace=True
-                )
-                if not doc_to_annot_df.empty:
-                    processed_dfs.append(doc_to_annot_df)
-        except Exception as e:
-            if config_obj.verbosity >= 1:
-                logger.warning(f"Error processing document {i}: {str(e)}")
-            continue
-
-    if processed_dfs:
-        final_df = pd.concat(processed_dfs, ignore_index=True)
-    else:
-        # If no data, create an empty DataFrame with the correct columns
-        col_list = [
-            "client_idcode",
-            time_column,
-            "pretty_name",
-            "cui",
-            "type_ids",
-            "types",
-            "source_value",
-            "detected_name",
-            "acc",
-            "context_similarity",
-            "start",
-            "end",
-            "icd10",
-            "ontologies",
-            "snomed",
-            "id",
-            "Time_Value",
-            "Time_Confidence",
-            "Presence_Value",
-            "Presence_Confidence",
-            "Subject_Value",
-            "Subject_Confidence",
-            "text_sample",
-            "full_doc",
-            guid_column,
-        ]
-        final_df = pd.DataFrame(columns=col_list)
+    def log_document_error(i: int, e: Exception) -> None:
+        if config_obj.verbosity >= 1:
+            logger.warning(f"Error processing document {i}: {str(e)}")
+
+    final_df = annots_to_dataframe(
+        multi_annots,
+        pat_batch,
+        current_pat_client_idcode,
+        text_column=text_column,
+        time_column=time_column,
+        guid_column=guid_column,
+        include_text_sample=include_text_sample,
+        on_error=log_document_error,
+    )
 
     # Handle ICD10 and OPC4S code joining
     if include_text_sample and "text_sample" not in final_df.columns:
@@ -152,26 +112,25 @@ def multi_annots_to_df(
     try:
         if not final_df.empty:  # Only join if there is data
             if config_obj.add_icd10 and config_obj.add_opc4s:
-                final_df = join_icd10_OPC4S_codes_to_annot(df=final_df, inner=False)
+                final_df = join_icd10_OPC4S_codes_to_annot(
+                    df=final_df, inner=False, config_obj=config_obj
+                )
             elif config_obj.add_icd10:
-                final_df = join_icd10_codes_to_annot(df=final_df, inner=False)
+                final_df = join_icd10_codes_to_annot(
+                    df=final_df, inner=False, config_obj=config_obj
+                )
     except Exception as e:
         if config_obj.verbosity >= 1:
             logger.warning(f"Error joining ICD10/OPC4S codes: {str(e)}")
 
-    # Write to file only if backend is 'file'
-    if getattr(config_obj, "storage_backend", "file") != "database":
-        destination_path = os.path.join(
-            config_obj.pre_document_annotation_batch_path,
-            current_pat_client_idcode + ".csv",
-        )
-
-        final_df.to_csv(destination_path, index=False)
-
-    # Write to Database if backend is 'database'
-    if getattr(config_obj, "storage_backend", "file") == "database":
-        save_annotations_to_db(
-            final_df, current_pat_client_idcode, "ann_epr_docs", config_obj
-        )
+    final_df = write_annotation_output(
+        final_df,
+        pat_batch,
+        current_pat_client_idcode,
+        getattr(config_obj, "pre_document_annotation_batch_path", None),
+        "ann_epr_docs",
+        config_obj,
+        guid_column=guid_column,
+    )
 
     return final_df
@@ -7,6 +7,8 @@ from sqlalchemy import create_engine
 from sqlalchemy.schema import CreateSchema
 from typing import Any
 from tqdm import tqdm
+
+from pat2vec.util.annotation_io import annotation_lists_to_json, read_annotation_output
 from sqlalchemy import Index
 
 
@@ -210,7 +212,13 @@ def migrate_csv_to_db(config_obj: Any):
             logger.info(f"Directory {dir_path} does not exist, skipping {table}")
             continue
 
-        files = [f for f in os.listdir(dir_path) if f.endswith(".csv")]
+        # Annotation outputs may also be Parquet files.
+        files = [
+            f
+            for f in os.listdir(dir_path)
+            if f.endswith(".csv")
+            or (schema == "annotations" and f.endswith(".parquet"))
+        ]
         if not files:
             continue
 
@@ -225,7 +233,12 @@ def migrate_csv_to_db(config_obj: Any):
 
         for i, f in enumerate(tqdm(files, desc=f"Reading {table}")):
             try:
-                df = pd.read_csv(os.path.join(dir_path, f))
+                if schema == "annotations":
+                    df = annotation_lists_to_json(
+                        read_annotation_output(os.path.join(dir_path, f))
+                    )
+                else:
+                    df = pd.read_csv(os.path.join(dir_path, f))
                 # Ensure ID column is present if not in CSV (e.g. inferred from filename)
                 # But usually pat2vec saves ID in CSV.
                 # Just in case for features which might strictly use filename as ID sometimes?
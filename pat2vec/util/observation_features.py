@@ -0,0 +1,224 @@
+"""
+A shared kernel for the features of categorical observation terms.
+
+The CORE_* observation methods (`get_core_02`, `get_bed`, `get_vte_status`,
+`get_hosp_site`, `get_core_resus`, `get_smoking`) and `get_covid` each
+selected their term's observations, cleaned the values and looped over them to
+build features. They now describe their features with an
+`ObservationFeatureSpec` and share `calculate_observation_features`, which
+works on the distinct values of a slice at once. A new term only needs a spec.
+
+The numeric multi-component methods (`get_news`, `get_bmi_features`) filtered
+and reduced each of their terms separately. `calculate_component_stats` groups
+a slice by term and reduces all of them at once.
+"""
+
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+#: The kinds of features an `ObservationFeatureSpec` can describe.
+OBSERVATION_FEATURE_KINDS = ("presence", "count", "contains", "stats", "first_match")
+
+#: The summary statistics of 'stats' features, in column order.
+OBSERVATION_STATS = ("mean", "median", "std", "max", "min", "n")
+
+
+@dataclass(frozen=True)
+class ObservationFeatureSpec:
+    """Describes the features calculated from one observation term.
+
+    Attributes:
+        search_term: The observation item the features are calculated from.
+        kind: How the observation values become features:
+            'presence': a 1 per distinct value, named `prefix` + the value.
+            'count': the number of values equal to each of `values`.
+            'contains': a 1 or 0 per pattern in `values`, if any value
+            contains it.
+            'stats': the `OBSERVATION_STATS` of the values mapped by `values`.
+            'first_match': the `values` entry of the first pattern any value
+            contains, as a single feature named `prefix`.
+        prefix: The prefix of the feature names.
+        values: The feature suffixes mapped to the values or patterns they
+            match ('count', 'contains'), the values mapped to numbers
+            ('stats'), or the patterns mapped to feature values
+            ('first_match').
+        item_column: The column holding the observation item.
+        value_column: The column holding the observation values.
+        clean: A function cleaning 'presence' values into feature names,
+            returning None to skip a value.
+        lowercase: If True, values are lowercased before matching.
+        negated_value: The value of each fixed feature when there are no
+            observations and `negate_biochem` is set.
+        always_present: If True, fixed features are NaN when there are no
+            observations and `negate_biochem` is not set, rather than absent.
+        dropna: If True, observations without a value are ignored.
+    """
+
+    search_term: str
+    kind: str
+    prefix: str = ""
+    values: Optional[Dict[str, Any]] = None
+    item_column: str = "obscatalogmasteritem_displayname"
+    value_column: str = "observation_valuetext_analysed"
+    clean: Optional[Callable[[Any], Optional[str]]] = None
+    lowercase: bool = False
+    negated_value: Any = np.nan
+    always_present: bool = False
+    dropna: bool = True
+
+    def __post_init__(self):
+        if self.kind not in OBSERVATION_FEATURE_KINDS:
+            raise ValueError(
+                f"Unsupported observation feature kind '{self.kind}', "
+                f"expected one of {OBSERVATION_FEATURE_KINDS}."
+            )
+
+    def feature_names(self):
+        """Returns the names of the fixed features, which 'presence' lacks."""
+        if self.kind == "presence":
+            return []
+        if self.kind == "first_match":
+            return [self.prefix]
+        if self.kind == "stats":
+            return [f"{self.prefix}{stat}" for stat in OBSERVATION_STATS]
+        return [f"{self.prefix}{suffix}" for suffix in self.values]
+
+
+def select_observations(
+    observations: pd.DataFrame, spec: ObservationFeatureSpec
+) -> pd.DataFrame:
+    """Returns the observations of the spec's term, with a value if `dropna`."""
+    if observations.empty or spec.item_column not in observations.columns:
+        return observations.iloc[0:0]
+    selected = observations[observations[spec.item_column] == spec.search_term]
+    if spec.dropna:
+        selected = selected.dropna(subset=[spec.value_column])
+    return selected
+
+
+def calculate_observation_features(
+    observations: pd.DataFrame,
+    spec: ObservationFeatureSpec,
+    negate_biochem: bool = False,
+) -> Dict[str, Any]:
+    """Calculates the features of an observation term.
+
+    Args:
+        observations: The observations of a time slice. Observations of
+            other terms are ignored.
+        spec: The features to calculate.
+        negate_biochem: If True, fixed features are given `negated_value`
+            when there are no observations.
+
+    Returns:
+        The features, by name.
+    """
+    selected = select_observations(observations, spec)
+    values = selected.get(spec.value_column, pd.Series(dtype=object))
+    if spec.lowercase:
+        values = values.astype(str).str.lower()
+
+    if values.empty:
+        if negate_biochem:
+            return dict.fromkeys(spec.feature_names(), spec.negated_value)
+        if spec.always_present:
+            return dict.fromkeys(spec.feature_names(), np.nan)
+        return {}
+
+    if spec.kind == "stats":
+        numeric = values.map(spec.values).dropna().astype(float)
+        if numeric.empty:
+            return (
+                dict.fromkeys(spec.feature_names(), spec.negated_value)
+                if negate_biochem
+                else {}
+            )
+        stats = numeric.agg(["mean", "median", "std", "max", "min"]).tolist()
+        return dict(zip(spec.feature_names(), stats + [len(numeric)]))
+
+    # The other kinds only depend on the distinct values and their counts.
+    counts = values.value_counts(sort=False)
+    distinct = pd.Series(counts.index.astype(str), index=counts.index)
+
+    if spec.kind == "presence":
+        clean = spec.clean or str
+        names = (clean(value) for value in pd.unique(values))
+        return {f"{spec.prefix}{name}": 1 for name in names if name}
+
+    if spec.kind == "count":
+        matched = counts.reindex(list(spec.values.values()), fill_value=0)
+        return dict(zip(spec.feature_names(), matched.astype(int).tolist()))
+
+    if spec.kind == "contains":
+        return {
+            f"{spec.prefix}{suffix}": int(distinct.str.contains(pattern).any())
+            for suffix, pattern in spec.values.items()
+        }
+
+    # first_match
+    for pattern, feature_value in spec.values.items():
+        if distinct.str.contains(pattern).any():
+            return {spec.prefix: feature_value}
+    return {spec.prefix: np.nan}
+
+
+def observation_features_frame(
+    current_pat_client_id_code: str,
+    observations: pd.DataFrame,
+    spec: ObservationFeatureSpec,
+    negate_biochem: bool = False,
+) -> pd.DataFrame:
+    """Returns the features of an observation term as a single-row DataFrame.
+
+    The first column is the `client_idcode`, followed by the features of
+    `calculate_observation_features`.
+    """
+    features = calculate_observation_features(observations, spec, negate_biochem)
+    return pd.DataFrame([{"client_idcode": current_pat_client_id_code, **features}])
+
+
+def calculate_component_stats(
+    observations: pd.DataFrame,
+    components: Dict[str, str],
+    bounds: Optional[Dict[str, Tuple[float, float]]] = None,
+    item_column: str = "obscatalogmasteritem_displayname",
+    value_column: str = "observation_valuetext_analysed",
+) -> pd.DataFrame:
+    """Calculates the statistics of several numeric observation terms at once.
+
+    Args:
+        observations: The observations of a time slice. Observations of
+            other terms and without a numeric value are ignored.
+        components: The terms mapped to their feature names.
+        bounds: Feature names mapped to exclusive (low, high) bounds. Values
+            outside the bounds of their feature are ignored.
+        item_column: The column holding the observation item.
+        value_column: The column holding the observation values.
+
+    Returns:
+        A DataFrame with a column per `OBSERVATION_STATS` and a row per
+        feature name with values, in the order of `components`.
+    """
+    if observations.empty or item_column not in observations.columns:
+        return pd.DataFrame(columns=list(OBSERVATION_STATS))
+
+    names = observations[item_column].map(components)
+    values = pd.to_numeric(observations[value_column], errors="coerce")
+    keep = names.notna() & values.notna()
+    if bounds:
+        low = names.map({name: bound[0] for name, bound in bounds.items()})
+        high = names.map({name: bound[1] for name, bound in bounds.items()})
+        keep &= ~(values <= low.astype(float)) & ~(values >= high.astype(float))
+
+    stats = (
+        values[keep]
+        .astype(float)
+        .groupby(names[keep].to_numpy())
+        .agg(["mean", "median", "std", "max", "min", "size"])
+        .rename(columns={"size": "n"})
+    )
+    order = [name for name in dict.fromkeys(components.values()) if name in stats.index]
+    return stats.loc[order]
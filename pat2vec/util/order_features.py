@@ -0,0 +1,106 @@
+"""
+Per-order-name summaries shared by the drug and diagnostic order features.
+
+Both feature sets count each order name's orders and measure the days since
+its last order and between its first and last. They are computed here for all
+order names at once, with one groupby over the order times.
+"""
+
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import pandas as pd
+
+
+def summarise_orders(orders: pd.DataFrame, today: datetime) -> pd.DataFrame:
+    """Summarises the orders of each order name.
+
+    Args:
+        orders: The orders, with `order_name` and `datetime` columns.
+        today: The date the days since the last order are counted to.
+
+    Returns:
+        A DataFrame indexed by order name, in order of first appearance, with
+        the number of orders (`n`), the days since the last order
+        (`days_since_last`) and the days between the first and last order
+        (`days_between_first_last`). Orders without a time are counted only,
+        and orders without a name are ignored.
+    """
+    times = orders["datetime"]
+    if not pd.api.types.is_datetime64_any_dtype(times):
+        times = pd.to_datetime(times, errors="coerce")
+
+    summary = (
+        pd.DataFrame({"order_name": orders["order_name"].to_numpy(), "time": times})
+        .groupby("order_name", sort=False)["time"]
+        .agg(["size", "min", "max"])
+    )
+    return pd.DataFrame(
+        {
+            "n": summary["size"],
+            "days_since_last": (pd.Timestamp(today) - summary["max"]).dt.days,
+            "days_between_first_last": (summary["max"] - summary["min"]).dt.days,
+        }
+    )
+
+
+def concat_orders_by_name(
+    order_name_df_dict: Dict[str, pd.DataFrame], order_name_list: List[str]
+) -> pd.DataFrame:
+    """Concatenates orders grouped by order name, in `order_name_list` order.
+
+    Converts the arguments of the former per-order-name feature functions
+    into the single DataFrame `summarise_orders` takes.
+    """
+    frames = [
+        order_name_df_dict[name].assign(order_name=name)
+        for name in order_name_list
+        if name in order_name_df_dict and len(order_name_df_dict[name]) > 0
+    ]
+    if not frames:
+        return pd.DataFrame(columns=["order_name", "datetime"])
+    return pd.concat(frames, ignore_index=True)
+
+
+def order_features(
+    summary: pd.DataFrame,
+    num_suffix: Optional[str],
+    days_since_last_suffix: Optional[str],
+    days_between_suffix: Optional[str],
+) -> Dict[str, object]:
+    """Names the features of an order summary.
+
+    Args:
+        summary: The summary of `summarise_orders`.
+        num_suffix: The suffix of the order count features, or None to omit
+            them.
+        days_since_last_suffix: The suffix of the days since the last order,
+            or None to omit them.
+        days_between_suffix: The suffix of the days between the first and
+            last order, or None to omit them. They are only given for order
+            names with two or more orders.
+
+    Returns:
+        A dictionary of `<order_name><suffix>` features, grouped by order name.
+    """
+    columns = {
+        "n": num_suffix,
+        "days_since_last": days_since_last_suffix,
+        "days_between_first_last": days_between_suffix,
+    }
+    columns = {column: suffix for column, suffix in columns.items() if suffix}
+    if not columns:
+        return {}
+
+    # One row per feature, ordered by order name and then feature.
+    features = summary[list(columns)].astype(object).stack(dropna=False)
+    names = features.index.get_level_values(0)
+    feature_columns = features.index.get_level_values(1)
+    single_order = summary["n"].reindex(names).to_numpy() < 2
+    keep = ~((feature_columns == "days_between_first_last") & single_order)
+
+    keys = [
+        f"{name}{columns[column]}"
+        for name, column in zip(names[keep], feature_columns[keep])
+    ]
+    return dict(zip(keys, features[keep].tolist()))
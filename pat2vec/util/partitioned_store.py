@@ -0,0 +1,505 @@
+"""
+A columnar store for prefetched raw patient data.
+
+Prefetched batches are written as Parquet files partitioned by a hash bucket
+of the patient id. Rows are sorted by patient and time, so the row group
+statistics on the patient id column let a reader load a single patient's rows
+with predicate pushdown. A store lives in the `_store` sub-directory of a
+`pre_*_batch_path` and replaces the per-patient CSV files written by
+`split_and_save_csv`.
+
+The `patient_batch_exists` and `read_patient_batch` helpers used by the
+`get_pat_batch_*` readers also look up a patient in an indexed merged batch
+cache (see `pat2vec.util.merged_batch_cache`).
+
+Layout::
+
+    <pre_*_batch_path>/_store/_store_metadata.json
+    <pre_*_batch_path>/_store/bucket=0007/part-<uuid>.parquet
+"""
+
+import json
+import logging
+import os
+import shutil
+import uuid
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+
+from pat2vec.util.arrow_utils import write_parquet_with_fallback
+from pat2vec.util.merged_batch_cache import (
+    get_merged_batch_index,
+    read_patient_from_merged_batch,
+)
+from pat2vec.util.methods_get import exist_check
+
+logger = logging.getLogger(__name__)
+
+#: Name of the store directory inside a `pre_*_batch_path`.
+STORE_DIRNAME = "_store"
+#: Name of the file holding the store's bucket count and id column.
+STORE_METADATA_FILENAME = "_store_metadata.json"
+#: Default number of patient hash buckets.
+DEFAULT_N_BUCKETS = 64
+#: Default number of rows per Parquet row group.
+DEFAULT_ROW_GROUP_SIZE = 5000
+
+
+def patient_buckets(client_idcodes: Any, n_buckets: int) -> np.ndarray:
+    """Returns the hash bucket of each patient id.
+
+    The hash is stable across processes and runs.
+
+    Args:
+        client_idcodes: An iterable of patient ids.
+        n_buckets: The number of buckets.
+
+    Returns:
+        An array of bucket numbers in `[0, n_buckets)`.
+    """
+    values = pd.Series(client_idcodes, dtype=object).astype(str).to_numpy()
+    return (pd.util.hash_array(values) % np.uint64(n_buckets)).astype(np.int64)
+
+
+def _bucket_dir(store_path: str, bucket: int) -> str:
+    return os.path.join(store_path, f"bucket={bucket:04d}")
+
+
+def read_store_metadata(store_path: str) -> Optional[Dict[str, Any]]:
+    """Reads a store's metadata, or returns None if there is no store."""
+    metadata_path = os.path.join(store_path, STORE_METADATA_FILENAME)
+    if not os.path.exists(metadata_path):
+        return None
+    with open(metadata_path) as f:
+        return json.load(f)
+
+
+def _read_bucket(
+    bucket_dir: str,
+    columns: Optional[List[str]] = None,
+    filters: Optional[List[Any]] = None,
+) -> List[pd.DataFrame]:
+    """Reads every part file in a bucket directory.
+
+    Parts are read one by one rather than as a dataset because parts written
+    by different prefetches may infer different types for all-null columns.
+    """
+    if not os.path.isdir(bucket_dir):
+        return []
+    frames = []
+    for filename in sorted(os.listdir(bucket_dir)):
+        if filename.endswith(".parquet"):
+            table = pq.read_table(
+                os.path.join(bucket_dir, filename), columns=columns, filters=filters
+            )
+            frames.append(table.to_pandas())
+    return frames
+
+
+def _drop_stored_rows(bucket_dir: str, column: str, values: pd.Series) -> int:
+    """Removes the stored rows of a bucket whose `column` value is in `values`.
+
+    Only the parts holding such rows are rewritten. Each rewritten part is
+    written before the original is removed, so an interrupted rewrite can
+    leave a duplicate but never loses rows.
+
+    Returns:
+        The number of rows removed.
+    """
+    if not os.path.isdir(bucket_dir):
+        return 0
+    values = values.astype(str)
+    n_removed = 0
+    for filename in sorted(os.listdir(bucket_dir)):
+        if not filename.endswith(".parquet"):
+            continue
+        part_path = os.path.join(bucket_dir, filename)
+        if column not in pq.read_schema(part_path).names:
+            continue
+        stored = pq.read_table(part_path, columns=[column]).to_pandas()[column]
+        if not stored.astype(str).isin(values).any():
+            continue
+        part = pq.read_table(part_path).to_pandas()
+        kept = part[~part[column].astype(str).isin(values)]
+        if not kept.empty:
+            write_parquet_with_fallback(
+                kept,
+                os.path.join(bucket_dir, f"part-{uuid.uuid4().hex}.parquet"),
+                row_group_size=DEFAULT_ROW_GROUP_SIZE,
+                write_statistics=True,
+            )
+        os.remove(part_path)
+        n_removed += len(part) - len(kept)
+    return n_removed
+
+
+def drop_store_patients(store_path: str, client_idcodes: Any) -> int:
+    """Removes the stored rows of the given patients.
+
+    Used before the full history of patients is written again, e.g. by the
+    first incremental prefetch over a store written by a full prefetch.
+
+    Args:
+        store_path: The store directory.
+        client_idcodes: The patients whose rows are removed.
+
+    Returns:
+        The number of rows removed.
+    """
+    metadata = read_store_metadata(store_path)
+    client_idcodes = pd.Series(list(client_idcodes), dtype=object).astype(str)
+    if metadata is None or client_idcodes.empty:
+        return 0
+    buckets = patient_buckets(client_idcodes, metadata["n_buckets"])
+    n_removed = 0
+    for bucket, patients in client_idcodes.groupby(buckets):
+        n_removed += _drop_stored_rows(
+            _bucket_dir(store_path, bucket),
+            metadata["client_idcode_column"],
+            patients,
+        )
+    return n_removed
+
+
+def write_partitioned_store(
+    df: pd.DataFrame,
+    client_idcode_column: str,
+    store_path: str,
+    time_column: Optional[str] = None,
+    n_buckets: int = DEFAULT_N_BUCKETS,
+    row_group_size: int = DEFAULT_ROW_GROUP_SIZE,
+    skip_stored_patients: bool = True,
+    dedup_column: Optional[str] = None,
+) -> int:
+    """Writes a merged batch to a patient-bucketed Parquet store.
+
+    Rows are sorted by patient and `time_column` and written as one new part
+    file per bucket. As with the per-patient CSV files this store replaces,
+    patients already in the store are not written again unless
+    `skip_stored_patients` is False, in which case the rows are appended.
+
+    Appended rows can replace earlier versions of the same record: with a
+    `dedup_column` (e.g. a document GUID), stored rows sharing a value with
+    the new rows are removed, and only the latest new row of each value is
+    written.
+
+    Args:
+        df: The merged batch for many patients.
+        client_idcode_column: The name of the patient id column.
+        store_path: The store directory.
+        time_column: An optional column to sort each patient's rows by.
+        n_buckets: The number of hash buckets for a new store. An existing
+            store keeps its bucket count.
+        row_group_size: The number of rows per Parquet row group.
+        skip_stored_patients: If False, rows of patients already in the store
+            are appended rather than skipped. Used by incremental prefetching.
+        dedup_column: An optional column identifying a record. Stored and
+            duplicate rows of a record written again are dropped. Ignored if
+            `df` lacks the column.
+
+    Returns:
+        The number of rows written.
+    """
+    os.makedirs(store_path, exist_ok=True)
+    metadata = read_store_metadata(store_path)
+    if metadata is None:
+        metadata = {
+            "client_idcode_column": client_idcode_column,
+            "n_buckets": int(n_buckets),
+            "time_column": time_column,
+        }
+        with open(os.path.join(store_path, STORE_METADATA_FILENAME), "w") as f:
+            json.dump(metadata, f)
+    n_buckets = metadata["n_buckets"]
+
+    if df is None or df.empty:
+        return 0
+
+    df = df.assign(**{client_idcode_column: df[client_idcode_column].astype(str)})
+    sort_columns = [client_idcode_column]
+    if time_column is not None and time_column in df.columns:
+        sort_columns.append(time_column)
+    df = df.sort_values(sort_columns, kind="mergesort")
+    if dedup_column is not None and dedup_column not in df.columns:
+        dedup_column = None
+    if dedup_column is not None:
+        # Rows are in time order, so the last of each record is its latest.
+        df = df[
+            df[dedup_column].isna() | ~df.duplicated(subset=[dedup_column], keep="last")
+        ]
+
+    buckets = patient_buckets(df[client_idcode_column], n_buckets)
+    n_written = 0
+    for bucket, part in df.groupby(buckets, sort=True):
+        bucket_dir = _bucket_dir(store_path, bucket)
+        existing = []
+        if skip_stored_patients:
+            existing = _read_bucket(bucket_dir, columns=[client_idcode_column])
+        if existing:
+            stored_ids = pd.concat(existing)[client_idcode_column].astype(str)
+            part = part[~part[client_idcode_column].astype(str).isin(stored_ids)]
+            if part.empty:
+                continue
+        if dedup_column is not None:
+            _drop_stored_rows(bucket_dir, dedup_column, part[dedup_column].dropna())
+
+        os.makedirs(bucket_dir, exist_ok=True)
+        write_parquet_with_fallback(
+            part,
+            os.path.join(bucket_dir, f"part-{uuid.uuid4().hex}.parquet"),
+            row_group_size=row_group_size,
+            write_statistics=True,
+        )
+        n_written += len(part)
+
+    logger.info(f"Wrote {n_written} rows to partitioned store {store_path}.")
+    return n_written
+
+
+def merge_staged_store(
+    staging_path: str,
+    store_path: str,
+    skip_stored_patients: bool = True,
+    row_group_size: int = DEFAULT_ROW_GROUP_SIZE,
+) -> int:
+    """Merges a staged store into `store_path` and removes the staged store.
+
+    Prefetches stream each chunk of patients into a staging store, so that a
+    failed fetch leaves `store_path` untouched. Merging reads one staged
+    bucket at a time, so it holds about `1 / n_buckets` of the batch in
+    memory, and writes it as a single part. A prefetch thus adds at most one
+    part per bucket, whatever the number of chunks.
+
+    Args:
+        staging_path: The staged store, written by `write_partitioned_store`.
+        store_path: The store to merge into.
+        skip_stored_patients: See `write_partitioned_store`.
+        row_group_size: The number of rows per Parquet row group.
+
+    Returns:
+        The number of rows written to `store_path`.
+    """
+    metadata = read_store_metadata(staging_path)
+    n_written = 0
+    if metadata is not None:
+        for entry in sorted(os.listdir(staging_path)):
+            frames = _read_bucket(os.path.join(staging_path, entry))
+            frames = [frame for frame in frames if not frame.empty]
+            if not frames:
+                continue
+            n_written += write_partitioned_store(
+                pd.concat(frames, ignore_index=True),
+                metadata["client_idcode_column"],
+                store_path,
+                time_column=metadata["time_column"],
+                n_buckets=metadata["n_buckets"],
+                row_group_size=row_group_size,
+                skip_stored_patients=skip_stored_patients,
+            )
+    shutil.rmtree(staging_path, ignore_errors=True)
+    return n_written
+
+
+def compact_partitioned_store(
+    store_path: str, row_group_size: int = DEFAULT_ROW_GROUP_SIZE
+) -> int:
+    """Rewrites each bucket of a store holding several parts as a single part.
+
+    Each incremental prefetch appends up to one part per bucket, so the file
+    count of a store grows with the number of runs. Compaction reads one
+    bucket at a time.
+
+    Args:
+        store_path: The store directory.
+        row_group_size: The number of rows per Parquet row group.
+
+    Returns:
+        The number of buckets compacted.
+    """
+    metadata = read_store_metadata(store_path)
+    if metadata is None:
+        return 0
+    n_compacted = 0
+    for entry in sorted(os.listdir(store_path)):
+        bucket_dir = os.path.join(store_path, entry)
+        if not os.path.isdir(bucket_dir):
+            continue
+        parts = [name for name in os.listdir(bucket_dir) if name.endswith(".parquet")]
+        if len(parts) < 2:
+            continue
+        df = pd.concat(_read_bucket(bucket_dir), ignore_index=True)
+        time_column = metadata.get("time_column")
+        if time_column in df.columns:
+            # Parts may hold the times as strings or timestamps, so they are
+            # ordered here and the write only sorts by patient, stably.
+            df = df.sort_values(
+                time_column,
+                kind="mergesort",
+                ignore_index=True,
+                key=lambda col: pd.to_datetime(col, errors="coerce", utc=True),
+            )
+        # The compacted part is written before the parts it replaces are
+        # removed, so an interrupted compaction never loses rows.
+        write_partitioned_store(
+            df,
+            metadata["client_idcode_column"],
+            store_path,
+            row_group_size=row_group_size,
+            skip_stored_patients=False,
+        )
+        for name in parts:
+            os.remove(os.path.join(bucket_dir, name))
+        n_compacted += 1
+    return n_compacted
+
+
+def read_patient_from_store(
+    store_path: str,
+    client_idcode: str,
+    columns: Optional[List[str]] = None,
+) -> Optional[pd.DataFrame]:
+    """Reads one patient's rows from a partitioned store.
+
+    Only the patient's bucket is opened, and row groups whose id statistics
+    exclude the patient are skipped. Rows appended by incremental prefetches
+    are merged back into time order.
+
+    Args:
+        store_path: The store directory.
+        client_idcode: The patient id to read.
+        columns: An optional list of columns to read.
+
+    Returns:
+        The patient's rows, or None if the store does not hold the patient.
+    """
+    metadata = read_store_metadata(store_path)
+    if metadata is None:
+        return None
+
+    id_column = metadata["client_idcode_column"]
+    bucket = int(patient_buckets([client_idcode], metadata["n_buckets"])[0])
+    frames = _read_bucket(
+        _bucket_dir(store_path, bucket),
+        columns=columns,
+        filters=[(id_column, "==", str(client_idcode))],
+    )
+    frames = [frame for frame in frames if not frame.empty]
+    if not frames:
+        return None
+    if len(frames) == 1:
+        return frames[0]
+    df = pd.concat(frames, ignore_index=True)
+    time_column = metadata.get("time_column")
+    if time_column in df.columns:
+        df = df.sort_values(
+            time_column,
+            kind="mergesort",
+            ignore_index=True,
+            key=lambda col: pd.to_datetime(col, errors="coerce", utc=True),
+        )
+    return df
+
+
+def list_store_patients(store_path: str) -> List[str]:
+    """Lists the patient ids held in a partitioned store."""
+    metadata = read_store_metadata(store_path)
+    if metadata is None:
+        return []
+    id_column = metadata["client_idcode_column"]
+    patients = set()
+    for entry in sorted(os.listdir(store_path)):
+        for frame in _read_bucket(os.path.join(store_path, entry), columns=[id_column]):
+            patients.update(frame[id_column].astype(str))
+    return sorted(patients)
+
+
+def _split_patient_path(target_path: str):
+    batch_dir, filename = os.path.split(target_path)
+    return os.path.join(batch_dir, STORE_DIRNAME), os.path.splitext(filename)[0]
+
+
+def _merged_batch_csv_path(
+    config_obj: Any, merged_batch: Optional[str]
+) -> Optional[str]:
+    """Returns the legacy merged batch path for `merged_batch`, if configured."""
+    merged_dir = getattr(config_obj, "pre_merged_input_batches_path", None)
+    if merged_batch is None or not merged_dir:
+        return None
+    return os.path.join(merged_dir, f"merged_{merged_batch}_batches.csv")
+
+
+def patient_batch_exists(
+    target_path: str, config_obj: Any = None, merged_batch: Optional[str] = None
+) -> bool:
+    """Checks whether a patient's raw batch is stored.
+
+    The batch is found as the per-patient CSV at `target_path`, in the
+    partitioned store of the same batch directory, or through the patient
+    index of the `merged_<merged_batch>_batches` cache.
+
+    Args:
+        target_path: The per-patient CSV path, `<batch_path>/<client_idcode>.csv`.
+        config_obj: The configuration object.
+        merged_batch: The name of the merged batch holding this data source
+            (e.g., 'bloods'), if any.
+
+    Returns:
+        True if the patient's batch is stored, False otherwise.
+    """
+    if exist_check(target_path, config_obj):
+        return True
+    if config_obj is not None and config_obj.remote_dump:
+        return False
+    store_path, client_idcode = _split_patient_path(target_path)
+
+    merged_csv_path = _merged_batch_csv_path(config_obj, merged_batch)
+    if merged_csv_path is not None:
+        index = get_merged_batch_index(merged_csv_path)
+        if index is not None and client_idcode in index:
+            return True
+
+    metadata = read_store_metadata(store_path)
+    if metadata is None:
+        return False
+    return (
+        read_patient_from_store(
+            store_path, client_idcode, columns=[metadata["client_idcode_column"]]
+        )
+        is not None
+    )
+
+
+def read_patient_batch(
+    target_path: str, config_obj: Any = None, merged_batch: Optional[str] = None
+) -> pd.DataFrame:
+    """Reads a patient's raw batch from its CSV, a merged batch or the store.
+
+    Args:
+        target_path: The per-patient CSV path, `<batch_path>/<client_idcode>.csv`.
+        config_obj: The configuration object.
+        merged_batch: The name of the merged batch holding this data source
+            (e.g., 'bloods'), if any.
+
+    Returns:
+        The patient's raw batch.
+
+    Raises:
+        FileNotFoundError: If the patient's batch is not stored.
+    """
+    if exist_check(target_path, config_obj):
+        return pd.read_csv(target_path)
+    store_path, client_idcode = _split_patient_path(target_path)
+
+    merged_csv_path = _merged_batch_csv_path(config_obj, merged_batch)
+    if merged_csv_path is not None:
+        df = read_patient_from_merged_batch(merged_csv_path, client_idcode)
+        if df is not None:
+            return df
+
+    df = read_patient_from_store(store_path, client_idcode)
+    if df is None:
+        raise FileNotFoundError(f"No stored batch found for {target_path}")
+    return df
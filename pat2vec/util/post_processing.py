@@ -8,11 +8,21 @@ from itertools import chain
 from typing import Any, Dict, List, Optional
 
 import matplotlib.pyplot as plt
+import numpy as np
 import pandas as pd
 from IPython.display import display
 from tqdm import tqdm
 from sqlalchemy import text
 
+from pat2vec.util.annotation_io import (
+    ANNOTATION_FILTER_COLUMN,
+    GUIDS_SUFFIX,
+    annotation_filter_provenance,
+    find_annotation_output,
+    read_annotation_output,
+    write_annotation_frame,
+)
+from pat2vec.util.code_mappings import get_icd10_map, get_icd10_opcs4_map
 from pat2vec.util.helper_functions import get_df_from_db
 import logging
 
@@ -122,6 +132,17 @@ def filter_annot_dataframe2(
     Returns:
         The filtered DataFrame.
     """
+    # Annotations filtered with the same arguments when they were written
+    # need no second pass.
+    if (
+        ANNOTATION_FILTER_COLUMN in dataframe.columns
+        and not dataframe.empty
+        and (
+            dataframe[ANNOTATION_FILTER_COLUMN]
+            == annotation_filter_provenance(filter_args)
+        ).all()
+    ):
+        return dataframe
 
     # Initialize a boolean mask with True values for all rows
     mask = pd.Series(True, index=dataframe.index)
@@ -238,13 +259,15 @@ def produce_filtered_annotation_dataframe(
                 else "pre_document_annotation_batch_path"
             )
             base_path = getattr(config_obj, path_attr)
-            current_pat_annot_batch_path = os.path.join(
-                base_path, f"{current_pat_client_idcode}.csv"
+            current_pat_annot_batch_path = find_annotation_output(
+                base_path, current_pat_client_idcode
             )
 
-            if os.path.exists(current_pat_annot_batch_path):
+            if current_pat_annot_batch_path is not None:
                 try:
-                    current_pat_annot_batch = pd.read_csv(current_pat_annot_batch_path)
+                    current_pat_annot_batch = read_annotation_output(
+                        current_pat_annot_batch_path
+                    )
                     results.append(current_pat_annot_batch)
                 except Exception as e:
                     logger.warning(
@@ -306,13 +329,16 @@ def produce_filtered_annotation_dataframe(
 
 
 def extract_types_from_csv(directory: str) -> List[str]:
-    """Extracts all unique 'types' from CSV files within a given directory and its subdirectories.
+    """Extracts all unique 'types' from annotation files within a given directory and its subdirectories.
+
+    Both CSV and Parquet annotation outputs are read. List values, as stored
+    in Parquet, are returned in the string form they take in a CSV file.
 
     Args:
-        directory: The path to the directory to search for CSV files.
+        directory: The path to the directory to search for annotation files.
 
     Returns:
-        A list of all unique 'types' found in the 'types' column of the CSV files.
+        A list of all unique 'types' found in the 'types' column of the files.
     """
 
     all_types = set()
@@ -321,15 +347,20 @@ def extract_types_from_csv(directory: str) -> List[str]:
     for root, dirs, files in os.walk(directory):
         logger.debug(f"Scanning files in {root}: {files}")
         for file in files:
-            if file.endswith(".csv"):
+            if file.endswith((".csv", ".parquet")):
                 # Construct the full file path
                 file_path = os.path.join(root, file)
 
-                # Read the CSV file using pandas
-                df = pd.read_csv(file_path)
+                df = read_annotation_output(file_path, columns=["types"])
+                if "types" not in df.columns:
+                    continue
 
                 # Extract the "types" column and add unique values to the set
-                types_column = df["types"]
+                types_column = df["types"].map(
+                    lambda x: (
+                        str(list(x)) if isinstance(x, (list, tuple, np.ndarray)) else x
+                    )
+                )
                 all_types.update(types_column.unique())
 
     return list(all_types)
@@ -500,17 +531,18 @@ def remove_file_from_paths(
     logger.debug(pat_file_paths)
 
     for path in pat_file_paths:
-        file_path = path + current_pat_idcode + ".csv"
-        try:
-            os.remove(file_path)
-            if verbosity > 0:
-                logger.info(f"{file_path} successfully removed")
-        except FileNotFoundError:
-            if verbosity > 0:
-                logger.debug(f"{file_path} not found, skipping.")
-        except Exception as e:
-            if verbosity > 0:
-                logger.error(f"Error removing {file_path}: {e}")
+        for extension in (".csv", ".parquet", GUIDS_SUFFIX):
+            file_path = path + current_pat_idcode + extension
+            try:
+                os.remove(file_path)
+                if verbosity > 0:
+                    logger.info(f"{file_path} successfully removed")
+            except FileNotFoundError:
+                if verbosity > 0 and extension == ".csv":
+                    logger.debug(f"{file_path} not found, skipping.")
+            except Exception as e:
+                if verbosity > 0:
+                    logger.error(f"Error removing {file_path}: {e}")
 
 
 def process_chunk(args: tuple) -> Dict[str, List[str]]:
@@ -539,67 +571,46 @@ def process_chunk(args: tuple) -> Dict[str, List[str]]:
     return concatenated_data
 
 
-def join_icd10_codes_to_annot(df: pd.DataFrame, inner: bool = False) -> pd.DataFrame:
+def join_icd10_codes_to_annot(
+    df: pd.DataFrame, inner: bool = False, config_obj: Optional[Any] = None
+) -> pd.DataFrame:
     """Joins ICD-10 codes to an annotation DataFrame.
 
-    This function merges the input DataFrame `df` with a predefined ICD-10 mapping
-    DataFrame based on the 'cui' column in `df` and 'referencedComponentId' in the mapping.
+    This function joins the input DataFrame `df` with the ICD-10 mapping
+    based on the 'cui' column in `df` and 'referencedComponentId' in the mapping.
+    The mapping is loaded once per process.
 
     Args:
         df: The annotation DataFrame.
         inner: If True, performs an inner merge; otherwise, performs a left merge.
+        config_obj: The configuration object, setting `icd10_map_path` and
+            `code_map_cache_dir`. Defaults are used if None.
 
     Returns:
         The DataFrame with ICD-10 codes joined.
     """
-
-    mfp = (
-        "../../snomed_icd10_map/data/tls_Icd10cmHumanReadableMap_US1000124_20230901.tsv"
-    )
-
-    mdf = pd.read_csv(mfp, sep="\t")
-
-    if inner:
-        result = pd.merge(
-            df, mdf, left_on="cui", right_on="referencedComponentId", how="inner"
-        )
-
-    else:
-        result = pd.merge(
-            df, mdf, left_on="cui", right_on="referencedComponentId", how="left"
-        )
-
-    return result
+    return get_icd10_map(config_obj).join(df, inner=inner)
 
 
 def join_icd10_OPC4S_codes_to_annot(
-    df: pd.DataFrame, inner: bool = False
+    df: pd.DataFrame, inner: bool = False, config_obj: Optional[Any] = None
 ) -> pd.DataFrame:
     """Joins ICD-10 and OPCS-4 codes to an annotation DataFrame.
 
-    This function merges the input DataFrame `df` with a predefined ICD-10/OPCS-4 mapping
-    DataFrame based on the 'cui' column in `df` and 'conceptId' in the mapping.
+    This function joins the input DataFrame `df` with the ICD-10/OPCS-4 mapping
+    based on the 'cui' column in `df` and 'conceptId' in the mapping. The
+    mapping is loaded once per process.
 
     Args:
         df: The annotation DataFrame.
         inner: If True, performs an inner merge; otherwise, performs a left merge.
+        config_obj: The configuration object, setting `icd10_opcs4_map_path`
+            and `code_map_cache_dir`. Defaults are used if None.
 
     Returns:
         The DataFrame with ICD-10 and OPCS-4 codes joined.
     """
-
-    # ../home/cogstack/samora/_data/gloabl_files/
-    mfp = "../../snomed_to_icd10_opcs4/map.csv"
-
-    mdf = pd.read_csv(mfp)
-
-    if inner:
-        result = pd.merge(df, mdf, left_on="cui", right_on="conceptId", how="inner")
-
-    else:
-        result = pd.merge(df, mdf, left_on="cui", right_on="conceptId", how="left")
-
-    return result
+    return get_icd10_opcs4_map(config_obj).join(df, inner=inner)
 
 
 def filter_and_select_rows(
@@ -843,14 +854,15 @@ def filter_and_update_csv(
     filter_type: str = "after",
     verbosity: bool = False,
 ) -> None:
-    """Filters and updates CSV files in a target directory based on patient IPW records.
+    """Filters and updates CSV or Parquet files in a target directory based on patient IPW records.
 
     This function iterates through each patient record in the `ipw_dataframe`,
-    finds corresponding CSV files in the `target_directory` (and its subdirectories),
-    and filters the rows in those CSV files based on a timestamp column and a filter date.
+    finds corresponding CSV or Parquet files in the `target_directory` (and its
+    subdirectories), and filters the rows in those files based on a timestamp
+    column and a filter date. Each file is rewritten in its own format.
 
     Args:
-        target_directory: The root directory containing the CSV files to be filtered.
+        target_directory: The root directory containing the files to be filtered.
         ipw_dataframe (pd.DataFrame): A DataFrame containing patient IPW records, including 'client_idcode' and a timestamp column (e.g., 'updatetime').
         filter_type (str, optional): The type of filtering to apply: "after" (keep records after filter_date) or "before" (keep records before filter_date). Defaults to "after".
         verbosity (bool, optional): If True, print verbose messages during processing. Defaults to False.
@@ -867,13 +879,15 @@ def filter_and_update_csv(
         # Recursively walk through the target directory
         for root, dirs, files in os.walk(target_directory):
             for file in files:
-                if file.startswith(client_idcode) and file.endswith(".csv"):
+                if file.startswith(client_idcode) and file.endswith(
+                    (".csv", ".parquet")
+                ):
                     file_path = os.path.join(root, file)
 
                     if verbosity:
-                        logger.info(f"Found CSV file: {file_path}")
+                        logger.info(f"Found file: {file_path}")
 
-                    df = pd.read_csv(file_path)
+                    df = read_annotation_output(file_path)
 
                     # Check if 'updatetime' is in columns
                     if "updatetime" in df.columns:
@@ -907,7 +921,7 @@ def filter_and_update_csv(
                     df = df.dropna(subset=[update_column])
 
                     if verbosity:
-                        logger.info(f"Updating CSV file based on {update_column}")
+                        logger.info(f"Updating file based on {update_column}")
 
                     df[update_column] = pd.to_datetime(df[update_column], utc=True)
                     filter_condition = (
@@ -916,10 +930,10 @@ def filter_and_update_csv(
                         else df[update_column] < filter_date
                     )
                     filtered_df = df[filter_condition]
-                    filtered_df.to_csv(file_path, index=False)
+                    write_annotation_frame(filtered_df, file_path)
 
                     if verbosity:
-                        logger.info("CSV file updated successfully")
+                        logger.info("File updated successfully")
 
 
 def retrieve_pat_annots_mct_epr(
@@ -990,10 +1004,10 @@ def retrieve_pat_annots_mct_epr(
             ),
         }
         for source_name, (base_path, cols) in path_map.items():
-            file_path = f"{base_path}/{client_idcode}.csv"
-            if os.path.exists(file_path):
+            file_path = find_annotation_output(base_path, client_idcode)
+            if file_path is not None:
                 try:
-                    df = pd.read_csv(file_path, usecols=cols)
+                    df = read_annotation_output(file_path, columns=cols)
                     df["annotation_batch_source"] = source_name
                     all_annots_dfs.append(df)
                 except Exception as e:
@@ -1,3 +1,4 @@
+from pat2vec.util.partitioned_store import STORE_DIRNAME, list_store_patients
 from pat2vec.util.post_processing_get_pat_ipw_record import get_pat_ipw_record
 import pandas as pd
 import os
@@ -139,6 +140,11 @@ def build_ipw_dataframe(
             pat_list_stripped = [
                 os.path.splitext(file)[0] for file in pat_list if file.endswith(".csv")
             ]
+            # Include patients prefetched into the partitioned store.
+            store_patients = list_store_patients(
+                os.path.join(config_obj.pre_document_batch_path, STORE_DIRNAME)
+            )
+            pat_list_stripped = list(dict.fromkeys(pat_list_stripped + store_patients))
 
     results_list = []
     for pat in tqdm(pat_list_stripped, desc="Building IPW DataFrame"):
@@ -4,6 +4,7 @@ from typing import Any, Dict, List, Optional
 import logging
 import pandas as pd
 
+from pat2vec.util.annotation_io import find_annotation_output, read_annotation_output
 from pat2vec.util.helper_functions import get_df_from_db
 from pat2vec.util.post_processing import filter_and_select_rows, filter_annot_dataframe2
 
@@ -31,7 +32,8 @@ def _get_source_record(
 
     Args:
         pat_id: The patient identifier.
-        base_path: The base directory path where the patient's CSV file is located.
+        base_path: The base directory path where the patient's annotation file
+            is located.
         time_column: The name of the column containing the timestamp.
         necessary_columns: A list of columns that must have non-NaN values.
         annot_filter_arguments: A dictionary of filters to apply
@@ -65,8 +67,8 @@ def _get_source_record(
             return pd.DataFrame()
     else:
         # File-based fallback
-        file_path = f"{base_path}/{pat_id}.csv"
-        if not os.path.exists(file_path):
+        file_path = find_annotation_output(base_path, pat_id)
+        if file_path is None:
             if verbose >= 10:
                 logger.debug(f"File not found for patient {pat_id} at {base_path}")
             return pd.DataFrame()
@@ -75,19 +77,19 @@ def _get_source_record(
             logger.debug(f"Reading annotations from {base_path}...")
 
         try:
-            df = pd.read_csv(file_path)
+            df = read_annotation_output(file_path)
 
             if df.empty:
                 if verbose >= 10:
                     logger.warning(
-                        f"Empty CSV file for patient {pat_id} at {base_path}"
+                        f"Empty annotation file for patient {pat_id} at {base_path}"
                     )
                 return pd.DataFrame()
 
         except Exception as e:
             if verbose >= 10:
                 logger.error(
-                    f"Error reading CSV for patient {pat_id} at {base_path}: {e}"
+                    f"Error reading annotations for patient {pat_id} at {base_path}: {e}"
                 )
             return pd.DataFrame()
 
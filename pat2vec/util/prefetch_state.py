@@ -0,0 +1,202 @@
+"""
+Records what incremental prefetching has already fetched for each data source.
+
+For each batch type, the state holds the time column used as a watermark, the
+latest value of that column fetched so far and the patients the fetch
+covered. A later incremental prefetch fetches only the documents newer than
+the watermark for covered patients, and the full history for new patients.
+The watermark column is the record's update time where the source has one,
+so that edited records are fetched again, and its creation or entry time
+otherwise.
+
+The state is kept as JSON next to the partitioned store it describes::
+
+    <pre_*_batch_path>/_store/_prefetch_state.json
+"""
+
+import copy
+import json
+import os
+import threading
+from dataclasses import asdict, dataclass, field
+from typing import Any, Iterable, List, Optional, Tuple
+
+import pandas as pd
+
+#: Name of the prefetch state file inside a store directory.
+PREFETCH_STATE_FILENAME = "_prefetch_state.json"
+
+# Batch types sharing a store also share its state file.
+_STATE_LOCK = threading.Lock()
+
+
+@dataclass
+class PrefetchState:
+    """What has been prefetched for one batch type."""
+
+    time_column: Optional[str] = None
+    """The column the watermark is taken from."""
+
+    watermark: Optional[str] = None
+    """The latest `time_column` value fetched, as an ISO 8601 UTC timestamp."""
+
+    patients: List[str] = field(default_factory=list)
+    """The patients covered by the fetches so far."""
+
+
+def _state_path(store_path: str) -> str:
+    return os.path.join(store_path, PREFETCH_STATE_FILENAME)
+
+
+def _read_states(store_path: str) -> dict:
+    path = _state_path(store_path)
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def load_prefetch_state(store_path: str, name: str) -> Optional[PrefetchState]:
+    """Loads the prefetch state of a batch type.
+
+    Args:
+        store_path: The store directory the batch type is written to.
+        name: The batch type name (e.g., 'bloods').
+
+    Returns:
+        The `PrefetchState`, or None if the batch type has not been
+        prefetched incrementally.
+    """
+    with _STATE_LOCK:
+        state = _read_states(store_path).get(name)
+    return PrefetchState(**state) if state is not None else None
+
+
+def save_prefetch_state(store_path: str, name: str, state: PrefetchState) -> None:
+    """Saves the prefetch state of a batch type.
+
+    Args:
+        store_path: The store directory the batch type is written to.
+        name: The batch type name (e.g., 'bloods').
+        state: The state to save.
+    """
+    os.makedirs(store_path, exist_ok=True)
+    with _STATE_LOCK:
+        states = _read_states(store_path)
+        states[name] = asdict(state)
+        tmp_path = _state_path(store_path) + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(states, f)
+        os.replace(tmp_path, _state_path(store_path))
+
+
+def _to_utc(values: Any) -> Any:
+    return pd.to_datetime(values, errors="coerce", utc=True)
+
+
+def max_time(df: Optional[pd.DataFrame], time_column: Optional[str]) -> Optional[str]:
+    """Returns the latest value of `time_column` in `df` as an ISO string.
+
+    Args:
+        df: The fetched batch.
+        time_column: The watermark column.
+
+    Returns:
+        The latest parseable timestamp, or None if there is none.
+    """
+    if df is None or time_column is None or time_column not in df.columns:
+        return None
+    latest = _to_utc(df[time_column]).max()
+    return None if pd.isna(latest) else latest.isoformat()
+
+
+def later_watermark(first: Optional[str], second: Optional[str]) -> Optional[str]:
+    """Returns the later of two watermarks, ignoring missing ones."""
+    candidates = [value for value in (first, second) if value is not None]
+    if not candidates:
+        return None
+    return max(candidates, key=_to_utc)
+
+
+def rows_after_watermark(
+    df: Optional[pd.DataFrame], time_column: Optional[str], watermark: Optional[str]
+) -> Optional[pd.DataFrame]:
+    """Keeps the rows of `df` strictly newer than `watermark`.
+
+    Rows whose time cannot be parsed are dropped, since they cannot be placed
+    relative to the watermark.
+
+    Args:
+        df: A batch fetched from the watermark's day onwards.
+        time_column: The watermark column.
+        watermark: The state's watermark.
+
+    Returns:
+        The rows after the watermark.
+    """
+    if df is None or df.empty or watermark is None or time_column not in df.columns:
+        return df
+    return df[_to_utc(df[time_column]) > _to_utc(watermark)]
+
+
+def split_cohort(
+    client_idcode_list: Iterable[Any], state: PrefetchState
+) -> Tuple[List[Any], List[Any]]:
+    """Splits a cohort into patients covered by `state` and new patients.
+
+    Args:
+        client_idcode_list: The cohort to prefetch.
+        state: The batch type's prefetch state.
+
+    Returns:
+        A tuple of `(covered_patients, new_patients)`, in cohort order.
+    """
+    covered = set(state.patients)
+    covered_patients, new_patients = [], []
+    for client_idcode in client_idcode_list:
+        if str(client_idcode) in covered:
+            covered_patients.append(client_idcode)
+        else:
+            new_patients.append(client_idcode)
+    return covered_patients, new_patients
+
+
+def delta_fetch_config(
+    config_obj: Any,
+    watermark: Optional[str] = None,
+    watermark_field: Optional[str] = None,
+) -> Any:
+    """Returns a copy of `config_obj` for an incremental fetch.
+
+    The copy bypasses the merged batch caches, which hold the previous
+    fetch, and starts the global time window on the watermark's day. The
+    `get_merged_pat_batch_*` functions overwrite their cache with the partial
+    batch fetched using this config, so the caller removes it afterwards.
+
+    Args:
+        config_obj: The configuration object.
+        watermark: The state's watermark. If None, the global start date is
+            kept.
+        watermark_field: The field the watermark was taken from, if not the
+            field the global time window applies to. The window is then kept
+            and the search restricted to records with a `watermark_field` from
+            the watermark's day onwards (`delta_fetch_field` and
+            `delta_fetch_start`, see `build_search_string`).
+
+    Returns:
+        A shallow copy of `config_obj`.
+    """
+    delta_config = copy.copy(config_obj)
+    delta_config.overwrite_stored_pat_observations = True
+    delta_config.overwrite_stored_pat_docs = True
+    delta_config.delta_fetch_field = None
+    if watermark is not None:
+        start = _to_utc(watermark)
+        if watermark_field is not None:
+            delta_config.delta_fetch_field = watermark_field
+            delta_config.delta_fetch_start = start.strftime("%Y-%m-%d")
+        else:
+            delta_config.global_start_year = f"{start.year:04d}"
+            delta_config.global_start_month = f"{start.month:02d}"
+            delta_config.global_start_day = f"{start.day:02d}"
+    return delta_config
@@ -1,6 +1,7 @@
 import pandas as pd
 import logging
 from typing import Any, Dict
+from pat2vec.util.annotation_io import find_annotation_output, read_annotation_output
 from pat2vec.util.helper_functions import get_df_from_db
 
 logger = logging.getLogger(__name__)
@@ -140,8 +141,12 @@ def retrieve_patient_data(
 
         base_path = getattr(config_obj, path_attr)
         file_path = f"{base_path}/{client_idcode}.csv"
+        if config["db_schema"] == "annotations":
+            file_path = find_annotation_output(base_path, client_idcode) or file_path
 
         try:
+            if file_path.endswith(".parquet"):
+                return read_annotation_output(file_path)
             return pd.read_csv(file_path)
         except FileNotFoundError:
             return pd.DataFrame()